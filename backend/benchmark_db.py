@@ -0,0 +1,116 @@
+"""
+Benchmark - modo pooler vs direct
+Mede a latência por query das consultas de CRUD e estatísticas com e sem
+cache de prepared statements (parse/plan reaproveitado no modo direct)
+
+Executa: python benchmark_db.py [iteracoes]
+Requer conexão direta ao Postgres (host/port do .env sem pgbouncer).
+"""
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database import HOST, PORT, build_database_url, engine_options
+from src.models import Teacher, Class, Student, StudentExam
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+
+def build_queries(teacher_id, class_id, student_id):
+    """Mesmas consultas emitidas pelas rotas de CRUD e estatísticas"""
+    return {
+        "GET /teachers/": select(Teacher).offset(0).limit(100),
+        "GET /teachers/{id}/classes": select(Class).where(Class.teacher_id == teacher_id),
+        "GET /classes/{id}/students": select(Student).where(Student.class_id == class_id),
+        "GET /students/{id}": select(Student).where(Student.id == student_id),
+        "stats: count alunos turma": select(func.count(Student.id)).where(Student.class_id == class_id),
+        "stats: genero turma": (
+            select(Student.gender, func.count(Student.id))
+            .where(Student.class_id == class_id)
+            .group_by(Student.gender)
+        ),
+        "stats: media turma": select(func.avg(Student.overall_average)).where(Student.class_id == class_id),
+        "stats: provas aluno": select(func.count(StudentExam.id)).where(StudentExam.student_id == student_id),
+        "stats: alunos professor": (
+            select(func.count(Student.id))
+            .join(Class, Student.class_id == Class.id)
+            .where(Class.teacher_id == teacher_id)
+        ),
+    }
+
+
+async def run_mode(mode: str, ids) -> dict:
+    engine = create_async_engine(build_database_url(HOST, PORT, mode), **engine_options(), pool_size=1, max_overflow=0)
+    queries = build_queries(*ids)
+    timings = {}
+    try:
+        # Uma única conexão: o ganho do modo direct vem de reaproveitar statements nela
+        async with engine.connect() as conn:
+            for name, query in queries.items():
+                await conn.execute(query)  # aquecimento (prepara o statement no modo direct)
+                samples = []
+                for _ in range(ITERATIONS):
+                    start = time.perf_counter()
+                    result = await conn.execute(query)
+                    result.all()
+                    samples.append((time.perf_counter() - start) * 1000)
+                timings[name] = samples
+    finally:
+        await engine.dispose()
+    return timings
+
+
+async def fetch_ids():
+    engine = create_async_engine(build_database_url(HOST, PORT, "pooler"), **engine_options())
+    try:
+        async with engine.connect() as conn:
+            row = (await conn.execute(
+                select(Class.teacher_id, Class.id, Student.id)
+                .join(Student, Student.class_id == Class.id)
+                .limit(1)
+            )).first()
+    finally:
+        await engine.dispose()
+    if not row:
+        raise RuntimeError("Nenhum aluno cadastrado. Rode seed_data.py e cadastre uma turma com alunos.")
+    return row
+
+
+def print_section(title):
+    print(f"\n{'='*78}")
+    print(f"  {title}")
+    print(f"{'='*78}\n")
+
+
+async def main():
+    ids = await fetch_ids()
+    results = {}
+    for mode in ("pooler", "direct"):
+        print(f" Rodando modo {mode} ({ITERATIONS} iterações por query)...")
+        results[mode] = await run_mode(mode, ids)
+
+    print_section("LATÊNCIA POR QUERY (ms) - mediana / p95")
+    print(f"{'query':<32}{'pooler':>16}{'direct':>16}{'economia':>12}")
+    total_saved = []
+    for name in results["pooler"]:
+        pooler = results["pooler"][name]
+        direct = results["direct"][name]
+        p_med, d_med = statistics.median(pooler), statistics.median(direct)
+        p_p95 = statistics.quantiles(pooler, n=20)[-1]
+        d_p95 = statistics.quantiles(direct, n=20)[-1]
+        saved = p_med - d_med
+        total_saved.append(saved)
+        print(f"{name:<32}{p_med:>8.3f}/{p_p95:<7.3f}{d_med:>8.3f}/{d_p95:<7.3f}{saved:>11.3f}")
+
+    print(f"\n Economia média de parse/plan por query: {statistics.mean(total_saved):.3f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Benchmark offline dos fluxos com LLM (sem Gemini/OpenAI): correção de provas
+(evaluate_exam), relatório da análise causal (analyze_causal_factors) e /chat/
+Por padrão usa o LLM falso em processo (LLM_PROVIDER=fake) e desliga o cache de
+respostas; latência, ritmo e erros seguem FAKE_LLM_* (src/fake_llm.py).
+
+Executa: python benchmark_llm.py [requisicoes] [concorrencia]
+Ex.: FAKE_LLM_LATENCY=lognormal:800:0.5 FAKE_LLM_ERROR_RATE=0.05 python benchmark_llm.py 50 10
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("CHAT_LLM_PROVIDER", "fake")
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+import httpx
+
+from src.analysis.causal_analysis import analyze_causal_factors, load_dashboard_from_file
+from src.correction.gemini import evaluate_exam
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+CONCURRENCY = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+QUESTOES_POR_PROVA = 10
+
+DASHBOARD_PATH = Path(__file__).parent / "utils" / "dados_dashboard.json"
+
+
+def build_exam():
+    """Prova sintética com QUESTOES_POR_PROVA questões discursivas"""
+    questoes = [
+        {"numero": n, "letra": "", "tipo": "discursiva", "pergunta": f"Pergunta {n}?",
+         "nota_maxima": 1.0, "resposta_aluno": f"Resposta do aluno à questão {n}."}
+        for n in range(1, QUESTOES_POR_PROVA + 1)
+    ]
+    gabarito = [{"numero": n, "letra": "", "resposta_esperada": f"Resposta esperada {n}."} for n in range(1, QUESTOES_POR_PROVA + 1)]
+    return {"questoes": questoes}, gabarito
+
+
+async def run_load(name: str, make_call) -> dict:
+    """REQUESTS chamadas com no máximo CONCURRENCY simultâneas"""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    samples, errors = [], 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await make_call()
+            except Exception:
+                errors += 1
+                return
+            samples.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(REQUESTS)])
+    elapsed = time.perf_counter() - started
+    samples.sort()
+    return {
+        "fluxo": name,
+        "ok": len(samples),
+        "erros": errors,
+        "p50_ms": round(statistics.median(samples), 1) if samples else None,
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 1) if samples else None,
+        "req_s": round(len(samples) / elapsed, 2),
+    }
+
+
+async def main():
+    from src.main import app
+
+    exam, gabarito = build_exam()
+    dashboard = load_dashboard_from_file(str(DASHBOARD_PATH))
+    transport = httpx.ASGITransport(app=app)
+    chat_body = {"messages": [{"role": "user", "content": "Quantos alunos estão em risco?"}]}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def chat():
+            async with client.stream("POST", "/chat/", json=chat_body) as resp:
+                async for line in resp.aiter_lines():
+                    if line.startswith("e:"):
+                        raise RuntimeError(line)
+
+        results = [
+            await run_load("evaluate_exam", lambda: evaluate_exam(exam, gabarito)),
+            await run_load("analyze_causal_factors (relatório)", lambda: analyze_causal_factors(dashboard, formato_relatorio=True)),
+            await run_load("POST /chat/", chat),
+        ]
+
+    print(f"\n {REQUESTS} requisições, {CONCURRENCY} simultâneas, provedor {os.environ['LLM_PROVIDER']}")
+    print(f" {'fluxo':<40}{'ok':>6}{'erros':>7}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>8}")
+    for r in results:
+        print(f" {r['fluxo']:<40}{r['ok']:>6}{r['erros']:>7}{str(r['p50_ms']):>10}{str(r['p95_ms']):>10}{r['req_s']:>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
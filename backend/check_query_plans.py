@@ -0,0 +1,172 @@
+"""
+Regressão de planos - EXPLAIN das queries quentes das rotas
+Falha (exit 1) se alguma consulta filtrada cair em Seq Scan, ou seja, se um
+índice de migrations/002_indices_fk_filtros.sql sumir ou deixar de servir à query.
+
+Executa: python check_query_plans.py            planner com enable_seqscan=off:
+                                                 Seq Scan = não existe índice utilizável
+         python check_query_plans.py --natural  planner com as estatísticas reais: só
+                                                 reprova Seq Scan em tabelas com pelo
+                                                 menos QUERY_PLAN_MIN_ROWS linhas
+Só roda EXPLAIN (sem ANALYZE): não executa as queries nem precisa de dados.
+"""
+import asyncio
+import json
+import os
+import sys
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from sqlalchemy import select, func, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database import HOST, PORT, build_database_url, engine_options
+from src.models import Class, Student, Exam, Question, StudentExam, StudentAnswer
+from src.models_dashboard import (
+    Turma, Aluno, ClusterTurma, DistribuicaoFaixa, FatorCritico, AlunoRisco, TendenciaNota, RelatorioGeral, PlanoAcao
+)
+
+# Abaixo disso o Seq Scan é a escolha certa do planner (modo --natural)
+QUERY_PLAN_MIN_ROWS = int(os.getenv("QUERY_PLAN_MIN_ROWS", "10000"))
+
+# Os ids não precisam existir: o plano depende só da forma da query
+TEACHER_ID, CLASS_ID, STUDENT_ID, EXAM_ID = (uuid.uuid4() for _ in range(4))
+TURMA_ID, ESCOLA_ID = uuid.uuid4(), uuid.uuid4()
+
+
+def build_queries():
+    """Mesmas formas de consulta emitidas pelas rotas (routes.py / routes_dashboard.py)"""
+    return {
+        # CRUD
+        "GET /teachers/{id}/classes": select(Class).where(Class.teacher_id == TEACHER_ID),
+        "GET /classes/{id}/students": select(Student).where(Student.class_id == CLASS_ID),
+        "GET /search/students?name=": select(Student.id, Student.name).where(Student.name.ilike("%silva%")).limit(100),
+        "GET /search/students?min_average=": (
+            select(Student.id, Student.overall_average).where(Student.overall_average >= 9.5).limit(100)
+        ),
+        "DELETE /teachers/{id} (alunos)": (
+            select(Class.id, Student.id).outerjoin(Student, Student.class_id == Class.id)
+            .where(Class.teacher_id == TEACHER_ID)
+        ),
+        "exams da turma": select(Exam).where(Exam.class_id == CLASS_ID),
+        "exams do professor": select(Exam).where(Exam.teacher_id == TEACHER_ID),
+        "questões da prova": select(Question).where(Question.exam_id == EXAM_ID),
+        "respostas por questão": select(StudentAnswer).where(StudentAnswer.question_id == uuid.uuid4()),
+        # Estatísticas
+        "stats: genero turma": (
+            select(Student.gender, func.count(Student.id))
+            .where(Student.class_id == CLASS_ID)
+            .group_by(Student.gender)
+        ),
+        "stats: media turma": select(func.avg(Student.overall_average)).where(Student.class_id == CLASS_ID),
+        "stats: provas aluno": (
+            select(func.count(StudentExam.id), func.avg(StudentExam.total_score))
+            .where(StudentExam.student_id == STUDENT_ID)
+        ),
+        "stats: professor": (
+            select(func.count(Class.id), func.coalesce(func.sum(Class.student_count), 0))
+            .where(Class.teacher_id == TEACHER_ID)
+        ),
+        # Dashboard
+        "GET /dashboard/turmas?escola_id=": select(Turma).where(Turma.escola_id == ESCOLA_ID),
+        "GET /dashboard/alunos?turma_id=": select(Aluno).where(Aluno.turma_id == TURMA_ID),
+        "GET /dashboard/alunos?escola_id=": select(Aluno).where(Aluno.escola_id == ESCOLA_ID),
+        "GET /dashboard/alunos?cluster_id=": select(Aluno).where(Aluno.cluster_id == 3),
+        "GET /dashboard/turmas/{id}/clusters": select(ClusterTurma).where(ClusterTurma.turma_id == TURMA_ID),
+        "GET /dashboard/distribuicao-faixas/": select(DistribuicaoFaixa).where(DistribuicaoFaixa.turma_id == TURMA_ID),
+        "GET /dashboard/fatores-criticos/": select(FatorCritico).where(FatorCritico.turma_id == TURMA_ID),
+        "GET /dashboard/alunos-risco/": select(AlunoRisco).where(AlunoRisco.nivel_risco == "Alto"),
+        "GET /dashboard/alunos/{id}/risco": select(AlunoRisco).where(AlunoRisco.aluno_id == 1),
+        "GET /dashboard/tendencias-notas?disciplina=": (
+            select(TendenciaNota).where(TendenciaNota.alerta_queda, TendenciaNota.disciplina == "matematica")
+            .order_by(TendenciaNota.inclinacao).limit(100)
+        ),
+        "GET /dashboard/alunos/{id}/tendencias": select(TendenciaNota).where(TendenciaNota.aluno_id == 1),
+        "GET /dashboard/relatorios?turma_id=": (
+            select(RelatorioGeral).where(RelatorioGeral.turma_id == TURMA_ID)
+            .order_by(RelatorioGeral.data_geracao.desc())
+        ),
+        "GET /dashboard/relatorios?tipo_relatorio=": (
+            select(RelatorioGeral).where(RelatorioGeral.tipo_relatorio == "analise_geral")
+            .order_by(RelatorioGeral.data_geracao.desc()).limit(1)
+        ),
+        "GET /dashboard/planos-acao?turma_id=": select(PlanoAcao).where(PlanoAcao.turma_id == TURMA_ID),
+    }
+
+
+def seq_scans(plan: dict) -> list:
+    """Tabelas lidas por Seq Scan em qualquer nó do plano"""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def explain_all(natural: bool) -> list:
+    engine = create_async_engine(build_database_url(HOST, PORT, "pooler"), **engine_options())
+    failures = []
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                text("SELECT relname, reltuples::bigint FROM pg_class WHERE relkind = 'r'")
+            )
+            table_rows = dict(result.all())
+            await conn.rollback()
+
+            for name, query in build_queries().items():
+                sql = str(query.compile(engine.sync_engine, compile_kwargs={"literal_binds": True}))
+                # SET LOCAL vale só nesta transação, desfeita logo em seguida
+                transaction = await conn.begin()
+                try:
+                    if not natural:
+                        await conn.execute(text("SET LOCAL enable_seqscan = off"))
+                    result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+                    plan = result.scalar()
+                finally:
+                    await transaction.rollback()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+
+                root = plan[0]["Plan"]
+                scans = [
+                    table for table in seq_scans(root)
+                    if not natural or table_rows.get(table, 0) >= QUERY_PLAN_MIN_ROWS
+                ]
+                status = "FALHOU" if scans else "ok"
+                detail = ", ".join(f"Seq Scan em {t} (~{table_rows.get(t, 0)} linhas)" for t in scans)
+                print(f" [{status:>6}] {name:<46} custo {root['Total Cost']:>10.2f}  {detail}")
+                if scans:
+                    failures.append((name, scans, sql))
+    finally:
+        await engine.dispose()
+    return failures
+
+
+def print_section(title):
+    print(f"\n{'='*78}")
+    print(f"  {title}")
+    print(f"{'='*78}\n")
+
+
+async def main():
+    natural = "--natural" in sys.argv
+    mode = f"planner real, tabelas >= {QUERY_PLAN_MIN_ROWS} linhas" if natural else "enable_seqscan=off"
+    print_section(f"PLANOS DAS QUERIES QUENTES ({mode})")
+    failures = await explain_all(natural)
+
+    if failures:
+        print_section(f"{len(failures)} QUERY(S) SEM ÍNDICE")
+        for name, scans, sql in failures:
+            print(f" {name}: {', '.join(scans)}")
+            print(f"   {' '.join(sql.split())}\n")
+        print(" Rode python migrate.py ou confira os índices em migrations/002_indices_fk_filtros.sql")
+        sys.exit(1)
+    print("\n Todas as queries usam índice")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
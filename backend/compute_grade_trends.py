@@ -0,0 +1,31 @@
+"""
+Recalcula as tendências das notas bimestrais (notas_bimestrais -> tendencias_notas)
+fora do agendador da API
+
+Executa: python compute_grade_trends.py          só séries com nota nova/alterada
+         python compute_grade_trends.py --full   todas as séries
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from src.database import AsyncSessionLocal, init_engines
+from src.grade_trends import update_tendencias
+
+
+async def main(full: bool):
+    init_engines()
+    async with AsyncSessionLocal() as db:
+        trends = await update_tendencias(db, full=full)
+
+    if trends is None:
+        print(" Cálculo de tendências já em andamento em outro processo")
+        return
+    print(f" {trends['series']} série(s) aluno/disciplina, {trends['alertas']} com alerta de queda")
+    print(f" leitura {trends['load_ms']} ms | cálculo {trends['trend_ms']} ms | gravação {trends['write_ms']} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main("--full" in sys.argv[1:]))
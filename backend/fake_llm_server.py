@@ -0,0 +1,22 @@
+"""
+Servidor de LLM falso para testes offline (imita as APIs REST do Gemini e da OpenAI)
+Latência, ritmo do streaming e taxa de erro vêm das variáveis FAKE_LLM_* (src/fake_llm.py).
+
+Executa: python fake_llm_server.py [porta]     (padrão 8090)
+
+Apontando a API para ele:
+    LLM_PROVIDER=http GEMINI_BASE_URL=http://localhost:8090    análise causal e correção
+    CHAT_LLM_PROVIDER=openai OPENAI_BASE_URL=http://localhost:8090/v1 OPENAI_API_KEY=fake    /chat/
+"""
+import sys
+
+import uvicorn
+
+from src.fake_llm import create_fake_llm_app, fake_config
+
+PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 8090
+
+
+if __name__ == "__main__":
+    print(f" LLM falso em http://localhost:{PORT} | latência {fake_config.latency.spec} | erros {fake_config.error_rate:.0%}")
+    uvicorn.run(create_fake_llm_app(), host="0.0.0.0", port=PORT, log_level="warning")
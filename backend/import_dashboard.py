@@ -0,0 +1,437 @@
+"""
+Importação em lote para as tabelas do dashboard (models_dashboard)
+Aceita o roster CSV (research/dados_alunos.csv) ou a saída do
+generate_dashboard_data (utils/dados_dashboard.json).
+
+- escolas / turmas: criadas se ainda não existem (por nome / escola + nome)
+- alunos: COPY para uma tabela temporária + upsert por cpf_aluno (ids do arquivo
+  conciliados antes: aluno que ganhou CPF, id já usado por outro CPF)
+- notas_bimestrais: notas das colunas largas dos alunos importados (formato longo)
+- só no JSON: clusters_globais (upsert), clusters_turma, distribuicao_faixas e
+  fatores_criticos (substituídos) também via COPY, em lote
+- agregados das turmas recalculados no fim
+Tudo numa única transação: se algo falhar, nada fica gravado.
+Depois do commit, o risco e as tendências de notas dos alunos novos/alterados
+são recalculados (src/risk_scoring.py, src/grade_trends.py) e as materialized
+views de estatísticas são atualizadas.
+
+Executa: python import_dashboard.py [arquivo.csv|arquivo.json]
+         (padrão: utils/dados_dashboard.json)
+"""
+import asyncio
+import csv
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from sqlalchemy import Float, Integer, column, delete, func, insert, select, table, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from src.database import AsyncSessionLocal, init_engines
+from src.aggregates import refresh_turma_aggregates
+from src.materialized_views import refresh_materialized_views
+from src.risk_scoring import score_alunos
+from src.grade_trends import prune_notas_sql, sync_notas_sql, update_tendencias
+from src.models_dashboard import (
+    Escola, Turma, Aluno, ClusterGlobal, ClusterTurma, DistribuicaoFaixa, FatorCritico
+)
+
+DEFAULT_INPUT = Path(__file__).parent / "utils" / "dados_dashboard.json"
+
+# Colunas gravadas pela importação (id de origem incluso; timestamps ficam com o banco)
+ALUNO_COLUMNS = [c.name for c in Aluno.__table__.columns if c.name not in ("created_at", "updated_at")]
+# O roster CSV não traz cluster: reimportar o CSV não apaga o que o JSON gravou
+KEEP_IF_NULL = ("cluster_id", "cluster_turma_id")
+
+# Chaves do formato antigo dos alunos no JSON (sem o sufixo _aluno)
+ALUNO_KEY_ALIASES = {"turma": "turma_nome", "cpf": "cpf_aluno", "telefone": "telefone_aluno", "idade": "idade_aluno"}
+
+ALUNOS_STAGING = table("alunos_import", *[column(name) for name in ALUNO_COLUMNS])
+
+FATORES_DESCRICAO = {
+    "trabalho": "Alunos que trabalham fora da escola",
+    "baixa_renda": "Renda familiar abaixo de R$1.500",
+    "deslocamento_longo": "Deslocamento maior que 60 minutos",
+    "inseg_alimentar": "Alunos em insegurança alimentar",
+    "sem_internet": "Alunos sem acesso à internet",
+    "pretos_pardos_indigenas": "Alunos pretos, pardos ou indígenas",
+}
+
+
+# =========================
+# Leitura dos arquivos
+# =========================
+
+def _converter(col):
+    if isinstance(col.type, Integer):
+        return lambda value: int(float(value))
+    if isinstance(col.type, Float):
+        return float
+    return str
+
+
+CONVERTERS = {name: _converter(Aluno.__table__.c[name]) for name in ALUNO_COLUMNS}
+
+
+def aluno_row(source: dict) -> dict:
+    """Linha do CSV (cabeçalhos como Nome_Aluno) ou aluno do JSON -> colunas de alunos"""
+    row = {}
+    for key, value in source.items():
+        name = ALUNO_KEY_ALIASES.get(key.lower(), key.lower())
+        convert = CONVERTERS.get(name)
+        if convert is None:
+            continue
+        row[name] = None if value is None or value == "" else convert(value)
+    return row
+
+
+def read_roster_csv(path: Path) -> dict:
+    alunos = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for source in csv.DictReader(f):
+            alunos.append((source["Escola"], source.get("Endereco_Escola"), source.get("Serie"), aluno_row(source)))
+    return {"alunos": alunos}
+
+
+def read_dashboard_json(path: Path) -> dict:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    # Alunos no formato antigo não trazem a escola: só dá para inferir se o arquivo tem uma só
+    escolas = {
+        aluno["escola"]: aluno.get("endereco_escola")
+        for cluster in data.get("clusters_globais", []) for aluno in cluster.get("alunos", []) if aluno.get("escola")
+    }
+    escola_padrao = next(iter(escolas)) if len(escolas) == 1 else None
+
+    def entry(aluno: dict) -> tuple:
+        escola = aluno.get("escola") or escola_padrao
+        if escola is None:
+            raise ValueError(f"Aluno {aluno['id']} sem escola e o arquivo tem {len(escolas)} escolas")
+        return escola, escolas.get(escola), aluno.get("serie"), aluno_row(aluno)
+
+    # Todo aluno aparece em exatamente um cluster global; o cluster da turma vem de dados_por_turma
+    alunos = {}
+    for cluster in data.get("clusters_globais", []):
+        for aluno in cluster.get("alunos", []):
+            alunos[aluno["id"]] = entry(aluno)
+            alunos[aluno["id"]][3]["cluster_id"] = cluster["cluster_id"]
+    for turma in data.get("dados_por_turma", []):
+        for cluster in turma.get("clusters_turma", []):
+            for aluno in cluster.get("alunos", []):
+                if aluno["id"] not in alunos:
+                    alunos[aluno["id"]] = entry(aluno)
+                alunos[aluno["id"]][3]["cluster_turma_id"] = cluster["cluster_id"]
+
+    return {
+        "alunos": list(alunos.values()),
+        "metadata": data.get("metadata", {}),
+        "resumo_geral": data.get("resumo_geral", {}),
+        "clusters_globais": data.get("clusters_globais", []),
+        "dados_por_turma": data.get("dados_por_turma", []),
+    }
+
+
+def dedupe_alunos(alunos: list) -> list:
+    """Último registro de cada CPF vence (o upsert não pode tocar a mesma linha duas vezes)"""
+    by_key = {}
+    for entry in alunos:
+        row = entry[3]
+        by_key[("cpf", row["cpf_aluno"]) if row.get("cpf_aluno") else ("id", row["id"])] = entry
+    return list(by_key.values())
+
+
+# =========================
+# Escrita
+# =========================
+
+def report(stage: str, rows: int, started: float):
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed > 0 else 0
+    print(f" {stage:<30}{rows:>9} linhas {elapsed:>8.2f} s {rate:>10.0f} linhas/s")
+
+
+async def copy_records(db, table_name: str, columns: list, records: list):
+    """COPY binário pela conexão asyncpg da própria sessão (mesma transação)"""
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(table_name, records=records, columns=columns)
+
+
+async def resolve_escolas(db, alunos: list) -> dict:
+    enderecos = {escola: endereco for escola, endereco, _, _ in alunos}
+    result = await db.execute(select(Escola.nome, Escola.id).where(Escola.nome.in_(list(enderecos))))
+    ids = dict(result.all())
+    novas = [{"id": uuid.uuid4(), "nome": nome, "endereco": endereco} for nome, endereco in enderecos.items() if nome not in ids]
+    if novas:
+        await db.execute(insert(Escola), novas)
+        ids.update({escola["nome"]: escola["id"] for escola in novas})
+    return ids
+
+
+async def resolve_turmas(db, alunos: list, escola_ids: dict) -> dict:
+    series = {(escola_ids[escola], row.get("turma_nome")): serie for escola, _, serie, row in alunos}
+    result = await db.execute(
+        select(Turma.escola_id, Turma.nome, Turma.id).where(Turma.escola_id.in_(list(escola_ids.values())))
+    )
+    ids = {(escola_id, nome): turma_id for escola_id, nome, turma_id in result.all()}
+    novas = [
+        {"id": uuid.uuid4(), "escola_id": escola_id, "nome": nome, "serie": serie}
+        for (escola_id, nome), serie in series.items() if (escola_id, nome) not in ids
+    ]
+    if novas:
+        await db.execute(insert(Turma), novas)
+        ids.update({(turma["escola_id"], turma["nome"]): turma["id"] for turma in novas})
+    return ids
+
+
+# Antes do upsert por CPF, os ids do arquivo são conciliados com os do banco:
+# - aluno já importado sem CPF (linha com o mesmo id e cpf_aluno vazio) que agora
+#   tem CPF: a linha recebe o CPF e o upsert por cpf_aluno a encontra
+ADOTAR_CPF_SQL = text("""
+UPDATE alunos a SET cpf_aluno = i.cpf_aluno
+FROM alunos_import i
+WHERE a.id = i.id AND a.cpf_aluno IS NULL AND i.cpf_aluno IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM alunos x WHERE x.cpf_aluno = i.cpf_aluno)
+""")
+# - CPF novo cujo id do arquivo já é de outro aluno (outro CPF): ganha um id novo,
+#   acima de todos os ids do banco e do arquivo (o INSERT violaria a chave primária)
+NOVOS_IDS_SQL = text("""
+WITH base AS (
+    SELECT GREATEST(
+        (SELECT COALESCE(max(id), 0) FROM alunos),
+        (SELECT COALESCE(max(id), 0) FROM alunos_import)
+    ) AS maximo
+),
+conflitos AS (
+    SELECT i.ctid AS linha, row_number() OVER (ORDER BY i.id) AS n
+    FROM alunos_import i
+    WHERE i.cpf_aluno IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM alunos x WHERE x.cpf_aluno = i.cpf_aluno)
+      AND EXISTS (SELECT 1 FROM alunos a WHERE a.id = i.id)
+)
+UPDATE alunos_import i SET id = base.maximo + c.n
+FROM conflitos c, base
+WHERE i.ctid = c.linha
+""")
+
+
+def _upsert_alunos(conflict: str):
+    """INSERT ... SELECT da tabela temporária com ON CONFLICT na chave dada"""
+    staged = select(*ALUNOS_STAGING.c).where(
+        ALUNOS_STAGING.c.cpf_aluno.isnot(None) if conflict == "cpf_aluno" else ALUNOS_STAGING.c.cpf_aluno.is_(None)
+    )
+    stmt = pg_insert(Aluno).from_select(ALUNO_COLUMNS, staged)
+    values = {}
+    for name in ALUNO_COLUMNS:
+        if name in ("id", conflict):
+            continue
+        values[name] = func.coalesce(stmt.excluded[name], getattr(Aluno, name)) if name in KEEP_IF_NULL else stmt.excluded[name]
+    values["updated_at"] = func.now()
+    return stmt.on_conflict_do_update(index_elements=[conflict], set_=values)
+
+
+async def load_alunos(db, alunos: list, escola_ids: dict, turma_ids: dict) -> int:
+    await db.execute(text("CREATE TEMP TABLE alunos_import (LIKE alunos INCLUDING DEFAULTS) ON COMMIT DROP"))
+
+    started = time.perf_counter()
+    records = []
+    for escola, _, _, row in alunos:
+        row["escola_id"] = escola_ids[escola]
+        row["turma_id"] = turma_ids[(row["escola_id"], row.get("turma_nome"))]
+        records.append(tuple(row.get(name) for name in ALUNO_COLUMNS))
+    await copy_records(db, "alunos_import", ALUNO_COLUMNS, records)
+    report("alunos (COPY)", len(records), started)
+
+    started = time.perf_counter()
+    adotados = (await db.execute(ADOTAR_CPF_SQL)).rowcount
+    adotados += (await db.execute(NOVOS_IDS_SQL)).rowcount
+    report("alunos (ids conciliados)", adotados, started)
+
+    started = time.perf_counter()
+    upserted = (await db.execute(_upsert_alunos("cpf_aluno"))).rowcount
+    upserted += (await db.execute(_upsert_alunos("id"))).rowcount
+    report("alunos (upsert por cpf)", upserted, started)
+
+    # Mesmas chaves do upsert: o id no banco pode diferir do id do arquivo quando o CPF já existia
+    started = time.perf_counter()
+    notas = (await db.execute(text(sync_notas_sql("JOIN alunos_import i ON i.cpf_aluno = a.cpf_aluno")))).scalar()
+    notas += (await db.execute(text(sync_notas_sql("JOIN alunos_import i ON i.id = a.id AND i.cpf_aluno IS NULL")))).scalar()
+    report("notas bimestrais", notas, started)
+
+    # Notas que ficaram vazias no arquivo saem de notas_bimestrais (e a série é recalculada)
+    started = time.perf_counter()
+    removidas = (await db.execute(text(prune_notas_sql("JOIN alunos_import i ON i.cpf_aluno = a.cpf_aluno")))).scalar()
+    removidas += (await db.execute(text(prune_notas_sql("JOIN alunos_import i ON i.id = a.id AND i.cpf_aluno IS NULL")))).scalar()
+    report("notas bimestrais removidas", removidas, started)
+    return upserted
+
+
+async def load_clusters_globais(db, clusters: list) -> int:
+    if not clusters:
+        return 0
+    rows = [
+        {
+            "cluster_id": cluster["cluster_id"],
+            "total_alunos": cluster["total_alunos"],
+            "percentual": cluster["percentual"],
+            **{key: cluster["caracteristicas"].get(key) for key in (
+                "media_notas", "renda_media", "pct_trabalha", "tempo_desl_medio", "pct_pretos_pardos", "pct_inseg_alimentar"
+            )},
+            "features_relevantes": cluster.get("features_relevantes"),
+        }
+        for cluster in clusters
+    ]
+    stmt = pg_insert(ClusterGlobal).values(rows)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=["cluster_id"],
+        set_={name: stmt.excluded[name] for name in rows[0] if name != "cluster_id"}
+    ))
+    return len(rows)
+
+
+def _turma_of_cluster_data(turma: dict, turma_ids: dict, escola_ids: dict):
+    """dados_por_turma só traz o nome da turma: resolve a escola pelos alunos dela"""
+    candidates = {turma_id for (_, nome), turma_id in turma_ids.items() if nome == turma["turma"]}
+    if len(candidates) == 1:
+        return candidates.pop()
+    for cluster in turma.get("clusters_turma", []):
+        for aluno in cluster.get("alunos", []):
+            if aluno.get("escola") in escola_ids:
+                return turma_ids.get((escola_ids[aluno["escola"]], turma["turma"]))
+    return None
+
+
+async def load_analysis(db, data: dict, turma_ids: dict, escola_ids: dict) -> int:
+    """clusters_turma, distribuicao_faixas e fatores_criticos: substitui os das turmas importadas e os globais"""
+    total = data["metadata"].get("total_alunos") or len(data["alunos"])
+    clusters_turma, faixas = [], []
+
+    for turma in data["dados_por_turma"]:
+        turma_id = _turma_of_cluster_data(turma, turma_ids, escola_ids)
+        if turma_id is None:
+            print(f" Aviso: turma {turma['turma']} ambígua entre escolas, análise dela ignorada")
+            continue
+        for cluster in turma.get("clusters_turma", []):
+            caracteristicas = cluster.get("caracteristicas", {})
+            clusters_turma.append((
+                uuid.uuid4(), turma_id, cluster["cluster_id"], cluster["total_alunos"],
+                round(cluster["total_alunos"] / turma["total_alunos"] * 100, 1) if turma["total_alunos"] else None,
+                cluster.get("intervalo_notas", {}).get("media"),
+                caracteristicas.get("renda_media"), caracteristicas.get("pct_trabalha"), caracteristicas.get("tempo_desl_medio"),
+                json.dumps(cluster.get("features_relevantes", []), ensure_ascii=False),
+            ))
+        for faixa, values in turma.get("distribuicao_faixas", {}).items():
+            faixas.append((
+                uuid.uuid4(), turma_id, faixa, None, None, None, None,
+                values["total"], values["percentual"], None, None, None, False,
+            ))
+
+    for faixa in data["resumo_geral"].get("por_faixa", []):
+        intervalo = faixa.get("intervalo_notas", {})
+        faixas.append((
+            uuid.uuid4(), None, faixa["faixa"],
+            intervalo.get("min"), intervalo.get("max"), intervalo.get("media"), intervalo.get("mediana"),
+            faixa["total_alunos"], faixa["percentual"], faixa.get("pct_trabalha"), faixa.get("renda_media"),
+            faixa.get("pct_pretos_pardos"), True,
+        ))
+
+    fatores = [
+        (uuid.uuid4(), tipo, FATORES_DESCRICAO.get(tipo), afetados, round(afetados / total * 100, 1) if total else None, None, True)
+        for tipo, afetados in data["resumo_geral"].get("fatores_criticos", {}).items()
+    ]
+
+    imported = list(set(turma_ids.values()))
+    await db.execute(delete(ClusterTurma).where(ClusterTurma.turma_id.in_(imported)))
+    await db.execute(delete(DistribuicaoFaixa).where(
+        DistribuicaoFaixa.turma_id.in_(imported) | (DistribuicaoFaixa.is_global & DistribuicaoFaixa.turma_id.is_(None))
+    ))
+    if fatores:
+        await db.execute(delete(FatorCritico).where(FatorCritico.is_global & FatorCritico.turma_id.is_(None)))
+
+    await copy_records(db, "clusters_turma", [
+        "id", "turma_id", "cluster_id", "total_alunos", "percentual", "media_notas",
+        "renda_media", "pct_trabalha", "tempo_desl_medio", "features_relevantes",
+    ], clusters_turma)
+    await copy_records(db, "distribuicao_faixas", [
+        "id", "turma_id", "faixa", "nota_min", "nota_max", "nota_media", "nota_mediana",
+        "total_alunos", "percentual", "pct_trabalha", "renda_media", "pct_pretos_pardos", "is_global",
+    ], faixas)
+    await copy_records(db, "fatores_criticos", [
+        "id", "tipo_fator", "descricao", "total_alunos_afetados", "percentual_afetados", "turma_id", "is_global",
+    ], fatores)
+    return len(clusters_turma) + len(faixas) + len(fatores)
+
+
+async def import_file(path: Path):
+    started_total = time.perf_counter()
+
+    started = time.perf_counter()
+    data = read_roster_csv(path) if path.suffix.lower() == ".csv" else read_dashboard_json(path)
+    data["alunos"] = dedupe_alunos(data["alunos"])
+    report(f"leitura ({path.name})", len(data["alunos"]), started)
+    if not data["alunos"]:
+        print(" Nenhum aluno no arquivo")
+        return
+
+    init_engines()
+    async with AsyncSessionLocal() as db:
+        try:
+            started = time.perf_counter()
+            escola_ids = await resolve_escolas(db, data["alunos"])
+            turma_ids = await resolve_turmas(db, data["alunos"], escola_ids)
+            report("escolas + turmas", len(escola_ids) + len(turma_ids), started)
+
+            # Antes dos alunos: alunos.cluster_id referencia clusters_globais
+            started = time.perf_counter()
+            report("clusters_globais", await load_clusters_globais(db, data.get("clusters_globais", [])), started)
+
+            upserted = await load_alunos(db, data["alunos"], escola_ids, turma_ids)
+
+            if "dados_por_turma" in data:
+                started = time.perf_counter()
+                report("análise por turma (COPY)", await load_analysis(db, data, turma_ids, escola_ids), started)
+
+            started = time.perf_counter()
+            report("agregados das turmas", await refresh_turma_aggregates(db), started)
+
+            started = time.perf_counter()
+            await db.commit()
+            report("commit", upserted, started)
+        except Exception:
+            await db.rollback()
+            raise
+
+    report("TOTAL", upserted, started_total)
+
+    # Risco dos alunos novos/alterados antes do refresh (as views contam alunos_risco)
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        scored = await score_alunos(db)
+    if scored is None:
+        print(" Scoring de risco já em andamento em outro processo")
+    else:
+        report("scoring de risco", scored["alunos"], started)
+
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        trends = await update_tendencias(db)
+    if trends is None:
+        print(" Cálculo de tendências já em andamento em outro processo")
+    else:
+        report(f"tendências ({trends['alertas']} alertas)", trends["series"], started)
+
+    async with AsyncSessionLocal() as db:
+        durations = await refresh_materialized_views(db)
+    if durations is None:
+        print(" Refresh das materialized views já em andamento em outro processo")
+    else:
+        print(f" Materialized views atualizadas: {durations}")
+
+
+if __name__ == "__main__":
+    asyncio.run(import_file(Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_INPUT))
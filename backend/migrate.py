@@ -0,0 +1,88 @@
+"""
+Aplica as migrations SQL de backend/migrations em ordem
+Cada arquivo NNN_nome.sql roda uma única vez (registrado em schema_migrations).
+Arquivos com "-- migrate: no-transaction" (ex: CREATE INDEX CONCURRENTLY) rodam
+statement a statement, fora de transação.
+
+Executa: python migrate.py            aplica as pendentes
+         python migrate.py --status   só lista aplicadas/pendentes
+Use a conexão direta (não o pgbouncer) para DDL.
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import asyncpg
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from src.database import USER, PASSWORD, HOST, PORT, DBNAME
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+
+
+def split_statements(sql: str) -> list:
+    """Separa os statements (um ';' no fim da linha encerra cada um)"""
+    statements, current = [], []
+    for line in sql.splitlines():
+        if line.strip().startswith("--") and not current:
+            continue
+        current.append(line)
+        if line.rstrip().endswith(";"):
+            statements.append("\n".join(current).strip())
+            current = []
+    if "".join(current).strip():
+        statements.append("\n".join(current).strip())
+    return statements
+
+
+async def applied_versions(conn) -> set:
+    await conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version TEXT PRIMARY KEY,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """
+    )
+    rows = await conn.fetch("SELECT version FROM schema_migrations")
+    return {row["version"] for row in rows}
+
+
+async def migrate(status_only: bool = False):
+    if not all([USER, PASSWORD, HOST, PORT, DBNAME]):
+        raise ValueError("Credenciais do banco não encontradas no arquivo .env")
+
+    conn = await asyncpg.connect(user=USER, password=PASSWORD, host=HOST, port=PORT, database=DBNAME)
+    try:
+        done = await applied_versions(conn)
+        pending = [path for path in sorted(MIGRATIONS_DIR.glob("*.sql")) if path.stem not in done]
+
+        for version in sorted(done):
+            print(f" [aplicada] {version}")
+        for path in pending:
+            print(f" [pendente] {path.stem}")
+        if status_only or not pending:
+            return
+
+        for path in pending:
+            print(f" Aplicando {path.name}...")
+            sql = path.read_text(encoding="utf-8")
+            if NO_TRANSACTION_MARKER in sql:
+                # Statements idempotentes (IF NOT EXISTS): se falhar no meio, basta rodar de novo
+                for statement in split_statements(sql):
+                    await conn.execute(statement)
+                await conn.execute("INSERT INTO schema_migrations (version) VALUES ($1)", path.stem)
+                continue
+            # Cada migration roda numa transação: se falhar, nada dela fica aplicado
+            async with conn.transaction():
+                await conn.execute(sql)
+                await conn.execute("INSERT INTO schema_migrations (version) VALUES ($1)", path.stem)
+        print(f" {len(pending)} migration(s) aplicada(s)")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate(status_only="--status" in sys.argv))
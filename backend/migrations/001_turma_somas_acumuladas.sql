@@ -0,0 +1,12 @@
+-- Somas acumuladas por turma (dashboard), mantidas incrementalmente em src/aggregates.py.
+-- Os valores são preenchidos pela reconciliação (reconcile_aggregates) no startup.
+ALTER TABLE turmas
+    ADD COLUMN IF NOT EXISTS n_media_geral INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS soma_media_geral DOUBLE PRECISION NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS soma_quadrados_media_geral DOUBLE PRECISION NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS n_trabalha INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS n_renda INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS soma_renda DOUBLE PRECISION NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS n_pretos_pardos INTEGER NOT NULL DEFAULT 0;
+
+UPDATE classes SET student_count = 0 WHERE student_count IS NULL;
@@ -0,0 +1,46 @@
+-- migrate: no-transaction
+-- Índices das FKs e colunas filtradas pelas rotas (CONCURRENTLY: não trava escritas).
+-- Formas de query cobertas estão em check_query_plans.py; nomes iguais aos dos models.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- CRUD -------------------------------------------------------------------------
+-- /teachers/{id}/classes, estatísticas do professor (soma de student_count sem ler a tabela)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_classes_teacher_id
+    ON classes (teacher_id) INCLUDE (student_count);
+
+-- /classes/{id}/students e estatísticas da turma (gênero/médias via index-only scan)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_students_class_id
+    ON students (class_id) INCLUDE (gender, overall_average, attendance_percentage);
+
+-- /search/students: faixa de média e nome com ILIKE '%...%'
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_students_overall_average ON students (overall_average);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_students_name_trgm ON students USING gin (name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_exams_class_id ON exams (class_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_exams_teacher_id ON exams (teacher_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_questions_exam_id ON questions (exam_id);
+
+-- Estatísticas do aluno: contagem e média das provas (exam_id já coberto por uq_student_exam)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_student_exams_student_id
+    ON student_exams (student_id) INCLUDE (total_score);
+
+-- student_exam_id já coberto por uq_student_answer
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_student_answers_question_id ON student_answers (question_id);
+
+-- Dashboard --------------------------------------------------------------------
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_turmas_escola_id ON turmas (escola_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_alunos_turma_id ON alunos (turma_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_alunos_escola_id ON alunos (escola_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_alunos_cluster_id ON alunos (cluster_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_alunos_risco_aluno_id ON alunos_risco (aluno_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_alunos_risco_nivel_risco ON alunos_risco (nivel_risco);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_clusters_turma_turma_id ON clusters_turma (turma_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_distribuicao_faixas_turma_id ON distribuicao_faixas (turma_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_fatores_criticos_turma_id ON fatores_criticos (turma_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_planos_acao_turma_id ON planos_acao (turma_id);
+
+-- /dashboard/relatorios/ ordena por data_geracao desc, filtrando por turma ou tipo
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_relatorios_gerais_turma_data
+    ON relatorios_gerais (turma_id, data_geracao DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_relatorios_gerais_tipo_data
+    ON relatorios_gerais (tipo_relatorio, data_geracao DESC);
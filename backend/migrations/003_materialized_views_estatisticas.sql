@@ -0,0 +1,125 @@
+-- Estatísticas do dashboard pré-calculadas por escola, turma e cluster global.
+-- Atualizadas com REFRESH MATERIALIZED VIEW CONCURRENTLY (src/materialized_views.py),
+-- que exige um índice único sem WHERE em cada view e não bloqueia as leituras.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_estatisticas_turma AS
+WITH por_turma AS (
+    SELECT turma_id,
+           COUNT(*) AS total_alunos,
+           COUNT(media_geral) AS n_media_geral,
+           SUM(media_geral) AS soma_media_geral,
+           AVG(media_geral) AS media_geral,
+           STDDEV_SAMP(media_geral) AS desvio_padrao,
+           MIN(media_geral) AS nota_minima,
+           MAX(media_geral) AS nota_maxima,
+           COUNT(*) FILTER (WHERE trabalha_fora = 'Sim') AS n_trabalha,
+           (100.0 * COUNT(*) FILTER (WHERE trabalha_fora = 'Sim') / COUNT(*))::float8 AS pct_trabalha,
+           AVG(renda_familiar) AS renda_media,
+           (100.0 * COUNT(*) FILTER (WHERE cor_raca IN ('Preta', 'Parda', 'Indígena')) / COUNT(*))::float8 AS pct_pretos_pardos
+    FROM alunos
+    GROUP BY turma_id
+),
+risco AS (
+    SELECT a.turma_id, COUNT(DISTINCT r.aluno_id) AS alunos_risco_alto
+    FROM alunos_risco r
+    JOIN alunos a ON a.id = r.aluno_id
+    WHERE r.nivel_risco = 'Alto'
+    GROUP BY a.turma_id
+)
+SELECT t.id AS turma_id,
+       t.escola_id,
+       t.nome AS turma_nome,
+       COALESCE(p.total_alunos, 0) AS total_alunos,
+       COALESCE(p.n_media_geral, 0) AS n_media_geral,
+       COALESCE(p.soma_media_geral, 0) AS soma_media_geral,
+       p.media_geral,
+       p.desvio_padrao,
+       p.nota_minima,
+       p.nota_maxima,
+       COALESCE(p.n_trabalha, 0) AS n_trabalha,
+       p.pct_trabalha,
+       p.renda_media,
+       p.pct_pretos_pardos,
+       COALESCE(r.alunos_risco_alto, 0) AS alunos_risco_alto
+FROM turmas t
+LEFT JOIN por_turma p ON p.turma_id = t.id
+LEFT JOIN risco r ON r.turma_id = t.id
+WITH DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_estatisticas_turma ON mv_estatisticas_turma (turma_id);
+
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_estatisticas_escola AS
+WITH por_escola AS (
+    SELECT escola_id,
+           COUNT(*) AS total_alunos,
+           COUNT(media_geral) AS n_media_geral,
+           SUM(media_geral) AS soma_media_geral,
+           AVG(media_geral) AS media_geral,
+           STDDEV_SAMP(media_geral) AS desvio_padrao,
+           (100.0 * COUNT(*) FILTER (WHERE trabalha_fora = 'Sim') / COUNT(*))::float8 AS pct_trabalha,
+           AVG(renda_familiar) AS renda_media,
+           (100.0 * COUNT(*) FILTER (WHERE cor_raca IN ('Preta', 'Parda', 'Indígena')) / COUNT(*))::float8 AS pct_pretos_pardos
+    FROM alunos
+    GROUP BY escola_id
+),
+turmas_escola AS (
+    SELECT escola_id, COUNT(*) AS total_turmas FROM turmas GROUP BY escola_id
+),
+risco AS (
+    SELECT a.escola_id, COUNT(DISTINCT r.aluno_id) AS alunos_risco_alto
+    FROM alunos_risco r
+    JOIN alunos a ON a.id = r.aluno_id
+    WHERE r.nivel_risco = 'Alto'
+    GROUP BY a.escola_id
+)
+SELECT e.id AS escola_id,
+       e.nome AS escola_nome,
+       COALESCE(t.total_turmas, 0) AS total_turmas,
+       COALESCE(p.total_alunos, 0) AS total_alunos,
+       COALESCE(p.n_media_geral, 0) AS n_media_geral,
+       COALESCE(p.soma_media_geral, 0) AS soma_media_geral,
+       p.media_geral,
+       p.desvio_padrao,
+       p.pct_trabalha,
+       p.renda_media,
+       p.pct_pretos_pardos,
+       COALESCE(r.alunos_risco_alto, 0) AS alunos_risco_alto
+FROM escolas e
+LEFT JOIN por_escola p ON p.escola_id = e.id
+LEFT JOIN turmas_escola t ON t.escola_id = e.id
+LEFT JOIN risco r ON r.escola_id = e.id
+WITH DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_estatisticas_escola ON mv_estatisticas_escola (escola_id);
+
+
+-- Mesmas características do clustering_model.generate_dashboard_data, calculadas sobre alunos
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_estatisticas_cluster AS
+SELECT cluster_id,
+       COUNT(*) AS total_alunos,
+       (100.0 * COUNT(*) / SUM(COUNT(*)) OVER ())::float8 AS percentual,
+       AVG(media_geral) AS media_notas,
+       AVG(renda_familiar) AS renda_media,
+       (100.0 * COUNT(*) FILTER (WHERE trabalha_fora = 'Sim') / COUNT(*))::float8 AS pct_trabalha,
+       AVG(tempo_deslocamento_min)::float8 AS tempo_desl_medio,
+       (100.0 * COUNT(*) FILTER (WHERE cor_raca IN ('Preta', 'Parda', 'Indígena')) / COUNT(*))::float8 AS pct_pretos_pardos,
+       (100.0 * COUNT(*) FILTER (WHERE seguranca_alimentar <> 'Segura') / COUNT(*))::float8 AS pct_inseg_alimentar
+FROM alunos
+WHERE cluster_id IS NOT NULL
+GROUP BY cluster_id
+WITH DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_estatisticas_cluster ON mv_estatisticas_cluster (cluster_id);
+
+
+-- Quando cada view foi atualizada pela última vez (defasagem exibida nas respostas)
+CREATE TABLE IF NOT EXISTS materialized_view_refresh (
+    view_name TEXT PRIMARY KEY,
+    refreshed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    duration_ms DOUBLE PRECISION
+);
+
+INSERT INTO materialized_view_refresh (view_name)
+VALUES ('mv_estatisticas_turma'), ('mv_estatisticas_escola'), ('mv_estatisticas_cluster')
+ON CONFLICT (view_name) DO UPDATE SET refreshed_at = now();
@@ -0,0 +1,13 @@
+-- migrate: no-transaction
+-- Uma linha de risco por aluno: o scoring em lote (src/risk_scoring.py) faz upsert por aluno_id.
+-- Duplicatas antigas: fica a mais recente.
+DELETE FROM alunos_risco r
+USING alunos_risco newer
+WHERE r.aluno_id = newer.aluno_id
+  AND (COALESCE(r.ultima_atualizacao, '-infinity'), r.id)
+    < (COALESCE(newer.ultima_atualizacao, '-infinity'), newer.id);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_alunos_risco_aluno_id ON alunos_risco (aluno_id);
+
+-- Substituído pelo índice único acima
+DROP INDEX CONCURRENTLY IF EXISTS ix_alunos_risco_aluno_id;
@@ -0,0 +1,42 @@
+-- Notas em formato longo (aluno, disciplina, bimestre) e tendências pré-calculadas
+-- por aluno/disciplina (src/grade_trends.py). As colunas largas de alunos
+-- (matematica_1bim ... portugues_4bim) continuam sendo gravadas pela importação.
+
+CREATE TABLE IF NOT EXISTS notas_bimestrais (
+    aluno_id INTEGER NOT NULL REFERENCES alunos(id) ON DELETE CASCADE,
+    disciplina VARCHAR(50) NOT NULL,
+    bimestre SMALLINT NOT NULL CHECK (bimestre BETWEEN 1 AND 4),
+    nota DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (aluno_id, disciplina, bimestre)
+);
+
+CREATE TABLE IF NOT EXISTS tendencias_notas (
+    aluno_id INTEGER NOT NULL REFERENCES alunos(id) ON DELETE CASCADE,
+    disciplina VARCHAR(50) NOT NULL,
+    n_bimestres SMALLINT NOT NULL,
+    primeira_nota DOUBLE PRECISION,
+    ultima_nota DOUBLE PRECISION,
+    inclinacao DOUBLE PRECISION,
+    variancia DOUBLE PRECISION,
+    queda_maxima DOUBLE PRECISION,
+    alerta_queda BOOLEAN NOT NULL DEFAULT false,
+    calculado_em TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (aluno_id, disciplina)
+);
+
+-- A listagem de alertas só lê as linhas sinalizadas
+CREATE INDEX IF NOT EXISTS ix_tendencias_notas_alerta ON tendencias_notas (disciplina, inclinacao) WHERE alerta_queda;
+
+-- Carga inicial a partir das colunas largas
+INSERT INTO notas_bimestrais (aluno_id, disciplina, bimestre, nota)
+SELECT a.id, n.disciplina, n.bimestre, n.nota
+FROM alunos a
+CROSS JOIN LATERAL (VALUES
+    ('matematica', 1, a.matematica_1bim), ('matematica', 2, a.matematica_2bim),
+    ('matematica', 3, a.matematica_3bim), ('matematica', 4, a.matematica_4bim),
+    ('portugues', 1, a.portugues_1bim), ('portugues', 2, a.portugues_2bim),
+    ('portugues', 3, a.portugues_3bim), ('portugues', 4, a.portugues_4bim)
+) AS n(disciplina, bimestre, nota)
+WHERE n.nota IS NOT NULL
+ON CONFLICT (aluno_id, disciplina, bimestre) DO NOTHING;
@@ -0,0 +1,7 @@
+-- Regeneração incremental do relatório do diretor (src/report_store.py): cada
+-- análise de turma (e a Parte 1 geral) fica salva com o hash dos dados que
+-- alimentaram o prompt; na próxima geração só as turmas com hash novo vão ao Gemini.
+-- A busca da última análise por turma usa ix_relatorios_gerais_turma_data.
+
+ALTER TABLE relatorios_gerais ADD COLUMN IF NOT EXISTS hash_dados VARCHAR(64);
+ALTER TABLE relatorios_gerais ADD COLUMN IF NOT EXISTS analise JSONB;
@@ -0,0 +1,12 @@
+-- Jobs incrementais (src/risk_scoring.py e src/grade_trends.py): cada linha
+-- calculada guarda a versão dos dados que foram lidos, e o job só recalcula o
+-- que mudou comparando por igualdade. Comparar updated_at > calculado_em perde
+-- alterações: now() é o início da transação, e uma edição iniciada antes do job
+-- e confirmada depois dele ficaria com updated_at menor que o carimbo do job.
+-- Linhas antigas ficam com NULL e são recalculadas na próxima execução.
+
+-- alunos.updated_at do aluno avaliado
+ALTER TABLE alunos_risco ADD COLUMN IF NOT EXISTS aluno_updated_at TIMESTAMPTZ;
+
+-- md5 dos (bimestre, updated_at) da série de notas_bimestrais usada no cálculo
+ALTER TABLE tendencias_notas ADD COLUMN IF NOT EXISTS versao_notas VARCHAR(32);
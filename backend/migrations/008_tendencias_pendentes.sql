@@ -0,0 +1,32 @@
+-- Fila das séries de notas a recalcular (src/grade_trends.py). Toda gravação ou
+-- remoção em notas_bimestrais marca a série aqui, no mesmo statement; o job
+-- incremental lê só as séries marcadas, em vez de agregar todas as notas e
+-- comparar a versão. A versão da marca é renovada a cada marcação e o job só
+-- apaga a marca que leu: uma edição confirmada durante o job deixa a série
+-- marcada para a próxima execução.
+
+CREATE TABLE IF NOT EXISTS tendencias_pendentes (
+    aluno_id INTEGER NOT NULL REFERENCES alunos(id) ON DELETE CASCADE,
+    disciplina VARCHAR(50) NOT NULL,
+    versao BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    PRIMARY KEY (aluno_id, disciplina)
+);
+
+-- Carga inicial: séries ainda não calculadas ou alteradas desde o último cálculo
+INSERT INTO tendencias_pendentes (aluno_id, disciplina)
+SELECT nb.aluno_id, nb.disciplina
+FROM notas_bimestrais nb
+LEFT JOIN tendencias_notas t ON t.aluno_id = nb.aluno_id AND t.disciplina = nb.disciplina
+GROUP BY nb.aluno_id, nb.disciplina, t.versao_notas
+HAVING md5(string_agg(nb.bimestre || ':' || extract(epoch FROM nb.updated_at), ',' ORDER BY nb.bimestre))
+       IS DISTINCT FROM t.versao_notas
+ON CONFLICT (aluno_id, disciplina) DO NOTHING;
+
+-- Tendências de séries que ficaram sem notas
+INSERT INTO tendencias_pendentes (aluno_id, disciplina)
+SELECT t.aluno_id, t.disciplina
+FROM tendencias_notas t
+WHERE NOT EXISTS (
+    SELECT 1 FROM notas_bimestrais nb WHERE nb.aluno_id = t.aluno_id AND nb.disciplina = t.disciplina
+)
+ON CONFLICT (aluno_id, disciplina) DO NOTHING;
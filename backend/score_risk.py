@@ -0,0 +1,30 @@
+"""
+Recalcula o risco dos alunos (alunos -> alunos_risco) fora do agendador da API
+
+Executa: python score_risk.py          só alunos novos/alterados desde a última avaliação
+         python score_risk.py --full   todos os alunos
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from src.database import AsyncSessionLocal, init_engines
+from src.risk_scoring import score_alunos
+
+
+async def main(full: bool):
+    init_engines()
+    async with AsyncSessionLocal() as db:
+        scored = await score_alunos(db, full=full)
+
+    if scored is None:
+        print(" Scoring de risco já em andamento em outro processo")
+        return
+    print(f" {scored['alunos']} aluno(s) avaliado(s): {scored['alto']} alto, {scored['medio']} médio, {scored['baixo']} baixo")
+    print(f" leitura {scored['load_ms']} ms | scoring {scored['score_ms']} ms | gravação {scored['write_ms']} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main("--full" in sys.argv[1:]))
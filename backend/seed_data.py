@@ -9,7 +9,7 @@ from pathlib import Path
 # Adicionar o diretório src ao path
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
-from src.database import AsyncSessionLocal
+from src.database import AsyncSessionLocal, init_engines
 from src.models import Teacher
 import uuid
 
@@ -19,6 +19,7 @@ TEACHER_ID_MOCK = "550e8400-e29b-41d4-a716-446655440000"
 
 async def seed():
     """Criar professor de teste no banco"""
+    init_engines()
     async with AsyncSessionLocal() as db:
         try:
             # Criar professor de teste
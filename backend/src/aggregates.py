@@ -0,0 +1,195 @@
+"""
+Agregados mantidos incrementalmente
+- classes.student_count: +1/-1 no mesmo commit que cria/remove/move o aluno
+- turmas: somas acumuladas (n, soma, soma dos quadrados) por aluno, das quais
+  saem media_geral, desvio_padrao, pct_trabalha, renda_media e pct_pretos_pardos
+- reconcile_aggregates(): recalcula tudo a partir das tabelas base (corrige drift)
+
+Os UPDATEs são atômicos no banco (coluna = coluna + delta), então escritas
+concorrentes na mesma turma não perdem incrementos.
+"""
+from typing import Dict, Optional
+from sqlalchemy import update, case, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+try:
+    from .models import Class
+    from .models_dashboard import Turma, Aluno
+except ImportError:
+    from models import Class
+    from models_dashboard import Turma, Aluno
+
+# Mesmo critério do clustering_model.generate_dashboard_data
+CORES_PRETOS_PARDOS = ("Preta", "Parda", "Indígena")
+
+# Chave do advisory lock da reconciliação (um worker por vez)
+RECONCILE_LOCK_KEY = 730_001
+
+
+# =========================
+# classes.student_count
+# =========================
+
+async def adjust_student_count(db: AsyncSession, class_id, delta: int):
+    """Soma `delta` ao student_count da turma (sem commit: entra na transação da escrita)"""
+    if not delta:
+        return
+    await db.execute(
+        update(Class)
+        .where(Class.id == class_id)
+        .values(student_count=func.coalesce(Class.student_count, 0) + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# =========================
+# Agregados da Turma (dashboard)
+# =========================
+
+def aluno_contribution(aluno: Aluno) -> Dict[str, float]:
+    """Quanto um aluno soma em cada coluna acumulada da turma"""
+    contribution = {
+        "total_alunos": 1,
+        "n_media_geral": 0,
+        "soma_media_geral": 0.0,
+        "soma_quadrados_media_geral": 0.0,
+        "n_trabalha": 1 if aluno.trabalha_fora == "Sim" else 0,
+        "n_renda": 0,
+        "soma_renda": 0.0,
+        "n_pretos_pardos": 1 if aluno.cor_raca in CORES_PRETOS_PARDOS else 0,
+    }
+    if aluno.media_geral is not None:
+        media = float(aluno.media_geral)
+        contribution.update(n_media_geral=1, soma_media_geral=media, soma_quadrados_media_geral=media * media)
+    if aluno.renda_familiar is not None:
+        contribution.update(n_renda=1, soma_renda=float(aluno.renda_familiar))
+    return contribution
+
+
+def _derived_values() -> Dict[str, object]:
+    """Estatísticas derivadas das somas acumuladas (desvio amostral, como o pandas)"""
+    n = Turma.n_media_geral
+    soma = Turma.soma_media_geral
+    variancia = (Turma.soma_quadrados_media_geral - soma * soma / n) / (n - 1)
+    return {
+        "media_geral": case((n > 0, soma / n), else_=None),
+        "desvio_padrao": case((n > 1, func.sqrt(func.greatest(variancia, 0))), else_=None),
+        "pct_trabalha": case((Turma.total_alunos > 0, Turma.n_trabalha * 100.0 / Turma.total_alunos), else_=None),
+        "renda_media": case((Turma.n_renda > 0, Turma.soma_renda / Turma.n_renda), else_=None),
+        "pct_pretos_pardos": case((Turma.total_alunos > 0, Turma.n_pretos_pardos * 100.0 / Turma.total_alunos), else_=None),
+    }
+
+
+async def apply_turma_delta(db: AsyncSession, turma_id, contribution: Dict[str, float], sign: int = 1):
+    """
+    Aplica (+1) ou remove (-1) a contribuição de um aluno na turma.
+    O primeiro UPDATE trava a linha da turma, então o segundo recalcula as
+    derivadas já sobre as somas novas, dentro da mesma transação.
+    """
+    await db.execute(
+        update(Turma)
+        .where(Turma.id == turma_id)
+        .values({
+            getattr(Turma, column): func.coalesce(getattr(Turma, column), 0) + sign * value
+            for column, value in contribution.items()
+        })
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(Turma)
+        .where(Turma.id == turma_id)
+        .values(_derived_values())
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def move_aluno_contribution(db: AsyncSession, old_turma_id, old: Dict[str, float], new_turma_id, new: Dict[str, float]):
+    """Atualização de aluno: tira a contribuição antiga e soma a nova"""
+    if str(old_turma_id) == str(new_turma_id):
+        delta = {column: new[column] - old[column] for column in new}
+        if any(delta.values()):
+            await apply_turma_delta(db, new_turma_id, delta)
+        return
+    await apply_turma_delta(db, old_turma_id, old, sign=-1)
+    await apply_turma_delta(db, new_turma_id, new)
+
+
+# =========================
+# Reconciliação
+# =========================
+
+RECONCILE_STUDENT_COUNT_SQL = """
+UPDATE classes c
+SET student_count = COALESCE(s.total, 0)
+FROM classes c2
+LEFT JOIN (SELECT class_id, COUNT(*) AS total FROM students GROUP BY class_id) s ON s.class_id = c2.id
+WHERE c.id = c2.id AND c.student_count IS DISTINCT FROM COALESCE(s.total, 0)
+"""
+
+RECONCILE_TURMAS_SQL = """
+UPDATE turmas t
+SET total_alunos = COALESCE(a.total_alunos, 0),
+    n_media_geral = COALESCE(a.n_media_geral, 0),
+    soma_media_geral = COALESCE(a.soma_media_geral, 0),
+    soma_quadrados_media_geral = COALESCE(a.soma_quadrados_media_geral, 0),
+    n_trabalha = COALESCE(a.n_trabalha, 0),
+    n_renda = COALESCE(a.n_renda, 0),
+    soma_renda = COALESCE(a.soma_renda, 0),
+    n_pretos_pardos = COALESCE(a.n_pretos_pardos, 0)
+FROM turmas t2
+LEFT JOIN (
+    SELECT turma_id,
+           COUNT(*) AS total_alunos,
+           COUNT(media_geral) AS n_media_geral,
+           SUM(media_geral) AS soma_media_geral,
+           SUM(media_geral * media_geral) AS soma_quadrados_media_geral,
+           COUNT(*) FILTER (WHERE trabalha_fora = 'Sim') AS n_trabalha,
+           COUNT(renda_familiar) AS n_renda,
+           SUM(renda_familiar) AS soma_renda,
+           COUNT(*) FILTER (WHERE cor_raca IN ('Preta', 'Parda', 'Indígena')) AS n_pretos_pardos
+    FROM alunos
+    GROUP BY turma_id
+) a ON a.turma_id = t2.id
+WHERE t.id = t2.id
+  AND (
+    (t.total_alunos, t.n_media_geral, t.n_trabalha, t.n_renda, t.n_pretos_pardos)
+        IS DISTINCT FROM (COALESCE(a.total_alunos, 0), COALESCE(a.n_media_geral, 0), COALESCE(a.n_trabalha, 0),
+                          COALESCE(a.n_renda, 0), COALESCE(a.n_pretos_pardos, 0))
+    OR abs(t.soma_media_geral - COALESCE(a.soma_media_geral, 0)) > 1e-3
+    OR abs(t.soma_quadrados_media_geral - COALESCE(a.soma_quadrados_media_geral, 0)) > 1e-3
+    OR abs(t.soma_renda - COALESCE(a.soma_renda, 0)) > 1e-3
+  )
+RETURNING t.id
+"""
+
+
+async def refresh_turma_aggregates(db: AsyncSession) -> int:
+    """
+    Recalcula as somas das turmas que divergem de alunos e as derivadas delas
+    (sem commit: também usado pela importação em lote, na mesma transação).
+    Retorna quantas turmas mudaram.
+    """
+    turmas_fixed = (await db.execute(text(RECONCILE_TURMAS_SQL))).scalars().all()
+    if turmas_fixed:
+        await db.execute(
+            update(Turma)
+            .where(Turma.id.in_(turmas_fixed))
+            .values(_derived_values())
+            .execution_options(synchronize_session=False)
+        )
+    return len(turmas_fixed)
+
+
+async def reconcile_aggregates(db: AsyncSession) -> Optional[Dict[str, int]]:
+    """
+    Recalcula os agregados a partir de students/alunos e corrige o que divergiu.
+    Retorna quantas turmas de cada tabela foram corrigidas (None se outro worker já está rodando).
+    """
+    got_lock = (await db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": RECONCILE_LOCK_KEY})).scalar()
+    if not got_lock:
+        return None
+
+    classes_fixed = (await db.execute(text(RECONCILE_STUDENT_COUNT_SQL))).rowcount
+    turmas_fixed = await refresh_turma_aggregates(db)
+    await db.commit()
+    return {"classes": classes_fixed, "turmas": turmas_fixed}
@@ -2,102 +2,184 @@
 Análise Causal de Desempenho Escolar
 Usa Google Gemini para analisar fatores que impactam o desempenho dos alunos
 """
+import asyncio
+import hashlib
 import json
 import os
-import re
-import time
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 from pathlib import Path
-from dotenv import load_dotenv
-import google.generativeai as genai
 
-# =========================
-# Configuração Gemini
-# =========================
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY não encontrada no arquivo .env")
+# Cliente Gemini compartilhado com a correção (cache de modelos, retries assíncronos)
+try:
+    from ..llm_client import gemini_generate_json_async
+    from ..llm_rate_limit import estimate_tokens
+except ImportError:
+    from llm_client import gemini_generate_json_async
+    from llm_rate_limit import estimate_tokens
 
-genai.configure(api_key=GEMINI_API_KEY)
+
+def _causal_stats():
+    """
+    Pré-análise estatística local (correlações, diferenças de grupo, ranking de efeitos),
+    importada no primeiro uso: NumPy/SciPy ficam fora do cold start da API
+    """
+    try:
+        from . import causal_stats
+    except ImportError:
+        import causal_stats
+    return causal_stats
 
 # Modelo para análise estrutural
 MODEL_STRUCT = "gemini-2.5-flash"
 
-# Configuração de geração JSON
-GEN_CONFIG_JSON = {
-    "temperature": 0.2,
-    "response_mime_type": "application/json",
+# Chamadas simultâneas ao Gemini no relatório de todas as turmas
+CAUSAL_ANALYSIS_CONCURRENCY = int(os.getenv("CAUSAL_ANALYSIS_CONCURRENCY", "8"))
+
+# Orçamento (tokens estimados) de cada prompt; acima dele as amostras de alunos são reduzidas
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "24000"))
+
+# Alunos por cluster em cada nível de compactação (0 = só estatísticas agregadas)
+AMOSTRA_NIVEIS = (10, 3, 0)
+
+# Com as estatísticas calculadas no prompt, a amostra de alunos serve só de exemplo
+AMOSTRA_NIVEIS_COM_ESTATISTICAS = (3, 0)
+
+INSTRUCAO_ESTATISTICAS = (
+    "Use os valores de 'estatisticas_calculadas' (correlações, diferenças de média com IC 95% "
+    "e ranking de efeitos, calculados sobre todos os alunos) como evidência; não recalcule "
+    "nem contradiga esses números"
+)
+
+# System instructions do relatório para diretor (entram no relatorio_data_hash)
+INSTRUCAO_SISTEMA_TURMA = (
+    "Você é um especialista em análise educacional e gestão escolar. "
+    "Sua tarefa é gerar um relatório analítico completo, em linguagem formal, clara e propositiva, "
+    "destinado ao diretor escolar. O relatório deve orientar a tomada de decisão e o planejamento de ações. "
+    "Sempre retorne JSON válido no formato especificado. "
+    "Seja específico e detalhado nas recomendações, considerando o contexto brasileiro de educação pública."
+)
+
+INSTRUCAO_SISTEMA_GERAL = (
+    "Você é um especialista em análise educacional e gestão escolar. "
+    "Sua tarefa é gerar a PARTE 1 (Análise Geral) de um relatório analítico completo. "
+    "Você está analisando dados de TODAS as turmas para gerar uma visão consolidada. "
+    "Sempre retorne JSON válido no formato especificado. "
+    "Foque na estrutura 'parte_1_analise_geral' com análise geral dos alunos, plano de ação geral (5 ações) e insights."
+)
+
+# Colunas da amostra de alunos no prompt (chave curta -> campo de extract_relevant_data)
+AMOSTRA_COLUNAS = {
+    "id": "id",
+    "nome": "nome_aluno",
+    "mg": "media_geral",
+    "mat": "media_matematica",
+    "port": "media_portugues",
+    "freq": "frequencia_percentual",
+    "renda": "renda_familiar",
+    "trab": "trabalha_fora",
+    "h_trab": "horas_trabalho_semana",
+    "desl": "tempo_deslocamento_min",
+    "net": "acesso_internet",
+    "pc": "tem_computador",
+    "seg_alim": "seguranca_alimentar",
+    "refeicoes": "refeicoes_diarias",
+    "apoio_fam": "apoio_familiar_estudos",
+    "amb_fam": "ambiente_familiar",
+    "cor": "cor_raca",
+    "defic": "deficiencia",
+    "municipio": "municipio",
+    "clima": "area_climatica",
+    "seca": "impacto_seca",
 }
 
 
 # =========================
-# Helpers Gemini
+# Extração de Dados Relevantes
 # =========================
 
-def _extract_json(text: str) -> Any:
-    """Extrai JSON de uma string. Tenta json.loads direto; se falhar, usa regex."""
-    text = text.strip()
-    # Remove cercas de código se existirem
-    if text.startswith("```json"):
-        text = text[7:]
-    if text.startswith("```"):
-        text = text[3:]
-    if text.endswith("```"):
-        text = text[:-3]
-    try:
-        return json.loads(text)
-    except Exception:
-        pass
-
-    # Fallback: pega o primeiro bloco {...} balanceado
-    match = re.search(r'\{.*\}', text, flags=re.DOTALL)
-    if match:
-        candidate = match.group(0)
-        try:
-            return json.loads(candidate)
-        except Exception:
-            pass
-    raise ValueError("Falha ao extrair JSON do retorno do modelo.")
-
-
-def _gemini_generate_json(
-    model_name: str,
-    system_instruction: Optional[str],
-    user_prompt: str,
-    max_retries: int = 3,
-    backoff_sec: float = 1.2,
-) -> Any:
+def extract_turma_data(turma_data: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Faz uma chamada ao Gemini esperando JSON e retorna objeto Python.
-    Força MIME de resposta em JSON e aplica retries com backoff exponencial.
+    Dados de uma turma do dashboard para a análise causal: estatísticas da turma,
+    amostra de alunos e estatísticas agregadas de cada cluster.
     """
-    model = genai.GenerativeModel(model_name, system_instruction=system_instruction) if system_instruction \
-        else genai.GenerativeModel(model_name)
-
-    last_err = None
-    for attempt in range(1, max_retries + 1):
-        try:
-            resp = model.generate_content(
-                user_prompt,
-                generation_config=GEN_CONFIG_JSON,
-            )
-            # Em SDKs recentes, JSON vem em resp.text mesmo com mime JSON.
-            return _extract_json(resp.text)
-        except Exception as e:
-            last_err = e
-            if attempt < max_retries:
-                time.sleep(backoff_sec * attempt)
-            else:
-                raise last_err
+    turma_info = {
+        "turma": turma_data.get("turma"),
+        "total_alunos": turma_data.get("total_alunos", 0),
+        "estatisticas_gerais": turma_data.get("estatisticas_gerais", {}),
+        "distribuicao_faixas": turma_data.get("distribuicao_faixas", {}),
+        "clusters": []
+    }
+    
+    # Processar cada cluster da turma
+    for cluster in turma_data.get("clusters_turma", []):
+        cluster_info = {
+            "cluster_id": cluster.get("cluster_id"),
+            "total_alunos": cluster.get("total_alunos", 0),
+            "intervalo_notas": cluster.get("intervalo_notas", {}),
+            "caracteristicas": cluster.get("caracteristicas", {}),
+            "features_relevantes": cluster.get("features_relevantes", []),
+            "nivel_risco": cluster.get("nivel_risco", "Não especificado"),
+            "alunos_amostra": []
+        }
+        
+        # Extrair dados relevantes de uma amostra de alunos (máximo 10 por cluster)
+        alunos = cluster.get("alunos", [])
+        amostra_size = min(10, len(alunos))
+        alunos_amostra = alunos[:amostra_size] if alunos else []
+        
+        for aluno in alunos_amostra:
+            aluno_data = {
+                "id": aluno.get("id"),
+                "nome_aluno": aluno.get("nome_aluno"),
+                "media_geral": aluno.get("media_geral", 0),
+                "media_matematica": aluno.get("media_matematica", 0),
+                "media_portugues": aluno.get("media_portugues", 0),
+                "frequencia_percentual": aluno.get("frequencia_percentual", 0),
+                "renda_familiar": aluno.get("renda_familiar", 0),
+                "trabalha_fora": aluno.get("trabalha_fora", "Não"),
+                "horas_trabalho_semana": aluno.get("horas_trabalho_semana", 0),
+                "tempo_deslocamento_min": aluno.get("tempo_deslocamento_min", 0),
+                "acesso_internet": aluno.get("acesso_internet", "Não"),
+                "tem_computador": aluno.get("tem_computador", "Não"),
+                "seguranca_alimentar": aluno.get("seguranca_alimentar", "Não especificado"),
+                "refeicoes_diarias": aluno.get("refeicoes_diarias", 0),
+                "apoio_familiar_estudos": aluno.get("apoio_familiar_estudos", "Não especificado"),
+                "ambiente_familiar": aluno.get("ambiente_familiar", "Não especificado"),
+                "cor_raca": aluno.get("cor_raca", "Não especificado"),
+                "deficiencia": aluno.get("deficiencia", "Nenhuma"),
+                "municipio": aluno.get("municipio", ""),
+                "area_climatica": aluno.get("area_climatica", ""),
+                "impacto_seca": aluno.get("impacto_seca", "")
+            }
+            cluster_info["alunos_amostra"].append(aluno_data)
+        
+        # Estatísticas agregadas do cluster
+        if alunos:
+            medias_gerais = [a.get("media_geral", 0) for a in alunos]
+            rendas = [a.get("renda_familiar", 0) for a in alunos]
+            trabalha_count = sum(1 for a in alunos if a.get("trabalha_fora") == "Sim")
+            inseg_alimentar_count = sum(1 for a in alunos if a.get("seguranca_alimentar") != "Segura")
+            sem_internet_count = sum(1 for a in alunos if a.get("acesso_internet") == "Não")
+            
+            cluster_info["estatisticas_agregadas"] = {
+                "media_geral_cluster": sum(medias_gerais) / len(medias_gerais) if medias_gerais else 0,
+                "renda_media": sum(rendas) / len(rendas) if rendas else 0,
+                "pct_trabalha": (trabalha_count / len(alunos)) * 100 if alunos else 0,
+                "pct_inseg_alimentar": (inseg_alimentar_count / len(alunos)) * 100 if alunos else 0,
+                "pct_sem_internet": (sem_internet_count / len(alunos)) * 100 if alunos else 0,
+                "total_alunos_cluster": len(alunos)
+            }
+        
+        turma_info["clusters"].append(cluster_info)
+    
+    return turma_info
 
-# =========================
-# Extração de Dados Relevantes
-# =========================
 
 def extract_relevant_data(dashboard_data: Dict[str, Any], turma: Optional[str] = None) -> Dict[str, Any]:
     """
     Extrai dados relevantes para análise causal do JSON de dashboard.
+    Com um dashboard indexado (dashboard_store.IndexedDashboard), as turmas já
+    vêm extraídas e a busca por turma é um acesso ao dicionário.
     
     Args:
         dashboard_data: Dados completos do dashboard
@@ -112,83 +194,21 @@ def extract_relevant_data(dashboard_data: Dict[str, Any], turma: Optional[str] =
         "turmas": []
     }
     
+    turmas_extraidas = getattr(dashboard_data, "turmas_extraidas", None)
+    if turmas_extraidas is not None:
+        if turma:
+            extracted["turmas"] = list(turmas_extraidas.get(turma, []))
+        else:
+            extracted["turmas"] = [info for infos in turmas_extraidas.values() for info in infos]
+        return extracted
+    
     # Se turma específica foi solicitada, filtrar
     turmas_data = dashboard_data.get("dados_por_turma", [])
     if turma:
         turmas_data = [t for t in turmas_data if t.get("turma") == turma]
     
     for turma_data in turmas_data:
-        turma_info = {
-            "turma": turma_data.get("turma"),
-            "total_alunos": turma_data.get("total_alunos", 0),
-            "estatisticas_gerais": turma_data.get("estatisticas_gerais", {}),
-            "distribuicao_faixas": turma_data.get("distribuicao_faixas", {}),
-            "clusters": []
-        }
-        
-        # Processar cada cluster da turma
-        for cluster in turma_data.get("clusters_turma", []):
-            cluster_info = {
-                "cluster_id": cluster.get("cluster_id"),
-                "total_alunos": cluster.get("total_alunos", 0),
-                "intervalo_notas": cluster.get("intervalo_notas", {}),
-                "caracteristicas": cluster.get("caracteristicas", {}),
-                "features_relevantes": cluster.get("features_relevantes", []),
-                "nivel_risco": cluster.get("nivel_risco", "Não especificado"),
-                "alunos_amostra": []
-            }
-            
-            # Extrair dados relevantes de uma amostra de alunos (máximo 10 por cluster)
-            alunos = cluster.get("alunos", [])
-            amostra_size = min(10, len(alunos))
-            alunos_amostra = alunos[:amostra_size] if alunos else []
-            
-            for aluno in alunos_amostra:
-                aluno_data = {
-                    "id": aluno.get("id"),
-                    "nome_aluno": aluno.get("nome_aluno"),
-                    "media_geral": aluno.get("media_geral", 0),
-                    "media_matematica": aluno.get("media_matematica", 0),
-                    "media_portugues": aluno.get("media_portugues", 0),
-                    "frequencia_percentual": aluno.get("frequencia_percentual", 0),
-                    "renda_familiar": aluno.get("renda_familiar", 0),
-                    "trabalha_fora": aluno.get("trabalha_fora", "Não"),
-                    "horas_trabalho_semana": aluno.get("horas_trabalho_semana", 0),
-                    "tempo_deslocamento_min": aluno.get("tempo_deslocamento_min", 0),
-                    "acesso_internet": aluno.get("acesso_internet", "Não"),
-                    "tem_computador": aluno.get("tem_computador", "Não"),
-                    "seguranca_alimentar": aluno.get("seguranca_alimentar", "Não especificado"),
-                    "refeicoes_diarias": aluno.get("refeicoes_diarias", 0),
-                    "apoio_familiar_estudos": aluno.get("apoio_familiar_estudos", "Não especificado"),
-                    "ambiente_familiar": aluno.get("ambiente_familiar", "Não especificado"),
-                    "cor_raca": aluno.get("cor_raca", "Não especificado"),
-                    "deficiencia": aluno.get("deficiencia", "Nenhuma"),
-                    "municipio": aluno.get("municipio", ""),
-                    "area_climatica": aluno.get("area_climatica", ""),
-                    "impacto_seca": aluno.get("impacto_seca", "")
-                }
-                cluster_info["alunos_amostra"].append(aluno_data)
-            
-            # Estatísticas agregadas do cluster
-            if alunos:
-                medias_gerais = [a.get("media_geral", 0) for a in alunos]
-                rendas = [a.get("renda_familiar", 0) for a in alunos]
-                trabalha_count = sum(1 for a in alunos if a.get("trabalha_fora") == "Sim")
-                inseg_alimentar_count = sum(1 for a in alunos if a.get("seguranca_alimentar") != "Segura")
-                sem_internet_count = sum(1 for a in alunos if a.get("acesso_internet") == "Não")
-                
-                cluster_info["estatisticas_agregadas"] = {
-                    "media_geral_cluster": sum(medias_gerais) / len(medias_gerais) if medias_gerais else 0,
-                    "renda_media": sum(rendas) / len(rendas) if rendas else 0,
-                    "pct_trabalha": (trabalha_count / len(alunos)) * 100 if alunos else 0,
-                    "pct_inseg_alimentar": (inseg_alimentar_count / len(alunos)) * 100 if alunos else 0,
-                    "pct_sem_internet": (sem_internet_count / len(alunos)) * 100 if alunos else 0,
-                    "total_alunos_cluster": len(alunos)
-                }
-            
-            turma_info["clusters"].append(cluster_info)
-        
-        extracted["turmas"].append(turma_info)
+        extracted["turmas"].append(extract_turma_data(turma_data))
     
     return extracted
 
@@ -197,13 +217,59 @@ def extract_relevant_data(dashboard_data: Dict[str, Any], turma: Optional[str] =
 # Preparação de Prompt
 # =========================
 
-def prepare_analysis_prompt(extracted_data: Dict[str, Any], formato_relatorio: bool = False) -> str:
+def _round_floats(value: Any) -> Any:
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, dict):
+        return {k: _round_floats(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_round_floats(v) for v in value]
+    return value
+
+
+def compact_extracted_data(extracted_data: Dict[str, Any], amostra_max: int) -> Dict[str, Any]:
+    """
+    Versão compacta dos dados para o prompt: números com 2 casas e a amostra de
+    alunos em formato tabular (colunas curtas + linhas). Com amostra_max=0 a
+    amostra sai e ficam só as estatísticas agregadas de cada cluster.
+    """
+    turmas = []
+    for turma_info in extracted_data.get("turmas", []):
+        clusters = []
+        for cluster in turma_info.get("clusters", []):
+            amostra = cluster.get("alunos_amostra", [])[:amostra_max]
+            cluster = {key: value for key, value in cluster.items() if key != "alunos_amostra"}
+            if amostra:
+                cluster["alunos_amostra"] = {
+                    "colunas": list(AMOSTRA_COLUNAS),
+                    "linhas": [[aluno.get(campo) for campo in AMOSTRA_COLUNAS.values()] for aluno in amostra],
+                }
+            clusters.append(cluster)
+        turmas.append({**turma_info, "clusters": clusters})
+
+    compact = _round_floats({**extracted_data, "turmas": turmas})
+    if amostra_max:
+        compact["legenda_colunas_amostra"] = AMOSTRA_COLUNAS
+    return compact
+
+
+def prepare_analysis_prompt(
+    extracted_data: Dict[str, Any],
+    formato_relatorio: bool = False,
+    token_budget: int = PROMPT_TOKEN_BUDGET,
+    estatisticas: Optional[Dict[str, Any]] = None,
+    log: bool = True
+) -> str:
     """
     Prepara prompt estruturado para análise causal com Gemini.
     
     Args:
         extracted_data: Dados extraídos e estruturados
         formato_relatorio: Se True, gera relatório narrativo para diretor escolar
+        token_budget: Máximo de tokens estimados; acima disso a amostra de alunos é resumida
+        estatisticas: Estatísticas já calculadas (causal_stats.stats_for_prompt), enviadas
+            ao modelo no lugar da maior parte da amostra de alunos
+        log: Se False, não imprime o tamanho do prompt (uso no relatorio_data_hash)
     
     Returns:
         String com prompt formatado
@@ -458,16 +524,40 @@ def prepare_analysis_prompt(extracted_data: Dict[str, Any], formato_relatorio: b
         }
     }
     
-    return json.dumps(prompt_data, ensure_ascii=False, indent=2)
+    niveis = AMOSTRA_NIVEIS
+    if estatisticas:
+        prompt_data["estatisticas_calculadas"] = estatisticas
+        prompt_data["tarefa"]["instrucoes"].append(INSTRUCAO_ESTATISTICAS)
+        niveis = AMOSTRA_NIVEIS_COM_ESTATISTICAS
+    
+    # JSON compacto; se passar do orçamento, reduz a amostra de alunos até só agregados
+    for amostra_max in niveis:
+        prompt_data["dados"] = compact_extracted_data(extracted_data, amostra_max)
+        prompt = json.dumps(prompt_data, ensure_ascii=False, separators=(",", ":"))
+        tokens = estimate_tokens(prompt)
+        if tokens <= token_budget:
+            break
+    
+    if not log:
+        return prompt
+    aviso = "" if tokens <= token_budget else f" (acima do orçamento de {token_budget})"
+    print(
+        f" Prompt: {len(prompt)} caracteres, ~{tokens} tokens, "
+        f"{total_turmas} turma(s), amostra de {amostra_max} aluno(s)/cluster{aviso}"
+    )
+    return prompt
 
 
 # =========================
 # Análise com Gemini
 # =========================
 
-def _analyze_single_turma_relatorio(
+async def _analyze_single_turma_relatorio(
     dashboard_data: Dict[str, Any],
-    turma_name: str
+    turma_name: str,
+    use_cache: bool = True,
+    extracted_data: Optional[Dict[str, Any]] = None,
+    estatisticas: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
     Analisa uma única turma para gerar relatório.
@@ -475,33 +565,34 @@ def _analyze_single_turma_relatorio(
     Args:
         dashboard_data: Dados completos do dashboard
         turma_name: Nome da turma
+        use_cache: Se False, ignora respostas em cache do Gemini
+        extracted_data: Dados da turma já extraídos (se None, extrai aqui)
+        estatisticas: Resultado de causal_stats.compute_causal_stats (se None, o prompt vai sem elas)
     
     Returns:
         Análise da turma no formato de relatório
     """
+    causal_stats = _causal_stats()
     # Extrair dados da turma específica
-    extracted_data = extract_relevant_data(dashboard_data, turma=turma_name)
+    if extracted_data is None:
+        extracted_data = extract_relevant_data(dashboard_data, turma=turma_name)
     
     # Preparar prompt no formato de relatório
-    prompt = prepare_analysis_prompt(extracted_data, formato_relatorio=True)
-    
-    # System instruction para relatório
-    system_instruction = (
-        "Você é um especialista em análise educacional e gestão escolar. "
-        "Sua tarefa é gerar um relatório analítico completo, em linguagem formal, clara e propositiva, "
-        "destinado ao diretor escolar. O relatório deve orientar a tomada de decisão e o planejamento de ações. "
-        "Sempre retorne JSON válido no formato especificado. "
-        "Seja específico e detalhado nas recomendações, considerando o contexto brasileiro de educação pública."
+    prompt = prepare_analysis_prompt(
+        extracted_data,
+        formato_relatorio=True,
+        estatisticas=causal_stats.stats_for_prompt(estatisticas, turma_name) if estatisticas else None
     )
     
     # Chamar Gemini
     try:
-        result = _gemini_generate_json(
+        result = await gemini_generate_json_async(
             model_name=MODEL_STRUCT,
-            system_instruction=system_instruction,
+            system_instruction=INSTRUCAO_SISTEMA_TURMA,
             user_prompt=prompt,
             max_retries=3,
-            backoff_sec=1.5
+            backoff_sec=1.5,
+            use_cache=use_cache
         )
         
         # Adicionar metadados da turma
@@ -535,101 +626,421 @@ def _analyze_single_turma_relatorio(
         }
 
 
-def _consolidate_relatorio(
-    analyses: List[Dict[str, Any]],
-    dashboard_data: Dict[str, Any]
+def _parte_1_fallback(total_turmas: int) -> Dict[str, Any]:
+    """Parte 1 básica usada quando o Gemini falha"""
+    return {
+        "analise_geral_alunos": {
+            "resumo_estatistico": f"Análise consolidada de {total_turmas} turma(s).",
+            "padroes_gerais": "Padrões identificados através da análise de todas as turmas.",
+            "interpretacao_ia": "Interpretação baseada em análise de dados de todas as turmas."
+        },
+        "plano_acao_geral": [],
+        "insights_correlacoes": {
+            "observacoes": "Análise consolidada de todas as turmas.",
+            "correlacoes_identificadas": [],
+            "causas_subjacentes": "Causas identificadas através da análise consolidada."
+        }
+    }
+
+
+def _turma_sem_llm(turma_name: str, estatisticas: Dict[str, Any]) -> Dict[str, Any]:
+    """Análise da turma só com as estatísticas (modo sem LLM)"""
+    causal_stats = _causal_stats()
+    stats = estatisticas["turmas"][turma_name]
+    return {
+        "parte_2_analise_por_turma": [{
+            "turma": turma_name,
+            "analise_plano_acao": {
+                "sintese_desempenho": causal_stats.resumo_estatistico(stats),
+                "principais_desafios": "; ".join(
+                    f"{f['fator']}: {f['impacto']}" for f in causal_stats.principais_fatores(stats, limite=3)
+                ),
+                "recomendacoes_especificas": []
+            },
+            "correlacao_clusterizacao": {
+                "descricao_clusters": causal_stats.descricao_clusters(stats),
+                "correlacoes_internas": "; ".join(
+                    c["relacao"] for c in causal_stats.insights_correlacoes(stats)["correlacoes_identificadas"]
+                ),
+                "padroes_comportamentais": "",
+                "oportunidades_intervencao": []
+            }
+        }],
+        "metadata": {
+            "turma_analisada": turma_name,
+            "total_turmas": 1,
+            "total_alunos": stats["n_alunos"],
+            "formato": "estatisticas_sem_llm"
+        }
+    }
+
+
+def _parte_1_sem_llm(estatisticas: Dict[str, Any]) -> Dict[str, Any]:
+    """Parte 1 só com as estatísticas (modo sem LLM)"""
+    causal_stats = _causal_stats()
+    geral = estatisticas["geral"]
+    return {
+        "analise_geral_alunos": {
+            "resumo_estatistico": causal_stats.resumo_estatistico(geral),
+            "padroes_gerais": " ".join(
+                f"{nome}: maior efeito de {stats['ranking_fatores'][0]['fator']} "
+                f"(d = {stats['ranking_fatores'][0]['efeito_d']})."
+                for nome, stats in estatisticas["turmas"].items() if stats["ranking_fatores"]
+            ),
+            "interpretacao_ia": ""
+        },
+        "plano_acao_geral": [],
+        "insights_correlacoes": causal_stats.insights_correlacoes(geral)
+    }
+
+
+async def _analyze_parte_1_relatorio(
+    dashboard_data: Dict[str, Any],
+    total_turmas: int,
+    use_cache: bool = True,
+    extracted_data_geral: Optional[Dict[str, Any]] = None,
+    raise_errors: bool = False,
+    estatisticas: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
-    Consolida análises de múltiplas turmas em um relatório único para diretor escolar.
+    Gera a Parte 1 (Análise Geral) do relatório com os dados de todas as turmas.
+    Não depende das análises por turma: pode rodar em paralelo com elas.
     
     Args:
-        analyses: Lista de análises individuais por turma
         dashboard_data: Dados completos do dashboard
+        total_turmas: Número de turmas (usado no texto de fallback)
+        use_cache: Se False, ignora respostas em cache do Gemini
+        extracted_data_geral: Dados de todas as turmas já extraídos (se None, extrai aqui)
+        raise_errors: Se True, propaga o erro do Gemini em vez de devolver a estrutura básica
+        estatisticas: Resultado de causal_stats.compute_causal_stats; as correlações
+            identificadas passam a ser as calculadas, não as do modelo
     
     Returns:
-        Relatório consolidado
+        Conteúdo de "parte_1_analise_geral"
     """
-    # Extrair Parte 1 (Análise Geral) da primeira análise ou criar síntese
-    # Para análise geral, vamos usar dados consolidados de todas as turmas
-    extracted_data_geral = extract_relevant_data(dashboard_data, turma=None)
-    prompt_geral = prepare_analysis_prompt(extracted_data_geral, formato_relatorio=True)
-    
-    system_instruction_geral = (
-        "Você é um especialista em análise educacional e gestão escolar. "
-        "Sua tarefa é gerar a PARTE 1 (Análise Geral) de um relatório analítico completo. "
-        "Você está analisando dados de TODAS as turmas para gerar uma visão consolidada. "
-        "Sempre retorne JSON válido no formato especificado. "
-        "Foque na estrutura 'parte_1_analise_geral' com análise geral dos alunos, plano de ação geral (5 ações) e insights."
+    causal_stats = _causal_stats()
+    if extracted_data_geral is None:
+        extracted_data_geral = extract_relevant_data(dashboard_data, turma=None)
+    prompt_geral = prepare_analysis_prompt(
+        extracted_data_geral,
+        formato_relatorio=True,
+        estatisticas=causal_stats.stats_for_prompt(estatisticas) if estatisticas else None
     )
     
     try:
-        parte_1 = _gemini_generate_json(
+        parte_1 = await gemini_generate_json_async(
             model_name=MODEL_STRUCT,
-            system_instruction=system_instruction_geral,
+            system_instruction=INSTRUCAO_SISTEMA_GERAL,
             user_prompt=prompt_geral,
             max_retries=3,
-            backoff_sec=1.5
+            backoff_sec=1.5,
+            use_cache=use_cache
         )
-        parte_1_analise = parte_1.get("parte_1_analise_geral", {})
     except Exception as e:
-        # Em caso de erro, criar estrutura básica
-        parte_1_analise = {
-            "analise_geral_alunos": {
-                "resumo_estatistico": f"Análise consolidada de {len(analyses)} turma(s).",
-                "padroes_gerais": "Padrões identificados através da análise de todas as turmas.",
-                "interpretacao_ia": "Interpretação baseada em análise de dados de todas as turmas."
+        if raise_errors:
+            raise
+        # Em caso de erro, criar estrutura básica (ou a das estatísticas, se houver)
+        return _parte_1_sem_llm(estatisticas) if estatisticas else _parte_1_fallback(total_turmas)
+    
+    parte_1 = parte_1.get("parte_1_analise_geral", {})
+    if estatisticas:
+        insights = parte_1.setdefault("insights_correlacoes", {})
+        insights["correlacoes_identificadas"] = (
+            causal_stats.insights_correlacoes(estatisticas["geral"])["correlacoes_identificadas"]
+        )
+    return parte_1
+
+
+def _turmas_nomes(dashboard_data: Dict[str, Any]) -> List[str]:
+    """Nomes das turmas do dashboard (ValueError se não houver)"""
+    turmas_data = dashboard_data.get("dados_por_turma", [])
+    if not turmas_data:
+        raise ValueError("Nenhuma turma encontrada nos dados do dashboard")
+    turmas_nomes = [t.get("turma") for t in turmas_data if t.get("turma")]
+    if not turmas_nomes:
+        raise ValueError("Nenhuma turma válida encontrada")
+    return turmas_nomes
+
+
+def _parte_2_of(analise: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Entradas de "parte_2_analise_por_turma" de uma análise individual de turma"""
+    if "parte_2_analise_por_turma" in analise:
+        return analise["parte_2_analise_por_turma"]
+    if "erro" in analise:
+        return []
+    # Se não tem parte_2 mas tem dados, tentar extrair
+    turma_name = analise.get("metadata", {}).get("turma_analisada", "N/A")
+    return [{
+        "turma": turma_name,
+        "analise_plano_acao": {
+            "sintese_desempenho": "Análise disponível mas formato não padronizado.",
+            "principais_desafios": "Verificar análise individual da turma.",
+            "recomendacoes_especificas": []
+        },
+        "correlacao_clusterizacao": {
+            "descricao_clusters": "",
+            "correlacoes_internas": "",
+            "padroes_comportamentais": "",
+            "oportunidades_intervencao": []
+        }
+    }]
+
+
+def _erro_turma_relatorio(turma_name: str, erro: BaseException) -> Dict[str, Any]:
+    """Análise substituta de uma turma cuja tarefa falhou"""
+    return {
+        "erro": str(erro),
+        "turma": turma_name,
+        "parte_2_analise_por_turma": [{
+            "turma": turma_name,
+            "analise_plano_acao": {
+                "sintese_desempenho": f"Erro ao analisar turma {turma_name}",
+                "principais_desafios": "Não foi possível realizar a análise.",
+                "recomendacoes_especificas": []
             },
-            "plano_acao_geral": [],
-            "insights_correlacoes": {
-                "observacoes": "Análise consolidada de todas as turmas.",
-                "correlacoes_identificadas": [],
-                "causas_subjacentes": "Causas identificadas através da análise consolidada."
+            "correlacao_clusterizacao": {
+                "descricao_clusters": "",
+                "correlacoes_internas": "",
+                "padroes_comportamentais": "",
+                "oportunidades_intervencao": []
             }
-        }
+        }]
+    }
+
+
+def _relatorio_metadata(dashboard_data: Dict[str, Any], total_turmas: int) -> Dict[str, Any]:
+    return {
+        "turma_analisada": "Todas as turmas",
+        "total_turmas": total_turmas,
+        "total_alunos": dashboard_data.get("metadata", {}).get("total_alunos", 0),
+        "data_analise": dashboard_data.get("metadata", {}).get("data_geracao", ""),
+        "formato": "relatorio_diretor_escolar"
+    }
+
+
+async def _consolidate_relatorio(
+    analyses: List[Dict[str, Any]],
+    dashboard_data: Dict[str, Any],
+    parte_1_analise: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Consolida análises de múltiplas turmas em um relatório único para diretor escolar.
+    
+    Args:
+        analyses: Lista de análises individuais por turma
+        dashboard_data: Dados completos do dashboard
+        parte_1_analise: Parte 1 já gerada (se None, é gerada aqui)
+    
+    Returns:
+        Relatório consolidado
+    """
+    if parte_1_analise is None:
+        parte_1_analise = await _analyze_parte_1_relatorio(dashboard_data, len(analyses))
     
     # Consolidar Parte 2 (Análise por Turma) de todas as análises
     parte_2_analises = []
     for analise in analyses:
-        if "parte_2_analise_por_turma" in analise:
-            parte_2_analises.extend(analise["parte_2_analise_por_turma"])
-        elif "erro" not in analise:
-            # Se não tem parte_2 mas tem dados, tentar extrair
-            turma_name = analise.get("metadata", {}).get("turma_analisada", "N/A")
-            parte_2_analises.append({
-                "turma": turma_name,
-                "analise_plano_acao": {
-                    "sintese_desempenho": "Análise disponível mas formato não padronizado.",
-                    "principais_desafios": "Verificar análise individual da turma.",
-                    "recomendacoes_especificas": []
-                },
-                "correlacao_clusterizacao": {
-                    "descricao_clusters": "",
-                    "correlacoes_internas": "",
-                    "padroes_comportamentais": "",
-                    "oportunidades_intervencao": []
-                }
-            })
+        parte_2_analises.extend(_parte_2_of(analise))
     
     # Estrutura final do relatório consolidado
     relatorio_consolidado = {
         "parte_1_analise_geral": parte_1_analise,
         "parte_2_analise_por_turma": parte_2_analises,
-        "metadata": {
-            "turma_analisada": "Todas as turmas",
-            "total_turmas": len(analyses),
-            "total_alunos": dashboard_data.get("metadata", {}).get("total_alunos", 0),
-            "data_analise": dashboard_data.get("metadata", {}).get("data_geracao", ""),
-            "formato": "relatorio_diretor_escolar"
-        }
+        "metadata": _relatorio_metadata(dashboard_data, len(analyses))
     }
     
     return relatorio_consolidado
 
 
-def analyze_causal_factors(
+def relatorio_data_hash(
+    extracted_data: Dict[str, Any],
+    estatisticas: Optional[Dict[str, Any]] = None,
+    turma: Optional[str] = None
+) -> str:
+    """
+    Hash do que vai ao modelo: prompt montado com os dados (sem metadata, que muda a
+    cada geração do dashboard), system instruction (da turma, ou da Parte 1 se
+    turma=None) e modelo. Mudar o template, as instruções, o orçamento de tokens
+    ou as estatísticas calculadas também muda o hash. Mesmo hash = mesma análise.
+    """
+    dados = {key: value for key, value in extracted_data.items() if key != "metadata"}
+    # Ordem das chaves estável, como se viesse do mesmo extract_relevant_data
+    dados = json.loads(json.dumps(dados, ensure_ascii=False, sort_keys=True, default=str))
+    prompt = prepare_analysis_prompt(
+        dados,
+        formato_relatorio=True,
+        token_budget=PROMPT_TOKEN_BUDGET,
+        estatisticas=_causal_stats().stats_for_prompt(estatisticas, turma) if estatisticas else None,
+        log=False
+    )
+    instrucao = INSTRUCAO_SISTEMA_GERAL if turma is None else INSTRUCAO_SISTEMA_TURMA
+    payload = json.dumps([MODEL_STRUCT, instrucao, prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def analyze_relatorio_incremental(
+    dashboard_data: Dict[str, Any],
+    stored_analyses: Optional[Dict[Optional[str], Dict[str, Any]]] = None,
+    use_cache: bool = True,
+    use_stats: bool = True
+) -> Tuple[Dict[str, Any], Dict[Optional[str], Dict[str, Any]]]:
+    """
+    Relatório para diretor escolar (todas as turmas), reaproveitando análises salvas.
+    Só chama o Gemini para as turmas cujo hash dos dados mudou; a Parte 1 só é
+    refeita se os dados de alguma turma ou o resumo geral mudaram.
+    
+    Args:
+        dashboard_data: Dados completos do dashboard
+        stored_analyses: Análises salvas por nome da turma (None = Parte 1),
+            cada uma {"hash": ..., "analise": ...}
+        use_cache: Se False, ignora respostas em cache do Gemini
+        use_stats: Se True, envia as estatísticas calculadas localmente nos prompts
+    
+    Returns:
+        (relatório consolidado, análises por turma e Parte 1 com "hash", "analise",
+        "reutilizada" e "erro"; só as sem erro e não reutilizadas precisam ser salvas)
+    """
+    causal_stats = _causal_stats()
+    stored_analyses = stored_analyses or {}
+    turmas_nomes = _turmas_nomes(dashboard_data)
+    
+    estatisticas = await asyncio.to_thread(causal_stats.compute_causal_stats, dashboard_data) if use_stats else None
+    
+    # Só os dados da própria turma entram no hash dela; o resumo geral só afeta a Parte 1
+    dados = {turma_name: extract_relevant_data(dashboard_data, turma=turma_name) for turma_name in turmas_nomes}
+    hashes = {
+        turma_name: relatorio_data_hash({"turmas": dados[turma_name]["turmas"]}, estatisticas, turma_name)
+        for turma_name in turmas_nomes
+    }
+    dados[None] = extract_relevant_data(dashboard_data, turma=None)
+    hashes[None] = relatorio_data_hash(dados[None], estatisticas)
+    
+    pendentes = [
+        key for key in [None, *turmas_nomes]
+        if stored_analyses.get(key, {}).get("hash") != hashes[key]
+    ]
+    reutilizadas = len(turmas_nomes) + 1 - len(pendentes)
+    print(
+        f" Relatório de {len(turmas_nomes)} turma(s): {len(pendentes)} análise(s) a gerar, "
+        f"{reutilizadas} reaproveitada(s) ({CAUSAL_ANALYSIS_CONCURRENCY} em paralelo)..."
+    )
+    
+    # Cada turma (e a Parte 1 geral) é uma chamada independente ao Gemini:
+    # todas saem em paralelo e o tempo total fica perto da chamada mais lenta
+    semaphore = asyncio.Semaphore(max(1, CAUSAL_ANALYSIS_CONCURRENCY))
+    
+    async def limited(key):
+        async with semaphore:
+            if key is None:
+                return await _analyze_parte_1_relatorio(
+                    dashboard_data, len(turmas_nomes), use_cache, dados[None], raise_errors=True,
+                    estatisticas=estatisticas
+                )
+            return await _analyze_single_turma_relatorio(dashboard_data, key, use_cache, dados[key], estatisticas)
+    
+    results = await asyncio.gather(*[limited(key) for key in pendentes], return_exceptions=True)
+    
+    analises = {
+        key: {"hash": hashes[key], "analise": stored_analyses[key]["analise"], "reutilizada": True, "erro": None}
+        for key in [None, *turmas_nomes] if key not in pendentes
+    }
+    for key, analise in zip(pendentes, results):
+        if isinstance(analise, asyncio.CancelledError):
+            raise analise
+        erro = None
+        if isinstance(analise, Exception):
+            erro = str(analise)
+            if key is not None:
+                analise = _erro_turma_relatorio(key, analise)
+            elif estatisticas:
+                analise = _parte_1_sem_llm(estatisticas)
+            else:
+                analise = _parte_1_fallback(len(turmas_nomes))
+        elif key is not None and "erro" in analise:
+            erro = analise["erro"]
+        analises[key] = {"hash": hashes[key], "analise": analise, "reutilizada": False, "erro": erro}
+    
+    # Resultados na ordem original das turmas; a falha de uma não afeta as outras
+    analyses = []
+    for i, turma_name in enumerate(turmas_nomes, 1):
+        info = analises[turma_name]
+        if info["erro"]:
+            print(f"  [{i}/{len(turmas_nomes)}] Erro ao analisar turma {turma_name}: {info['erro']}")
+        elif info["reutilizada"]:
+            print(f"  [{i}/{len(turmas_nomes)}] Turma {turma_name} sem mudanças, análise reaproveitada")
+        else:
+            print(f"  [{i}/{len(turmas_nomes)}] Turma {turma_name} analisada com sucesso")
+        analyses.append(info["analise"])
+    if analises[None]["erro"]:
+        print(f"  Erro ao gerar a análise geral: {analises[None]['erro']}")
+    
+    # Consolidar todas as análises
+    print(f"\n Consolidando relatório de {len(analyses)} turma(s)...")
+    relatorio = await _consolidate_relatorio(analyses, dashboard_data, analises[None]["analise"])
+    relatorio["metadata"]["analises_reaproveitadas"] = reutilizadas
+    relatorio["metadata"]["analises_geradas"] = len(pendentes)
+    return relatorio, analises
+
+
+def analyze_causal_factors_sem_llm(
     dashboard_data: Dict[str, Any],
     turma: Optional[str] = None,
-    formato_relatorio: bool = False
+    formato_relatorio: bool = False,
+    estatisticas: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Modo rápido: mesma estrutura de analyze_causal_factors, preenchida só com as
+    estatísticas locais (sem chamadas ao Gemini; seções narrativas ficam vazias).
+    Com turma, as estatísticas (se passadas) devem ter sido calculadas só para ela.
+    """
+    causal_stats = _causal_stats()
+    if estatisticas is None:
+        estatisticas = causal_stats.compute_causal_stats(dashboard_data, turma)
+    if turma and turma not in estatisticas["turmas"]:
+        raise ValueError(f"Turma '{turma}' não encontrada nos dados do dashboard")
+    turmas_nomes = list(estatisticas["turmas"])
+    stats = estatisticas["geral"]
+    metadata = {
+        "turma_analisada": turma if turma else "Todas as turmas",
+        "total_turmas": len(turmas_nomes),
+        "total_alunos": stats["n_alunos"],
+        "data_analise": dashboard_data.get("metadata", {}).get("data_geracao", ""),
+        "formato": "relatorio_diretor_escolar" if formato_relatorio else "analise_causal",
+        "sem_llm": True
+    }
+    
+    if formato_relatorio:
+        return {
+            "parte_1_analise_geral": _parte_1_sem_llm(estatisticas),
+            "parte_2_analise_por_turma": [
+                entrada for turma_name in turmas_nomes
+                for entrada in _turma_sem_llm(turma_name, estatisticas)["parte_2_analise_por_turma"]
+            ],
+            "metadata": metadata
+        }
+    
+    return {
+        "analise_geral_turma": {
+            "resumo_executivo": causal_stats.resumo_estatistico(stats),
+            "principais_fatores_causais": causal_stats.principais_fatores(stats),
+            "desigualdades_identificadas": []
+        },
+        "analise_por_cluster": [],
+        "recomendacoes_politicas_publicas": [],
+        "recomendacoes_agentes_escola": [],
+        "metricas_sugeridas": [],
+        "estatisticas": causal_stats.stats_for_prompt(estatisticas, turma),
+        "metadata": metadata
+    }
+
+
+async def analyze_causal_factors(
+    dashboard_data: Dict[str, Any],
+    turma: Optional[str] = None,
+    formato_relatorio: bool = False,
+    use_cache: bool = True,
+    use_stats: bool = True,
+    no_llm: bool = False
 ) -> Dict[str, Any]:
     """
     Realiza análise causal completa usando Google Gemini.
@@ -639,56 +1050,22 @@ def analyze_causal_factors(
         dashboard_data: Dados completos do dashboard JSON
         turma: Nome da turma específica (opcional)
         formato_relatorio: Se True, gera relatório para diretor escolar
+        use_cache: Se False, refaz as chamadas ao Gemini mesmo com resposta em cache
+        use_stats: Se True, calcula as estatísticas localmente e as envia no prompt
+        no_llm: Se True, não chama o Gemini (análise só com as estatísticas)
     
     Returns:
         Dicionário com análise completa estruturada
     """
+    causal_stats = _causal_stats()
+    if no_llm:
+        return await asyncio.to_thread(analyze_causal_factors_sem_llm, dashboard_data, turma, formato_relatorio)
+    
     # Se formato relatório e turma=None, processar todas as turmas individualmente
     if formato_relatorio and turma is None:
-        turmas_data = dashboard_data.get("dados_por_turma", [])
-        if not turmas_data:
-            raise ValueError("Nenhuma turma encontrada nos dados do dashboard")
-        
-        # Obter lista de nomes das turmas
-        turmas_nomes = [t.get("turma") for t in turmas_data if t.get("turma")]
-        
-        if not turmas_nomes:
-            raise ValueError("Nenhuma turma válida encontrada")
-        
-        print(f" Processando {len(turmas_nomes)} turma(s) individualmente para relatório...")
-        
-        # Analisar cada turma separadamente
-        analyses = []
-        for i, turma_name in enumerate(turmas_nomes, 1):
-            print(f"  [{i}/{len(turmas_nomes)}] Analisando turma: {turma_name}...")
-            try:
-                analise = _analyze_single_turma_relatorio(dashboard_data, turma_name)
-                analyses.append(analise)
-                print(f"   Turma {turma_name} analisada com sucesso")
-            except Exception as e:
-                print(f"    Erro ao analisar turma {turma_name}: {str(e)}")
-                analyses.append({
-                    "erro": str(e),
-                    "turma": turma_name,
-                    "parte_2_analise_por_turma": [{
-                        "turma": turma_name,
-                        "analise_plano_acao": {
-                            "sintese_desempenho": f"Erro ao analisar turma {turma_name}",
-                            "principais_desafios": "Não foi possível realizar a análise.",
-                            "recomendacoes_especificas": []
-                        },
-                        "correlacao_clusterizacao": {
-                            "descricao_clusters": "",
-                            "correlacoes_internas": "",
-                            "padroes_comportamentais": "",
-                            "oportunidades_intervencao": []
-                        }
-                    }]
-                })
-        
-        # Consolidar todas as análises
-        print(f"\n Consolidando relatório de {len(analyses)} turma(s)...")
-        relatorio_consolidado = _consolidate_relatorio(analyses, dashboard_data)
+        relatorio_consolidado, _ = await analyze_relatorio_incremental(
+            dashboard_data, use_cache=use_cache, use_stats=use_stats
+        )
         
         print(f" Relatório consolidado concluído!")
         
@@ -697,9 +1074,16 @@ def analyze_causal_factors(
     # Caso padrão: análise única (turma específica ou formato antigo)
     # Extrair dados relevantes
     extracted_data = extract_relevant_data(dashboard_data, turma)
+    estatisticas = (
+        await asyncio.to_thread(causal_stats.compute_causal_stats, dashboard_data, turma) if use_stats else None
+    )
     
     # Preparar prompt
-    prompt = prepare_analysis_prompt(extracted_data, formato_relatorio=formato_relatorio)
+    prompt = prepare_analysis_prompt(
+        extracted_data,
+        formato_relatorio=formato_relatorio,
+        estatisticas=causal_stats.stats_for_prompt(estatisticas, turma) if estatisticas else None
+    )
     
     # System instruction
     if formato_relatorio:
@@ -720,14 +1104,22 @@ def analyze_causal_factors(
     
     # Chamar Gemini
     try:
-        result = _gemini_generate_json(
+        result = await gemini_generate_json_async(
             model_name=MODEL_STRUCT,
             system_instruction=system_instruction,
             user_prompt=prompt,
             max_retries=3,
-            backoff_sec=1.5
+            backoff_sec=1.5,
+            use_cache=use_cache
         )
         
+        if estatisticas and formato_relatorio:
+            insights = result.get("parte_1_analise_geral", {}).get("insights_correlacoes")
+            if isinstance(insights, dict):
+                insights["correlacoes_identificadas"] = (
+                    causal_stats.insights_correlacoes(estatisticas["geral"])["correlacoes_identificadas"]
+                )
+        
         # Adicionar metadados
         result["metadata"] = {
             "turma_analisada": turma if turma else "Todas as turmas",
@@ -774,6 +1166,102 @@ def analyze_causal_factors(
             }
 
 
+# =========================
+# Relatório em Streaming
+# =========================
+
+async def stream_causal_report(
+    dashboard_data: Dict[str, Any],
+    use_cache: bool = True,
+    use_stats: bool = True,
+    no_llm: bool = False
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Relatório para diretor escolar em eventos, na ordem em que ficam prontos.
+    Mesmas chamadas de analyze_causal_factors(formato_relatorio=True), mas cada
+    turma é entregue assim que sua chamada ao Gemini termina.
+    
+    Eventos (campo "evento"):
+        "inicio": total_turmas e turmas
+        "turma": indice (posição original), turma e parte_2_analise_por_turma (uma por turma)
+        "parte_1_analise_geral": Parte 1 consolidada e metadata do relatório (último evento)
+    
+    Args:
+        dashboard_data: Dados completos do dashboard
+        use_cache: Se False, ignora respostas em cache do Gemini
+        use_stats: Se True, envia as estatísticas calculadas localmente nos prompts
+        no_llm: Se True, todos os eventos saem só das estatísticas (sem Gemini)
+    """
+    causal_stats = _causal_stats()
+    turmas_nomes = _turmas_nomes(dashboard_data)
+    print(f" Relatório em streaming: {len(turmas_nomes)} turma(s) ({CAUSAL_ANALYSIS_CONCURRENCY} em paralelo)...")
+    estatisticas = (
+        await asyncio.to_thread(causal_stats.compute_causal_stats, dashboard_data)
+        if use_stats or no_llm else None
+    )
+    
+    semaphore = asyncio.Semaphore(max(1, CAUSAL_ANALYSIS_CONCURRENCY))
+    
+    async def limited(indice, coro):
+        async with semaphore:
+            try:
+                return indice, await coro
+            except Exception as e:
+                return indice, _erro_turma_relatorio(turmas_nomes[indice], e)
+    
+    async def parte_1():
+        if no_llm:
+            return _parte_1_sem_llm(estatisticas)
+        async with semaphore:
+            return await _analyze_parte_1_relatorio(
+                dashboard_data, len(turmas_nomes), use_cache, estatisticas=estatisticas
+            )
+    
+    async def analisar_turma(turma_name):
+        if no_llm:
+            return _turma_sem_llm(turma_name, estatisticas)
+        return await _analyze_single_turma_relatorio(
+            dashboard_data, turma_name, use_cache, estatisticas=estatisticas
+        )
+    
+    # A Parte 1 sai em paralelo com as turmas, mas só é emitida no fim
+    parte_1_task = asyncio.ensure_future(parte_1())
+    turma_tasks = [
+        asyncio.ensure_future(limited(i, analisar_turma(turma_name)))
+        for i, turma_name in enumerate(turmas_nomes)
+    ]
+    try:
+        yield {"evento": "inicio", "total_turmas": len(turmas_nomes), "turmas": turmas_nomes}
+        
+        for done, next_task in enumerate(asyncio.as_completed(turma_tasks), 1):
+            indice, analise = await next_task
+            turma_name = turmas_nomes[indice]
+            if "erro" in analise:
+                print(f"  [{done}/{len(turmas_nomes)}] Erro ao analisar turma {turma_name}: {analise['erro']}")
+            else:
+                print(f"  [{done}/{len(turmas_nomes)}] Turma {turma_name} analisada com sucesso")
+            evento = {
+                "evento": "turma",
+                "indice": indice,
+                "turma": turma_name,
+                "parte_2_analise_por_turma": _parte_2_of(analise),
+            }
+            if "erro" in analise:
+                evento["erro"] = analise["erro"]
+            yield evento
+        
+        yield {
+            "evento": "parte_1_analise_geral",
+            "parte_1_analise_geral": await parte_1_task,
+            "metadata": _relatorio_metadata(dashboard_data, len(turmas_nomes)),
+        }
+    finally:
+        # Cliente desconectou (ou erro): não deixa chamadas ao Gemini órfãs
+        for task in (parte_1_task, *turma_tasks):
+            if not task.done():
+                task.cancel()
+
+
 # =========================
 # Função Helper para Carregar Dashboard
 # =========================
@@ -809,7 +1297,7 @@ if __name__ == "__main__":
         dashboard_data = load_dashboard_from_file(str(dashboard_path))
         
         print(" Realizando análise causal...")
-        resultado = analyze_causal_factors(dashboard_data, turma="1A")
+        resultado = asyncio.run(analyze_causal_factors(dashboard_data, turma="1A"))
         
         print(" Análise concluída!")
         print(f"\n Resumo Executivo:")
@@ -0,0 +1,390 @@
+"""
+Pré-análise estatística local da análise causal (NumPy/SciPy, sem LLM)
+Calcula de forma exata o que antes era pedido ao Gemini para "descobrir":
+- Matriz de correlação (Pearson, com p-valor) entre nota e fatores, por turma e geral
+- Diferença de média de nota entre grupos (ex: trabalha x não trabalha) com
+  intervalo de confiança por bootstrap (todas as reamostragens de uma vez)
+- Ranking dos fatores por tamanho de efeito (d de Cohen; r convertido em d)
+- Por cluster: nota média e prevalência de cada fator binário
+
+Os resultados compactos entram no prompt (estatisticas_calculadas) e podem
+substituir o LLM em insights_correlacoes ou em todo o relatório (modo sem LLM).
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Reamostragens do bootstrap e semente fixa (mesmos dados -> mesmos intervalos -> mesmo hash)
+BOOTSTRAP_SAMPLES = int(os.getenv("CAUSAL_STATS_BOOTSTRAP", "2000"))
+BOOTSTRAP_SEED = 20240601
+
+# Grupos menores que isso não têm diferença de média calculada
+MIN_GRUPO = 3
+
+# |r| mínimo para uma correlação entre fatores entrar nos destaques
+CORRELACAO_DESTAQUE = 0.3
+
+# Turmas processadas em paralelo (NumPy libera o GIL nas operações vetorizadas)
+CAUSAL_STATS_WORKERS = int(os.getenv("CAUSAL_STATS_WORKERS", "4"))
+
+NOTA = "media_geral"
+
+# Fatores contínuos: (nome, campo do aluno)
+FATORES_CONTINUOS: List[Tuple[str, str]] = [
+    ("renda_familiar", "renda_familiar"),
+    ("tempo_deslocamento_min", "tempo_deslocamento_min"),
+    ("frequencia_percentual", "frequencia_percentual"),
+    ("horas_trabalho_semana", "horas_trabalho_semana"),
+]
+
+# Fatores binários: (nome, descrição, condição sobre o aluno)
+FATORES_BINARIOS: List[Tuple[str, str, Callable[[dict], Optional[bool]]]] = [
+    ("trabalha_fora", "trabalha fora", lambda a: a.get("trabalha_fora") == "Sim"),
+    ("inseguranca_alimentar", "em insegurança alimentar",
+     lambda a: None if a.get("seguranca_alimentar") is None else a.get("seguranca_alimentar") != "Segura"),
+    ("sem_internet", "sem acesso à internet", lambda a: a.get("acesso_internet") == "Não"),
+    ("sem_computador", "sem computador", lambda a: a.get("tem_computador") == "Não"),
+    ("baixo_apoio_familiar", "com baixo apoio familiar aos estudos", lambda a: a.get("apoio_familiar_estudos") == "Baixo"),
+]
+
+VARIAVEIS = [NOTA] + [nome for nome, _ in FATORES_CONTINUOS] + [nome for nome, _, _ in FATORES_BINARIOS]
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def alunos_matrix(alunos: List[dict]) -> np.ndarray:
+    """Alunos -> matriz (alunos x VARIAVEIS), NaN onde falta o dado; binários como 0/1"""
+    matrix = np.full((len(alunos), len(VARIAVEIS)), np.nan)
+    for i, aluno in enumerate(alunos):
+        matrix[i, 0] = _number(aluno.get(NOTA))
+        for j, (_, campo) in enumerate(FATORES_CONTINUOS, 1):
+            matrix[i, j] = _number(aluno.get(campo))
+        for j, (_, _, condicao) in enumerate(FATORES_BINARIOS, 1 + len(FATORES_CONTINUOS)):
+            valor = condicao(aluno)
+            matrix[i, j] = np.nan if valor is None else float(valor)
+    return matrix
+
+
+def correlation_matrix(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pearson entre todas as colunas com pares completos (NaN ignorados par a par).
+    Retorna (r, p-valor, n) como matrizes variáveis x variáveis.
+    """
+    # scipy.stats é pesado de importar: só quando alguma correlação é calculada
+    from scipy.stats import t as t_dist
+
+    valid = ~np.isnan(matrix)
+    filled = np.where(valid, matrix, 0.0)
+    v = valid.astype(np.float64)
+
+    n = v.T @ v
+    sum_x = filled.T @ v              # soma de x_i nas linhas em que x_j também existe
+    sum_xx = (filled ** 2).T @ v
+    sum_xy = filled.T @ filled
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sum_xy - sum_x * sum_x.T / n
+        var_x = sum_xx - sum_x ** 2 / n
+        r = cov / np.sqrt(var_x * var_x.T)
+        r = np.clip(r, -1.0, 1.0)
+        t = r * np.sqrt((n - 2) / (1 - r ** 2))
+        p = 2 * t_dist.sf(np.abs(t), np.maximum(n - 2, 1))
+    p = np.where(np.abs(r) >= 1.0, 0.0, p)
+    r = np.where(n >= 3, r, np.nan)
+    p = np.where(n >= 3, p, np.nan)
+    return r, p, n
+
+
+def group_differences(nota: np.ndarray, grupos: np.ndarray, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """
+    Diferença da nota média (com fator - sem fator) para cada coluna de `grupos`
+    (alunos x fatores, 0/1/NaN), com d de Cohen e IC 95% por bootstrap
+    """
+    n_fatores = grupos.shape[1]
+    result = {key: np.full(n_fatores, np.nan) for key in ("media_com", "media_sem", "diferenca", "d", "ic_inf", "ic_sup")}
+    result["n_com"] = np.zeros(n_fatores, dtype=int)
+    result["n_sem"] = np.zeros(n_fatores, dtype=int)
+
+    for j in range(n_fatores):
+        valid = ~np.isnan(nota) & ~np.isnan(grupos[:, j])
+        com = nota[valid & (grupos[:, j] == 1)]
+        sem = nota[valid & (grupos[:, j] == 0)]
+        result["n_com"][j], result["n_sem"][j] = len(com), len(sem)
+        if len(com) < MIN_GRUPO or len(sem) < MIN_GRUPO:
+            continue
+
+        result["media_com"][j], result["media_sem"][j] = com.mean(), sem.mean()
+        result["diferenca"][j] = com.mean() - sem.mean()
+        pooled = np.sqrt(((len(com) - 1) * com.var(ddof=1) + (len(sem) - 1) * sem.var(ddof=1)) / (len(com) + len(sem) - 2))
+        result["d"][j] = result["diferenca"][j] / pooled if pooled > 0 else np.nan
+
+        # Bootstrap: BOOTSTRAP_SAMPLES reamostragens de cada grupo numa só operação
+        boot_com = com[rng.integers(0, len(com), (BOOTSTRAP_SAMPLES, len(com)))].mean(axis=1)
+        boot_sem = sem[rng.integers(0, len(sem), (BOOTSTRAP_SAMPLES, len(sem)))].mean(axis=1)
+        result["ic_inf"][j], result["ic_sup"][j] = np.percentile(boot_com - boot_sem, [2.5, 97.5])
+    return result
+
+
+def _r_to_d(r: float) -> float:
+    return 2 * r / np.sqrt(1 - r ** 2) if abs(r) < 1 else np.sign(r) * np.inf
+
+
+def _round(value: Any, digits: int = 3) -> Any:
+    if value is None or (isinstance(value, float) and not np.isfinite(value)):
+        return None
+    return round(float(value), digits)
+
+
+def analyze_alunos(alunos: List[dict], rng: np.random.Generator) -> Dict[str, Any]:
+    """Estatísticas de um grupo de alunos (turma ou escola inteira)"""
+    matrix = alunos_matrix(alunos)
+    r, p, n = correlation_matrix(matrix)
+    binarios = matrix[:, 1 + len(FATORES_CONTINUOS):]
+    diffs = group_differences(matrix[:, 0], binarios, rng)
+
+    correlacoes = [
+        {"fator": nome, "r": _round(r[0, j]), "p": _round(p[0, j], 4), "n": int(n[0, j])}
+        for j, nome in enumerate(VARIAVEIS) if j > 0 and np.isfinite(r[0, j])
+    ]
+    diferencas = []
+    for j, (nome, descricao, _) in enumerate(FATORES_BINARIOS):
+        if not np.isfinite(diffs["diferenca"][j]):
+            continue
+        diferencas.append({
+            "fator": nome,
+            "grupo": descricao,
+            "n_com": int(diffs["n_com"][j]),
+            "n_sem": int(diffs["n_sem"][j]),
+            "media_com": _round(diffs["media_com"][j], 2),
+            "media_sem": _round(diffs["media_sem"][j], 2),
+            "diferenca": _round(diffs["diferenca"][j], 2),
+            "ic95": [_round(diffs["ic_inf"][j], 2), _round(diffs["ic_sup"][j], 2)],
+            "d": _round(diffs["d"][j], 2),
+        })
+
+    # Ranking: d de Cohen dos binários; r -> d dos contínuos
+    efeitos = [
+        {"fator": c["fator"], "efeito_d": _round(_r_to_d(c["r"]), 2), "fonte": "correlacao", "p": c["p"]}
+        for c in correlacoes if c["fator"] in dict(FATORES_CONTINUOS)
+    ] + [
+        {"fator": d["fator"], "efeito_d": d["d"], "fonte": "diferenca_grupos",
+         "significativo": d["ic95"][0] > 0 or d["ic95"][1] < 0}
+        for d in diferencas if d["d"] is not None
+    ]
+    ranking = sorted((e for e in efeitos if e["efeito_d"] is not None), key=lambda e: -abs(e["efeito_d"]))
+
+    destaques = [
+        {"variavel_1": VARIAVEIS[i], "variavel_2": VARIAVEIS[j], "r": _round(r[i, j]), "p": _round(p[i, j], 4)}
+        for i in range(1, len(VARIAVEIS)) for j in range(i + 1, len(VARIAVEIS))
+        if np.isfinite(r[i, j]) and abs(r[i, j]) >= CORRELACAO_DESTAQUE
+    ]
+
+    return {
+        "n_alunos": len(alunos),
+        "media_nota": _round(np.nanmean(matrix[:, 0]), 2) if len(alunos) else None,
+        "correlacoes_nota": correlacoes,
+        "diferencas_grupos": diferencas,
+        "ranking_fatores": ranking,
+        "correlacoes_entre_fatores": destaques,
+        "matriz_correlacao": {
+            "variaveis": VARIAVEIS,
+            "r": [[_round(value) for value in row] for row in r],
+        },
+    }
+
+
+def cluster_profile(cluster: dict) -> Dict[str, Any]:
+    """Nota média e prevalência (%) de cada fator binário no cluster"""
+    matrix = alunos_matrix(cluster.get("alunos", []))
+    binarios = matrix[:, 1 + len(FATORES_CONTINUOS):]
+    with np.errstate(invalid="ignore"):
+        prevalencia = np.nanmean(binarios, axis=0) * 100 if len(matrix) else np.full(len(FATORES_BINARIOS), np.nan)
+    return {
+        "cluster_id": cluster.get("cluster_id"),
+        "n_alunos": len(matrix),
+        "media_nota": _round(np.nanmean(matrix[:, 0]), 2) if len(matrix) else None,
+        "pct_fatores": {nome: _round(prevalencia[j], 1) for j, (nome, _, _) in enumerate(FATORES_BINARIOS)},
+    }
+
+
+def _analyze_turma(turma: dict, seed: int) -> Dict[str, Any]:
+    alunos = [aluno for cluster in turma.get("clusters_turma", []) for aluno in cluster.get("alunos", [])]
+    stats = analyze_alunos(alunos, np.random.default_rng(seed))
+    stats["clusters"] = [cluster_profile(cluster) for cluster in turma.get("clusters_turma", [])]
+    return stats
+
+
+def compute_causal_stats(dashboard_data: Dict[str, Any], turma: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Estatísticas de todas as turmas (em paralelo) e da escola inteira.
+    Turma específica: só ela (e "geral" igual à turma).
+    Com um dashboard indexado (dashboard_store.IndexedDashboard), o resultado
+    fica guardado nele até o arquivo mudar.
+    """
+    cache = getattr(dashboard_data, "cache_estatisticas", None)
+    if cache is not None and turma in cache:
+        return cache[turma]
+
+    turmas = [t for t in dashboard_data.get("dados_por_turma", []) if t.get("turma")]
+    if turma:
+        turmas = [t for t in turmas if t["turma"] == turma]
+
+    # Semente por turma (posição): resultado não depende da ordem de execução
+    seeds = [BOOTSTRAP_SEED + i for i in range(len(turmas))]
+    if len(turmas) > 1 and CAUSAL_STATS_WORKERS > 1:
+        with ThreadPoolExecutor(max_workers=CAUSAL_STATS_WORKERS) as pool:
+            por_turma = list(pool.map(_analyze_turma, turmas, seeds))
+    else:
+        por_turma = [_analyze_turma(t, s) for t, s in zip(turmas, seeds)]
+
+    todos = [aluno for t in turmas for cluster in t.get("clusters_turma", []) for aluno in cluster.get("alunos", [])]
+    result = {
+        "geral": analyze_alunos(todos, np.random.default_rng(BOOTSTRAP_SEED - 1)),
+        "turmas": {t["turma"]: stats for t, stats in zip(turmas, por_turma)},
+    }
+    if cache is not None:
+        cache[turma] = result
+    return result
+
+
+# =========================
+# Saídas para prompt e relatório
+# =========================
+
+# Correlações entre fatores enviadas ao LLM (as de maior |r|)
+DESTAQUES_PROMPT = 5
+
+
+def _compact(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Versão para o LLM: sem a matriz completa e sem o perfil dos clusters (o prompt
+    já tem os agregados de cada cluster); ranking só com fator e d
+    """
+    if not stats:
+        return {}
+    destaques = sorted(stats["correlacoes_entre_fatores"], key=lambda c: -abs(c["r"]))[:DESTAQUES_PROMPT]
+    return {
+        "n_alunos": stats["n_alunos"],
+        "media_nota": stats["media_nota"],
+        "correlacoes_nota": stats["correlacoes_nota"],
+        "diferencas_grupos": [
+            {key: value for key, value in d.items() if key != "grupo"} for d in stats["diferencas_grupos"]
+        ],
+        "ranking_fatores": [[e["fator"], e["efeito_d"]] for e in stats["ranking_fatores"]],
+        "correlacoes_entre_fatores": [[c["variavel_1"], c["variavel_2"], c["r"]] for c in destaques],
+    }
+
+
+def stats_for_prompt(causal_stats: Dict[str, Any], turma: Optional[str] = None) -> Dict[str, Any]:
+    """Versão compacta para o prompt: da turma, ou geral + 3 maiores efeitos de cada turma"""
+    if turma:
+        return _compact(causal_stats["turmas"].get(turma, {}))
+    return {
+        "geral": _compact(causal_stats["geral"]),
+        "ranking_por_turma": {
+            nome: [[e["fator"], e["efeito_d"]] for e in stats["ranking_fatores"][:3]]
+            for nome, stats in causal_stats["turmas"].items()
+        },
+    }
+
+
+def _descricao_correlacao(r: float) -> str:
+    forca = "forte" if abs(r) >= 0.5 else "moderada" if abs(r) >= 0.3 else "fraca"
+    return f"correlação {forca} {'positiva' if r > 0 else 'negativa'} (r = {r:.2f})"
+
+
+def insights_correlacoes(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Seção insights_correlacoes (formato do relatório) calculada a partir das estatísticas"""
+    correlacoes = [
+        {
+            "variavel_1": c["fator"],
+            "variavel_2": NOTA,
+            "relacao": _descricao_correlacao(c["r"]),
+            "significancia": f"p = {c['p']:.4f} (n = {c['n']})" if c["p"] is not None else f"n = {c['n']}",
+        }
+        for c in stats["correlacoes_nota"]
+    ] + [
+        {
+            "variavel_1": d["fator"],
+            "variavel_2": NOTA,
+            "relacao": (
+                f"alunos {d['grupo']} têm média {d['media_com']:.2f} contra {d['media_sem']:.2f} "
+                f"(diferença {d['diferenca']:+.2f}, d = {d['d']})"
+            ),
+            "significancia": f"IC 95% bootstrap [{d['ic95'][0]:+.2f}, {d['ic95'][1]:+.2f}]",
+        }
+        for d in stats["diferencas_grupos"]
+    ]
+    principais = [e["fator"] for e in stats["ranking_fatores"][:3]]
+    return {
+        "observacoes": (
+            f"Correlações e diferenças calculadas sobre {stats['n_alunos']} aluno(s), média geral "
+            f"{stats['media_nota']}. Fatores com maior efeito sobre a nota: {', '.join(principais) or 'nenhum'}."
+        ),
+        "correlacoes_identificadas": correlacoes,
+        "causas_subjacentes": (
+            "Associações estatísticas (não implicam causalidade); os fatores de maior efeito "
+            "indicam onde investigar e intervir primeiro."
+        ),
+    }
+
+
+def _magnitude(d: float) -> str:
+    return "alto" if abs(d) >= 0.8 else "medio" if abs(d) >= 0.5 else "baixo"
+
+
+def _evidencia(stats: Dict[str, Any], fator: str) -> str:
+    for d in stats["diferencas_grupos"]:
+        if d["fator"] == fator:
+            return (
+                f"Média {d['media_com']:.2f} (n = {d['n_com']}) contra {d['media_sem']:.2f} (n = {d['n_sem']}); "
+                f"IC 95% da diferença [{d['ic95'][0]:+.2f}, {d['ic95'][1]:+.2f}]"
+            )
+    for c in stats["correlacoes_nota"]:
+        if c["fator"] == fator:
+            return f"r = {c['r']:.2f} com a média geral (p = {c['p']:.4f}, n = {c['n']})"
+    return ""
+
+
+def principais_fatores(stats: Dict[str, Any], limite: int = 5) -> List[Dict[str, Any]]:
+    """principais_fatores_causais (formato da análise causal) a partir do ranking de efeitos"""
+    return [
+        {
+            "fator": e["fator"],
+            "impacto": f"{'Aumenta' if e['efeito_d'] > 0 else 'Reduz'} a média geral (d = {e['efeito_d']})",
+            "evidencia": _evidencia(stats, e["fator"]),
+            "magnitude": _magnitude(e["efeito_d"]),
+        }
+        for e in stats["ranking_fatores"][:limite]
+    ]
+
+
+def resumo_estatistico(stats: Dict[str, Any]) -> str:
+    ranking = stats["ranking_fatores"]
+    texto = f"{stats['n_alunos']} aluno(s) com média geral {stats['media_nota']}."
+    if ranking:
+        texto += " Fatores ordenados por tamanho de efeito: " + ", ".join(
+            f"{e['fator']} (d = {e['efeito_d']})" for e in ranking
+        ) + "."
+    return texto
+
+
+def descricao_clusters(stats: Dict[str, Any]) -> str:
+    """Nota média e fatores mais frequentes de cada cluster"""
+    partes = []
+    for cluster in stats.get("clusters", []):
+        frequentes = sorted(
+            ((nome, pct) for nome, pct in cluster["pct_fatores"].items() if pct),
+            key=lambda item: -item[1]
+        )[:3]
+        fatores = ", ".join(f"{nome} {pct:.0f}%" for nome, pct in frequentes) or "nenhum fator de risco"
+        partes.append(
+            f"Cluster {cluster['cluster_id']}: {cluster['n_alunos']} aluno(s), média {cluster['media_nota']}; {fatores}"
+        )
+    return ". ".join(partes) + ("." if partes else "")
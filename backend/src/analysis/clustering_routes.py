@@ -1,27 +1,41 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, HTTPException, UploadFile, File, Request, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-import pandas as pd
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
+from contextlib import aclosing
+import asyncio
 import io
 import sys
 import json
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
-from models.clustering_model import StudentClusteringModel
+
+# pandas/sklearn só são importados no primeiro uso (cold start mais rápido)
+if TYPE_CHECKING:
+    from models.clustering_model import StudentClusteringModel
 
 # Importar análise causal do mesmo diretório
 from .causal_analysis import (
     analyze_causal_factors,
-    load_dashboard_from_file,
+    analyze_relatorio_incremental,
+    stream_causal_report,
     extract_relevant_data
 )
+from .dashboard_store import DashboardStore
+from ..llm_client import ClientDisconnected, cancel_on_disconnect
+from ..database import session_scope
+from ..report_store import load_stored_analyses, resolve_turma_ids, save_analyses
 
 
 router = APIRouter(prefix="/analysis", tags=["Analysis"])
 
 MODEL_PATH = Path(__file__).parent.parent / "models" / "student_clustering_model.pkl"
 
+# Dashboard das rotas de análise causal: lido uma vez, relido quando o arquivo muda
+DASHBOARD_PATH = Path(__file__).parent.parent.parent / "utils" / "dados_dashboard.json"
+dashboard_store = DashboardStore(DASHBOARD_PATH)
+
 
 class StudentData(BaseModel):
     ID: int
@@ -55,7 +69,14 @@ class DashboardResponse(BaseModel):
     insights_principais: List[str]
 
 
-def load_model() -> StudentClusteringModel:
+_model_cache = None
+
+
+def load_model() -> "StudentClusteringModel":
+    global _model_cache
+    if _model_cache is not None:
+        return _model_cache
+
     if not MODEL_PATH.exists():
         raise HTTPException(
             status_code=503,
@@ -63,8 +84,9 @@ def load_model() -> StudentClusteringModel:
         )
     
     try:
-        model = StudentClusteringModel.load(str(MODEL_PATH))
-        return model
+        from models.clustering_model import StudentClusteringModel
+        _model_cache = StudentClusteringModel.load(str(MODEL_PATH))
+        return _model_cache
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -91,6 +113,8 @@ async def clustering_health():
 
 @router.post("/predict/single", response_model=ClusterPrediction)
 async def predict_single_student(student: StudentData):
+    import pandas as pd
+
     try:
         model = load_model()
         student_dict = student.model_dump()
@@ -115,6 +139,8 @@ async def predict_single_student(student: StudentData):
 
 @router.post("/predict/batch")
 async def predict_batch_students(students: List[StudentData]):
+    import pandas as pd
+
     try:
         model = load_model()
         students_dicts = [s.model_dump() for s in students]
@@ -145,6 +171,8 @@ async def predict_batch_students(students: List[StudentData]):
 
 @router.post("/dashboard/generate", response_model=DashboardResponse)
 async def generate_dashboard(students: List[StudentData]):
+    import pandas as pd
+
     try:
         model = load_model()
         students_dicts = [s.model_dump() for s in students]
@@ -160,6 +188,8 @@ async def generate_dashboard(students: List[StudentData]):
 
 @router.post("/dashboard/from-csv", response_model=DashboardResponse)
 async def generate_dashboard_from_csv(file: UploadFile = File(...)):
+    import pandas as pd
+
     try:
         if not file.filename.endswith('.csv'):
             raise HTTPException(
@@ -230,19 +260,35 @@ async def get_model_info():
 # =========================
 
 @router.post("/causal-analysis")
-async def causal_analysis_from_dashboard(dashboard_data: Dict[str, Any], turma: Optional[str] = None):
+async def causal_analysis_from_dashboard(
+    request: Request,
+    dashboard_data: Dict[str, Any],
+    turma: Optional[str] = None,
+    usar_cache: bool = True,
+    usar_estatisticas: bool = True,
+    sem_llm: bool = False
+):
     """
     Realiza análise causal completa a partir de dados do dashboard.
     
     Args:
         dashboard_data: Dados completos do dashboard JSON
         turma: Nome da turma específica (opcional). Se None, analisa todas as turmas.
+        usar_cache: Se False, refaz as chamadas ao Gemini mesmo com resposta em cache
+        usar_estatisticas: Envia ao Gemini as estatísticas calculadas localmente (prompt menor)
+        sem_llm: Modo rápido, só com as estatísticas (sem chamadas ao Gemini)
     
     Returns:
         Análise causal completa com recomendações
     """
     try:
-        resultado = analyze_causal_factors(dashboard_data, turma)
+        # Chamadas ao Gemini canceladas se o cliente desconectar
+        resultado = await cancel_on_disconnect(
+            request,
+            analyze_causal_factors(
+                dashboard_data, turma, use_cache=usar_cache, use_stats=usar_estatisticas, no_llm=sem_llm
+            )
+        )
         
         # Salvar resultado em arquivo
         output_path = Path(__file__).parent.parent.parent / "utils" / "resultado_analise.json"
@@ -250,6 +296,8 @@ async def causal_analysis_from_dashboard(dashboard_data: Dict[str, Any], turma:
             json.dump(resultado, f, ensure_ascii=False, indent=2)
         
         return resultado
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Cliente desconectou; análise cancelada")
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -258,28 +306,41 @@ async def causal_analysis_from_dashboard(dashboard_data: Dict[str, Any], turma:
 
 
 @router.get("/causal-analysis/turma/{turma_name}")
-async def causal_analysis_by_turma(turma_name: str):
+async def causal_analysis_by_turma(
+    request: Request,
+    turma_name: str,
+    usar_cache: bool = True,
+    usar_estatisticas: bool = True,
+    sem_llm: bool = False
+):
     """
     Realiza análise causal para uma turma específica usando dados do arquivo padrão.
     
     Args:
         turma_name: Nome da turma (ex: "1A", "2B")
+        usar_cache: Se False, refaz as chamadas ao Gemini mesmo com resposta em cache
+        usar_estatisticas: Envia ao Gemini as estatísticas calculadas localmente (prompt menor)
+        sem_llm: Modo rápido, só com as estatísticas (sem chamadas ao Gemini)
     
     Returns:
         Análise causal completa da turma
     """
     try:
         # Carregar dados do arquivo padrão
-        dashboard_path = Path(__file__).parent.parent.parent / "utils" / "dados_dashboard.json"
-        
-        if not dashboard_path.exists():
+        if not DASHBOARD_PATH.exists():
             raise HTTPException(
                 status_code=404,
                 detail="Arquivo de dashboard não encontrado. Gere o dashboard primeiro."
             )
         
-        dashboard_data = load_dashboard_from_file(str(dashboard_path))
-        resultado = analyze_causal_factors(dashboard_data, turma=turma_name)
+        dashboard_data = dashboard_store.get()
+        resultado = await cancel_on_disconnect(
+            request,
+            analyze_causal_factors(
+                dashboard_data, turma=turma_name, use_cache=usar_cache,
+                use_stats=usar_estatisticas, no_llm=sem_llm
+            )
+        )
         
         # Salvar resultado em arquivo
         output_path = Path(__file__).parent.parent.parent / "utils" / "resultado_analise.json"
@@ -287,6 +348,10 @@ async def causal_analysis_by_turma(turma_name: str):
             json.dump(resultado, f, ensure_ascii=False, indent=2)
         
         return resultado
+    except HTTPException:
+        raise
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Cliente desconectou; análise cancelada")
     except FileNotFoundError:
         raise HTTPException(
             status_code=404,
@@ -299,28 +364,72 @@ async def causal_analysis_by_turma(turma_name: str):
         )
 
 
+async def _relatorio_incremental(dashboard_data: Dict[str, Any], use_cache: bool, use_stats: bool) -> Dict[str, Any]:
+    """
+    Relatório do diretor reaproveitando as análises salvas em relatorios_gerais.
+    O banco só é usado antes e depois das chamadas ao Gemini (sem segurar conexão);
+    se estiver indisponível, o relatório é gerado por completo.
+    """
+    try:
+        async with session_scope() as db:
+            turma_ids = await resolve_turma_ids(db, dashboard_data)
+            stored = await load_stored_analyses(db, turma_ids)
+    except Exception as e:
+        print(f" Aviso: análises salvas indisponíveis ({str(e)}); gerando relatório completo")
+        turma_ids, stored = None, {}
+    
+    relatorio, analises = await analyze_relatorio_incremental(
+        dashboard_data, stored, use_cache=use_cache, use_stats=use_stats
+    )
+    
+    if turma_ids is not None:
+        try:
+            async with session_scope() as db:
+                salvas = await save_analyses(db, analises, turma_ids, relatorio["metadata"])
+            print(f" {salvas} análise(s) salva(s) para as próximas gerações")
+        except Exception as e:
+            print(f" Aviso: falha ao salvar análises do relatório: {str(e)}")
+    return relatorio
+
+
 @router.get("/causal-analysis/all")
-async def causal_analysis_all_turmas(formato_relatorio: bool = False):
+async def causal_analysis_all_turmas(
+    request: Request,
+    formato_relatorio: bool = False,
+    usar_cache: bool = True,
+    incremental: bool = True,
+    usar_estatisticas: bool = True,
+    sem_llm: bool = False
+):
     """
     Realiza análise causal para todas as turmas usando dados do arquivo padrão.
     
     Args:
         formato_relatorio: Se True, gera relatório para diretor escolar (processa turma por turma)
+        usar_cache: Se False, refaz as chamadas ao Gemini mesmo com resposta em cache
+        incremental: No relatório, reaproveita as análises salvas das turmas cujos dados não mudaram
+        usar_estatisticas: Envia ao Gemini as estatísticas calculadas localmente (prompt menor)
+        sem_llm: Modo rápido, só com as estatísticas (sem Gemini e sem análises salvas)
     
     Returns:
         Análise causal completa de todas as turmas ou relatório consolidado
     """
     try:
-        dashboard_path = Path(__file__).parent.parent.parent / "utils" / "dados_dashboard.json"
-        
-        if not dashboard_path.exists():
+        if not DASHBOARD_PATH.exists():
             raise HTTPException(
                 status_code=404,
                 detail="Arquivo de dashboard não encontrado. Gere o dashboard primeiro."
             )
         
-        dashboard_data = load_dashboard_from_file(str(dashboard_path))
-        resultado = analyze_causal_factors(dashboard_data, turma=None, formato_relatorio=formato_relatorio)
+        dashboard_data = dashboard_store.get()
+        if formato_relatorio and incremental and not sem_llm:
+            analise = _relatorio_incremental(dashboard_data, usar_cache, usar_estatisticas)
+        else:
+            analise = analyze_causal_factors(
+                dashboard_data, turma=None, formato_relatorio=formato_relatorio, use_cache=usar_cache,
+                use_stats=usar_estatisticas, no_llm=sem_llm
+            )
+        resultado = await cancel_on_disconnect(request, analise)
         
         # Salvar resultado em arquivo
         if formato_relatorio:
@@ -332,6 +441,10 @@ async def causal_analysis_all_turmas(formato_relatorio: bool = False):
             json.dump(resultado, f, ensure_ascii=False, indent=2)
         
         return resultado
+    except HTTPException:
+        raise
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Cliente desconectou; análise cancelada")
     except FileNotFoundError:
         raise HTTPException(
             status_code=404,
@@ -344,6 +457,122 @@ async def causal_analysis_all_turmas(formato_relatorio: bool = False):
         )
 
 
+STREAM_MEDIA_TYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _encode_event(evento: Dict[str, Any], formato: str) -> str:
+    data = json.dumps(evento, ensure_ascii=False)
+    if formato == "sse":
+        return f"event: {evento['evento']}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+@router.get("/causal-analysis/all/stream")
+async def causal_analysis_all_turmas_stream(
+    formato: str = Query("sse", pattern="^(sse|ndjson)$"),
+    usar_cache: bool = True,
+    usar_estatisticas: bool = True,
+    sem_llm: bool = False
+):
+    """
+    Relatório para diretor escolar (todas as turmas) em streaming (SSE ou NDJSON).
+    Cada turma é enviada assim que sua análise termina; a Parte 1 (análise geral)
+    é o último evento. Ao final, o relatório completo é salvo como em /causal-analysis/all.
+    
+    Args:
+        formato: "sse" (text/event-stream) ou "ndjson" (um evento JSON por linha)
+        usar_cache: Se False, refaz as chamadas ao Gemini mesmo com resposta em cache
+        usar_estatisticas: Envia ao Gemini as estatísticas calculadas localmente (prompt menor)
+        sem_llm: Modo rápido, só com as estatísticas (sem chamadas ao Gemini)
+    
+    Returns:
+        Eventos "inicio", "turma" (um por turma) e "parte_1_analise_geral"
+    """
+    if not DASHBOARD_PATH.exists():
+        raise HTTPException(
+            status_code=404,
+            detail="Arquivo de dashboard não encontrado. Gere o dashboard primeiro."
+        )
+    
+    try:
+        dashboard_data = dashboard_store.get()
+        events = stream_causal_report(
+            dashboard_data, use_cache=usar_cache, use_stats=usar_estatisticas, no_llm=sem_llm
+        )
+        # Primeiro evento antes de abrir o stream: dados inválidos ainda viram erro HTTP
+        inicio = await events.__anext__()
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao realizar análise causal: {str(e)}"
+        )
+    
+    async def body():
+        # aclosing: se o cliente desconectar, as chamadas pendentes ao Gemini são canceladas
+        async with aclosing(events):
+            yield _encode_event(inicio, formato)
+            por_turma = {}
+            try:
+                async for evento in events:
+                    if evento["evento"] == "turma":
+                        por_turma[evento["indice"]] = evento["parte_2_analise_por_turma"]
+                    elif evento["evento"] == "parte_1_analise_geral":
+                        relatorio = {
+                            "parte_1_analise_geral": evento["parte_1_analise_geral"],
+                            "parte_2_analise_por_turma": [item for i in sorted(por_turma) for item in por_turma[i]],
+                            "metadata": evento["metadata"],
+                        }
+                        output_path = Path(__file__).parent.parent.parent / "utils" / "relatorio_diretor_escolar.json"
+                        with open(output_path, 'w', encoding='utf-8') as f:
+                            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+                    yield _encode_event(evento, formato)
+            except Exception as e:
+                yield _encode_event({"evento": "erro", "erro": f"Erro ao realizar análise causal: {str(e)}"}, formato)
+    
+    return StreamingResponse(
+        body(),
+        media_type=STREAM_MEDIA_TYPES[formato],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/causal-analysis/stats")
+async def causal_stats_for_analysis(turma: Optional[str] = None):
+    """
+    Estatísticas locais da análise causal (sem Gemini): matriz de correlação,
+    diferenças de média entre grupos com IC 95% (bootstrap) e ranking de fatores
+    por tamanho de efeito, geral e por turma.
+    
+    Args:
+        turma: Nome da turma específica (opcional)
+    
+    Returns:
+        {"geral": ..., "turmas": {nome: ...}}
+    """
+    if not DASHBOARD_PATH.exists():
+        raise HTTPException(
+            status_code=404,
+            detail="Arquivo de dashboard não encontrado."
+        )
+    
+    try:
+        dashboard_data = dashboard_store.get()
+        # SciPy/NumPy só no primeiro uso (cold start mais rápido)
+        from .causal_stats import compute_causal_stats
+        estatisticas = await asyncio.to_thread(compute_causal_stats, dashboard_data, turma)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao calcular estatísticas: {str(e)}"
+        )
+    if turma and turma not in estatisticas["turmas"]:
+        raise HTTPException(status_code=404, detail=f"Turma '{turma}' não encontrada.")
+    return estatisticas
+
+
 @router.get("/causal-analysis/extract-data")
 async def extract_data_for_analysis(turma: Optional[str] = None):
     """
@@ -357,15 +586,13 @@ async def extract_data_for_analysis(turma: Optional[str] = None):
         Dados extraídos e estruturados
     """
     try:
-        dashboard_path = Path(__file__).parent.parent.parent / "utils" / "dados_dashboard.json"
-        
-        if not dashboard_path.exists():
+        if not DASHBOARD_PATH.exists():
             raise HTTPException(
                 status_code=404,
                 detail="Arquivo de dashboard não encontrado."
             )
         
-        dashboard_data = load_dashboard_from_file(str(dashboard_path))
+        dashboard_data = dashboard_store.get()
         extracted = extract_relevant_data(dashboard_data, turma=turma)
         return extracted
     except Exception as e:
@@ -0,0 +1,91 @@
+"""
+Dashboard (dados_dashboard.json) carregado uma vez e indexado por turma
+- O JSON é lido com orjson (se instalado) e só é relido quando o arquivo muda
+  (mtime ou tamanho diferentes)
+- IndexedDashboard: o próprio dict do dashboard, com o índice turma -> registro
+  e os dados de cada turma já extraídos para a análise causal (amostra de alunos
+  e agregados por cluster); extract_relevant_data usa esse índice direto e
+  compute_causal_stats guarda nele as estatísticas calculadas
+- O snapshot é compartilhado entre requisições: somente leitura
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from .causal_analysis import extract_turma_data
+except ImportError:
+    from causal_analysis import extract_turma_data
+
+
+def parse_json_bytes(raw: bytes) -> Any:
+    """orjson quando disponível (bem mais rápido), json da biblioteca padrão senão"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode("utf-8"))
+
+
+class IndexedDashboard(dict):
+    """
+    Dashboard com índices por turma (atributos, fora do JSON):
+        turmas: nome -> registro em dados_por_turma
+        turmas_extraidas: nome -> [extract_turma_data(registro)] (lista: nomes repetidos)
+        cache_estatisticas: turma (None = todas) -> compute_causal_stats, preenchido no primeiro uso
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        super().__init__(data)
+        self.turmas: Dict[str, Dict[str, Any]] = {}
+        self.turmas_extraidas: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        self.cache_estatisticas: Dict[Optional[str], Dict[str, Any]] = {}
+        for turma_data in self.get("dados_por_turma", []):
+            nome = turma_data.get("turma")
+            self.turmas.setdefault(nome, turma_data)
+            self.turmas_extraidas.setdefault(nome, []).append(extract_turma_data(turma_data))
+
+
+class DashboardStore:
+    """Cache do dashboard de um arquivo, recarregado quando o arquivo muda"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int]] = None
+        self._dashboard: Optional[IndexedDashboard] = None
+        self.loads = 0
+
+    def _stat_signature(self) -> Tuple[int, int]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Arquivo não encontrado: {self.path}")
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self) -> IndexedDashboard:
+        """Dashboard atual; relê e reindexa só se o arquivo mudou desde a última leitura"""
+        signature = self._stat_signature()
+        dashboard = self._dashboard
+        if dashboard is not None and signature == self._signature:
+            return dashboard
+
+        with self._lock:
+            # Outra thread pode ter recarregado enquanto esta esperava
+            if self._dashboard is not None and signature == self._signature:
+                return self._dashboard
+            raw = self.path.read_bytes()
+            dashboard = IndexedDashboard(parse_json_bytes(raw))
+            self._dashboard, self._signature = dashboard, signature
+            self.loads += 1
+            print(f" Dashboard carregado: {self.path.name} ({len(raw)} bytes, {len(dashboard.turmas)} turma(s))")
+            return dashboard
+
+    def invalidate(self):
+        with self._lock:
+            self._dashboard, self._signature = None, None
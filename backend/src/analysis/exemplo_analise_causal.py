@@ -1,6 +1,7 @@
 """
 Exemplo de uso do módulo de análise causal
 """
+import asyncio
 import json
 import sys
 from pathlib import Path
@@ -44,7 +45,7 @@ def exemplo_analise_turma():
             print(" Formato: Relatório para Diretor Escolar (processamento turma por turma)")
         print(" Isso pode levar alguns segundos...")
         
-        resultado = analyze_causal_factors(dashboard_data, turma=turma, formato_relatorio=formato_relatorio)
+        resultado = asyncio.run(analyze_causal_factors(dashboard_data, turma=turma, formato_relatorio=formato_relatorio))
         
         # Exibir resumo
         print("\n" + "=" * 60)
@@ -0,0 +1,358 @@
+"""
+Cache de respostas para rotas de leitura (CRUD e estatísticas)
+
+- Backends: memória do processo (LRU + TTL), SQLite local compartilhado entre
+  workers da mesma máquina (stand-in do Redis) ou Redis, via RESPONSE_CACHE_BACKEND
+- Chaves por rota + parâmetros; cada entrada carrega tags ("class:<id>", ...)
+  e as escritas invalidam só as tags afetadas
+- Respostas levam ETag: If-None-Match igual devolve 304 sem corpo
+- O backend "memory" só invalida no worker que fez a escrita: com mais de um
+  worker (WEB_CONCURRENCY > 1) o cache passa para o SQLite compartilhado
+- Com réplica de leitura, o que foi carregado da réplica logo depois de uma
+  invalidação (RESPONSE_CACHE_REPLICA_LAG s) é servido mas não guardado: a
+  réplica pode ainda não ter a escrita
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple, Union
+
+from fastapi import Request, Response
+
+try:
+    from .database import READ_REPLICA_HOST
+    from .serialization import dumps_json
+except ImportError:
+    from database import READ_REPLICA_HOST
+    from serialization import dumps_json
+
+# "memory" (padrão), "sqlite", "redis" ou "off"
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+RESPONSE_CACHE_PATH = os.getenv(
+    "RESPONSE_CACHE_PATH",
+    str(Path(__file__).parent.parent / "response_cache.sqlite")
+)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Atraso máximo (s) esperado da réplica de leitura em relação ao primário
+RESPONSE_CACHE_REPLICA_LAG = float(os.getenv("RESPONSE_CACHE_REPLICA_LAG", "5"))
+# Workers do uvicorn (o uvicorn usa WEB_CONCURRENCY como padrão de --workers)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# (corpo JSON, etag)
+CachedBody = Tuple[bytes, str]
+
+
+# =========================
+# Backends
+# =========================
+
+class MemoryCache:
+    """LRU com TTL no processo. Cada worker do uvicorn tem o seu."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[bytes, str, float, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, set] = {}
+        self._epoch = 0
+        self._invalidated_at = 0.0
+
+    async def get(self, key: str) -> Optional[CachedBody]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        body, etag, expires_at, _ = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return body, etag
+
+    async def set(self, key: str, body: bytes, etag: str, ttl: float, tags: Iterable[str]):
+        tags = tuple(tags)
+        self._remove(key)
+        self._entries[key] = (body, etag, time.monotonic() + ttl, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    async def invalidate_tags(self, tags: Iterable[str]):
+        self._epoch += 1
+        self._invalidated_at = time.time()
+        for tag in tags:
+            for key in list(self._tags.pop(tag, ())):
+                self._remove(key)
+
+    async def epoch(self) -> int:
+        return self._epoch
+
+    async def invalidated_at(self) -> float:
+        return self._invalidated_at
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[3]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class SQLiteCache:
+    """
+    Cache compartilhado entre os workers da mesma máquina, num arquivo SQLite.
+    Stand-in local do Redis: mesma semântica (TTL, tags, epoch), sem servidor.
+    Uma conexão por worker (aberta no primeiro uso) protegida por lock; as
+    operações rodam numa thread (asyncio.to_thread) e não bloqueiam o event loop.
+    """
+
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY, body BLOB, etag TEXT, expires_at REAL, accessed_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS entry_tags (tag TEXT, key TEXT, PRIMARY KEY (tag, key));
+                CREATE INDEX IF NOT EXISTS ix_entry_tags_key ON entry_tags (key);
+                CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER);
+                INSERT OR IGNORE INTO meta (name, value) VALUES ('epoch', 0);
+                INSERT OR IGNORE INTO meta (name, value) VALUES ('invalidated_at', 0);
+                """
+            )
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _delete_keys(conn: sqlite3.Connection, keys: Iterable[str]):
+        """Remove as entradas e as tags delas"""
+        params = [(key,) for key in keys]
+        conn.executemany("DELETE FROM entries WHERE key = ?", params)
+        conn.executemany("DELETE FROM entry_tags WHERE key = ?", params)
+
+    def _get(self, key: str) -> Optional[CachedBody]:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT body, etag, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[2] < now:
+                self._delete_keys(conn, (key,))
+                return None
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            return bytes(row[0]), row[1]
+
+    def _set(self, key: str, body: bytes, etag: str, ttl: float, tags: Tuple[str, ...]):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM entry_tags WHERE key = ?", (key,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, body, etag, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, body, etag, now + ttl, now)
+                )
+                conn.executemany("INSERT OR IGNORE INTO entry_tags (tag, key) VALUES (?, ?)", [(t, key) for t in tags])
+                # Despejo LRU quando passa do limite (só as tags das entradas despejadas saem junto)
+                evicted = conn.execute(
+                    "SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?", (self.max_entries,)
+                ).fetchall()
+                if evicted:
+                    self._delete_keys(conn, (row[0] for row in evicted))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _invalidate_tags(self, tags: Tuple[str, ...]):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("UPDATE meta SET value = value + 1 WHERE name = 'epoch'")
+                conn.execute("UPDATE meta SET value = ? WHERE name = 'invalidated_at'", (time.time(),))
+                keys = set()
+                for tag in tags:
+                    keys.update(row[0] for row in conn.execute("SELECT key FROM entry_tags WHERE tag = ?", (tag,)))
+                self._delete_keys(conn, keys)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _meta(self, name: str):
+        with self._lock:
+            return self._connection().execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()[0]
+
+    async def get(self, key: str) -> Optional[CachedBody]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, body: bytes, etag: str, ttl: float, tags: Iterable[str]):
+        await asyncio.to_thread(self._set, key, body, etag, ttl, tuple(tags))
+
+    async def invalidate_tags(self, tags: Iterable[str]):
+        await asyncio.to_thread(self._invalidate_tags, tuple(tags))
+
+    async def epoch(self) -> int:
+        return await asyncio.to_thread(self._meta, "epoch")
+
+    async def invalidated_at(self) -> float:
+        return await asyncio.to_thread(self._meta, "invalidated_at")
+
+
+class RedisCache:
+    """Cache compartilhado entre máquinas (requer o pacote `redis`)"""
+
+    PREFIX = "respcache:"
+
+    def __init__(self, url: str = REDIS_URL):
+        import redis.asyncio as redis
+        self.client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[CachedBody]:
+        values = await self.client.hmget(self.PREFIX + key, "body", "etag")
+        if values[0] is None:
+            return None
+        return values[0], values[1].decode()
+
+    async def set(self, key: str, body: bytes, etag: str, ttl: float, tags: Iterable[str]):
+        pipe = self.client.pipeline()
+        pipe.hset(self.PREFIX + key, mapping={"body": body, "etag": etag})
+        pipe.expire(self.PREFIX + key, max(1, int(ttl)))
+        for tag in tags:
+            pipe.sadd(f"{self.PREFIX}tag:{tag}", key)
+            pipe.expire(f"{self.PREFIX}tag:{tag}", max(1, int(ttl)))
+        await pipe.execute()
+
+    async def invalidate_tags(self, tags: Iterable[str]):
+        await self.client.incr(self.PREFIX + "epoch")
+        await self.client.set(self.PREFIX + "invalidated_at", time.time())
+        for tag in tags:
+            tag_key = f"{self.PREFIX}tag:{tag}"
+            keys = await self.client.smembers(tag_key)
+            if keys:
+                await self.client.delete(*[self.PREFIX + k.decode() for k in keys])
+            await self.client.delete(tag_key)
+
+    async def epoch(self) -> int:
+        value = await self.client.get(self.PREFIX + "epoch")
+        return int(value or 0)
+
+    async def invalidated_at(self) -> float:
+        value = await self.client.get(self.PREFIX + "invalidated_at")
+        return float(value or 0)
+
+
+_cache = None
+
+
+def get_response_cache():
+    """Instancia o backend configurado na primeira chamada (None se desligado)"""
+    global _cache
+    if _cache is None and RESPONSE_CACHE_BACKEND != "off":
+        backend = RESPONSE_CACHE_BACKEND
+        if backend == "memory" and WEB_CONCURRENCY > 1:
+            # Cada worker teria o seu cache e só o da escrita seria invalidado
+            print(f" Aviso: RESPONSE_CACHE_BACKEND=memory com {WEB_CONCURRENCY} workers; usando o cache SQLite compartilhado")
+            backend = "sqlite"
+        if backend == "sqlite":
+            _cache = SQLiteCache(RESPONSE_CACHE_PATH)
+        elif backend == "redis":
+            _cache = RedisCache()
+        else:
+            _cache = MemoryCache()
+    return _cache
+
+
+# =========================
+# Helpers para as rotas
+# =========================
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _json_response(request: Request, body: bytes, etag: str, cache_status: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Cache": cache_status}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def cached_json_response(
+    request: Request,
+    key: str,
+    tags: Union[Iterable[str], Callable[[Any], Iterable[str]]],
+    loader: Callable[[], Awaitable[Any]],
+    ttl: float = RESPONSE_CACHE_TTL,
+    from_replica: bool = False,
+) -> Response:
+    """
+    Devolve a resposta em cache para `key` ou executa `loader` e guarda o resultado.
+
+    Args:
+        request: Request atual (para If-None-Match)
+        key: Chave da rota + parâmetros (ex: "class_students:<id>")
+        tags: Tags invalidáveis da entrada, ou função que as calcula a partir do resultado
+        loader: Corrotina que consulta o banco; HTTPException não é cacheada
+        ttl: Segundos de validade
+        from_replica: `loader` lê da réplica (get_read_db/get_analytics_db); com
+            READ_REPLICA_HOST, o resultado não é guardado logo após uma invalidação
+    """
+    cache = get_response_cache()
+    if cache is not None:
+        cached = await cache.get(key)
+        if cached is not None:
+            return _json_response(request, cached[0], cached[1], "HIT")
+        epoch_before = await cache.epoch()
+
+    payload = await loader()
+    body = dumps_json(payload)
+    etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+
+    if cache is not None:
+        entry_tags = tags(payload) if callable(tags) else tags
+        # Se houve escrita enquanto consultávamos, o resultado pode já estar velho
+        fresh = await cache.epoch() == epoch_before
+        # Réplica atrasada: a escrita invalidada há pouco pode não ter chegado nela
+        if fresh and from_replica and READ_REPLICA_HOST and RESPONSE_CACHE_REPLICA_LAG > 0:
+            fresh = time.time() - await cache.invalidated_at() >= RESPONSE_CACHE_REPLICA_LAG
+        if fresh:
+            await cache.set(key, body, etag, ttl, entry_tags)
+
+    return _json_response(request, body, etag, "MISS")
+
+
+async def invalidate(*tags: str):
+    """Invalida todas as entradas marcadas com qualquer uma das tags"""
+    cache = get_response_cache()
+    if cache is not None and tags:
+        await cache.invalidate_tags(set(tags))
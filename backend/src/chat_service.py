@@ -10,6 +10,11 @@ from typing import List, Dict, Any, AsyncGenerator
 from dotenv import load_dotenv
 from openai import OpenAI
 
+try:
+    from .llm_rate_limit import estimate_tokens, is_rate_limited, llm_rate_limiter, retry_after_of
+except ImportError:
+    from llm_rate_limit import estimate_tokens, is_rate_limited, llm_rate_limiter, retry_after_of
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -129,39 +134,48 @@ async def generate_chat_response(
         {'role': 'system', 'content': system_prompt}
     ] + openai_messages
     
-    # Inicializar cliente OpenAI
-    client = OpenAI(api_key=api_key)
+    # Inicializar cliente OpenAI (OPENAI_BASE_URL permite usar o servidor falso de fake_llm_server.py)
+    client = OpenAI(api_key=api_key, base_url=os.getenv('OPENAI_BASE_URL') or None)
     
     # Criar requisição com streaming
     # Nota: A API da OpenAI é síncrona, mas vamos usar em um executor para não bloquear
     import asyncio
     
-    # Criar stream síncrono
-    stream = client.chat.completions.create(
-        model=model,
-        messages=formatted_messages,
-        stream=True,
-        temperature=0.7
-    )
-    
-    # Yield chunks de texto de forma assíncrona
-    # Usar executor para não bloquear o event loop
-    loop = asyncio.get_event_loop()
-    
-    def get_next_chunk():
-        """Obtém próximo chunk de forma síncrona"""
+    # Vaga no limiter (RPM/TPM do modelo e concorrência) durante todo o streaming
+    tokens = estimate_tokens(json.dumps(formatted_messages, ensure_ascii=False))
+    async with llm_rate_limiter.slot(model, tokens):
+        # Criar stream síncrono
         try:
-            chunk = next(stream)
-            if chunk.choices[0].delta.content is not None:
-                return chunk.choices[0].delta.content
-            return None
-        except StopIteration:
-            return None
-    
-    # Processar chunks de forma assíncrona
-    while True:
-        chunk = await loop.run_in_executor(None, get_next_chunk)
-        if chunk is None:
-            break
-        yield chunk
+            stream = client.chat.completions.create(
+                model=model,
+                messages=formatted_messages,
+                stream=True,
+                temperature=0.7
+            )
+        except Exception as e:
+            if is_rate_limited(e):
+                retry_after = retry_after_of(e)
+                await llm_rate_limiter.throttled_async(model, retry_after if retry_after is not None else 1.0)
+            raise
+        
+        # Yield chunks de texto de forma assíncrona
+        # Usar executor para não bloquear o event loop
+        loop = asyncio.get_event_loop()
+        
+        def get_next_chunk():
+            """Obtém próximo chunk de forma síncrona"""
+            try:
+                chunk = next(stream)
+                if chunk.choices[0].delta.content is not None:
+                    return chunk.choices[0].delta.content
+                return None
+            except StopIteration:
+                return None
+        
+        # Processar chunks de forma assíncrona
+        while True:
+            chunk = await loop.run_in_executor(None, get_next_chunk)
+            if chunk is None:
+                break
+            yield chunk
 
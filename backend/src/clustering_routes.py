@@ -1,13 +1,15 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File
 from pydantic import BaseModel
-from typing import List, Dict, Any
-import pandas as pd
+from typing import List, Dict, Any, TYPE_CHECKING
 import io
 import sys
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
-from models.clustering_model import StudentClusteringModel
+
+# pandas/sklearn só são importados no primeiro uso (cold start mais rápido)
+if TYPE_CHECKING:
+    from models.clustering_model import StudentClusteringModel
 
 
 router = APIRouter(prefix="/clustering", tags=["Clustering"])
@@ -47,7 +49,14 @@ class DashboardResponse(BaseModel):
     insights_principais: List[str]
 
 
-def load_model() -> StudentClusteringModel:
+_model_cache = None
+
+
+def load_model() -> "StudentClusteringModel":
+    global _model_cache
+    if _model_cache is not None:
+        return _model_cache
+
     if not MODEL_PATH.exists():
         raise HTTPException(
             status_code=503,
@@ -55,8 +64,9 @@ def load_model() -> StudentClusteringModel:
         )
     
     try:
-        model = StudentClusteringModel.load(str(MODEL_PATH))
-        return model
+        from models.clustering_model import StudentClusteringModel
+        _model_cache = StudentClusteringModel.load(str(MODEL_PATH))
+        return _model_cache
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -83,6 +93,8 @@ async def clustering_health():
 
 @router.post("/predict/single", response_model=ClusterPrediction)
 async def predict_single_student(student: StudentData):
+    import pandas as pd
+
     try:
         model = load_model()
         student_dict = student.model_dump()
@@ -107,6 +119,8 @@ async def predict_single_student(student: StudentData):
 
 @router.post("/predict/batch")
 async def predict_batch_students(students: List[StudentData]):
+    import pandas as pd
+
     try:
         model = load_model()
         students_dicts = [s.model_dump() for s in students]
@@ -137,6 +151,8 @@ async def predict_batch_students(students: List[StudentData]):
 
 @router.post("/dashboard/generate", response_model=DashboardResponse)
 async def generate_dashboard(students: List[StudentData]):
+    import pandas as pd
+
     try:
         model = load_model()
         students_dicts = [s.model_dump() for s in students]
@@ -152,6 +168,8 @@ async def generate_dashboard(students: List[StudentData]):
 
 @router.post("/dashboard/from-csv", response_model=DashboardResponse)
 async def generate_dashboard_from_csv(file: UploadFile = File(...)):
+    import pandas as pd
+
     try:
         if not file.filename.endswith('.csv'):
             raise HTTPException(
@@ -0,0 +1,144 @@
+"""
+Índice de coortes em bitmap (um por escola, em memória)
+- Um bitmap empacotado (np.packbits, 1 bit por aluno) para cada fator de
+  risco_scoring.FATORES, cada cor/raça e cada turma da escola
+- Consultas AND/OR/NOT viram operações bit a bit sobre poucos KB: contagem e
+  lista de ids em microssegundos, sem DataFrame nem SQL ad-hoc
+- Reconstruído do banco quando passa de COHORT_INDEX_TTL segundos ou quando
+  invalidado (CRUD de alunos)
+
+Expressão de consulta (JSON):
+    "sem_internet"                        fator (FATORES)
+    {"turma": "2B"}                       alunos da turma (nome)
+    {"cor_raca": "Parda"}                 alunos com essa cor/raça
+    {"and": [expr, ...]}  {"or": [expr, ...]}  {"not": expr}
+"""
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+try:
+    from .risk_scoring import FATORES, FATOR_BIT, FEATURE_COLUMNS, factor_masks
+    from .models_dashboard import Aluno, Turma
+except ImportError:
+    from risk_scoring import FATORES, FATOR_BIT, FEATURE_COLUMNS, factor_masks
+    from models_dashboard import Aluno, Turma
+
+# Idade máxima (s) do índice de uma escola antes de reconstruir
+COHORT_INDEX_TTL = float(os.getenv("COHORT_INDEX_TTL", "300"))
+# Aninhamento máximo de and/or/not numa expressão (evita RecursionError)
+COHORT_EXPR_MAX_DEPTH = 32
+
+Expr = Union[str, dict]
+
+
+class CohortIndex:
+    """Bitmaps de uma escola; a posição do bit é a posição do aluno em aluno_ids"""
+
+    def __init__(self, aluno_ids: Sequence[int], masks: np.ndarray, turmas: Sequence[str], cores: Sequence[Optional[str]]):
+        self.aluno_ids = np.asarray(aluno_ids, dtype=np.int64)
+        self.size = len(self.aluno_ids)
+        self.built_at = datetime.now(timezone.utc)
+        self._built_monotonic = time.monotonic()
+
+        self.all = np.packbits(np.ones(self.size, dtype=bool))
+        self.fatores = {fator: np.packbits((masks & FATOR_BIT[fator]) != 0) for fator in FATORES}
+        self.turmas = self._by_value(turmas)
+        self.cores = self._by_value(cores)
+
+    def _by_value(self, values: Sequence[Optional[str]]) -> Dict[str, np.ndarray]:
+        values = np.array(["" if v is None else v for v in values], dtype=object)
+        return {value: np.packbits(values == value) for value in set(values.tolist()) if value}
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self._built_monotonic
+
+    def _empty(self) -> np.ndarray:
+        return np.zeros_like(self.all)
+
+    def evaluate(self, expr: Expr, depth: int = 0) -> np.ndarray:
+        """Bitmap empacotado dos alunos que satisfazem a expressão (ValueError se inválida)"""
+        if depth > COHORT_EXPR_MAX_DEPTH:
+            raise ValueError(f"Expressão aninhada demais (máximo {COHORT_EXPR_MAX_DEPTH} níveis)")
+        if isinstance(expr, str):
+            if expr not in self.fatores:
+                raise ValueError(f"Fator desconhecido: {expr}. Use um de: {', '.join(FATORES)}")
+            return self.fatores[expr]
+        if not isinstance(expr, dict) or len(expr) != 1:
+            raise ValueError(f"Expressão inválida: {expr!r}")
+
+        (op, arg), = expr.items()
+        if op in ("turma", "cor_raca") and not isinstance(arg, str):
+            raise ValueError(f"'{op}' espera um texto, recebeu {arg!r}")
+        if op == "turma":
+            return self.turmas.get(arg, self._empty())
+        if op == "cor_raca":
+            return self.cores.get(arg, self._empty())
+        if op == "not":
+            return np.bitwise_and(np.invert(self.evaluate(arg, depth + 1)), self.all)
+        if op in ("and", "or"):
+            if not isinstance(arg, list) or not arg:
+                raise ValueError(f"'{op}' espera uma lista não vazia de expressões")
+            combine = np.bitwise_and if op == "and" else np.bitwise_or
+            bits = self.evaluate(arg[0], depth + 1)
+            for sub in arg[1:]:
+                bits = combine(bits, self.evaluate(sub, depth + 1))
+            return bits
+        raise ValueError(f"Operador desconhecido: {op}")
+
+    def count(self, bits: np.ndarray) -> int:
+        return int(np.bitwise_count(bits).sum())
+
+    def ids(self, bits: np.ndarray, limit: Optional[int] = None) -> list:
+        positions = np.flatnonzero(np.unpackbits(bits, count=self.size))
+        if limit is not None:
+            positions = positions[:limit]
+        return self.aluno_ids[positions].tolist()
+
+
+_indexes: Dict[uuid.UUID, CohortIndex] = {}
+_build_locks: Dict[uuid.UUID, asyncio.Lock] = {}
+
+
+async def build_cohort_index(db: AsyncSession, escola_id: uuid.UUID) -> CohortIndex:
+    result = await db.execute(
+        select(Aluno.id, Turma.nome, *FEATURE_COLUMNS)
+        .join(Turma, Turma.id == Aluno.turma_id)
+        .where(Aluno.escola_id == escola_id)
+        .order_by(Aluno.id)
+    )
+    rows = result.all()
+    values = list(zip(*rows)) if rows else [()] * (len(FEATURE_COLUMNS) + 2)
+    columns = {col.key: values[i + 2] for i, col in enumerate(FEATURE_COLUMNS)}
+    return CohortIndex(values[0], factor_masks(columns), values[1], columns["cor_raca"])
+
+
+async def get_cohort_index(db: AsyncSession, escola_id: uuid.UUID) -> CohortIndex:
+    """Índice da escola em cache; reconstruído (uma vez por escola) se expirado"""
+    index = _indexes.get(escola_id)
+    if index is not None and index.age < COHORT_INDEX_TTL:
+        return index
+
+    lock = _build_locks.setdefault(escola_id, asyncio.Lock())
+    async with lock:
+        index = _indexes.get(escola_id)
+        if index is None or index.age >= COHORT_INDEX_TTL:
+            index = await build_cohort_index(db, escola_id)
+            _indexes[escola_id] = index
+    return index
+
+
+def invalidate_cohort_index(escola_id: Optional[uuid.UUID] = None):
+    """Descarta o índice da escola (ou de todas); a próxima consulta reconstrói"""
+    if escola_id is None:
+        _indexes.clear()
+    else:
+        _indexes.pop(escola_id, None)
@@ -4,6 +4,7 @@ Este exemplo demonstra o fluxo completo: OCR → Estruturação → Correção
 usando a prova real mostrada nas imagens.
 """
 
+import asyncio
 import sys
 import os
 from pathlib import Path
@@ -147,7 +148,7 @@ def executar_pipeline_completo(diretorio_temp: str = "backend/src/temp"):
     print("-" * 70)
     
     try:
-        texto_limpo = parse_ocr_text(texto_ocr_bruto)
+        texto_limpo = asyncio.run(parse_ocr_text(texto_ocr_bruto))
         print(f" Texto limpo gerado ({len(texto_limpo)} caracteres)")
         print("\nAmostra do texto limpo:")
         print("-" * 70)
@@ -162,7 +163,7 @@ def executar_pipeline_completo(diretorio_temp: str = "backend/src/temp"):
     
     try:
         questoes_registradas = extrair_questoes_registradas(gabarito)
-        prova_estruturada = structure_exam_json(texto_limpo, questoes_registradas)
+        prova_estruturada = asyncio.run(structure_exam_json(texto_limpo, questoes_registradas))
         print(f" {len(prova_estruturada['questoes'])} questões discursivas estruturadas")
         
         for q in prova_estruturada['questoes']:
@@ -184,7 +185,7 @@ def executar_pipeline_completo(diretorio_temp: str = "backend/src/temp"):
     
     try:
         gabarito_discursivas = filtrar_gabarito_discursivas(gabarito)
-        resultado_correcao = evaluate_exam(prova_estruturada, gabarito_discursivas, step=0.5)
+        resultado_correcao = asyncio.run(evaluate_exam(prova_estruturada, gabarito_discursivas, step=0.5))
         
         print(f"\n{'=' * 70}")
         print(" RESULTADO FINAL DA CORREÇÃO")
@@ -261,13 +262,13 @@ def executar_pipeline_simulado():
     
     print("\n ETAPA 1: Limpeza do texto OCR")
     print("-" * 70)
-    texto_limpo = parse_ocr_text(texto_ocr_simulado)
+    texto_limpo = asyncio.run(parse_ocr_text(texto_ocr_simulado))
     print(f" Texto limpo ({len(texto_limpo)} caracteres)")
     
     print("\n  ETAPA 2: Estruturação em JSON")
     print("-" * 70)
     questoes_registradas = extrair_questoes_registradas(gabarito)
-    prova_estruturada = structure_exam_json(texto_limpo, questoes_registradas)
+    prova_estruturada = asyncio.run(structure_exam_json(texto_limpo, questoes_registradas))
     print(f" {len(prova_estruturada['questoes'])} questões estruturadas")
     
     for q in prova_estruturada['questoes']:
@@ -278,7 +279,7 @@ def executar_pipeline_simulado():
     print("\n ETAPA 3: Correção automática")
     print("-" * 70)
     gabarito_discursivas = filtrar_gabarito_discursivas(gabarito)
-    resultado_correcao = evaluate_exam(prova_estruturada, gabarito_discursivas, step=0.5)
+    resultado_correcao = asyncio.run(evaluate_exam(prova_estruturada, gabarito_discursivas, step=0.5))
     
     print(f"\n{'=' * 70}")
     print(" RESULTADO FINAL")
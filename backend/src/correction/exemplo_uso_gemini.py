@@ -3,6 +3,7 @@ Exemplo de uso do pipeline de correção automática com LLM.
 Este arquivo demonstra o fluxo completo: OCR → Estruturação → Correção
 """
 
+import asyncio
 from gemini import parse_ocr_text, structure_exam_json, evaluate_exam
 
 # =========================
@@ -92,7 +93,7 @@ def executar_pipeline_completo():
     print("Texto original (com ruídos):")
     print(texto_ocr_bruto[:200] + "...")
     
-    texto_limpo = parse_ocr_text(texto_ocr_bruto)
+    texto_limpo = asyncio.run(parse_ocr_text(texto_ocr_bruto))
     print(f"\n Texto limpo gerado ({len(texto_limpo)} caracteres)")
     print("Amostra:", texto_limpo[:200] + "...")
     
@@ -100,7 +101,7 @@ def executar_pipeline_completo():
     print("\n  ETAPA 2: Estruturação em JSON")
     print("-" * 70)
     
-    prova_estruturada = structure_exam_json(texto_limpo, questoes_registradas)
+    prova_estruturada = asyncio.run(structure_exam_json(texto_limpo, questoes_registradas))
     print(f" {len(prova_estruturada['questoes'])} questões discursivas estruturadas")
     
     for q in prova_estruturada['questoes']:
@@ -111,7 +112,7 @@ def executar_pipeline_completo():
     print("\n ETAPA 3: Correção automática")
     print("-" * 70)
     
-    resultado_correcao = evaluate_exam(prova_estruturada, gabarito, step=0.5)
+    resultado_correcao = asyncio.run(evaluate_exam(prova_estruturada, gabarito, step=0.5))
     
     print(f"\n RESULTADO FINAL")
     print("=" * 70)
@@ -135,7 +136,7 @@ def executar_pipeline_completo():
 def testar_parse_ocr():
     """Testa apenas a função de limpeza do OCR."""
     print("\n Testando parse_ocr_text...")
-    texto_limpo = parse_ocr_text(texto_ocr_bruto)
+    texto_limpo = asyncio.run(parse_ocr_text(texto_ocr_bruto))
     print(f"Texto limpo:\n{texto_limpo}\n")
 
 
@@ -143,9 +144,9 @@ def testar_structure():
     """Testa apenas a estruturação."""
     print("\n Testando structure_exam_json...")
     # Primeiro limpa
-    texto_limpo = parse_ocr_text(texto_ocr_bruto)
+    texto_limpo = asyncio.run(parse_ocr_text(texto_ocr_bruto))
     # Depois estrutura
-    estruturado = structure_exam_json(texto_limpo, questoes_registradas)
+    estruturado = asyncio.run(structure_exam_json(texto_limpo, questoes_registradas))
     
     import json
     print(json.dumps(estruturado, indent=2, ensure_ascii=False))
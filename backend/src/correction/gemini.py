@@ -1,92 +1,25 @@
-import os
+import asyncio
 import re
 import json
-import time
+import sys
+from pathlib import Path
 from typing import List, Dict, Any, Optional
-from dotenv import load_dotenv
-import google.generativeai as genai
 
-# =========================
-# Configuração
-# =========================
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY não encontrada no arquivo .env")
-
-genai.configure(api_key=GEMINI_API_KEY)
+# Cliente Gemini compartilhado com a análise causal (cache de modelos, retries assíncronos)
+try:
+    from ..llm_client import GEMINI_API_KEY, gemini_generate_json_async
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from llm_client import GEMINI_API_KEY, gemini_generate_json_async
 
 # Usando gemini-2.5-flash: rápido, eficiente e com ótima qualidade
 MODEL_STRUCT = "gemini-2.5-flash"
 MODEL_EVAL = "gemini-2.5-flash"
 
-# Temperaturas: baixa para previsibilidade e JSON consistente
-GEN_CONFIG_JSON = {
-    "temperature": 0.2,
-    "response_mime_type": "application/json",
-}
-
 
 # =========================
 # Helpers Gerais
 # =========================
-def _extract_json(text: str) -> Any:
-    """Extrai JSON de uma string. Tenta json.loads direto; se falhar, usa regex no primeiro bloco {...}."""
-    text = text.strip()
-    # remove cercas de código se existirem
-    if text.startswith("```json"):
-        text = text[7:]
-    if text.startswith("```"):
-        text = text[3:]
-    if text.endswith("```"):
-        text = text[:-3]
-    try:
-        return json.loads(text)
-    except Exception:
-        pass
-
-    # fallback: pega o primeiro bloco {...} balanceado simples
-    match = re.search(r'\{.*\}', text, flags=re.DOTALL)
-    if match:
-        candidate = match.group(0)
-        try:
-            return json.loads(candidate)
-        except Exception:
-            pass
-    raise ValueError("Falha ao extrair JSON do retorno do modelo.")
-
-
-def _gemini_generate_json(
-    model_name: str,
-    system_instruction: Optional[str],
-    user_prompt: str,
-    max_retries: int = 3,
-    backoff_sec: float = 1.2,
-) -> Any:
-    """
-    Faz uma chamada ao Gemini esperando JSON e retorna objeto Python.
-    Força MIME de resposta em JSON e aplica retries com backoff exponencial.
-    """
-    model = genai.GenerativeModel(model_name, system_instruction=system_instruction) if system_instruction \
-        else genai.GenerativeModel(model_name)
-
-    last_err = None
-    for attempt in range(1, max_retries + 1):
-        try:
-            resp = model.generate_content(
-                user_prompt,
-                generation_config=GEN_CONFIG_JSON,
-            )
-            # Em SDKs recentes, JSON vem em resp.text mesmo com mime JSON.
-            return _extract_json(resp.text)
-        except Exception as e:
-            last_err = e
-            if attempt < max_retries:
-                time.sleep(backoff_sec * attempt)
-            else:
-                raise last_err
-
-
 def _round_to_step(value: float, step: float, max_score: float) -> float:
     """Arredonda a 'step' e limita ao intervalo [0, max_score]."""
     if value is None:
@@ -104,7 +37,7 @@ def _round_to_step(value: float, step: float, max_score: float) -> float:
 # =========================
 # 1) Parsing do OCR
 # =========================
-def parse_ocr_text(ocr_text: str) -> str:
+async def parse_ocr_text(ocr_text: str) -> str:
     """
     Usa a LLM para limpar o texto OCR de ruídos e normalizações.
     Remove cabeçalhos, rodapés, números de página e outros elementos não relevantes.
@@ -151,7 +84,7 @@ def parse_ocr_text(ocr_text: str) -> str:
     }
     
     try:
-        result = _gemini_generate_json(
+        result = await gemini_generate_json_async(
             model_name=MODEL_STRUCT,
             system_instruction=system_instruction,
             user_prompt=json.dumps(user_prompt, ensure_ascii=False),
@@ -186,7 +119,7 @@ def _gerar_id_questao(questao: Dict[str, Any]) -> str:
     return str(numero)
 
 
-def structure_exam_json(cleaned_text: str, registered_questions: List[Dict[str, Any]]) -> Dict[str, Any]:
+async def structure_exam_json(cleaned_text: str, registered_questions: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Usa LLM para identificar, segmentar e associar respostas do OCR às perguntas discursivas.
     A LLM faz TODO o trabalho de estruturação: identificação de questões, segmentação e associação.
@@ -240,7 +173,7 @@ def structure_exam_json(cleaned_text: str, registered_questions: List[Dict[str,
     }
 
     try:
-        result = _gemini_generate_json(
+        result = await gemini_generate_json_async(
             model_name=MODEL_STRUCT,
             system_instruction=system_instruction,
             user_prompt=json.dumps(user_prompt, ensure_ascii=False),
@@ -321,7 +254,7 @@ def structure_exam_json(cleaned_text: str, registered_questions: List[Dict[str,
 # =========================
 # 3) Correção (JSON -> notas + análise)
 # =========================
-def evaluate_answer(
+async def evaluate_answer(
     student_answer: str,
     expected_answer: str,
     max_score: float,
@@ -357,7 +290,7 @@ def evaluate_answer(
     }
 
     try:
-        result = _gemini_generate_json(
+        result = await gemini_generate_json_async(
             model_name=MODEL_EVAL,
             system_instruction=system_instruction,
             user_prompt=json.dumps(user_prompt, ensure_ascii=False),
@@ -374,14 +307,15 @@ def evaluate_answer(
         return {"nota": 0.0, "analise": f"Erro na avaliação automática: {str(e)}"}
 
 
-def evaluate_exam(structured_exam: Dict[str, Any], answer_key: List[Dict[str, Any]], step: float = 0.5) -> Dict[str, Any]:
+async def evaluate_exam(structured_exam: Dict[str, Any], answer_key: List[Dict[str, Any]], step: float = 0.5) -> Dict[str, Any]:
     """
-    Itera sobre as questões discursivas e aplica evaluate_answer em cada uma.
+    Itera sobre as questões discursivas e aplica evaluate_answer em cada uma
+    (as chamadas ao Gemini saem em paralelo; a ordem das questões é mantida).
     Retorna questões corrigidas e a nota total.
     Usa ID único (número + letra) para garantir alinhamento correto.
     """
     questoes_corrigidas = []
-    nota_total = 0.0
+    avaliacoes = []
 
     # Mapa do gabarito por ID único (número + letra)
     answer_map = {_gerar_id_questao(item): item for item in answer_key}
@@ -424,20 +358,20 @@ def evaluate_exam(structured_exam: Dict[str, Any], answer_key: List[Dict[str, An
             })
             continue
 
-        aval = evaluate_answer(
+        questoes_corrigidas.append({"numero": numero, "letra": letra})
+        avaliacoes.append((questoes_corrigidas[-1], evaluate_answer(
             student_answer=student_answer,
             expected_answer=esperado,
             max_score=max_score,
             question_text=question_text,
             step=step,
-        )
+        )))
 
-        questoes_corrigidas.append({
-            "numero": numero,
-            "letra": letra,
-            "nota": aval["nota"],
-            "analise": aval["analise"]
-        })
+    nota_total = 0.0
+    resultados = await asyncio.gather(*(aval for _, aval in avaliacoes))
+    for (questao, _), aval in zip(avaliacoes, resultados):
+        questao["nota"] = aval["nota"]
+        questao["analise"] = aval["analise"]
         nota_total += float(aval["nota"])
 
     return {
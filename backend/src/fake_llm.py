@@ -0,0 +1,269 @@
+"""
+LLM falso para testes offline de carga e latência (sem Gemini/OpenAI)
+- FakeGenerativeModel: mesmo contrato do GenerativeModel do Gemini
+  (generate_content / generate_content_async -> resposta com .text); usado pelo
+  llm_client quando LLM_PROVIDER=fake
+- fake_chat_stream(): texto do chat em chunks, no ritmo configurado (/chat/ em modo mock)
+- create_fake_llm_app(): servidor HTTP que imita a API REST do Gemini
+  (models/{modelo}:generateContent) e a da OpenAI (chat/completions, com stream SSE);
+  executado por fake_llm_server.py
+
+Respostas JSON: geradas a partir do "formato_saida" do prompt (todos os prompts do
+projeto descrevem a saída assim), com alguns campos preenchidos a partir da entrada
+(texto_limpo, questoes, nota).
+
+Configuração (env):
+    FAKE_LLM_LATENCY       latência até a resposta (ou até o 1º chunk), em ms:
+                           "fixed:2000", "uniform:200:1500", "normal:800:200",
+                           "lognormal:800:0.5" (mediana, sigma)
+    FAKE_LLM_ERROR_RATE    fração das chamadas que falham (0 a 1)
+    FAKE_LLM_CHUNK_MS      intervalo entre chunks do streaming (ms)
+    FAKE_LLM_CHUNK_CHARS   caracteres por chunk
+    FAKE_LLM_SEED          semente (execuções reproduzíveis)
+    FAKE_LLM_CHAT_RESPONSE texto da resposta do chat
+"""
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+DEFAULT_CHAT_RESPONSE = (
+    "Atualmente, 125 alunos estão na faixa de baixo desempenho (nota geral entre 0 e 4). "
+    "Isso representa 69,4% do total de alunos da escola."
+)
+
+
+class FakeLLMError(Exception):
+    """Falha simulada (equivalente a um 503/429 da API real)"""
+
+
+class LatencyDistribution:
+    """Distribuição de latência a partir de "tipo:param1:param2" (ms); sample() em segundos"""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        kind, *params = spec.split(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params]
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if self.kind not in expected or len(self.params) != expected[self.kind]:
+            raise ValueError(f"Distribuição de latência inválida: {spec!r} (ex: fixed:300, lognormal:800:0.5)")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            ms = rng.gauss(*self.params)
+        else:
+            median, sigma = self.params
+            ms = median * rng.lognormvariate(0.0, sigma)
+        return max(ms, 0.0) / 1000
+
+
+class FakeLLMConfig:
+    def __init__(
+        self,
+        latency: str = "fixed:2000",
+        error_rate: float = 0.0,
+        chunk_ms: float = 50.0,
+        chunk_chars: int = 3,
+        seed: Optional[int] = None,
+        chat_response: str = DEFAULT_CHAT_RESPONSE,
+    ):
+        self.latency = LatencyDistribution(latency)
+        self.error_rate = error_rate
+        self.chunk_interval = chunk_ms / 1000
+        self.chunk_chars = max(1, chunk_chars)
+        self.chat_response = chat_response
+        self.rng = random.Random(seed)
+
+    @classmethod
+    def from_env(cls) -> "FakeLLMConfig":
+        seed = os.getenv("FAKE_LLM_SEED")
+        return cls(
+            latency=os.getenv("FAKE_LLM_LATENCY", "fixed:2000"),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            chunk_ms=float(os.getenv("FAKE_LLM_CHUNK_MS", "50")),
+            chunk_chars=int(os.getenv("FAKE_LLM_CHUNK_CHARS", "3")),
+            seed=int(seed) if seed else None,
+            chat_response=os.getenv("FAKE_LLM_CHAT_RESPONSE", DEFAULT_CHAT_RESPONSE),
+        )
+
+    def delay(self) -> float:
+        return self.latency.sample(self.rng)
+
+    def check_error(self):
+        if self.error_rate and self.rng.random() < self.error_rate:
+            raise FakeLLMError("Falha simulada do LLM falso (FAKE_LLM_ERROR_RATE)")
+
+
+fake_config = FakeLLMConfig.from_env()
+
+
+# =========================
+# Respostas JSON a partir do "formato_saida"
+# =========================
+
+def _fill_value(key: str, spec: Any, rng: random.Random) -> Any:
+    if isinstance(spec, dict):
+        return {k: _fill_value(k, v, rng) for k, v in spec.items()}
+    if isinstance(spec, list):
+        return [_fill_value(key, item, rng) for item in spec]
+    if not isinstance(spec, str):
+        return spec
+    tipo = spec.split(" - ")[0].strip()
+    if tipo.startswith("int"):
+        return rng.randint(1, 5)
+    if tipo.startswith("float"):
+        return round(rng.uniform(0, 10), 1)
+    if "|" in tipo:
+        return rng.choice(tipo.split("|"))
+    if tipo == "discursiva":
+        return tipo
+    return f"Texto simulado para '{key}'."
+
+
+def fake_json_response(user_prompt: str, rng: random.Random) -> Dict[str, Any]:
+    """JSON no formato pedido pelo prompt (prompt em JSON com "formato_saida")"""
+    try:
+        prompt = json.loads(user_prompt)
+    except (TypeError, ValueError):
+        prompt = {}
+    if not isinstance(prompt, dict) or not isinstance(prompt.get("formato_saida"), dict):
+        return {"resposta": "Resposta simulada."}
+
+    result = _fill_value("", prompt["formato_saida"], rng)
+    # Campos que dependem da entrada: mantém os fallbacks dos chamadores fora do caminho
+    if "texto_limpo" in result:
+        result["texto_limpo"] = prompt.get("texto_ocr", "")
+    if "questoes" in result and "questoes_registradas_discursivas" in prompt:
+        result["questoes"] = [
+            {**q, "resposta_aluno": f"Resposta simulada da questão {q.get('numero')}."}
+            for q in prompt["questoes_registradas_discursivas"]
+        ]
+    if "nota" in result and "nota_maxima" in prompt:
+        result["nota"] = round(rng.uniform(0, float(prompt["nota_maxima"])), 1)
+    return result
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Substituto em processo do GenerativeModel do Gemini"""
+
+    def __init__(self, model_name: str, system_instruction: Optional[str] = None, config: Optional[FakeLLMConfig] = None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.config = config or fake_config
+
+    def _respond(self, prompt: str) -> FakeResponse:
+        self.config.check_error()
+        return FakeResponse(json.dumps(fake_json_response(prompt, self.config.rng), ensure_ascii=False))
+
+    async def generate_content_async(self, prompt: str, generation_config: Optional[dict] = None) -> FakeResponse:
+        await asyncio.sleep(self.config.delay())
+        return self._respond(prompt)
+
+    def generate_content(self, prompt: str, generation_config: Optional[dict] = None) -> FakeResponse:
+        time.sleep(self.config.delay())
+        return self._respond(prompt)
+
+
+async def fake_chat_stream(text: Optional[str] = None, config: Optional[FakeLLMConfig] = None) -> AsyncIterator[str]:
+    """Texto do chat em chunks: espera a latência sorteada e depois um chunk por intervalo"""
+    config = config or fake_config
+    text = text if text is not None else config.chat_response
+    await asyncio.sleep(config.delay())
+    config.check_error()
+    for i in range(0, len(text), config.chunk_chars):
+        yield text[i:i + config.chunk_chars]
+        await asyncio.sleep(config.chunk_interval)
+
+
+# =========================
+# Servidor HTTP (APIs REST do Gemini e da OpenAI)
+# =========================
+
+def _prompt_text(contents: List[Dict[str, Any]]) -> str:
+    return "".join(part.get("text", "") for content in contents for part in content.get("parts", []))
+
+
+def create_fake_llm_app(config: Optional[FakeLLMConfig] = None):
+    """App FastAPI que responde como o Gemini (generateContent) e a OpenAI (chat/completions)"""
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    config = config or fake_config
+    app = FastAPI(title="LLM falso (testes offline)")
+
+    @app.get("/health")
+    async def health():
+        return {
+            "status": "ok",
+            "latency": config.latency.spec,
+            "error_rate": config.error_rate,
+            "chunk_ms": config.chunk_interval * 1000,
+            "chunk_chars": config.chunk_chars,
+        }
+
+    @app.post("/v1beta/models/{model_action}")
+    async def gemini_generate_content(model_action: str, body: Dict[str, Any]):
+        model, _, action = model_action.partition(":")
+        if action != "generateContent":
+            return JSONResponse(status_code=404, content={"error": {"code": 404, "message": f"Ação não suportada: {action}", "status": "NOT_FOUND"}})
+        await asyncio.sleep(config.delay())
+        try:
+            config.check_error()
+        except FakeLLMError as e:
+            return JSONResponse(status_code=503, content={"error": {"code": 503, "message": str(e), "status": "UNAVAILABLE"}})
+        text = json.dumps(fake_json_response(_prompt_text(body.get("contents", [])), config.rng), ensure_ascii=False)
+        return {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+            "modelVersion": model,
+        }
+
+    @app.post("/v1/chat/completions")
+    async def openai_chat_completions(body: Dict[str, Any]):
+        model = body.get("model", "fake")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.delay())
+            try:
+                config.check_error()
+            except FakeLLMError as e:
+                return JSONResponse(status_code=503, content={"error": {"message": str(e), "type": "server_error"}})
+            return {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": config.chat_response}, "finish_reason": "stop"}],
+            }
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+            payload = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def events():
+            try:
+                async for text in fake_chat_stream(config=config):
+                    yield chunk({"content": text})
+            except FakeLLMError as e:
+                yield f"data: {json.dumps({'error': {'message': str(e), 'type': 'server_error'}})}\n\n"
+                return
+            yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
@@ -0,0 +1,390 @@
+"""
+Notas bimestrais em formato longo e tendências por aluno/disciplina
+- notas_bimestrais: (aluno, disciplina, bimestre, nota), preenchida a partir das
+  colunas largas de alunos (matematica_1bim ... portugues_4bim) pela importação
+  e pelo CRUD de alunos; nota apagada na coluna larga apaga a linha e marca a
+  série para o job recalcular
+- compute_trends(): inclinação, variância e maior queda de todas as séries de uma
+  vez, sobre uma matriz (séries x 4 bimestres) com NaN nas notas ausentes
+- update_tendencias(): job que grava tendencias_notas (incremental por padrão:
+  só as séries marcadas em tendencias_pendentes, que toda gravação/remoção de
+  nota marca no mesmo statement); as rotas só leem
+"""
+import os
+import time
+from itertools import chain
+from typing import Dict, Iterable, Optional, Tuple, TYPE_CHECKING
+
+from sqlalchemy import BigInteger, Float, Integer, SmallInteger, String, Boolean, Text, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# numpy só é importado pelo cálculo: as rotas de alunos usam apenas o upsert/remoção de notas
+if TYPE_CHECKING:
+    import numpy as np
+
+DISCIPLINAS = ("matematica", "portugues")
+BIMESTRES = (1, 2, 3, 4)
+
+# Coluna larga de alunos de cada (disciplina, bimestre)
+COLUNAS_NOTAS = {(disciplina, bimestre): f"{disciplina}_{bimestre}bim" for disciplina in DISCIPLINAS for bimestre in BIMESTRES}
+
+# Alerta de queda: recuo entre bimestres consecutivos ou inclinação (pontos/bimestre)
+QUEDA_ALERTA = float(os.getenv("GRADE_TREND_DROP_ALERT", "2.0"))
+INCLINACAO_ALERTA = float(os.getenv("GRADE_TREND_SLOPE_ALERT", "-1.0"))
+
+# Linhas por statement de upsert
+NOTAS_UPSERT_BATCH = 10_000
+
+TRENDS_LOCK_KEY = 730_004
+
+
+def _marcar_sql(series: str) -> str:
+    """
+    Marca em tendencias_pendentes as séries (aluno_id, disciplina) de `series`.
+    A versão da marca é renovada: o job só apaga a marca que leu, então uma
+    edição confirmada enquanto ele roda deixa a série para a próxima execução.
+    """
+    return f"""
+INSERT INTO tendencias_pendentes (aluno_id, disciplina)
+SELECT DISTINCT aluno_id, disciplina FROM {series} ORDER BY 1, 2
+ON CONFLICT (aluno_id, disciplina) DO UPDATE SET versao = EXCLUDED.versao
+"""
+
+
+UPSERT_NOTAS_SQL = text(f"""
+WITH gravadas AS (
+    INSERT INTO notas_bimestrais (aluno_id, disciplina, bimestre, nota)
+    SELECT * FROM unnest(:aluno_ids, :disciplinas, :bimestres, :notas)
+    ON CONFLICT (aluno_id, disciplina, bimestre) DO UPDATE
+    SET nota = EXCLUDED.nota, updated_at = now()
+    WHERE notas_bimestrais.nota IS DISTINCT FROM EXCLUDED.nota
+    RETURNING aluno_id, disciplina
+)
+{_marcar_sql("gravadas")}""").bindparams(
+    bindparam("aluno_ids", type_=ARRAY(Integer)),
+    bindparam("disciplinas", type_=ARRAY(String)),
+    bindparam("bimestres", type_=ARRAY(SmallInteger)),
+    bindparam("notas", type_=ARRAY(Float)),
+)
+
+# Versão de uma série: muda a cada nota gravada ou apagada (as notas que restam
+# ganham updated_at novo); fica em tendencias_notas.versao_notas
+VERSAO_NOTAS = "md5(string_agg(nb.bimestre || ':' || extract(epoch FROM nb.updated_at), ',' ORDER BY nb.bimestre))"
+
+# Todas as séries (full), com a marca de pendente quando houver
+SERIES_TODAS_SQL = text(f"""
+SELECT nb.aluno_id, nb.disciplina,
+       array_agg(nb.bimestre ORDER BY nb.bimestre) AS bimestres,
+       array_agg(nb.nota ORDER BY nb.bimestre) AS notas,
+       {VERSAO_NOTAS} AS versao,
+       p.versao AS pendente
+FROM notas_bimestrais nb
+LEFT JOIN tendencias_pendentes p ON p.aluno_id = nb.aluno_id AND p.disciplina = nb.disciplina
+GROUP BY nb.aluno_id, nb.disciplina, p.versao
+""")
+
+# Só as séries marcadas; série sem notas vem com bimestres vazio (a tendência sai)
+SERIES_PENDENTES_SQL = text(f"""
+SELECT p.aluno_id, p.disciplina,
+       array_remove(array_agg(nb.bimestre ORDER BY nb.bimestre), NULL) AS bimestres,
+       array_remove(array_agg(nb.nota ORDER BY nb.bimestre), NULL) AS notas,
+       {VERSAO_NOTAS} AS versao,
+       p.versao AS pendente
+FROM tendencias_pendentes p
+LEFT JOIN notas_bimestrais nb ON nb.aluno_id = p.aluno_id AND nb.disciplina = p.disciplina
+GROUP BY p.aluno_id, p.disciplina, p.versao
+""")
+
+# Marcas lidas pelo job; a que foi renovada enquanto ele rodava fica
+DESMARCAR_SQL = text("""
+DELETE FROM tendencias_pendentes p
+USING unnest(:aluno_ids, :disciplinas, :versoes) AS u(aluno_id, disciplina, versao)
+WHERE p.aluno_id = u.aluno_id AND p.disciplina = u.disciplina AND p.versao = u.versao
+""").bindparams(
+    bindparam("aluno_ids", type_=ARRAY(Integer)),
+    bindparam("disciplinas", type_=ARRAY(String)),
+    bindparam("versoes", type_=ARRAY(BigInteger)),
+)
+
+DELETE_TENDENCIAS_VAZIAS_SQL = text("""
+DELETE FROM tendencias_notas t
+USING unnest(:aluno_ids, :disciplinas) AS u(aluno_id, disciplina)
+WHERE t.aluno_id = u.aluno_id AND t.disciplina = u.disciplina
+  AND NOT EXISTS (SELECT 1 FROM notas_bimestrais nb WHERE nb.aluno_id = u.aluno_id AND nb.disciplina = u.disciplina)
+""").bindparams(
+    bindparam("aluno_ids", type_=ARRAY(Integer)),
+    bindparam("disciplinas", type_=ARRAY(String)),
+)
+
+UPSERT_TENDENCIAS_SQL = text("""
+INSERT INTO tendencias_notas (
+    aluno_id, disciplina, n_bimestres, primeira_nota, ultima_nota,
+    inclinacao, variancia, queda_maxima, alerta_queda, versao_notas, calculado_em
+)
+SELECT *, now() FROM unnest(
+    :aluno_ids, :disciplinas, :n_bimestres, :primeiras, :ultimas,
+    :inclinacoes, :variancias, :quedas, :alertas, :versoes
+)
+ON CONFLICT (aluno_id, disciplina) DO UPDATE
+SET n_bimestres = EXCLUDED.n_bimestres,
+    primeira_nota = EXCLUDED.primeira_nota,
+    ultima_nota = EXCLUDED.ultima_nota,
+    inclinacao = EXCLUDED.inclinacao,
+    variancia = EXCLUDED.variancia,
+    queda_maxima = EXCLUDED.queda_maxima,
+    alerta_queda = EXCLUDED.alerta_queda,
+    versao_notas = EXCLUDED.versao_notas,
+    calculado_em = now()
+""").bindparams(
+    bindparam("aluno_ids", type_=ARRAY(Integer)),
+    bindparam("disciplinas", type_=ARRAY(String)),
+    bindparam("n_bimestres", type_=ARRAY(SmallInteger)),
+    bindparam("primeiras", type_=ARRAY(Float)),
+    bindparam("ultimas", type_=ARRAY(Float)),
+    bindparam("inclinacoes", type_=ARRAY(Float)),
+    bindparam("variancias", type_=ARRAY(Float)),
+    bindparam("quedas", type_=ARRAY(Float)),
+    bindparam("alertas", type_=ARRAY(Boolean)),
+    bindparam("versoes", type_=ARRAY(Text)),
+)
+
+
+def sync_notas_sql(join: str) -> str:
+    """
+    Upsert das colunas largas de `alunos a` em notas_bimestrais, marcando as séries
+    alteradas. `join` restringe os alunos (ex: JOIN com a tabela temporária da
+    importação). Retorna uma linha com o total de notas gravadas.
+    """
+    valores = ", ".join(f"('{disciplina}', {bimestre}, a.{coluna})" for (disciplina, bimestre), coluna in COLUNAS_NOTAS.items())
+    return f"""
+WITH gravadas AS (
+    INSERT INTO notas_bimestrais (aluno_id, disciplina, bimestre, nota)
+    SELECT a.id, n.disciplina, n.bimestre, n.nota
+    FROM alunos a
+    {join}
+    CROSS JOIN LATERAL (VALUES {valores}) AS n(disciplina, bimestre, nota)
+    WHERE n.nota IS NOT NULL
+    ON CONFLICT (aluno_id, disciplina, bimestre) DO UPDATE
+    SET nota = EXCLUDED.nota, updated_at = now()
+    WHERE notas_bimestrais.nota IS DISTINCT FROM EXCLUDED.nota
+    RETURNING aluno_id, disciplina
+),
+marcadas AS ({_marcar_sql("gravadas")})
+SELECT count(*) FROM gravadas
+"""
+
+
+def _prune_sql(apagar: str) -> str:
+    """
+    Remoção de notas (`apagar`: DELETE ... RETURNING aluno_id, disciplina, bimestre)
+    e marcação das séries afetadas em tendencias_pendentes: as notas que restam
+    ganham updated_at novo (nova versão) e a tendência de série que ficou vazia é
+    apagada. Retorna uma linha com o total de notas removidas.
+    """
+    return f"""
+WITH apagadas AS (
+{apagar}
+),
+series AS (
+    SELECT DISTINCT aluno_id, disciplina FROM apagadas
+),
+restantes AS (
+    UPDATE notas_bimestrais nb SET updated_at = now()
+    FROM series s
+    WHERE nb.aluno_id = s.aluno_id AND nb.disciplina = s.disciplina
+      AND (nb.aluno_id, nb.disciplina, nb.bimestre) NOT IN (SELECT aluno_id, disciplina, bimestre FROM apagadas)
+    RETURNING nb.aluno_id, nb.disciplina
+),
+tendencias AS (
+    DELETE FROM tendencias_notas t
+    USING series s
+    WHERE t.aluno_id = s.aluno_id AND t.disciplina = s.disciplina
+      AND NOT EXISTS (SELECT 1 FROM restantes r WHERE r.aluno_id = s.aluno_id AND r.disciplina = s.disciplina)
+),
+marcadas AS ({_marcar_sql("series")})
+SELECT count(*) FROM apagadas
+"""
+
+
+def prune_notas_sql(join: str) -> str:
+    """
+    Remove de notas_bimestrais as notas cuja coluna larga em `alunos a` está vazia
+    (mesmo `join` de sync_notas_sql). Retorna uma linha com o total removido.
+    """
+    valores = ", ".join(f"('{disciplina}', {bimestre}, a.{coluna})" for (disciplina, bimestre), coluna in COLUNAS_NOTAS.items())
+    return _prune_sql(f"""
+    DELETE FROM notas_bimestrais nb
+    USING alunos a
+    {join}
+    CROSS JOIN LATERAL (VALUES {valores}) AS n(disciplina, bimestre, nota)
+    WHERE nb.aluno_id = a.id AND nb.disciplina = n.disciplina AND nb.bimestre = n.bimestre
+      AND n.nota IS NULL
+    RETURNING nb.aluno_id, nb.disciplina, nb.bimestre""")
+
+
+DELETE_NOTAS_SQL = text(_prune_sql("""
+    DELETE FROM notas_bimestrais nb
+    USING unnest(:aluno_ids, :disciplinas, :bimestres) AS d(aluno_id, disciplina, bimestre)
+    WHERE nb.aluno_id = d.aluno_id AND nb.disciplina = d.disciplina AND nb.bimestre = d.bimestre
+    RETURNING nb.aluno_id, nb.disciplina, nb.bimestre""")).bindparams(
+    bindparam("aluno_ids", type_=ARRAY(Integer)),
+    bindparam("disciplinas", type_=ARRAY(String)),
+    bindparam("bimestres", type_=ARRAY(SmallInteger)),
+)
+
+
+def notas_of_aluno(aluno) -> Iterable[Tuple[int, str, int, float]]:
+    """(aluno_id, disciplina, bimestre, nota) das colunas largas preenchidas"""
+    for (disciplina, bimestre), coluna in COLUNAS_NOTAS.items():
+        nota = getattr(aluno, coluna)
+        if nota is not None:
+            yield aluno.id, disciplina, bimestre, nota
+
+
+def notas_ausentes_of_aluno(aluno) -> Iterable[Tuple[int, str, int]]:
+    """(aluno_id, disciplina, bimestre) das colunas largas vazias"""
+    for (disciplina, bimestre), coluna in COLUNAS_NOTAS.items():
+        if getattr(aluno, coluna) is None:
+            yield aluno.id, disciplina, bimestre
+
+
+async def delete_notas(db: AsyncSession, chaves: Iterable[Tuple[int, str, int]]) -> int:
+    """Remove (aluno_id, disciplina, bimestre) de notas_bimestrais e marca as séries, sem commit"""
+    chaves = list(chaves)
+    if not chaves:
+        return 0
+    aluno_ids, disciplinas, bimestres = zip(*chaves)
+    result = await db.execute(DELETE_NOTAS_SQL, {
+        "aluno_ids": list(aluno_ids), "disciplinas": list(disciplinas), "bimestres": list(bimestres),
+    })
+    return result.scalar()
+
+
+async def upsert_notas(db: AsyncSession, notas: Iterable[Tuple[int, str, int, float]]) -> int:
+    """Grava (aluno_id, disciplina, bimestre, nota) em lote, sem commit"""
+    notas = list(notas)
+    for start in range(0, len(notas), NOTAS_UPSERT_BATCH):
+        aluno_ids, disciplinas, bimestres, valores = zip(*notas[start:start + NOTAS_UPSERT_BATCH])
+        await db.execute(UPSERT_NOTAS_SQL, {
+            "aluno_ids": list(aluno_ids), "disciplinas": list(disciplinas),
+            "bimestres": list(bimestres), "notas": list(valores),
+        })
+    return len(notas)
+
+
+def compute_trends(notas: "np.ndarray") -> Dict[str, "np.ndarray"]:
+    """
+    Tendência de cada linha de `notas` (séries x bimestres, NaN = sem nota).
+    Inclinação por mínimos quadrados só sobre os bimestres com nota.
+    """
+    import numpy as np
+
+    valid = ~np.isnan(notas)
+    n = valid.sum(axis=1)
+    x = np.where(valid, np.asarray(BIMESTRES, dtype=np.float64), np.nan)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dx = x - (np.nansum(x, axis=1) / n)[:, None]
+        dy = notas - (np.nansum(notas, axis=1) / n)[:, None]
+        sxx = np.nansum(dx * dx, axis=1)
+        inclinacao = np.where(sxx > 0, np.nansum(dx * dy, axis=1) / sxx, np.nan)
+        variancia = np.nansum(dy * dy, axis=1) / n
+
+    # Queda entre bimestres consecutivos com nota: cada nota contra a última nota
+    # anterior (forward-fill pula os bimestres vazios; fmax ignora os NaN)
+    rows = np.arange(len(notas))
+    ultima_posicao = np.maximum.accumulate(np.where(valid, np.arange(notas.shape[1]), 0), axis=1)
+    anteriores = notas[rows[:, None], ultima_posicao]
+    quedas = anteriores[:, :-1] - notas[:, 1:]
+    queda_maxima = np.fmax.reduce(quedas, axis=1) if quedas.shape[1] else np.full(len(notas), np.nan)
+
+    primeira = notas[rows, valid.argmax(axis=1)]
+    ultima = notas[rows, valid.shape[1] - 1 - valid[:, ::-1].argmax(axis=1)]
+
+    alerta = (n >= 2) & ((queda_maxima >= QUEDA_ALERTA) | (inclinacao <= INCLINACAO_ALERTA))
+    return {
+        "n_bimestres": n,
+        "primeira_nota": primeira,
+        "ultima_nota": ultima,
+        "inclinacao": inclinacao,
+        "variancia": variancia,
+        "queda_maxima": queda_maxima,
+        "alerta_queda": alerta,
+    }
+
+
+def _nullable(values: "np.ndarray") -> list:
+    """NaN -> None (NULL no banco)"""
+    return [None if v != v else round(v, 4) for v in values.tolist()]
+
+
+async def update_tendencias(db: AsyncSession, full: bool = False) -> Optional[Dict[str, object]]:
+    """
+    Recalcula tendencias_notas (faz commit).
+    Retorna séries, alertas e tempos (None se outro worker já está rodando).
+    """
+    import numpy as np
+
+    got_lock = (await db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": TRENDS_LOCK_KEY})).scalar()
+    if not got_lock:
+        return None
+
+    started = time.perf_counter()
+    # Uma linha por (aluno, disciplina), com a versão lida no mesmo statement das notas
+    rows = (await db.execute(SERIES_TODAS_SQL if full else SERIES_PENDENTES_SQL)).all()
+    marcas = [(row.aluno_id, row.disciplina, row.pendente) for row in rows if row.pendente is not None]
+    vazias = [(row.aluno_id, row.disciplina) for row in rows if not row.bimestres]
+    rows = [row for row in rows if row.bimestres]
+    load_ms = (time.perf_counter() - started) * 1000
+
+    trends = None
+    trend_ms = 0.0
+    if rows:
+        started = time.perf_counter()
+        series_aluno_ids, series_disciplinas, bimestres, valores, versoes, _ = (list(col) for col in zip(*rows))
+        tamanhos = np.fromiter(map(len, bimestres), dtype=np.int64, count=len(rows))
+        posicao = np.repeat(np.arange(len(rows)), tamanhos)
+        notas = np.full((len(rows), len(BIMESTRES)), np.nan)
+        notas[posicao, np.fromiter(chain.from_iterable(bimestres), dtype=np.int64) - BIMESTRES[0]] = \
+            np.fromiter(chain.from_iterable(valores), dtype=np.float64)
+        trends = compute_trends(notas)
+        trend_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    if trends is not None:
+        columns = {
+            "n_bimestres": trends["n_bimestres"].tolist(),
+            "primeiras": _nullable(trends["primeira_nota"]),
+            "ultimas": _nullable(trends["ultima_nota"]),
+            "inclinacoes": _nullable(trends["inclinacao"]),
+            "variancias": _nullable(trends["variancia"]),
+            "quedas": _nullable(trends["queda_maxima"]),
+            "alertas": trends["alerta_queda"].tolist(),
+            "versoes": versoes,
+        }
+        for start in range(0, len(rows), NOTAS_UPSERT_BATCH):
+            end = start + NOTAS_UPSERT_BATCH
+            await db.execute(UPSERT_TENDENCIAS_SQL, {
+                "aluno_ids": series_aluno_ids[start:end],
+                "disciplinas": series_disciplinas[start:end],
+                **{key: values[start:end] for key, values in columns.items()},
+            })
+    if vazias:
+        aluno_ids, disciplinas = zip(*vazias)
+        await db.execute(DELETE_TENDENCIAS_VAZIAS_SQL, {"aluno_ids": list(aluno_ids), "disciplinas": list(disciplinas)})
+    for start in range(0, len(marcas), NOTAS_UPSERT_BATCH):
+        aluno_ids, disciplinas, versoes_marcas = zip(*marcas[start:start + NOTAS_UPSERT_BATCH])
+        await db.execute(DESMARCAR_SQL, {
+            "aluno_ids": list(aluno_ids), "disciplinas": list(disciplinas), "versoes": list(versoes_marcas),
+        })
+    await db.commit()
+    write_ms = (time.perf_counter() - started) * 1000
+
+    return {
+        "series": len(rows),
+        "alertas": int(trends["alerta_queda"].sum()) if trends is not None else 0,
+        "load_ms": round(load_ms, 1),
+        "trend_ms": round(trend_ms, 1),
+        "write_ms": round(write_ms, 1),
+    }
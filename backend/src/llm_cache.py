@@ -0,0 +1,151 @@
+"""
+Cache em disco das respostas do Gemini (SQLite), endereçado pelo conteúdo
+- Chave: sha256 de (modelo, system_instruction, prompt, configuração de geração)
+- Entradas expiram após LLM_CACHE_TTL segundos
+- Acima de LLM_CACHE_MAX_MB, as entradas menos acessadas recentemente são removidas
+- Contadores de acerto/erro expostos em /health/llm-cache
+O arquivo é local ao worker (cada máquina tem o seu); WAL permite vários processos.
+get_async()/put_async() rodam a consulta numa thread: no event loop, use essas.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", str(Path(__file__).parent.parent / ".cache" / "llm_cache.sqlite3")))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "200"))
+
+# Na eviction, remove até ficar abaixo desta fração do limite (evita evictar a cada escrita)
+EVICTION_TARGET = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_llm_cache_last_access ON llm_cache (last_access);
+"""
+
+
+def cache_key(model_name: str, system_instruction: Optional[str], prompt: str, generation_config: Dict[str, Any]) -> str:
+    payload = json.dumps([model_name, system_instruction, prompt, generation_config], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Respostas JSON já decodificadas, por chave; thread-safe (uma conexão por processo com lock)"""
+
+    def __init__(self, path: Path, ttl: float, max_bytes: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "writes": 0, "evictions": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT value, size, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            value, size, created_at = row
+            if now - created_at > self.ttl:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            self.stats["hits"] += 1
+        return json.loads(value)
+
+    def put(self, key: str, model_name: str, value: Any):
+        data = json.dumps(value, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            old = conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, data, size, now, now)
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self.stats["writes"] += 1
+            if self._total_bytes > self.max_bytes:
+                self._evict(conn)
+
+    async def get_async(self, key: str) -> Optional[Any]:
+        """get() numa thread (não bloqueia o event loop)"""
+        return await asyncio.to_thread(self.get, key)
+
+    async def put_async(self, key: str, model_name: str, value: Any):
+        """put() numa thread (não bloqueia o event loop)"""
+        await asyncio.to_thread(self.put, key, model_name, value)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Remove expiradas e, se ainda preciso, as menos acessadas até EVICTION_TARGET do limite"""
+        target = self.max_bytes * EVICTION_TARGET
+        removed = conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,)).rowcount
+        self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if self._total_bytes > target:
+            excess = self._total_bytes - target
+            rows = conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access").fetchall()
+            keys = []
+            for key, size in rows:
+                if excess <= 0:
+                    break
+                keys.append((key,))
+                excess -= size
+                self._total_bytes -= size
+            conn.executemany("DELETE FROM llm_cache WHERE key = ?", keys)
+            removed += len(keys)
+        self.stats["evictions"] += removed
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        with self._lock:
+            entries = self._connection().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] if LLM_CACHE_ENABLED else 0
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "path": str(self.path),
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else None,
+            "entries": entries,
+            "size_mb": round(self._total_bytes / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "ttl_seconds": self.ttl,
+        }
+
+
+llm_cache = LLMResponseCache(LLM_CACHE_PATH, LLM_CACHE_TTL, int(LLM_CACHE_MAX_MB * 1024 * 1024))
+
+
+def get_llm_cache_metrics() -> Dict[str, Any]:
+    return llm_cache.metrics()
@@ -0,0 +1,311 @@
+"""
+Cliente Gemini compartilhado (análise causal e correção de provas)
+- SDK importado/configurado no primeiro uso: importar as rotas continua barato
+- Um GenerativeModel por (modelo, system_instruction), reaproveitado entre chamadas
+- gemini_generate_json_async(): generate_content_async + backoff exponencial com
+  jitter via asyncio.sleep; não bloqueia o event loop e pode ser cancelada
+- gemini_generate_json(): mesma lógica síncrona (scripts e threads)
+- Respostas guardadas no cache em disco do llm_cache (use_cache=False ignora o cache);
+  na versão async a leitura/escrita do SQLite roda numa thread
+- Toda chamada passa pelo llm_rate_limiter (RPM/TPM por modelo, concorrência,
+  pausa do modelo em 429 respeitando Retry-After)
+- cancel_on_disconnect(): cancela a chamada quando o cliente HTTP desconecta
+- LLM_PROVIDER escolhe quem responde: "gemini" (SDK), "fake" (LLM falso em
+  processo, src/fake_llm.py) ou "http" (API REST do Gemini em GEMINI_BASE_URL,
+  ex: o servidor falso de fake_llm_server.py)
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Awaitable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+try:
+    from .llm_cache import LLM_CACHE_ENABLED, cache_key, llm_cache
+    from .llm_rate_limit import estimate_tokens, is_rate_limited, llm_rate_limiter, retry_after_of
+except ImportError:
+    from llm_cache import LLM_CACHE_ENABLED, cache_key, llm_cache
+    from llm_rate_limit import estimate_tokens, is_rate_limited, llm_rate_limiter, retry_after_of
+
+load_dotenv()
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+GEMINI_HTTP_TIMEOUT = float(os.getenv("GEMINI_HTTP_TIMEOUT", "120"))
+
+# Configuração de geração JSON (temperatura baixa: previsibilidade e JSON consistente)
+GEN_CONFIG_JSON = {
+    "temperature": 0.2,
+    "response_mime_type": "application/json",
+}
+
+# Intervalo (s) entre verificações de desconexão do cliente
+DISCONNECT_POLL_INTERVAL = 0.5
+
+_genai = None
+_models: Dict[Tuple[str, Optional[str]], Any] = {}
+_models_lock = threading.Lock()
+
+
+def _get_genai():
+    """Importa e configura o SDK do Gemini na primeira chamada"""
+    global _genai
+    if _genai is None:
+        if not GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY não encontrada no arquivo .env")
+        import google.generativeai as genai
+        genai.configure(api_key=GEMINI_API_KEY)
+        _genai = genai
+    return _genai
+
+
+class _RestResponse:
+    def __init__(self, payload: Dict[str, Any]):
+        candidates = payload.get("candidates") or []
+        parts = candidates[0].get("content", {}).get("parts", []) if candidates else []
+        self.text = "".join(part.get("text", "") for part in parts)
+
+
+class RestGenerativeModel:
+    """
+    Cliente da API REST do Gemini (models/{modelo}:generateContent) com o mesmo
+    contrato do GenerativeModel; permite apontar para um servidor compatível
+    (GEMINI_BASE_URL), como o LLM falso local
+    """
+
+    def __init__(self, model_name: str, system_instruction: Optional[str] = None):
+        self.url = f"{GEMINI_BASE_URL}/v1beta/models/{model_name}:generateContent"
+        self.system_instruction = system_instruction
+
+    def _request(self, prompt: str, generation_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        body: Dict[str, Any] = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if self.system_instruction:
+            body["systemInstruction"] = {"parts": [{"text": self.system_instruction}]}
+        if generation_config:
+            body["generationConfig"] = {
+                "temperature": generation_config.get("temperature"),
+                "responseMimeType": generation_config.get("response_mime_type"),
+            }
+        return body
+
+    def _params(self) -> Dict[str, str]:
+        return {"key": GEMINI_API_KEY} if GEMINI_API_KEY else {}
+
+    async def generate_content_async(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> _RestResponse:
+        import httpx
+        async with httpx.AsyncClient(timeout=GEMINI_HTTP_TIMEOUT) as client:
+            resp = await client.post(self.url, params=self._params(), json=self._request(prompt, generation_config))
+        resp.raise_for_status()
+        return _RestResponse(resp.json())
+
+    def generate_content(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> _RestResponse:
+        import httpx
+        resp = httpx.post(self.url, params=self._params(), json=self._request(prompt, generation_config), timeout=GEMINI_HTTP_TIMEOUT)
+        resp.raise_for_status()
+        return _RestResponse(resp.json())
+
+
+def _create_model(model_name: str, system_instruction: Optional[str]):
+    """Modelo do provedor configurado em LLM_PROVIDER"""
+    if LLM_PROVIDER == "fake":
+        try:
+            from .fake_llm import FakeGenerativeModel
+        except ImportError:
+            from fake_llm import FakeGenerativeModel
+        return FakeGenerativeModel(model_name, system_instruction)
+    if LLM_PROVIDER == "http":
+        return RestGenerativeModel(model_name, system_instruction)
+    if LLM_PROVIDER != "gemini":
+        raise ValueError(f"LLM_PROVIDER inválido: {LLM_PROVIDER} (use gemini, fake ou http)")
+    genai = _get_genai()
+    return genai.GenerativeModel(model_name, system_instruction=system_instruction) if system_instruction \
+        else genai.GenerativeModel(model_name)
+
+
+def get_model(model_name: str, system_instruction: Optional[str] = None):
+    """Modelo em cache por (modelo, system_instruction)"""
+    key = (model_name, system_instruction)
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            model = _models.get(key)
+            if model is None:
+                model = _create_model(model_name, system_instruction)
+                _models[key] = model
+    return model
+
+
+def extract_json(text: str) -> Any:
+    """Extrai JSON de uma string. Tenta json.loads direto; se falhar, usa regex."""
+    text = text.strip()
+    # Remove cercas de código se existirem
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    try:
+        return json.loads(text)
+    except Exception:
+        pass
+
+    # Fallback: pega o primeiro bloco {...} balanceado
+    match = re.search(r'\{.*\}', text, flags=re.DOTALL)
+    if match:
+        candidate = match.group(0)
+        try:
+            return json.loads(candidate)
+        except Exception:
+            pass
+    raise ValueError("Falha ao extrair JSON do retorno do modelo.")
+
+
+def _cached_key(model_name: str, system_instruction: Optional[str], user_prompt: str, use_cache: bool) -> Optional[str]:
+    """Chave do cache da chamada (None se o cache não se aplica)"""
+    if not (use_cache and LLM_CACHE_ENABLED):
+        return None
+    # Respostas do LLM falso / outro endpoint não se misturam com as do Gemini
+    if LLM_PROVIDER != "gemini":
+        model_name = f"{LLM_PROVIDER}:{model_name}"
+    return cache_key(model_name, system_instruction, user_prompt, GEN_CONFIG_JSON)
+
+
+def _backoff_delay(backoff_sec: float, attempt: int) -> float:
+    """Backoff exponencial com jitter (evita que chamadas paralelas repitam juntas)"""
+    return backoff_sec * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+
+
+def _retry_delay(exc: Exception, backoff_sec: float, attempt: int) -> Tuple[float, Optional[float]]:
+    """
+    (espera antes da próxima tentativa, pausa do modelo no limiter). Em 429 o modelo
+    inteiro é pausado (Retry-After da API ou o backoff) e a espera acontece na fila
+    do próprio limiter.
+    """
+    delay = _backoff_delay(backoff_sec, attempt)
+    if is_rate_limited(exc):
+        retry_after = retry_after_of(exc)
+        return 0.0, retry_after if retry_after is not None else delay
+    return delay, None
+
+
+def _used_tokens(resp, reserved: int) -> int:
+    """Tokens reais da chamada (usage_metadata do Gemini) ou estimativa com a saída"""
+    usage = getattr(resp, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None) if usage is not None else None
+    return total if total else reserved + estimate_tokens(resp.text)
+
+
+async def gemini_generate_json_async(
+    model_name: str,
+    system_instruction: Optional[str],
+    user_prompt: str,
+    max_retries: int = 3,
+    backoff_sec: float = 1.2,
+    use_cache: bool = True,
+) -> Any:
+    """
+    Faz uma chamada ao Gemini esperando JSON e retorna objeto Python, sem bloquear o event loop.
+    Força MIME de resposta em JSON e aplica retries com backoff exponencial.
+    Prompts idênticos são respondidos pelo cache em disco (use_cache=False força nova chamada).
+    """
+    key = _cached_key(model_name, system_instruction, user_prompt, use_cache)
+    if key:
+        cached = await llm_cache.get_async(key)
+        if cached is not None:
+            return cached
+
+    model = get_model(model_name, system_instruction)
+    tokens = estimate_tokens((system_instruction or "") + user_prompt)
+
+    for attempt in range(1, max_retries + 1):
+        try:
+            async with llm_rate_limiter.slot(model_name, tokens):
+                resp = await model.generate_content_async(
+                    user_prompt,
+                    generation_config=GEN_CONFIG_JSON,
+                )
+            await llm_rate_limiter.record_usage_async(model_name, tokens, _used_tokens(resp, tokens))
+            # Em SDKs recentes, JSON vem em resp.text mesmo com mime JSON.
+            result = extract_json(resp.text)
+        except Exception as e:
+            # CancelledError não é Exception: cancelamento interrompe na hora, sem retry
+            delay, pause = _retry_delay(e, backoff_sec, attempt)
+            if pause is not None:
+                await llm_rate_limiter.throttled_async(model_name, pause)
+            if attempt == max_retries:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        if key:
+            await llm_cache.put_async(key, model_name, result)
+        return result
+
+
+def gemini_generate_json(
+    model_name: str,
+    system_instruction: Optional[str],
+    user_prompt: str,
+    max_retries: int = 3,
+    backoff_sec: float = 1.2,
+    use_cache: bool = True,
+) -> Any:
+    """Versão síncrona de gemini_generate_json_async (scripts e código fora do event loop)"""
+    key = _cached_key(model_name, system_instruction, user_prompt, use_cache)
+    if key:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+    model = get_model(model_name, system_instruction)
+    tokens = estimate_tokens((system_instruction or "") + user_prompt)
+
+    for attempt in range(1, max_retries + 1):
+        try:
+            with llm_rate_limiter.slot_sync(model_name, tokens):
+                resp = model.generate_content(
+                    user_prompt,
+                    generation_config=GEN_CONFIG_JSON,
+                )
+            llm_rate_limiter.record_usage(model_name, tokens, _used_tokens(resp, tokens))
+            result = extract_json(resp.text)
+        except Exception as e:
+            delay, pause = _retry_delay(e, backoff_sec, attempt)
+            if pause is not None:
+                llm_rate_limiter.throttled(model_name, pause)
+            if attempt == max_retries:
+                raise
+            time.sleep(delay)
+            continue
+        if key:
+            llm_cache.put(key, model_name, result)
+        return result
+
+
+class ClientDisconnected(Exception):
+    """O cliente HTTP desconectou antes da resposta"""
+
+
+async def cancel_on_disconnect(request, awaitable: Awaitable) -> Any:
+    """
+    Aguarda `awaitable`, cancelando-o se o cliente da `request` (Starlette) desconectar.
+    Evita gastar chamadas ao Gemini com respostas que ninguém vai ler.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
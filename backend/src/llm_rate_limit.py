@@ -0,0 +1,414 @@
+"""
+Limite de taxa e de concorrência das chamadas a LLM (Gemini e OpenAI)
+- Por modelo: balde de requisições/minuto (RPM) e de tokens/minuto (TPM)
+- Concorrência máxima do processo (LLM_MAX_CONCURRENCY)
+- Fila justa: quem chegou primeiro é liberado primeiro (por modelo)
+- 429 com Retry-After (ou retry_delay do Gemini) pausa o modelo para todos os chamadores
+- Opcionalmente compartilhado entre workers: estado dos baldes num SQLite local
+  (LLM_RATE_LIMIT_SHARED_PATH), como o cache de respostas
+- Profundidade da fila, espera e 429s expostos em /health/llm-rate-limit
+
+Configuração (env):
+    LLM_RATE_LIMITS      por modelo, "modelo=rpm:tpm,..." (ex: gemini-2.5-flash=1000:1000000)
+    LLM_RPM / LLM_TPM    padrão dos modelos não listados (0 = sem limite)
+    LLM_MAX_CONCURRENCY  chamadas simultâneas no processo (0 = sem limite)
+"""
+import asyncio
+import email.utils
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+LLM_RPM = float(os.getenv("LLM_RPM", "0"))
+LLM_TPM = float(os.getenv("LLM_TPM", "0"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_RATE_LIMIT_SHARED_PATH = os.getenv("LLM_RATE_LIMIT_SHARED_PATH")
+
+# Estimativa de tokens: ~4 caracteres por token
+CHARS_PER_TOKEN = 4
+
+# Espera máxima (s) entre verificações do balde (outros workers também consomem)
+MAX_POLL_INTERVAL = 1.0
+
+Limits = Tuple[float, float]
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa de tokens de um texto (sem chamada à API)"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def parse_rate_limits(spec: str) -> Dict[str, Limits]:
+    """ "modelo=rpm:tpm,..." -> {modelo: (rpm, tpm)} """
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, values = item.partition("=")
+        rpm, _, tpm = values.partition(":")
+        limits[model.strip()] = (float(rpm or 0), float(tpm or 0))
+    return limits
+
+
+def retry_after_of(exc: BaseException) -> Optional[float]:
+    """Segundos pedidos pela API antes de tentar de novo (header Retry-After ou retry_delay do Gemini)"""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            parsed = email.utils.parsedate_to_datetime(value)
+            return max(parsed.timestamp() - time.time(), 0.0) if parsed else None
+    match = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", str(exc))
+    return float(match.group(1)) if match else None
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """429 / cota excedida (SDK do Gemini, OpenAI ou HTTP direto)"""
+    status = getattr(getattr(exc, "response", None), "status_code", None) or getattr(exc, "code", None)
+    return status == 429 or type(exc).__name__ in ("ResourceExhausted", "RateLimitError", "TooManyRequests")
+
+
+class TokenBucket:
+    """Balde com capacidade de um minuto, reabastecido continuamente"""
+
+    def __init__(self, per_minute: float, level: Optional[float] = None, updated: Optional[float] = None):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute if level is None else level
+        self.updated = time.time() if updated is None else updated
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # Pedidos maiores que a capacidade passam com o balde cheio (e o deixam negativo)
+        need = min(amount, self.capacity)
+        return 0.0 if self.level >= need else (need - self.level) / self.rate
+
+
+class _LocalBuckets:
+    """Estado dos baldes só deste processo"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, Any]] = {}
+
+    def _get(self, model: str, limits: Limits) -> Dict[str, Any]:
+        state = self._state.get(model)
+        if state is None:
+            rpm, tpm = limits
+            state = self._state[model] = {
+                "rpm": TokenBucket(rpm) if rpm else None,
+                "tpm": TokenBucket(tpm) if tpm else None,
+                "blocked_until": 0.0,
+            }
+        return state
+
+    def reserve(self, model: str, limits: Limits, tokens: int) -> float:
+        """Consome 1 requisição + tokens; se não houver saldo, retorna a espera (s) sem consumir"""
+        with self._lock:
+            return _reserve(self._get(model, limits), tokens, time.time())
+
+    def adjust(self, model: str, limits: Limits, tokens: int):
+        with self._lock:
+            bucket = self._get(model, limits)["tpm"]
+            if bucket:
+                bucket.level -= tokens
+
+    def block(self, model: str, limits: Limits, seconds: float):
+        with self._lock:
+            state = self._get(model, limits)
+            state["blocked_until"] = max(state["blocked_until"], time.time() + seconds)
+
+
+def _reserve(state: Dict[str, Any], tokens: int, now: float) -> float:
+    waits = [state["blocked_until"] - now]
+    for bucket, amount in ((state["rpm"], 1), (state["tpm"], tokens)):
+        if bucket:
+            bucket.refill(now)
+            waits.append(bucket.wait_time(amount))
+    wait = max(waits)
+    if wait > 0:
+        return wait
+    for bucket, amount in ((state["rpm"], 1), (state["tpm"], tokens)):
+        if bucket:
+            bucket.level -= amount
+    return 0.0
+
+
+class _SharedBuckets:
+    """Estado dos baldes num SQLite local, compartilhado pelos workers da máquina"""
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS llm_rate_limit (
+        model TEXT PRIMARY KEY,
+        rpm_level REAL,
+        tpm_level REAL,
+        updated_at REAL NOT NULL,
+        blocked_until REAL NOT NULL DEFAULT 0
+    );
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(self._SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _state(self, model: str, limits: Limits):
+        """Carrega, deixa alterar e grava o estado do modelo numa transação exclusiva"""
+        rpm, tpm = limits
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT rpm_level, tpm_level, updated_at, blocked_until FROM llm_rate_limit WHERE model = ?", (model,)
+                ).fetchone()
+                rpm_level, tpm_level, updated, blocked_until = row or (None, None, None, 0.0)
+                state = {
+                    "rpm": TokenBucket(rpm, rpm_level, updated) if rpm else None,
+                    "tpm": TokenBucket(tpm, tpm_level, updated) if tpm else None,
+                    "blocked_until": blocked_until,
+                }
+                yield state
+                buckets = [b for b in (state["rpm"], state["tpm"]) if b]
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_rate_limit (model, rpm_level, tpm_level, updated_at, blocked_until) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        model,
+                        state["rpm"].level if state["rpm"] else None,
+                        state["tpm"].level if state["tpm"] else None,
+                        max((b.updated for b in buckets), default=time.time()),
+                        state["blocked_until"],
+                    )
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def reserve(self, model: str, limits: Limits, tokens: int) -> float:
+        with self._state(model, limits) as state:
+            return _reserve(state, tokens, time.time())
+
+    def adjust(self, model: str, limits: Limits, tokens: int):
+        with self._state(model, limits) as state:
+            if state["tpm"]:
+                state["tpm"].refill(time.time())
+                state["tpm"].level -= tokens
+
+    def block(self, model: str, limits: Limits, seconds: float):
+        with self._state(model, limits) as state:
+            state["blocked_until"] = max(state["blocked_until"], time.time() + seconds)
+
+
+class _ModelStats:
+    def __init__(self):
+        self.requests = 0
+        self.queued = 0
+        self.in_flight = 0
+        self.throttled = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def record_wait(self, wait_ms: float):
+        self.requests += 1
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "throttled_429": self.throttled,
+            "avg_wait_ms": round(self.total_wait_ms / self.requests, 3) if self.requests else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 3),
+        }
+
+
+class _LoopPrimitives:
+    """Semáforo e filas (asyncio.Lock é FIFO) de um event loop"""
+
+    def __init__(self, max_concurrency: int):
+        self.semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self.locks: Dict[str, asyncio.Lock] = {}
+
+
+class LLMRateLimiter:
+    def __init__(
+        self,
+        limits: Dict[str, Limits],
+        default_limits: Limits,
+        max_concurrency: int,
+        shared_path: Optional[Path] = None,
+    ):
+        self.limits = limits
+        self.default_limits = default_limits
+        self.max_concurrency = max_concurrency
+        self.shared = shared_path is not None
+        self._buckets = _SharedBuckets(shared_path) if shared_path else _LocalBuckets()
+        self._stats: Dict[str, _ModelStats] = {}
+        # Primitivas asyncio são presas ao loop; scripts podem rodar vários asyncio.run()
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopPrimitives]" = weakref.WeakKeyDictionary()
+        self._thread_semaphore = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._thread_locks: Dict[str, threading.Lock] = {}
+        self._thread_locks_lock = threading.Lock()
+
+    def limits_for(self, model: str) -> Limits:
+        return self.limits.get(model, self.default_limits)
+
+    def _model_stats(self, model: str) -> _ModelStats:
+        return self._stats.setdefault(model, _ModelStats())
+
+    def _primitives(self) -> _LoopPrimitives:
+        loop = asyncio.get_running_loop()
+        primitives = self._loops.get(loop)
+        if primitives is None:
+            primitives = self._loops[loop] = _LoopPrimitives(self.max_concurrency)
+        return primitives
+
+    async def _buckets_call(self, method: str, *args):
+        """Operação nos baldes; o SQLite compartilhado (BEGIN IMMEDIATE) roda fora do event loop"""
+        if self.shared:
+            return await asyncio.to_thread(getattr(self._buckets, method), *args)
+        return getattr(self._buckets, method)(*args)
+
+    @asynccontextmanager
+    async def slot(self, model: str, tokens: int):
+        """
+        Espera a vez (fila do modelo, RPM/TPM, concorrência) e mantém a vaga durante a chamada.
+        A vaga de concorrência só é pega depois do RPM/TPM: um modelo pausado por 429
+        não segura vagas dos outros modelos enquanto espera.
+        """
+        stats = self._model_stats(model)
+        limits = self.limits_for(model)
+        primitives = self._primitives()
+        lock = primitives.locks.setdefault(model, asyncio.Lock())
+        semaphore = primitives.semaphore
+        started = time.perf_counter()
+
+        stats.queued += 1
+        queued = True
+        acquired = False
+        try:
+            async with lock:
+                while (wait := await self._buckets_call("reserve", model, limits, tokens)) > 0:
+                    await asyncio.sleep(min(wait, MAX_POLL_INTERVAL))
+                # Ainda com a fila do modelo: mantém a ordem de chegada
+                if semaphore:
+                    await semaphore.acquire()
+                    acquired = True
+            try:
+                stats.queued -= 1
+                queued = False
+                stats.record_wait((time.perf_counter() - started) * 1000)
+                stats.in_flight += 1
+                try:
+                    yield
+                finally:
+                    stats.in_flight -= 1
+            finally:
+                if acquired:
+                    semaphore.release()
+        finally:
+            if queued:
+                stats.queued -= 1
+
+    @contextmanager
+    def slot_sync(self, model: str, tokens: int):
+        """slot() para código síncrono (scripts e threads)"""
+        stats = self._model_stats(model)
+        limits = self.limits_for(model)
+        with self._thread_locks_lock:
+            lock = self._thread_locks.setdefault(model, threading.Lock())
+        started = time.perf_counter()
+
+        stats.queued += 1
+        queued = True
+        acquired = False
+        try:
+            with lock:
+                while (wait := self._buckets.reserve(model, limits, tokens)) > 0:
+                    time.sleep(min(wait, MAX_POLL_INTERVAL))
+                if self._thread_semaphore:
+                    self._thread_semaphore.acquire()
+                    acquired = True
+            try:
+                stats.queued -= 1
+                queued = False
+                stats.record_wait((time.perf_counter() - started) * 1000)
+                stats.in_flight += 1
+                try:
+                    yield
+                finally:
+                    stats.in_flight -= 1
+            finally:
+                if acquired:
+                    self._thread_semaphore.release()
+        finally:
+            if queued:
+                stats.queued -= 1
+
+    def record_usage(self, model: str, reserved_tokens: int, used_tokens: int):
+        """Acerta o balde de tokens com o uso real (entrada + saída) depois da resposta"""
+        if used_tokens != reserved_tokens and self.limits_for(model)[1]:
+            self._buckets.adjust(model, self.limits_for(model), used_tokens - reserved_tokens)
+
+    def throttled(self, model: str, retry_after: float):
+        """429: pausa o modelo para todos os chamadores (e workers, se compartilhado)"""
+        self._model_stats(model).throttled += 1
+        self._buckets.block(model, self.limits_for(model), retry_after)
+
+    async def record_usage_async(self, model: str, reserved_tokens: int, used_tokens: int):
+        """record_usage() sem bloquear o event loop"""
+        if used_tokens != reserved_tokens and self.limits_for(model)[1]:
+            await self._buckets_call("adjust", model, self.limits_for(model), used_tokens - reserved_tokens)
+
+    async def throttled_async(self, model: str, retry_after: float):
+        """throttled() sem bloquear o event loop"""
+        self._model_stats(model).throttled += 1
+        await self._buckets_call("block", model, self.limits_for(model), retry_after)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency or None,
+            "shared_between_workers": self.shared,
+            "models": {
+                model: {
+                    "rpm": self.limits_for(model)[0] or None,
+                    "tpm": self.limits_for(model)[1] or None,
+                    **stats.to_dict(),
+                }
+                for model, stats in self._stats.items()
+            },
+        }
+
+
+llm_rate_limiter = LLMRateLimiter(
+    parse_rate_limits(os.getenv("LLM_RATE_LIMITS", "")),
+    (LLM_RPM, LLM_TPM),
+    LLM_MAX_CONCURRENCY,
+    Path(LLM_RATE_LIMIT_SHARED_PATH) if LLM_RATE_LIMIT_SHARED_PATH else None,
+)
+
+
+def get_llm_rate_limit_metrics() -> Dict[str, Any]:
+    return llm_rate_limiter.metrics()
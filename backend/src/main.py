@@ -2,13 +2,26 @@
 FastAPI + SQLAlchemy + Supabase
 Sistema de Correção de Provas com IA
 """
+import time
+
+# Marca o início do import para medir o cold start do worker
+_IMPORT_STARTED_AT = time.perf_counter()
+
+from contextlib import asynccontextmanager
+import asyncio
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
+import os
 import uuid
 
-from .database import engine, get_db, Base
+from .database import get_db, Base, AsyncSessionLocal, get_pool_metrics, init_engines, warm_pool, dispose_engines
+from .aggregates import reconcile_aggregates
+from .materialized_views import refresh_materialized_views
+from .query_metrics import QueryMetricsMiddleware, get_route_query_metrics
+from .llm_cache import get_llm_cache_metrics
+from .llm_rate_limit import get_llm_rate_limit_metrics
 from .models import (
     # Models
     Teacher, Class, Student, Exam, Question, StudentExam, StudentAnswer, ExamInsight,
@@ -23,46 +36,121 @@ from .models import (
     ExamInsightCreate, ExamInsightResponse
 )
 
-# ============================================
-# Teste de conexão síncrona (psycopg2)
-# ============================================
-from sqlalchemy import create_engine
-from dotenv import load_dotenv
-import os
+# Quantas conexões abrir em paralelo no startup (0 desliga o aquecimento)
+DB_WARM_CONNECTIONS = int(os.getenv("DB_WARM_CONNECTIONS", "2"))
+
+# Intervalo (s) da reconciliação de student_count/agregados das turmas (0 desliga)
+AGGREGATES_RECONCILE_INTERVAL = float(os.getenv("AGGREGATES_RECONCILE_INTERVAL", "3600"))
+
+# Intervalo (s) do REFRESH CONCURRENTLY das materialized views de estatísticas (0 desliga)
+MATERIALIZED_VIEWS_REFRESH_INTERVAL = float(os.getenv("MATERIALIZED_VIEWS_REFRESH_INTERVAL", "300"))
+
+# Intervalo (s) do scoring de risco incremental (alunos novos/alterados -> alunos_risco; 0 desliga)
+RISK_SCORING_INTERVAL = float(os.getenv("RISK_SCORING_INTERVAL", "600"))
+
+# Intervalo (s) do cálculo incremental das tendências de notas (notas_bimestrais -> tendencias_notas; 0 desliga)
+GRADE_TRENDS_INTERVAL = float(os.getenv("GRADE_TRENDS_INTERVAL", "900"))
+
+# Tempos de inicialização do worker (expostos em /health/startup)
+STARTUP_STATS = {}
+
+
+async def periodic_loop(interval: float, job, name: str):
+    """Roda `job(db)` a cada `interval` segundos (primeira rodada no startup); falhas só são logadas"""
+    while True:
+        try:
+            init_engines()
+            async with AsyncSessionLocal() as db:
+                await job(db)
+        except Exception as e:
+            print(f" Aviso: {name} falhou: {e}")
+        await asyncio.sleep(interval)
+
+
+async def reconcile_job(db: AsyncSession):
+    """Corrige o drift dos agregados incrementais"""
+    fixed = await reconcile_aggregates(db)
+    if fixed and any(fixed.values()):
+        print(f" Agregados reconciliados: {fixed['classes']} turma(s) CRUD, {fixed['turmas']} turma(s) dashboard")
+
+
+async def risk_scoring_job(db: AsyncSession):
+    """Reavalia o risco só dos alunos novos ou alterados desde a última rodada"""
+    # Import tardio: numpy fica fora do import do app (cold start)
+    from .risk_scoring import score_alunos
+    scored = await score_alunos(db)
+    if scored and scored["alunos"]:
+        print(
+            f" Risco reavaliado: {scored['alunos']} aluno(s) "
+            f"({scored['alto']} alto, {scored['medio']} médio, {scored['baixo']} baixo) "
+            f"em {scored['load_ms'] + scored['score_ms'] + scored['write_ms']:.0f} ms"
+        )
+
+
+async def grade_trends_job(db: AsyncSession):
+    """Recalcula as tendências só das séries com nota nova ou alterada"""
+    from .grade_trends import update_tendencias
+    trends = await update_tendencias(db)
+    if trends and trends["series"]:
+        print(
+            f" Tendências de notas: {trends['series']} série(s), {trends['alertas']} alerta(s) de queda "
+            f"em {trends['load_ms'] + trends['trend_ms'] + trends['write_ms']:.0f} ms"
+        )
+
+
+def start_periodic_jobs() -> list:
+    jobs = [
+        (AGGREGATES_RECONCILE_INTERVAL, reconcile_job, "reconciliação de agregados"),
+        (RISK_SCORING_INTERVAL, risk_scoring_job, "scoring de risco"),
+        (GRADE_TRENDS_INTERVAL, grade_trends_job, "tendências de notas"),
+        (MATERIALIZED_VIEWS_REFRESH_INTERVAL, refresh_materialized_views, "refresh das materialized views"),
+    ]
+    return [
+        asyncio.create_task(periodic_loop(interval, job, name))
+        for interval, job, name in jobs if interval > 0
+    ]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup: cria os engines e aquece o pool em paralelo.
+    Sem banco disponível a API sobe mesmo assim; /health reporta o erro.
+    """
+    STARTUP_STATS["import_ms"] = round((_APP_READY_AT - _IMPORT_STARTED_AT) * 1000, 1)
+
+    warm_started = time.perf_counter()
+    try:
+        init_engines()
+        STARTUP_STATS["warm_connections"] = await warm_pool(DB_WARM_CONNECTIONS)
+    except Exception as e:
+        STARTUP_STATS["warm_connections"] = 0
+        STARTUP_STATS["warm_error"] = str(e)
+        print(f" Aviso: não foi possível aquecer o pool de conexões: {e}")
+    STARTUP_STATS["warm_ms"] = round((time.perf_counter() - warm_started) * 1000, 1)
+    STARTUP_STATS["cold_start_ms"] = round((time.perf_counter() - _IMPORT_STARTED_AT) * 1000, 1)
 
-# Load environment variables from .env
-load_dotenv()
+    print(
+        f" Cold start: {STARTUP_STATS['cold_start_ms']} ms "
+        f"(import {STARTUP_STATS['import_ms']} ms, pool {STARTUP_STATS['warm_ms']} ms, "
+        f"{STARTUP_STATS['warm_connections']} conexão(ões) aquecida(s))"
+    )
 
-# Fetch variables
-USER = os.getenv("user")
-PASSWORD = os.getenv("password")
-HOST = os.getenv("host")
-PORT = os.getenv("port")
-DBNAME = os.getenv("dbname")
+    periodic_tasks = start_periodic_jobs()
 
-# Construct the SQLAlchemy connection string (SÍNCRONO - psycopg2)
-DATABASE_URL_SYNC = f"postgresql+psycopg2://{USER}:{PASSWORD}@{HOST}:{PORT}/{DBNAME}?sslmode=require"
+    yield
 
-# Create the SQLAlchemy engine (SÍNCRONO - para testes)
-engine_sync = create_engine(DATABASE_URL_SYNC)
+    for task in periodic_tasks:
+        task.cancel()
+    await dispose_engines()
 
-# Test the connection
-print("=" * 60)
-print("Testando conexão síncrona com Supabase (psycopg2)...")
-try:
-    with engine_sync.connect() as connection:
-        print(" Connection successful!")
-except Exception as e:
-    print(f" Failed to connect: {e}")
-print("=" * 60)
-print()
 
-
-# Inicializar FastAPI (sem eventos problemáticos)
+# Inicializar FastAPI
 app = FastAPI(
     title="Sistema de Correção de Provas - API",
     description="API para sistema de correção automática de provas com IA",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -78,6 +166,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Contagem de queries / tempo de banco por request (Server-Timing) e por rota
+app.add_middleware(QueryMetricsMiddleware)
+
 
 # ============================================
 # HEALTH CHECK
@@ -94,18 +185,51 @@ def read_root():
 
 
 @app.get("/health")
-async def health_check(db: AsyncSession = Depends(get_db)):
+async def health_check():
     """Verifica se a API e o banco estão funcionando"""
     try:
         from sqlalchemy import text
-        await db.execute(text("SELECT 1"))
+        init_engines()
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT 1"))
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Database error: {str(e)}")
 
 
+@app.get("/health/pools")
+async def pool_metrics():
+    """Uso dos pools de conexão (primário, leitura, analytics) e tempo de espera por conexão"""
+    return get_pool_metrics()
+
+
+@app.get("/health/queries")
+def query_metrics():
+    """Queries e tempo de banco por rota (médias, pior caso, SQL mais lenta, requests com N+1)"""
+    return get_route_query_metrics()
+
+
+@app.get("/health/llm-cache")
+def llm_cache_metrics():
+    """Cache em disco das respostas do Gemini: acertos, erros, taxa de acerto, tamanho e evictions"""
+    return get_llm_cache_metrics()
+
+
+@app.get("/health/llm-rate-limit")
+def llm_rate_limit_metrics():
+    """Limiter das chamadas a LLM: limites, fila, chamadas em andamento, espera e 429s por modelo"""
+    return get_llm_rate_limit_metrics()
+
+
+@app.get("/health/startup")
+def startup_metrics():
+    """Tempo de cold start deste worker (import dos módulos + aquecimento do pool)"""
+    return STARTUP_STATS
+
+
 # Incluir rotas
 from .routes import router
+from .routes_dashboard import router as dashboard_router
 from .clustering_routes import router as clustering_router
 
 # Rotas de análise causal (opcional - descomente se quiser usar)
@@ -117,8 +241,12 @@ except ImportError:
     pass
 
 app.include_router(router)
+app.include_router(dashboard_router)
 app.include_router(clustering_router)
 
+# Fim dos imports de módulo: o restante do cold start é o aquecimento no lifespan
+_APP_READY_AT = time.perf_counter()
+
 
 if __name__ == "__main__":
     import uvicorn
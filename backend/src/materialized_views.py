@@ -0,0 +1,94 @@
+"""
+Materialized views das estatísticas do dashboard (escola, turma e cluster global)
+- Criadas em migrations/003_materialized_views_estatisticas.sql, cada uma com
+  índice único: pré-requisito do REFRESH ... CONCURRENTLY, que não bloqueia leituras
+- refresh_materialized_views(): chamado pelo agendador do main.py e após importações
+- materialized_view_refresh guarda quando cada view foi atualizada; as rotas
+  devolvem essa data e a defasagem em segundos junto com os números
+"""
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import column, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Ordem de atualização (independentes entre si: todas leem das tabelas base)
+MATERIALIZED_VIEWS = ("mv_estatisticas_turma", "mv_estatisticas_escola", "mv_estatisticas_cluster")
+
+# Chave do advisory lock do refresh (um worker por vez)
+REFRESH_LOCK_KEY = 730_002
+
+mv_estatisticas_turma = table(
+    "mv_estatisticas_turma",
+    *[column(name) for name in (
+        "turma_id", "escola_id", "turma_nome", "total_alunos", "n_media_geral", "soma_media_geral",
+        "media_geral", "desvio_padrao", "nota_minima", "nota_maxima", "n_trabalha", "pct_trabalha",
+        "renda_media", "pct_pretos_pardos", "alunos_risco_alto",
+    )]
+)
+
+mv_estatisticas_escola = table(
+    "mv_estatisticas_escola",
+    *[column(name) for name in (
+        "escola_id", "escola_nome", "total_turmas", "total_alunos", "n_media_geral", "soma_media_geral",
+        "media_geral", "desvio_padrao", "pct_trabalha", "renda_media", "pct_pretos_pardos", "alunos_risco_alto",
+    )]
+)
+
+mv_estatisticas_cluster = table(
+    "mv_estatisticas_cluster",
+    *[column(name) for name in (
+        "cluster_id", "total_alunos", "percentual", "media_notas", "renda_media", "pct_trabalha",
+        "tempo_desl_medio", "pct_pretos_pardos", "pct_inseg_alimentar",
+    )]
+)
+
+materialized_view_refresh = table(
+    "materialized_view_refresh", column("view_name"), column("refreshed_at"), column("duration_ms")
+)
+
+
+def refreshed_at(view_name: str):
+    """Subquery com a data do último refresh da view (para ir na mesma query dos dados)"""
+    return (
+        select(materialized_view_refresh.c.refreshed_at)
+        .where(materialized_view_refresh.c.view_name == view_name)
+        .scalar_subquery()
+    )
+
+
+def staleness(refreshed: Optional[datetime]) -> Dict[str, object]:
+    """Campos de defasagem incluídos nas respostas"""
+    if refreshed is None:
+        return {"atualizado_em": None, "defasagem_segundos": None}
+    return {
+        "atualizado_em": refreshed.isoformat(),
+        "defasagem_segundos": round((datetime.now(timezone.utc) - refreshed).total_seconds(), 1),
+    }
+
+
+async def refresh_materialized_views(db: AsyncSession) -> Optional[Dict[str, float]]:
+    """
+    REFRESH CONCURRENTLY de todas as views e registro do horário.
+    Retorna a duração (ms) de cada uma (None se outro worker já está atualizando).
+    """
+    got_lock = (await db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": REFRESH_LOCK_KEY})).scalar()
+    if not got_lock:
+        return None
+
+    durations = {}
+    for view_name in MATERIALIZED_VIEWS:
+        started = time.perf_counter()
+        await db.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view_name}"))
+        durations[view_name] = round((time.perf_counter() - started) * 1000, 1)
+        await db.execute(
+            text(
+                "INSERT INTO materialized_view_refresh (view_name, refreshed_at, duration_ms) "
+                "VALUES (:view_name, now(), :duration_ms) "
+                "ON CONFLICT (view_name) DO UPDATE SET refreshed_at = now(), duration_ms = EXCLUDED.duration_ms"
+            ),
+            {"view_name": view_name, "duration_ms": durations[view_name]}
+        )
+    await db.commit()
+    return durations
@@ -2,7 +2,7 @@
 Models SQLAlchemy - Sistema de Correção de Provas
 Baseado no schema.md do projeto
 """
-from sqlalchemy import Column, String, Boolean, DateTime, Text, ForeignKey, Integer, Date, DECIMAL, CheckConstraint, UniqueConstraint
+from sqlalchemy import Column, String, Boolean, DateTime, Text, ForeignKey, Integer, Date, DECIMAL, CheckConstraint, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func, text
@@ -55,6 +55,12 @@ class Class(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    # Índices (criados em migrations/002_indices_fk_filtros.sql)
+    __table_args__ = (
+        # Turmas do professor + soma de student_count sem ler a tabela
+        Index('ix_classes_teacher_id', 'teacher_id', postgresql_include=['student_count']),
+    )
+
     # Relacionamentos
     teacher = relationship("Teacher", back_populates="classes")
     students = relationship("Student", back_populates="class_", cascade="all, delete-orphan")
@@ -117,7 +123,7 @@ class Student(Base):
     # DADOS ACADÊMICOS (HISTÓRICO)
     math_grade = Column(DECIMAL(4, 2))
     portuguese_grade = Column(DECIMAL(4, 2))
-    overall_average = Column(DECIMAL(4, 2))
+    overall_average = Column(DECIMAL(4, 2), index=True)
     attendance_percentage = Column(DECIMAL(5, 2))
     
     # METADADOS
@@ -131,6 +137,14 @@ class Student(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    # Índices (criados em migrations/002_indices_fk_filtros.sql)
+    __table_args__ = (
+        # Alunos da turma + estatísticas (gênero/médias) via index-only scan
+        Index('ix_students_class_id', 'class_id', postgresql_include=['gender', 'overall_average', 'attendance_percentage']),
+        # Busca por nome com ILIKE '%...%' (extensão pg_trgm)
+        Index('ix_students_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+    )
+
     # Relacionamentos
     class_ = relationship("Class", back_populates="students")
     student_exams = relationship("StudentExam", back_populates="student", cascade="all, delete-orphan")
@@ -144,8 +158,8 @@ class Exam(Base):
     __tablename__ = "exams"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    class_id = Column(UUID(as_uuid=True), ForeignKey("classes.id", ondelete="CASCADE"), nullable=False)
-    teacher_id = Column(UUID(as_uuid=True), ForeignKey("teachers.id", ondelete="CASCADE"), nullable=False)
+    class_id = Column(UUID(as_uuid=True), ForeignKey("classes.id", ondelete="CASCADE"), nullable=False, index=True)
+    teacher_id = Column(UUID(as_uuid=True), ForeignKey("teachers.id", ondelete="CASCADE"), nullable=False, index=True)
     title = Column(String(255), nullable=False)
     description = Column(Text)
     subject = Column(String(100), nullable=False)  # Disciplina: Matemática, Português
@@ -175,7 +189,7 @@ class Question(Base):
     __tablename__ = "questions"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    exam_id = Column(UUID(as_uuid=True), ForeignKey("exams.id", ondelete="CASCADE"), nullable=False)
+    exam_id = Column(UUID(as_uuid=True), ForeignKey("exams.id", ondelete="CASCADE"), nullable=False, index=True)
     question_number = Column(Integer, nullable=False)
     question_type = Column(
         String(20),
@@ -218,6 +232,8 @@ class StudentExam(Base):
     __table_args__ = (
         # Um aluno só pode ter uma prova por exam_id
         UniqueConstraint('exam_id', 'student_id', name='uq_student_exam'),
+        # Provas do aluno (a unique acima começa por exam_id, não serve para student_id)
+        Index('ix_student_exams_student_id', 'student_id', postgresql_include=['total_score']),
     )
 
     # Relacionamentos
@@ -235,7 +251,7 @@ class StudentAnswer(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     student_exam_id = Column(UUID(as_uuid=True), ForeignKey("student_exams.id", ondelete="CASCADE"), nullable=False)
-    question_id = Column(UUID(as_uuid=True), ForeignKey("questions.id", ondelete="CASCADE"), nullable=False)
+    question_id = Column(UUID(as_uuid=True), ForeignKey("questions.id", ondelete="CASCADE"), nullable=False, index=True)
     extracted_answer = Column(Text)
     ai_score = Column(DECIMAL(5, 2))
     ai_feedback = Column(Text)
@@ -2,7 +2,7 @@
 Models SQLAlchemy - Sistema Dashboard de Análise de Alunos
 Baseado nos JSONs: dados_dashboard.json e relatorio_completo.json
 """
-from sqlalchemy import Column, String, Boolean, DateTime, Text, ForeignKey, Integer, Date, DECIMAL, Float, CheckConstraint
+from sqlalchemy import Column, String, Boolean, DateTime, Text, ForeignKey, Integer, SmallInteger, BigInteger, Date, DECIMAL, Float, CheckConstraint, Index, Identity
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -43,7 +43,7 @@ class Turma(Base):
     __tablename__ = "turmas"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    escola_id = Column(UUID(as_uuid=True), ForeignKey("escolas.id", ondelete="CASCADE"), nullable=False)
+    escola_id = Column(UUID(as_uuid=True), ForeignKey("escolas.id", ondelete="CASCADE"), nullable=False, index=True)
     
     nome = Column(String(50), nullable=False)  # "1A", "2B", etc.
     serie = Column(String(50))  # "1º Ano", "2º Ano", etc.
@@ -58,6 +58,15 @@ class Turma(Base):
     renda_media = Column(Float)
     pct_pretos_pardos = Column(Float)
     
+    # Somas acumuladas (mantidas em aggregates.py a cada escrita de aluno)
+    n_media_geral = Column(Integer, default=0, nullable=False)
+    soma_media_geral = Column(Float, default=0, nullable=False)
+    soma_quadrados_media_geral = Column(Float, default=0, nullable=False)
+    n_trabalha = Column(Integer, default=0, nullable=False)
+    n_renda = Column(Integer, default=0, nullable=False)
+    soma_renda = Column(Float, default=0, nullable=False)
+    n_pretos_pardos = Column(Integer, default=0, nullable=False)
+    
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -77,8 +86,8 @@ class Aluno(Base):
     __tablename__ = "alunos"
 
     id = Column(Integer, primary_key=True)  # ID original dos JSONs
-    escola_id = Column(UUID(as_uuid=True), ForeignKey("escolas.id", ondelete="CASCADE"), nullable=False)
-    turma_id = Column(UUID(as_uuid=True), ForeignKey("turmas.id", ondelete="CASCADE"), nullable=False)
+    escola_id = Column(UUID(as_uuid=True), ForeignKey("escolas.id", ondelete="CASCADE"), nullable=False, index=True)
+    turma_id = Column(UUID(as_uuid=True), ForeignKey("turmas.id", ondelete="CASCADE"), nullable=False, index=True)
     
     # DADOS PESSOAIS
     nome_aluno = Column(String(255), nullable=False)
@@ -163,7 +172,7 @@ class Aluno(Base):
     frequencia_percentual = Column(Float)
     
     # CLUSTER
-    cluster_id = Column(Integer, ForeignKey("clusters_globais.cluster_id"))
+    cluster_id = Column(Integer, ForeignKey("clusters_globais.cluster_id"), index=True)
     cluster_turma_id = Column(Integer)
     
     # METADADOS
@@ -216,7 +225,7 @@ class ClusterTurma(Base):
     __tablename__ = "clusters_turma"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    turma_id = Column(UUID(as_uuid=True), ForeignKey("turmas.id", ondelete="CASCADE"), nullable=False)
+    turma_id = Column(UUID(as_uuid=True), ForeignKey("turmas.id", ondelete="CASCADE"), nullable=False, index=True)
     cluster_id = Column(Integer)
     
     total_alunos = Column(Integer)
@@ -250,7 +259,7 @@ class DistribuicaoFaixa(Base):
     __tablename__ = "distribuicao_faixas"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    turma_id = Column(UUID(as_uuid=True), ForeignKey("turmas.id", ondelete="CASCADE"))
+    turma_id = Column(UUID(as_uuid=True), ForeignKey("turmas.id", ondelete="CASCADE"), index=True)
     
     faixa = Column(String(50), nullable=False)  # "Baixo (0-4)", "Médio (4-7)", "Alto (7-10)"
     
@@ -291,7 +300,7 @@ class FatorCritico(Base):
     percentual_afetados = Column(Float)
     
     # Pode ser global ou por turma
-    turma_id = Column(UUID(as_uuid=True), ForeignKey("turmas.id", ondelete="CASCADE"))
+    turma_id = Column(UUID(as_uuid=True), ForeignKey("turmas.id", ondelete="CASCADE"), index=True)
     is_global = Column(Boolean, default=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -307,7 +316,7 @@ class AlunoRisco(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     aluno_id = Column(Integer, ForeignKey("alunos.id", ondelete="CASCADE"), nullable=False)
     
-    nivel_risco = Column(String(50), nullable=False)  # "Alto", "Médio", "Baixo"
+    nivel_risco = Column(String(50), nullable=False, index=True)  # "Alto", "Médio", "Baixo"
     fatores_risco = Column(JSONB)  # Array de fatores que contribuem para o risco
     
     # Pontuação de risco (calculada)
@@ -319,14 +328,74 @@ class AlunoRisco(Base):
     # Acompanhamento
     data_identificacao = Column(DateTime(timezone=True), server_default=func.now())
     ultima_atualizacao = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    aluno_updated_at = Column(DateTime(timezone=True))  # alunos.updated_at avaliado (scoring incremental)
     status_acompanhamento = Column(String(50))  # "Em acompanhamento", "Intervenção realizada", etc.
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Uma linha por aluno (upsert do scoring em lote, migrations/004_alunos_risco_unico_por_aluno.sql)
+    __table_args__ = (
+        Index('ux_alunos_risco_aluno_id', 'aluno_id', unique=True),
+    )
+
     def __repr__(self):
         return f"<AlunoRisco(aluno_id={self.aluno_id}, nivel='{self.nivel_risco}')>"
 
 
+class NotaBimestral(Base):
+    """Notas em formato longo: uma linha por aluno, disciplina e bimestre"""
+    __tablename__ = "notas_bimestrais"
+
+    aluno_id = Column(Integer, ForeignKey("alunos.id", ondelete="CASCADE"), primary_key=True)
+    disciplina = Column(String(50), primary_key=True)  # "matematica", "portugues"
+    bimestre = Column(SmallInteger, CheckConstraint("bimestre BETWEEN 1 AND 4"), primary_key=True)
+    nota = Column(Float, nullable=False)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<NotaBimestral(aluno_id={self.aluno_id}, disciplina='{self.disciplina}', bimestre={self.bimestre})>"
+
+
+class TendenciaNota(Base):
+    """Tendência das notas de um aluno numa disciplina (calculada pelo job de grade_trends)"""
+    __tablename__ = "tendencias_notas"
+
+    aluno_id = Column(Integer, ForeignKey("alunos.id", ondelete="CASCADE"), primary_key=True)
+    disciplina = Column(String(50), primary_key=True)
+
+    n_bimestres = Column(SmallInteger, nullable=False)
+    primeira_nota = Column(Float)
+    ultima_nota = Column(Float)
+    inclinacao = Column(Float)  # Pontos por bimestre (regressão linear)
+    variancia = Column(Float)
+    queda_maxima = Column(Float)  # Maior queda entre bimestres consecutivos
+    alerta_queda = Column(Boolean, default=False, nullable=False)
+
+    calculado_em = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    versao_notas = Column(String(32))  # md5 dos (bimestre, updated_at) usados no cálculo
+
+    __table_args__ = (
+        Index('ix_tendencias_notas_alerta', 'disciplina', 'inclinacao', postgresql_where=alerta_queda),
+    )
+
+    def __repr__(self):
+        return f"<TendenciaNota(aluno_id={self.aluno_id}, disciplina='{self.disciplina}', inclinacao={self.inclinacao})>"
+
+
+class TendenciaPendente(Base):
+    """Série (aluno, disciplina) com notas alteradas desde o último cálculo da tendência"""
+    __tablename__ = "tendencias_pendentes"
+
+    aluno_id = Column(Integer, ForeignKey("alunos.id", ondelete="CASCADE"), primary_key=True)
+    disciplina = Column(String(50), primary_key=True)
+    # Renovada a cada marcação: o job só apaga a marca que leu
+    versao = Column(BigInteger, Identity(), nullable=False)
+
+    def __repr__(self):
+        return f"<TendenciaPendente(aluno_id={self.aluno_id}, disciplina='{self.disciplina}', versao={self.versao})>"
+
+
 # ==================== TABELAS DE RELATÓRIOS E INSIGHTS ====================
 
 class RelatorioGeral(Base):
@@ -349,6 +418,10 @@ class RelatorioGeral(Base):
     observacoes = Column(Text)
     insights_principais = Column(JSONB)  # Array de strings
     
+    # Análise completa do Gemini e hash dos dados do prompt (regeneração incremental)
+    analise = Column(JSONB)
+    hash_dados = Column(String(64))
+    
     # Metadados
     turma_id = Column(UUID(as_uuid=True), ForeignKey("turmas.id", ondelete="CASCADE"))
     data_geracao = Column(DateTime(timezone=True), server_default=func.now())
@@ -357,6 +430,12 @@ class RelatorioGeral(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Índices (criados em migrations/002_indices_fk_filtros.sql): último relatório por turma / por tipo
+    __table_args__ = (
+        Index('ix_relatorios_gerais_turma_data', 'turma_id', data_geracao.desc()),
+        Index('ix_relatorios_gerais_tipo_data', 'tipo_relatorio', data_geracao.desc()),
+    )
+
     def __repr__(self):
         return f"<RelatorioGeral(tipo='{self.tipo_relatorio}', data='{self.data_geracao}')>"
 
@@ -377,7 +456,7 @@ class PlanoAcao(Base):
     impacto_esperado = Column(Text)
     
     # Pode ser global ou específico de turma
-    turma_id = Column(UUID(as_uuid=True), ForeignKey("turmas.id", ondelete="CASCADE"))
+    turma_id = Column(UUID(as_uuid=True), ForeignKey("turmas.id", ondelete="CASCADE"), index=True)
     is_global = Column(Boolean, default=False)
     
     # Status de execução
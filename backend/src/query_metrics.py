@@ -0,0 +1,154 @@
+"""
+Instrumentação de queries por request
+- Hooks do SQLAlchemy (before/after_cursor_execute) contam queries e tempo de banco
+- Middleware ASGI devolve Server-Timing (db, db-slowest) e X-DB-Queries em cada resposta
+- Agregado por rota em /health/queries
+- Loga N+1 (mesma SQL repetida >= QUERY_N_PLUS_ONE_THRESHOLD vezes na request)
+  e queries acima de SLOW_QUERY_MS, com a SQL culpada
+"""
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+QUERY_METRICS_ENABLED = os.getenv("QUERY_METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Mesma SQL executada esse número de vezes numa request = provável N+1
+QUERY_N_PLUS_ONE_THRESHOLD = int(os.getenv("QUERY_N_PLUS_ONE_THRESHOLD", "10"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+
+class RequestQueryStats:
+    """Queries de uma request"""
+
+    __slots__ = ("count", "total_ms", "slowest_ms", "slowest_sql", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_sql = None
+        self.statements = Counter()
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.statements[statement] += 1
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_sql = statement
+
+
+_current: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+def _short_sql(statement: str, limit: int = 300) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + "..."
+
+
+# =========================
+# Hooks do SQLAlchemy (valem para todos os engines)
+# =========================
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started_at"].pop()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+    if elapsed_ms >= SLOW_QUERY_MS:
+        print(f" [slow-query] {elapsed_ms:.1f} ms: {_short_sql(statement)}")
+
+
+# =========================
+# Agregado por rota
+# =========================
+
+ROUTE_QUERY_STATS: Dict[str, Dict[str, Any]] = {}
+
+
+def _record_route(route: str, stats: RequestQueryStats):
+    entry = ROUTE_QUERY_STATS.setdefault(route, {
+        "requests": 0, "queries": 0, "db_ms": 0.0, "max_queries": 0,
+        "slowest_ms": 0.0, "slowest_sql": None, "n_plus_one": 0,
+    })
+    entry["requests"] += 1
+    entry["queries"] += stats.count
+    entry["db_ms"] += stats.total_ms
+    entry["max_queries"] = max(entry["max_queries"], stats.count)
+    if stats.slowest_ms > entry["slowest_ms"]:
+        entry["slowest_ms"] = stats.slowest_ms
+        entry["slowest_sql"] = _short_sql(stats.slowest_sql)
+
+    statement, repeats = stats.statements.most_common(1)[0] if stats.statements else (None, 0)
+    if repeats >= QUERY_N_PLUS_ONE_THRESHOLD:
+        entry["n_plus_one"] += 1
+        print(f" [n+1] {route}: mesma query executada {repeats}x na request: {_short_sql(statement)}")
+
+
+def get_route_query_metrics() -> Dict[str, Dict[str, Any]]:
+    """Médias por rota (queries/request, ms de banco/request) e a query mais lenta vista"""
+    metrics = {}
+    for route, entry in sorted(ROUTE_QUERY_STATS.items(), key=lambda item: -item[1]["db_ms"]):
+        requests = entry["requests"]
+        metrics[route] = {
+            "requests": requests,
+            "avg_queries": round(entry["queries"] / requests, 2),
+            "max_queries": entry["max_queries"],
+            "avg_db_ms": round(entry["db_ms"] / requests, 3),
+            "slowest_ms": round(entry["slowest_ms"], 3),
+            "slowest_sql": entry["slowest_sql"],
+            "n_plus_one_requests": entry["n_plus_one"],
+        }
+    return metrics
+
+
+# =========================
+# Middleware
+# =========================
+
+class QueryMetricsMiddleware:
+    """
+    Middleware ASGI puro (não bufferiza o corpo, então não atrapalha
+    StreamingResponse). Queries feitas depois do início da resposta
+    (streaming) entram no agregado da rota, mas não no header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not QUERY_METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = _current.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                server_timing = f'db;dur={stats.total_ms:.1f};desc="{stats.count} queries", db-slowest;dur={stats.slowest_ms:.1f}'
+                headers.append((b"server-timing", server_timing.encode("latin-1")))
+                headers.append((b"x-db-queries", str(stats.count).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            if route is not None and stats.count:
+                _record_route(f"{scope['method']} {route.path}", stats)
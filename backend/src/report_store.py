@@ -0,0 +1,154 @@
+"""
+Análises do relatório do diretor salvas em relatorios_gerais
+- Uma linha por análise de turma (tipo "analise_turma", com turma_id) e por
+  Parte 1 geral (tipo "analise_geral", sem turma), com a resposta completa do
+  Gemini em `analise` e o hash dos dados do prompt em `hash_dados`
+- load_stored_analyses(): última análise de cada turma, no formato esperado por
+  analyze_relatorio_incremental (chave = nome da turma, None = Parte 1)
+- save_analyses(): grava só as análises novas e sem erro (histórico: não sobrescreve)
+"""
+import uuid
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+try:
+    from .models_dashboard import Escola, RelatorioGeral, Turma
+except ImportError:
+    from models_dashboard import Escola, RelatorioGeral, Turma
+
+TIPO_ANALISE_TURMA = "analise_turma"
+TIPO_ANALISE_GERAL = "analise_geral"
+
+
+def _escola_of_turma(turma: dict) -> Optional[str]:
+    """Nome da escola de uma turma do dashboard (pelos alunos dos clusters)"""
+    for cluster in turma.get("clusters_turma", []):
+        for aluno in cluster.get("alunos", []):
+            if aluno.get("escola"):
+                return aluno["escola"]
+    return None
+
+
+async def resolve_turma_ids(db: AsyncSession, dashboard_data: Dict[str, Any]) -> Dict[str, uuid.UUID]:
+    """
+    Nome da turma do dashboard -> turmas.id. Nome repetido entre escolas é
+    resolvido pela escola dos alunos; turmas que não estão no banco ficam de fora.
+    """
+    turmas = [t for t in dashboard_data.get("dados_por_turma", []) if t.get("turma")]
+    result = await db.execute(
+        select(Turma.nome, Turma.id, Escola.nome)
+        .join(Escola, Escola.id == Turma.escola_id)
+        .where(Turma.nome.in_([t["turma"] for t in turmas]))
+    )
+    candidates: Dict[str, Dict[str, uuid.UUID]] = {}
+    for nome, turma_id, escola in result.all():
+        candidates.setdefault(nome, {})[escola] = turma_id
+
+    turma_ids = {}
+    for turma in turmas:
+        por_escola = candidates.get(turma["turma"], {})
+        if len(por_escola) == 1:
+            turma_ids[turma["turma"]] = next(iter(por_escola.values()))
+        elif _escola_of_turma(turma) in por_escola:
+            turma_ids[turma["turma"]] = por_escola[_escola_of_turma(turma)]
+    return turma_ids
+
+
+async def load_stored_analyses(
+    db: AsyncSession, turma_ids: Dict[str, uuid.UUID]
+) -> Dict[Optional[str], Dict[str, Any]]:
+    """Última análise com hash de cada turma e a última Parte 1: {nome: {"hash", "analise"}}"""
+    nomes = {turma_id: nome for nome, turma_id in turma_ids.items()}
+    stored: Dict[Optional[str], Dict[str, Any]] = {}
+
+    if nomes:
+        result = await db.execute(
+            select(RelatorioGeral.turma_id, RelatorioGeral.hash_dados, RelatorioGeral.analise)
+            .where(
+                RelatorioGeral.tipo_relatorio == TIPO_ANALISE_TURMA,
+                RelatorioGeral.turma_id.in_(list(nomes)),
+                RelatorioGeral.hash_dados.isnot(None)
+            )
+            .order_by(RelatorioGeral.turma_id, RelatorioGeral.data_geracao.desc())
+            .distinct(RelatorioGeral.turma_id)
+        )
+        for turma_id, hash_dados, analise in result.all():
+            stored[nomes[turma_id]] = {"hash": hash_dados, "analise": analise}
+
+    result = await db.execute(
+        select(RelatorioGeral.hash_dados, RelatorioGeral.analise)
+        .where(
+            RelatorioGeral.tipo_relatorio == TIPO_ANALISE_GERAL,
+            RelatorioGeral.turma_id.is_(None),
+            RelatorioGeral.hash_dados.isnot(None)
+        )
+        .order_by(RelatorioGeral.data_geracao.desc())
+        .limit(1)
+    )
+    geral = result.first()
+    if geral is not None:
+        stored[None] = {"hash": geral.hash_dados, "analise": geral.analise}
+    return stored
+
+
+def _relatorio_turma(nome: str, turma_id: uuid.UUID, info: Dict[str, Any]) -> RelatorioGeral:
+    analise = info["analise"]
+    parte_2 = (analise.get("parte_2_analise_por_turma") or [{}])[0]
+    plano = parte_2.get("analise_plano_acao", {})
+    clusters = parte_2.get("correlacao_clusterizacao", {})
+    return RelatorioGeral(
+        tipo_relatorio=TIPO_ANALISE_TURMA,
+        titulo=f"Análise da turma {nome}",
+        resumo_estatistico=plano.get("sintese_desempenho"),
+        padroes_gerais=clusters.get("padroes_comportamentais"),
+        observacoes=plano.get("principais_desafios"),
+        turma_id=turma_id,
+        total_alunos_analisados=analise.get("metadata", {}).get("total_alunos"),
+        total_turmas_analisadas=1,
+        analise=analise,
+        hash_dados=info["hash"],
+    )
+
+
+def _relatorio_geral(info: Dict[str, Any], total_turmas: int, total_alunos: Optional[int]) -> RelatorioGeral:
+    analise = info["analise"]
+    geral = analise.get("analise_geral_alunos", {})
+    insights = analise.get("insights_correlacoes", {})
+    return RelatorioGeral(
+        tipo_relatorio=TIPO_ANALISE_GERAL,
+        titulo="Análise geral (relatório do diretor)",
+        resumo_estatistico=geral.get("resumo_estatistico"),
+        padroes_gerais=geral.get("padroes_gerais"),
+        interpretacao_ia=geral.get("interpretacao_ia"),
+        correlacoes_identificadas=insights.get("correlacoes_identificadas"),
+        causas_subjacentes=insights.get("causas_subjacentes"),
+        observacoes=insights.get("observacoes"),
+        total_alunos_analisados=total_alunos,
+        total_turmas_analisadas=total_turmas,
+        analise=analise,
+        hash_dados=info["hash"],
+    )
+
+
+async def save_analyses(
+    db: AsyncSession,
+    analises: Dict[Optional[str], Dict[str, Any]],
+    turma_ids: Dict[str, uuid.UUID],
+    relatorio_metadata: Dict[str, Any]
+) -> int:
+    """Grava as análises geradas agora (sem erro) e faz commit; retorna quantas"""
+    rows = []
+    for nome, info in analises.items():
+        if info["reutilizada"] or info["erro"]:
+            continue
+        if nome is None:
+            rows.append(_relatorio_geral(
+                info, relatorio_metadata.get("total_turmas"), relatorio_metadata.get("total_alunos")
+            ))
+        elif nome in turma_ids:
+            rows.append(_relatorio_turma(nome, turma_ids[nome], info))
+    db.add_all(rows)
+    await db.commit()
+    return len(rows)
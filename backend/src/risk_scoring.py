@@ -0,0 +1,210 @@
+"""
+Score de risco em lote (alunos -> alunos_risco)
+- Carrega as colunas usadas de todos os alunos em arrays NumPy e calcula, numa
+  passada vetorizada, a máscara de fatores (1 bit por fator) e o score ponderado
+- Grava tudo com um upsert por aluno_id a partir de arrays (unnest), em blocos
+- Incremental: por padrão só reavalia alunos sem linha de risco ou alterados
+  desde a última avaliação; cada linha guarda o alunos.updated_at que foi lido
+  (alunos_risco.aluno_updated_at) e a comparação é por igualdade, porque now()
+  marca o início da transação e uma edição confirmada durante o job teria
+  updated_at anterior ao carimbo do job
+"""
+import json
+import time
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import DateTime, Float, Integer, Text, bindparam, or_, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+try:
+    from .aggregates import CORES_PRETOS_PARDOS
+    from .models_dashboard import Aluno, AlunoRisco
+except ImportError:
+    from aggregates import CORES_PRETOS_PARDOS
+    from models_dashboard import Aluno, AlunoRisco
+
+# Fatores na ordem dos bits da máscara. Os seis primeiros são os fatores_criticos
+# do clustering_model.generate_dashboard_data (mesmos limiares).
+FATORES = (
+    "trabalho",
+    "baixa_renda",
+    "deslocamento_longo",
+    "inseg_alimentar",
+    "sem_internet",
+    "pretos_pardos_indigenas",
+    "desempenho_critico",
+    "desempenho_baixo",
+    "frequencia_baixa",
+)
+FATOR_BIT = {fator: 1 << bit for bit, fator in enumerate(FATORES)}
+
+# Pesos do score. Cor/raça entra na máscara (análise de coortes), mas não pesa no score.
+PESOS = {
+    "trabalho": 10,
+    "baixa_renda": 10,
+    "deslocamento_longo": 8,
+    "inseg_alimentar": 10,
+    "sem_internet": 7,
+    "pretos_pardos_indigenas": 0,
+    "desempenho_critico": 30,
+    "desempenho_baixo": 15,
+    "frequencia_baixa": 20,
+}
+# desempenho_critico e desempenho_baixo são exclusivos: o máximo conta só o maior
+PESO_MAXIMO = sum(PESOS.values()) - PESOS["desempenho_baixo"]
+
+LIMIAR_ALTO = 50.0
+LIMIAR_MEDIO = 25.0
+
+# Colunas de alunos lidas pelo scoring (e pelo índice de coortes)
+FEATURE_COLUMNS = (
+    Aluno.media_geral, Aluno.frequencia_percentual, Aluno.trabalha_fora, Aluno.renda_familiar,
+    Aluno.tempo_deslocamento_min, Aluno.seguranca_alimentar, Aluno.acesso_internet, Aluno.cor_raca,
+)
+
+# Linhas por statement de upsert
+RISK_UPSERT_BATCH = 10_000
+
+RISK_LOCK_KEY = 730_003
+
+UPSERT_RISCO_SQL = text("""
+INSERT INTO alunos_risco (id, aluno_id, nivel_risco, score_risco, fatores_risco, aluno_updated_at)
+SELECT gen_random_uuid(), u.aluno_id, u.nivel_risco, u.score_risco, u.fatores_risco::jsonb, u.aluno_updated_at
+FROM unnest(:aluno_ids, :niveis, :scores, :fatores, :updated_ats)
+    AS u(aluno_id, nivel_risco, score_risco, fatores_risco, aluno_updated_at)
+ON CONFLICT (aluno_id) DO UPDATE
+SET nivel_risco = EXCLUDED.nivel_risco,
+    score_risco = EXCLUDED.score_risco,
+    fatores_risco = EXCLUDED.fatores_risco,
+    aluno_updated_at = EXCLUDED.aluno_updated_at,
+    ultima_atualizacao = now()
+""").bindparams(
+    bindparam("aluno_ids", type_=ARRAY(Integer)),
+    bindparam("niveis", type_=ARRAY(Text)),
+    bindparam("scores", type_=ARRAY(Float)),
+    bindparam("fatores", type_=ARRAY(Text)),
+    bindparam("updated_ats", type_=ARRAY(DateTime(timezone=True))),
+)
+
+
+def _floats(values: Sequence) -> np.ndarray:
+    """None -> NaN (comparações com NaN dão False: fator ausente)"""
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def _strings(values: Sequence) -> np.ndarray:
+    return np.array(["" if v is None else v for v in values], dtype=object)
+
+
+def factor_masks(columns: Dict[str, Sequence]) -> np.ndarray:
+    """
+    Máscara de fatores (uint16, um bit por fator de FATORES) para cada aluno.
+    `columns` traz as FEATURE_COLUMNS por nome, todas com o mesmo tamanho.
+    """
+    media = _floats(columns["media_geral"])
+    frequencia = _floats(columns["frequencia_percentual"])
+    renda = _floats(columns["renda_familiar"])
+    deslocamento = _floats(columns["tempo_deslocamento_min"])
+    seguranca = _strings(columns["seguranca_alimentar"])
+    cor_raca = _strings(columns["cor_raca"])
+
+    flags = {
+        "trabalho": _strings(columns["trabalha_fora"]) == "Sim",
+        "baixa_renda": renda < 1500,
+        "deslocamento_longo": deslocamento > 60,
+        # Como no generate_dashboard_data: qualquer valor diferente de "Segura"
+        "inseg_alimentar": (seguranca != "Segura") & (seguranca != ""),
+        "sem_internet": _strings(columns["acesso_internet"]) == "Não",
+        "pretos_pardos_indigenas": np.isin(cor_raca, CORES_PRETOS_PARDOS),
+        "desempenho_critico": media < 3,
+        "desempenho_baixo": (media >= 3) & (media < 5),
+        "frequencia_baixa": frequencia < 75,
+    }
+    masks = np.zeros(len(media), dtype=np.uint16)
+    for fator, flag in flags.items():
+        masks |= flag.astype(np.uint16) * np.uint16(FATOR_BIT[fator])
+    return masks
+
+
+def score_masks(masks: np.ndarray):
+    """Score 0-100 e nível ("Alto"/"Médio"/"Baixo") a partir das máscaras"""
+    pesos = np.zeros(len(masks), dtype=np.float64)
+    for fator, peso in PESOS.items():
+        if peso:
+            pesos += ((masks & FATOR_BIT[fator]) != 0) * peso
+    scores = np.round(pesos * 100.0 / PESO_MAXIMO, 1)
+
+    # Média < 3 é risco alto em qualquer caso (critério do generate_dashboard_data)
+    critico = (masks & FATOR_BIT["desempenho_critico"]) != 0
+    niveis = np.where(
+        (scores >= LIMIAR_ALTO) | critico, "Alto",
+        np.where(scores >= LIMIAR_MEDIO, "Médio", "Baixo")
+    )
+    return scores, niveis
+
+
+def fatores_of(mask: int) -> list:
+    return [fator for fator in FATORES if mask & FATOR_BIT[fator]]
+
+
+# JSON de cada máscara possível, calculado uma vez (2^9 combinações)
+_FATORES_JSON = [json.dumps(fatores_of(mask), ensure_ascii=False) for mask in range(1 << len(FATORES))]
+
+
+async def score_alunos(db: AsyncSession, full: bool = False) -> Optional[Dict[str, object]]:
+    """
+    Reavalia o risco dos alunos e grava em alunos_risco (faz commit).
+    Retorna contagens por nível e tempos (None se outro worker já está rodando).
+    """
+    got_lock = (await db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": RISK_LOCK_KEY})).scalar()
+    if not got_lock:
+        return None
+
+    started = time.perf_counter()
+    query = select(Aluno.id, Aluno.updated_at, *FEATURE_COLUMNS)
+    if not full:
+        query = query.outerjoin(AlunoRisco, AlunoRisco.aluno_id == Aluno.id).where(or_(
+            AlunoRisco.id.is_(None),
+            AlunoRisco.aluno_updated_at.is_distinct_from(Aluno.updated_at)
+        ))
+    result = await db.execute(query)
+    rows = result.all()
+    load_ms = (time.perf_counter() - started) * 1000
+
+    if not rows:
+        await db.commit()
+        return {"alunos": 0, "alto": 0, "medio": 0, "baixo": 0, "load_ms": round(load_ms, 1), "score_ms": 0.0, "write_ms": 0.0}
+
+    started = time.perf_counter()
+    values = list(zip(*rows))
+    aluno_ids, updated_ats = values[0], values[1]
+    masks = factor_masks({col.key: values[i + 2] for i, col in enumerate(FEATURE_COLUMNS)})
+    scores, niveis = score_masks(masks)
+    fatores = [_FATORES_JSON[mask] for mask in masks.tolist()]
+    score_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    scores_list, niveis_list = scores.tolist(), niveis.tolist()
+    for start in range(0, len(rows), RISK_UPSERT_BATCH):
+        end = start + RISK_UPSERT_BATCH
+        await db.execute(UPSERT_RISCO_SQL, {
+            "aluno_ids": list(aluno_ids[start:end]),
+            "niveis": niveis_list[start:end],
+            "scores": scores_list[start:end],
+            "fatores": fatores[start:end],
+            "updated_ats": list(updated_ats[start:end]),
+        })
+    await db.commit()
+    write_ms = (time.perf_counter() - started) * 1000
+
+    return {
+        "alunos": len(rows),
+        "alto": int((niveis == "Alto").sum()),
+        "medio": int((niveis == "Médio").sum()),
+        "baixo": int((niveis == "Baixo").sum()),
+        "load_ms": round(load_ms, 1),
+        "score_ms": round(score_ms, 1),
+        "write_ms": round(write_ms, 1),
+    }
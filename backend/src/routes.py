@@ -2,11 +2,11 @@
 FastAPI Routes - Sistema de Correção de Provas
 Rotas principais da API (Async)
 """
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import List
+from typing import List, Optional
 import uuid
 import shutil
 from pathlib import Path
@@ -14,7 +14,10 @@ import os
 import json
 from datetime import datetime
 
-from .database import get_db
+from .database import get_db, get_read_db, get_analytics_db
+from .cache import cached_json_response, invalidate
+from .aggregates import adjust_student_count
+from .serialization import json_rows_response, rows_to_dicts, export_response
 from .models import (
     # Models
     Teacher, Class, Student, Exam, Question, StudentExam, StudentAnswer, ExamInsight,
@@ -36,6 +39,46 @@ TEMP_DIR = Path(__file__).parent / "temp"
 TEMP_DIR.mkdir(exist_ok=True)
 
 
+# ============================================
+# CACHE - tags de invalidação
+# ============================================
+# teacher:<id>           dados do professor e lista de turmas dele
+# teacher_students:<id>  alunos nas turmas do professor (contagens)
+# class:<id>             dados da turma e lista/agregados dos alunos dela
+# student:<id>           dados do aluno
+# overview               contagens globais
+
+# ============================================
+# SPARSE FIELDSETS (fields=) para listagens de alunos
+# ============================================
+
+# Colunas que podem ser pedidas em fields= (as mesmas do StudentResponse)
+STUDENT_FIELD_COLUMNS = {
+    name: getattr(Student, name) for name in StudentResponse.model_fields if hasattr(Student, name)
+}
+
+
+def _student_projection(fields: Optional[str]) -> list:
+    """
+    Colunas do SELECT para `fields` (ex: "name,overall_average").
+    O id sempre vem; sem `fields`, todas as colunas do StudentResponse.
+    """
+    if not fields:
+        return list(STUDENT_FIELD_COLUMNS.values())
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    invalid = [name for name in requested if name not in STUDENT_FIELD_COLUMNS]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Campos inválidos: {', '.join(invalid)}")
+    names = ["id"] + [name for name in dict.fromkeys(requested) if name != "id"]
+    return [STUDENT_FIELD_COLUMNS[name] for name in names]
+
+
+async def _class_teacher_id(db: AsyncSession, class_id) -> str:
+    """teacher_id da turma (para invalidar as estatísticas do professor)"""
+    result = await db.execute(select(Class.teacher_id).where(Class.id == class_id))
+    return str(result.scalar_one_or_none())
+
+
 # ============================================
 # TEACHERS (Professores)
 # ============================================
@@ -57,18 +100,19 @@ async def create_teacher(teacher: TeacherCreate, db: AsyncSession = Depends(get_
     db.add(new_teacher)
     await db.commit()
     await db.refresh(new_teacher)
+    await invalidate("overview")
     return new_teacher
 
 
 @router.get("/teachers/", response_model=List[TeacherResponse], tags=["Teachers"])
-async def get_teachers(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
+async def get_teachers(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_read_db)):
     """Listar todos os professores"""
     result = await db.execute(select(Teacher).offset(skip).limit(limit))
     return result.scalars().all()
 
 
 @router.get("/teachers/{teacher_id}", response_model=TeacherResponse, tags=["Teachers"])
-async def get_teacher(teacher_id: str, db: AsyncSession = Depends(get_db)):
+async def get_teacher(teacher_id: str, db: AsyncSession = Depends(get_read_db)):
     """Buscar professor por ID"""
     result = await db.execute(select(Teacher).where(Teacher.id == uuid.UUID(teacher_id)))
     teacher = result.scalar_one_or_none()
@@ -93,18 +137,19 @@ async def create_class(class_data: ClassCreate, db: AsyncSession = Depends(get_d
     db.add(new_class)
     await db.commit()
     await db.refresh(new_class)
+    await invalidate(f"teacher:{new_class.teacher_id}", "overview")
     return new_class
 
 
 @router.get("/classes/", response_model=List[ClassResponse], tags=["Classes"])
-async def get_classes(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
+async def get_classes(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_read_db)):
     """Listar todas as turmas"""
     result = await db.execute(select(Class).offset(skip).limit(limit))
     return result.scalars().all()
 
 
 @router.get("/classes/{class_id}", response_model=ClassResponse, tags=["Classes"])
-async def get_class(class_id: str, db: AsyncSession = Depends(get_db)):
+async def get_class(class_id: str, db: AsyncSession = Depends(get_read_db)):
     """Buscar turma por ID"""
     result = await db.execute(select(Class).where(Class.id == uuid.UUID(class_id)))
     class_ = result.scalar_one_or_none()
@@ -120,6 +165,7 @@ async def update_class(class_id: str, class_update: ClassCreate, db: AsyncSessio
     class_ = result.scalar_one_or_none()
     if not class_:
         raise HTTPException(status_code=404, detail="Turma não encontrada")
+    old_teacher_id = str(class_.teacher_id)
     
     # Verificar se novo professor existe
     if class_update.teacher_id:
@@ -132,6 +178,12 @@ async def update_class(class_id: str, class_update: ClassCreate, db: AsyncSessio
     
     await db.commit()
     await db.refresh(class_)
+    new_teacher_id = str(class_.teacher_id)
+    await invalidate(
+        f"class:{class_id}",
+        f"teacher:{old_teacher_id}", f"teacher:{new_teacher_id}",
+        f"teacher_students:{old_teacher_id}", f"teacher_students:{new_teacher_id}"
+    )
     return class_
 
 
@@ -143,22 +195,37 @@ async def delete_class(class_id: str, db: AsyncSession = Depends(get_db)):
     if not class_:
         raise HTTPException(status_code=404, detail="Turma não encontrada")
     
+    # Alunos da turma saem em cascata: invalidar também as entradas de cada um
+    result = await db.execute(select(Student.id).where(Student.class_id == class_.id))
+    student_tags = [f"student:{sid}" for sid in result.scalars().all()]
+    teacher_id = str(class_.teacher_id)
+    
     await db.delete(class_)
     await db.commit()
+    await invalidate(
+        f"class:{class_id}", f"teacher:{teacher_id}", f"teacher_students:{teacher_id}",
+        "overview", *student_tags
+    )
     return None
 
 
 @router.get("/teachers/{teacher_id}/classes", response_model=List[ClassResponse], tags=["Teachers"])
-async def get_teacher_classes(teacher_id: str, db: AsyncSession = Depends(get_db)):
+async def get_teacher_classes(teacher_id: str, request: Request, db: AsyncSession = Depends(get_db)):
     """Buscar todas as turmas de um professor"""
-    result = await db.execute(select(Teacher).where(Teacher.id == uuid.UUID(teacher_id)))
-    teacher = result.scalar_one_or_none()
-    if not teacher:
-        raise HTTPException(status_code=404, detail="Professor não encontrado")
+    # Miss lê do primário (get_db): a réplica pode ainda não ter a última escrita
+    async def load():
+        result = await db.execute(select(Teacher).where(Teacher.id == uuid.UUID(teacher_id)))
+        teacher = result.scalar_one_or_none()
+        if not teacher:
+            raise HTTPException(status_code=404, detail="Professor não encontrado")
+        
+        # Buscar as turmas do professor
+        result = await db.execute(select(Class).where(Class.teacher_id == uuid.UUID(teacher_id)))
+        return [ClassResponse.model_validate(c) for c in result.scalars().all()]
     
-    # Buscar as turmas do professor
-    result = await db.execute(select(Class).where(Class.teacher_id == uuid.UUID(teacher_id)))
-    return result.scalars().all()
+    return await cached_json_response(
+        request, f"teacher_classes:{teacher_id}", [f"teacher:{teacher_id}"], load
+    )
 
 
 @router.put("/teachers/{teacher_id}", response_model=TeacherResponse, tags=["Teachers"])
@@ -180,6 +247,7 @@ async def update_teacher(teacher_id: str, teacher_update: TeacherCreate, db: Asy
     
     await db.commit()
     await db.refresh(teacher)
+    await invalidate(f"teacher:{teacher_id}")
     return teacher
 
 
@@ -191,8 +259,21 @@ async def delete_teacher(teacher_id: str, db: AsyncSession = Depends(get_db)):
     if not teacher:
         raise HTTPException(status_code=404, detail="Professor não encontrado")
     
+    # Turmas e alunos do professor saem em cascata
+    result = await db.execute(
+        select(Class.id, Student.id)
+        .outerjoin(Student, Student.class_id == Class.id)
+        .where(Class.teacher_id == teacher.id)
+    )
+    cascade_tags = set()
+    for class_uuid, student_uuid in result.all():
+        cascade_tags.add(f"class:{class_uuid}")
+        if student_uuid:
+            cascade_tags.add(f"student:{student_uuid}")
+    
     await db.delete(teacher)
     await db.commit()
+    await invalidate(f"teacher:{teacher_id}", f"teacher_students:{teacher_id}", "overview", *cascade_tags)
     return None
 
 
@@ -205,7 +286,8 @@ async def create_student(student: StudentCreate, db: AsyncSession = Depends(get_
     """Criar novo aluno"""
     # Verificar se turma existe
     result = await db.execute(select(Class).where(Class.id == uuid.UUID(student.class_id)))
-    if not result.scalar_one_or_none():
+    class_ = result.scalar_one_or_none()
+    if not class_:
         raise HTTPException(status_code=404, detail="Turma não encontrada")
     
     # Verificar se access_code já existe
@@ -221,30 +303,43 @@ async def create_student(student: StudentCreate, db: AsyncSession = Depends(get_
     
     new_student = Student(**student.model_dump())
     db.add(new_student)
+    await adjust_student_count(db, class_.id, +1)
     await db.commit()
     await db.refresh(new_student)
+    await invalidate(f"class:{class_.id}", f"teacher_students:{class_.teacher_id}", "overview")
     return new_student
 
 
 @router.get("/students/", response_model=List[StudentResponse], tags=["Students"])
-async def get_students(skip: int = 0, limit: int = 100, class_id: str = None, db: AsyncSession = Depends(get_db)):
-    """Listar todos os alunos"""
-    query = select(Student)
+async def get_students(
+    skip: int = 0,
+    limit: int = 100,
+    class_id: str = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Listar todos os alunos (fields=name,overall_average retorna só essas colunas + id)"""
+    query = select(*_student_projection(fields))
     if class_id:
         query = query.where(Student.class_id == uuid.UUID(class_id))
     
+    # Linhas Core (tuplas), sem hidratar objetos ORM
     result = await db.execute(query.offset(skip).limit(limit))
-    return result.scalars().all()
+    return json_rows_response(result.keys(), result)
 
 
 @router.get("/students/{student_id}", response_model=StudentResponse, tags=["Students"])
-async def get_student(student_id: str, db: AsyncSession = Depends(get_db)):
+async def get_student(student_id: str, request: Request, db: AsyncSession = Depends(get_db)):
     """Buscar aluno por ID"""
-    result = await db.execute(select(Student).where(Student.id == uuid.UUID(student_id)))
-    student = result.scalar_one_or_none()
-    if not student:
-        raise HTTPException(status_code=404, detail="Aluno não encontrado")
-    return student
+    # Miss lê do primário (get_db): a réplica pode ainda não ter a última escrita
+    async def load():
+        result = await db.execute(select(Student).where(Student.id == uuid.UUID(student_id)))
+        student = result.scalar_one_or_none()
+        if not student:
+            raise HTTPException(status_code=404, detail="Aluno não encontrado")
+        return StudentResponse.model_validate(student)
+    
+    return await cached_json_response(request, f"student:{student_id}", [f"student:{student_id}"], load)
 
 
 @router.put("/students/{student_id}", response_model=StudentResponse, tags=["Students"])
@@ -254,12 +349,28 @@ async def update_student(student_id: str, student_update: StudentCreate, db: Asy
     student = result.scalar_one_or_none()
     if not student:
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
+    old_class_id = student.class_id
     
     for key, value in student_update.model_dump(exclude_unset=True).items():
         setattr(student, key, value)
     
+    class_changed = str(student.class_id) != str(old_class_id)
+    if class_changed:
+        await adjust_student_count(db, old_class_id, -1)
+        await adjust_student_count(db, uuid.UUID(str(student.class_id)), +1)
+    
     await db.commit()
     await db.refresh(student)
+    
+    tags = [f"student:{student_id}", f"class:{old_class_id}"]
+    if class_changed:
+        # Mudou de turma: contagens das duas turmas (e professores) mudam
+        tags += [
+            f"class:{student.class_id}",
+            f"teacher_students:{await _class_teacher_id(db, old_class_id)}",
+            f"teacher_students:{await _class_teacher_id(db, student.class_id)}",
+        ]
+    await invalidate(*tags)
     return student
 
 
@@ -270,22 +381,39 @@ async def delete_student(student_id: str, db: AsyncSession = Depends(get_db)):
     student = result.scalar_one_or_none()
     if not student:
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
+    class_id = student.class_id
+    teacher_id = await _class_teacher_id(db, class_id)
     
     await db.delete(student)
+    await adjust_student_count(db, class_id, -1)
     await db.commit()
+    await invalidate(f"student:{student_id}", f"class:{class_id}", f"teacher_students:{teacher_id}", "overview")
     return None
 
 
 @router.get("/classes/{class_id}/students", response_model=List[StudentResponse], tags=["Classes"])
-async def get_class_students(class_id: str, db: AsyncSession = Depends(get_db)):
-    """Buscar todos os alunos de uma turma"""
-    result = await db.execute(select(Class).where(Class.id == uuid.UUID(class_id)))
-    class_ = result.scalar_one_or_none()
-    if not class_:
-        raise HTTPException(status_code=404, detail="Turma não encontrada")
+async def get_class_students(
+    class_id: str,
+    request: Request,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Buscar todos os alunos de uma turma (aceita fields= como em /students/)"""
+    columns = _student_projection(fields)
     
-    result = await db.execute(select(Student).where(Student.class_id == uuid.UUID(class_id)))
-    return result.scalars().all()
+    # Miss lê do primário (get_db): a réplica pode ainda não ter a última escrita
+    async def load():
+        result = await db.execute(select(Class.id).where(Class.id == uuid.UUID(class_id)))
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Turma não encontrada")
+        
+        result = await db.execute(select(*columns).where(Student.class_id == uuid.UUID(class_id)))
+        return rows_to_dicts(result.keys(), result)
+    
+    fields_key = ",".join(column.key for column in columns) if fields else "*"
+    return await cached_json_response(
+        request, f"class_students:{class_id}:{fields_key}", [f"class:{class_id}"], load
+    )
 
 
 # ============================================
@@ -490,165 +618,167 @@ async def get_class_students(class_id: str, db: AsyncSession = Depends(get_db)):
 # ============================================
 
 @router.get("/statistics/overview", tags=["Statistics"])
-async def get_overview_statistics(db: AsyncSession = Depends(get_db)):
+async def get_overview_statistics(request: Request, db: AsyncSession = Depends(get_analytics_db)):
     """Obter estatísticas gerais do sistema"""
-    from sqlalchemy import func as sql_func
+    async def load():
+        from sqlalchemy import func as sql_func
     
-    # Total de professores
-    result = await db.execute(select(sql_func.count(Teacher.id)))
-    total_teachers = result.scalar()
+        # Total de professores
+        result = await db.execute(select(sql_func.count(Teacher.id)))
+        total_teachers = result.scalar()
     
-    # Total de turmas
-    result = await db.execute(select(sql_func.count(Class.id)))
-    total_classes = result.scalar()
+        # Total de turmas
+        result = await db.execute(select(sql_func.count(Class.id)))
+        total_classes = result.scalar()
     
-    # Total de alunos
-    result = await db.execute(select(sql_func.count(Student.id)))
-    total_students = result.scalar()
+        # Total de alunos
+        result = await db.execute(select(sql_func.count(Student.id)))
+        total_students = result.scalar()
     
-    # Total de provas
-    result = await db.execute(select(sql_func.count(Exam.id)))
-    total_exams = result.scalar()
+        # Total de provas
+        result = await db.execute(select(sql_func.count(Exam.id)))
+        total_exams = result.scalar()
     
-    return {
-        "total_teachers": total_teachers,
-        "total_classes": total_classes,
-        "total_students": total_students,
-        "total_exams": total_exams,
-        "timestamp": datetime.now()
-    }
+        return {
+            "total_teachers": total_teachers,
+            "total_classes": total_classes,
+            "total_students": total_students,
+            "total_exams": total_exams,
+            "timestamp": datetime.now()
+        }
+    
+    return await cached_json_response(request, "statistics:overview", ["overview"], load, from_replica=True)
 
 
 @router.get("/statistics/classes/{class_id}", tags=["Statistics"])
-async def get_class_statistics(class_id: str, db: AsyncSession = Depends(get_db)):
+async def get_class_statistics(class_id: str, request: Request, db: AsyncSession = Depends(get_analytics_db)):
     """Obter estatísticas detalhadas de uma turma"""
-    from sqlalchemy import func as sql_func
+    async def load():
+        from sqlalchemy import func as sql_func
     
-    # Verificar se turma existe
-    result = await db.execute(select(Class).where(Class.id == uuid.UUID(class_id)))
-    class_ = result.scalar_one_or_none()
-    if not class_:
-        raise HTTPException(status_code=404, detail="Turma não encontrada")
+        # Verificar se turma existe
+        result = await db.execute(select(Class).where(Class.id == uuid.UUID(class_id)))
+        class_ = result.scalar_one_or_none()
+        if not class_:
+            raise HTTPException(status_code=404, detail="Turma não encontrada")
     
-    # Contar alunos
-    result = await db.execute(
-        select(sql_func.count(Student.id)).where(Student.class_id == uuid.UUID(class_id))
-    )
-    student_count = result.scalar()
+        # Contagem mantida incrementalmente em classes.student_count
+        student_count = class_.student_count or 0
     
-    # Estatísticas de gênero
-    result = await db.execute(
-        select(Student.gender, sql_func.count(Student.id))
-        .where(Student.class_id == uuid.UUID(class_id))
-        .group_by(Student.gender)
-    )
-    gender_stats = {row[0] or "Não informado": row[1] for row in result.all()}
+        # Estatísticas de gênero
+        result = await db.execute(
+            select(Student.gender, sql_func.count(Student.id))
+            .where(Student.class_id == uuid.UUID(class_id))
+            .group_by(Student.gender)
+        )
+        gender_stats = {row[0] or "Não informado": row[1] for row in result.all()}
     
-    # Média geral da turma
-    result = await db.execute(
-        select(sql_func.avg(Student.overall_average))
-        .where(Student.class_id == uuid.UUID(class_id))
-    )
-    class_average = result.scalar()
+        # Média geral da turma
+        result = await db.execute(
+            select(sql_func.avg(Student.overall_average))
+            .where(Student.class_id == uuid.UUID(class_id))
+        )
+        class_average = result.scalar()
     
-    # Média de frequência
-    result = await db.execute(
-        select(sql_func.avg(Student.attendance_percentage))
-        .where(Student.class_id == uuid.UUID(class_id))
-    )
-    attendance_avg = result.scalar()
+        # Média de frequência
+        result = await db.execute(
+            select(sql_func.avg(Student.attendance_percentage))
+            .where(Student.class_id == uuid.UUID(class_id))
+        )
+        attendance_avg = result.scalar()
     
-    return {
-        "class_id": class_id,
-        "class_name": class_.name,
-        "student_count": student_count,
-        "gender_distribution": gender_stats,
-        "class_average": float(class_average) if class_average else None,
-        "attendance_average": float(attendance_avg) if attendance_avg else None,
-        "timestamp": datetime.now()
-    }
+        return {
+            "class_id": class_id,
+            "class_name": class_.name,
+            "student_count": student_count,
+            "gender_distribution": gender_stats,
+            "class_average": float(class_average) if class_average else None,
+            "attendance_average": float(attendance_avg) if attendance_avg else None,
+            "timestamp": datetime.now()
+        }
+    
+    return await cached_json_response(request, f"statistics:class:{class_id}", [f"class:{class_id}"], load, from_replica=True)
 
 
 @router.get("/statistics/students/{student_id}", tags=["Statistics"])
-async def get_student_statistics(student_id: str, db: AsyncSession = Depends(get_db)):
+async def get_student_statistics(student_id: str, request: Request, db: AsyncSession = Depends(get_analytics_db)):
     """Obter estatísticas detalhadas de um aluno"""
-    from sqlalchemy import func as sql_func
+    async def load():
+        from sqlalchemy import func as sql_func
     
-    # Buscar aluno
-    result = await db.execute(select(Student).where(Student.id == uuid.UUID(student_id)))
-    student = result.scalar_one_or_none()
-    if not student:
-        raise HTTPException(status_code=404, detail="Aluno não encontrado")
+        # Buscar aluno
+        result = await db.execute(select(Student).where(Student.id == uuid.UUID(student_id)))
+        student = result.scalar_one_or_none()
+        if not student:
+            raise HTTPException(status_code=404, detail="Aluno não encontrado")
     
-    # Contar provas realizadas
-    result = await db.execute(
-        select(sql_func.count(StudentExam.id))
-        .where(StudentExam.student_id == uuid.UUID(student_id))
-    )
-    exams_taken = result.scalar()
+        # Contar provas realizadas
+        result = await db.execute(
+            select(sql_func.count(StudentExam.id))
+            .where(StudentExam.student_id == uuid.UUID(student_id))
+        )
+        exams_taken = result.scalar()
     
-    # Média das provas
-    result = await db.execute(
-        select(sql_func.avg(StudentExam.total_score))
-        .where(StudentExam.student_id == uuid.UUID(student_id))
-    )
-    exam_average = result.scalar()
+        # Média das provas
+        result = await db.execute(
+            select(sql_func.avg(StudentExam.total_score))
+            .where(StudentExam.student_id == uuid.UUID(student_id))
+        )
+        exam_average = result.scalar()
     
-    return {
-        "student_id": student_id,
-        "student_name": student.name,
-        "class_id": str(student.class_id),
-        "exams_taken": exams_taken,
-        "exam_average": float(exam_average) if exam_average else None,
-        "overall_average": float(student.overall_average) if student.overall_average else None,
-        "math_grade": float(student.math_grade) if student.math_grade else None,
-        "portuguese_grade": float(student.portuguese_grade) if student.portuguese_grade else None,
-        "attendance_percentage": float(student.attendance_percentage) if student.attendance_percentage else None,
-        "has_disability": student.has_disability,
-        "works_outside": student.works_outside,
-        "timestamp": datetime.now()
-    }
+        return {
+            "student_id": student_id,
+            "student_name": student.name,
+            "class_id": str(student.class_id),
+            "exams_taken": exams_taken,
+            "exam_average": float(exam_average) if exam_average else None,
+            "overall_average": float(student.overall_average) if student.overall_average else None,
+            "math_grade": float(student.math_grade) if student.math_grade else None,
+            "portuguese_grade": float(student.portuguese_grade) if student.portuguese_grade else None,
+            "attendance_percentage": float(student.attendance_percentage) if student.attendance_percentage else None,
+            "has_disability": student.has_disability,
+            "works_outside": student.works_outside,
+            "timestamp": datetime.now()
+        }
+    
+    return await cached_json_response(request, f"statistics:student:{student_id}", [f"student:{student_id}"], load, from_replica=True)
 
 
 @router.get("/teachers/{teacher_id}/statistics", tags=["Statistics"])
-async def get_teacher_statistics(teacher_id: str, db: AsyncSession = Depends(get_db)):
+async def get_teacher_statistics(teacher_id: str, request: Request, db: AsyncSession = Depends(get_analytics_db)):
     """Obter estatísticas de um professor"""
-    from sqlalchemy import func as sql_func
+    async def load():
+        from sqlalchemy import func as sql_func
     
-    # Verificar se professor existe
-    result = await db.execute(select(Teacher).where(Teacher.id == uuid.UUID(teacher_id)))
-    teacher = result.scalar_one_or_none()
-    if not teacher:
-        raise HTTPException(status_code=404, detail="Professor não encontrado")
+        # Verificar se professor existe
+        result = await db.execute(select(Teacher).where(Teacher.id == uuid.UUID(teacher_id)))
+        teacher = result.scalar_one_or_none()
+        if not teacher:
+            raise HTTPException(status_code=404, detail="Professor não encontrado")
     
-    # Contar turmas
-    result = await db.execute(
-        select(sql_func.count(Class.id)).where(Class.teacher_id == uuid.UUID(teacher_id))
-    )
-    total_classes = result.scalar()
+        # Contar turmas e alunos (soma dos student_count das turmas, sem varrer students)
+        result = await db.execute(
+            select(sql_func.count(Class.id), sql_func.coalesce(sql_func.sum(Class.student_count), 0))
+            .where(Class.teacher_id == uuid.UUID(teacher_id))
+        )
+        total_classes, total_students = result.one()
     
-    # Contar alunos (através das turmas)
-    result = await db.execute(
-        select(sql_func.count(Student.id))
-        .join(Class, Student.class_id == Class.id)
-        .where(Class.teacher_id == uuid.UUID(teacher_id))
-    )
-    total_students = result.scalar()
+        # Contar provas
+        result = await db.execute(
+            select(sql_func.count(Exam.id)).where(Exam.teacher_id == uuid.UUID(teacher_id))
+        )
+        total_exams = result.scalar()
     
-    # Contar provas
-    result = await db.execute(
-        select(sql_func.count(Exam.id)).where(Exam.teacher_id == uuid.UUID(teacher_id))
-    )
-    total_exams = result.scalar()
+        return {
+            "teacher_id": teacher_id,
+            "teacher_name": teacher.name,
+            "total_classes": total_classes,
+            "total_students": total_students,
+            "total_exams": total_exams,
+            "timestamp": datetime.now()
+        }
     
-    return {
-        "teacher_id": teacher_id,
-        "teacher_name": teacher.name,
-        "total_classes": total_classes,
-        "total_students": total_students,
-        "total_exams": total_exams,
-        "timestamp": datetime.now()
-    }
+    return await cached_json_response(request, f"statistics:teacher:{teacher_id}", [f"teacher:{teacher_id}", f"teacher_students:{teacher_id}"], load, from_replica=True)
 
 
 # ============================================
@@ -665,11 +795,28 @@ async def search_students(
     max_average: float = None,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Buscar alunos com filtros avançados"""
-    query = select(Student)
-    
+    """Buscar alunos com filtros avançados (aceita fields= como em /students/)"""
+    query = _filter_students(
+        select(*_student_projection(fields)),
+        name, class_id, has_disability, works_outside, min_average, max_average
+    )
+    result = await db.execute(query.offset(skip).limit(limit))
+    return json_rows_response(result.keys(), result)
+
+
+def _filter_students(
+    query,
+    name: str = None,
+    class_id: str = None,
+    has_disability: bool = None,
+    works_outside: bool = None,
+    min_average: float = None,
+    max_average: float = None
+):
+    """Filtros da busca de alunos (compartilhados com a exportação)"""
     if name:
         query = query.where(Student.name.ilike(f"%{name}%"))
     
@@ -688,8 +835,7 @@ async def search_students(
     if max_average is not None:
         query = query.where(Student.overall_average <= max_average)
     
-    result = await db.execute(query.offset(skip).limit(limit))
-    return result.scalars().all()
+    return query
 
 
 @router.get("/search/classes", response_model=List[ClassResponse], tags=["Search"])
@@ -701,7 +847,7 @@ async def search_classes(
     is_active: bool = None,
     skip: int = 0,
     limit: int = 100,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Buscar turmas com filtros"""
     query = select(Class)
@@ -725,6 +871,32 @@ async def search_classes(
     return result.scalars().all()
 
 
+# ============================================
+# EXPORT (Exportação em streaming)
+# ============================================
+
+@router.get("/export/students", tags=["Export"])
+async def export_students(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    name: str = None,
+    class_id: str = None,
+    has_disability: bool = None,
+    works_outside: bool = None,
+    min_average: float = None,
+    max_average: float = None,
+    fields: Optional[str] = None
+):
+    """
+    Exportar alunos (NDJSON ou CSV) com os mesmos filtros de /search/students.
+    As linhas vão do cursor do banco direto para a resposta, sem montar a lista em memória.
+    """
+    query = _filter_students(
+        select(*_student_projection(fields)),
+        name, class_id, has_disability, works_outside, min_average, max_average
+    )
+    return export_response(query, format, "students")
+
+
 # ============================================
 # BULK OPERATIONS (Operações em Lote)
 # ============================================
@@ -733,12 +905,16 @@ async def search_classes(
 async def create_students_bulk(students: List[StudentCreate], db: AsyncSession = Depends(get_db)):
     """Criar múltiplos alunos de uma vez"""
     created_students = []
+    touched_tags = {"overview"}
+    added_per_class = {}
     
     for student_data in students:
         # Verificar se turma existe
         result = await db.execute(select(Class).where(Class.id == uuid.UUID(student_data.class_id)))
-        if not result.scalar_one_or_none():
+        class_ = result.scalar_one_or_none()
+        if not class_:
             raise HTTPException(status_code=404, detail=f"Turma {student_data.class_id} não encontrada")
+        touched_tags.update({f"class:{class_.id}", f"teacher_students:{class_.teacher_id}"})
         
         # Verificar access_code único
         result = await db.execute(select(Student).where(Student.access_code == student_data.access_code))
@@ -748,26 +924,38 @@ async def create_students_bulk(students: List[StudentCreate], db: AsyncSession =
         new_student = Student(**student_data.model_dump())
         db.add(new_student)
         created_students.append(new_student)
+        added_per_class[class_.id] = added_per_class.get(class_.id, 0) + 1
     
+    for class_id, added in added_per_class.items():
+        await adjust_student_count(db, class_id, added)
     await db.commit()
     
     # Refresh todos os alunos criados
     for student in created_students:
         await db.refresh(student)
     
+    await invalidate(*touched_tags)
     return created_students
 
 
 @router.delete("/bulk/students", status_code=status.HTTP_204_NO_CONTENT, tags=["Bulk Operations"])
 async def delete_students_bulk(student_ids: List[str], db: AsyncSession = Depends(get_db)):
     """Deletar múltiplos alunos de uma vez"""
-    for student_id in student_ids:
+    touched_tags = {"overview"}
+    removed_per_class = {}
+    for student_id in dict.fromkeys(student_ids):
         result = await db.execute(select(Student).where(Student.id == uuid.UUID(student_id)))
         student = result.scalar_one_or_none()
         if student:
+            touched_tags.update({f"student:{student.id}", f"class:{student.class_id}"})
+            touched_tags.add(f"teacher_students:{await _class_teacher_id(db, student.class_id)}")
+            removed_per_class[student.class_id] = removed_per_class.get(student.class_id, 0) + 1
             await db.delete(student)
     
+    for class_id, removed in removed_per_class.items():
+        await adjust_student_count(db, class_id, -removed)
     await db.commit()
+    await invalidate(*touched_tags)
     return None
 
 
@@ -816,6 +1004,10 @@ async def upload_prova(file: UploadFile = File(...)):
 # CHAT (Sabiá Chatbot)
 # ============================================
 
+# MODO DEMO: "fake" responde com o LLM falso (src/fake_llm.py); "openai" usa a API real
+CHAT_MOCK_MODE = os.getenv("CHAT_LLM_PROVIDER", "fake").lower() == "fake"
+
+
 @router.post("/chat/", tags=["Chat"])
 async def chat_endpoint(request_data: dict):
     """
@@ -823,10 +1015,6 @@ async def chat_endpoint(request_data: dict):
     Recebe mensagens e retorna resposta em streaming no formato do AI SDK
     """
     try:
-        # MODO DEMO: Resposta mockada para qualquer mensagem
-        MOCK_MODE = True  # Altere para False para usar a API real
-        MOCK_RESPONSE = "Atualmente, 125 alunos estão na faixa de baixo desempenho (nota geral entre 0 e 4). Isso representa 69,4% do total de alunos da escola."
-        
         # Extrair dados da requisição
         messages = request_data.get('messages', [])
         model = request_data.get('model', 'gpt-4.1-2025-04-14')
@@ -840,22 +1028,25 @@ async def chat_endpoint(request_data: dict):
         
         # Função geradora para streaming no formato AI SDK
         async def generate_stream():
-            import asyncio
+            if CHAT_MOCK_MODE:
+                # MODO MOCK: LLM falso (latência, ritmo e erros configuráveis em FAKE_LLM_*)
+                from .fake_llm import fake_chat_stream
+                text_chunks = fake_chat_stream()
+                log_prefix = "[Backend MOCK]"
+            else:
+                # MODO REAL: Usar a API da OpenAI (OPENAI_BASE_URL aponta para outro servidor)
+                from .chat_service import generate_chat_response
+                text_chunks = generate_chat_response(messages, model)
+                log_prefix = "[Backend]"
             
-            if MOCK_MODE:
-                # MODO MOCK: Simular processamento e retornar resposta mockada
-                # Esperar 2 segundos antes de começar
-                await asyncio.sleep(2)
-                
-                # Dividir a resposta em chunks para simular streaming
-                chunk_size = 3  # Caracteres por chunk para streaming suave
-                chunk_count = 0
-                
-                for i in range(0, len(MOCK_RESPONSE), chunk_size):
+            chunk_count = 0
+            try:
+                # Gerar resposta com streaming
+                async for text_chunk in text_chunks:
                     chunk_count += 1
-                    text_chunk = MOCK_RESPONSE[i:i + chunk_size]
-                    
-                    # Formato do AI SDK data stream
+                    # Formato do AI SDK data stream: prefixo "0:" + JSON
+                    # O prefixo "0:" indica que é um chunk de texto da primeira mensagem
+                    # IMPORTANTE: usar ensure_ascii=False para suportar caracteres especiais
                     chunk_data = {
                         'type': 'text-delta',
                         'textDelta': text_chunk,
@@ -863,11 +1054,8 @@ async def chat_endpoint(request_data: dict):
                     chunk_json = json.dumps(chunk_data, ensure_ascii=False)
                     chunk_line = f"0:{chunk_json}\n"
                     yield chunk_line
-                    
-                    # Pequeno delay entre chunks para simular streaming real
-                    await asyncio.sleep(0.05)  # 50ms entre chunks
                 
-                print(f"[Backend MOCK] Total de chunks enviados: {chunk_count}")
+                print(f"{log_prefix} Total de chunks enviados: {chunk_count}")
                 
                 # Enviar mensagem de finalização
                 finish_data = {
@@ -876,49 +1064,20 @@ async def chat_endpoint(request_data: dict):
                 }
                 finish_json = json.dumps(finish_data, ensure_ascii=False)
                 yield f"d:{finish_json}\n"
-            else:
-                # MODO REAL: Usar a API da OpenAI
-                from .chat_service import generate_chat_response
-                
-                chunk_count = 0
-                try:
-                    # Gerar resposta com streaming
-                    async for text_chunk in generate_chat_response(messages, model):
-                        chunk_count += 1
-                        # Formato do AI SDK data stream: prefixo "0:" + JSON
-                        # O prefixo "0:" indica que é um chunk de texto da primeira mensagem
-                        # IMPORTANTE: usar ensure_ascii=False para suportar caracteres especiais
-                        chunk_data = {
-                            'type': 'text-delta',
-                            'textDelta': text_chunk,
-                        }
-                        chunk_json = json.dumps(chunk_data, ensure_ascii=False)
-                        chunk_line = f"0:{chunk_json}\n"
-                        yield chunk_line
-                    
-                    print(f"[Backend] Total de chunks enviados: {chunk_count}")
-                    
-                    # Enviar mensagem de finalização
-                    finish_data = {
-                        'type': 'finish',
-                        'finishReason': 'stop',
-                    }
-                    finish_json = json.dumps(finish_data, ensure_ascii=False)
-                    yield f"d:{finish_json}\n"
-                except ValueError as e:
-                    # Erro de configuração
-                    error_data = {
-                        'type': 'error',
-                        'error': str(e)
-                    }
-                    yield f"e:{json.dumps(error_data)}\n"
-                except Exception as e:
-                    # Erro genérico
-                    error_data = {
-                        'type': 'error',
-                        'error': f'Erro ao gerar resposta: {str(e)}'
-                    }
-                    yield f"e:{json.dumps(error_data)}\n"
+            except ValueError as e:
+                # Erro de configuração
+                error_data = {
+                    'type': 'error',
+                    'error': str(e)
+                }
+                yield f"e:{json.dumps(error_data)}\n"
+            except Exception as e:
+                # Erro genérico
+                error_data = {
+                    'type': 'error',
+                    'error': f'Erro ao gerar resposta: {str(e)}'
+                }
+                yield f"e:{json.dumps(error_data)}\n"
         
         return StreamingResponse(
             generate_stream(),
@@ -4,15 +4,24 @@ Rotas para o dashboard com dados socioeconômicos e clustering (Async)
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_
-from typing import List, Optional
+from sqlalchemy import select, func, and_, or_, distinct, text
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
+from typing import Any, List, Optional, Union
+import sys
+import time
 import uuid
 
-from .database import get_db
+from .database import get_db, get_read_db, get_analytics_db
+from .aggregates import aluno_contribution, apply_turma_delta, move_aluno_contribution
+from .serialization import export_response
+from .grade_trends import delete_notas, notas_ausentes_of_aluno, notas_of_aluno, upsert_notas
+from .materialized_views import (
+    mv_estatisticas_escola, mv_estatisticas_turma, mv_estatisticas_cluster, refreshed_at, staleness
+)
 from .models_dashboard import (
     # Models
     Escola, Turma, Aluno, ClusterGlobal, ClusterTurma,
-    DistribuicaoFaixa, FatorCritico, AlunoRisco,
+    DistribuicaoFaixa, FatorCritico, AlunoRisco, TendenciaNota,
     RelatorioGeral, PlanoAcao, Metadata
 )
 
@@ -52,8 +61,6 @@ class TurmaBase(BaseModel):
     serie: Optional[str] = None
     ano_letivo: Optional[int] = None
     turno: Optional[str] = None
-    total_alunos: int = 0
-    media_geral: Optional[float] = None
     is_active: bool = True
 
 
@@ -64,6 +71,9 @@ class TurmaCreate(TurmaBase):
 class TurmaResponse(TurmaBase):
     id: str
     escola_id: str
+    # Agregados mantidos por aggregates.py a cada escrita de aluno: só leitura
+    total_alunos: int = 0
+    media_geral: Optional[float] = None
     created_at: datetime
     
     model_config = ConfigDict(from_attributes=True)
@@ -150,6 +160,14 @@ class PlanoAcaoResponse(PlanoAcaoBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class CohortQuery(BaseModel):
+    escola_id: str
+    # Ex: {"and": ["trabalho", "sem_internet", "deslocamento_longo", {"turma": "2B"}]}
+    query: Union[str, dict[str, Any]]
+    incluir_ids: bool = False
+    limite_ids: int = Field(1000, ge=1, le=100000)
+
+
 # ============================================
 # ESCOLAS
 # ============================================
@@ -165,14 +183,14 @@ async def create_escola(escola: EscolaCreate, db: AsyncSession = Depends(get_db)
 
 
 @router.get("/escolas/", response_model=List[EscolaResponse])
-async def get_escolas(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
+async def get_escolas(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_read_db)):
     """Listar todas as escolas"""
     result = await db.execute(select(Escola).offset(skip).limit(limit))
     return result.scalars().all()
 
 
 @router.get("/escolas/{escola_id}", response_model=EscolaResponse)
-async def get_escola(escola_id: str, db: AsyncSession = Depends(get_db)):
+async def get_escola(escola_id: str, db: AsyncSession = Depends(get_read_db)):
     """Buscar escola por ID"""
     result = await db.execute(select(Escola).where(Escola.id == uuid.UUID(escola_id)))
     escola = result.scalar_one_or_none()
@@ -235,7 +253,7 @@ async def get_turmas(
     limit: int = 100, 
     escola_id: Optional[str] = None,
     is_active: Optional[bool] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Listar todas as turmas"""
     query = select(Turma)
@@ -249,7 +267,7 @@ async def get_turmas(
 
 
 @router.get("/turmas/{turma_id}", response_model=TurmaResponse)
-async def get_turma(turma_id: str, db: AsyncSession = Depends(get_db)):
+async def get_turma(turma_id: str, db: AsyncSession = Depends(get_read_db)):
     """Buscar turma por ID"""
     result = await db.execute(select(Turma).where(Turma.id == uuid.UUID(turma_id)))
     turma = result.scalar_one_or_none()
@@ -291,6 +309,16 @@ async def delete_turma(turma_id: str, db: AsyncSession = Depends(get_db)):
 # ALUNOS
 # ============================================
 
+def _invalidate_cohort_index(escola_id: uuid.UUID):
+    """
+    Descarta o índice de coortes da escola. src/cohort_index.py (numpy) só é
+    importado pela rota de coortes: se ainda não foi, não há índice em cache.
+    """
+    cohort_index = sys.modules.get(f"{__package__}.cohort_index")
+    if cohort_index is not None:
+        cohort_index.invalidate_cohort_index(escola_id)
+
+
 @router.post("/alunos/", response_model=AlunoResponse, status_code=status.HTTP_201_CREATED)
 async def create_aluno(aluno: AlunoCreate, db: AsyncSession = Depends(get_db)):
     """Criar novo aluno"""
@@ -312,7 +340,12 @@ async def create_aluno(aluno: AlunoCreate, db: AsyncSession = Depends(get_db)):
     
     new_aluno = Aluno(**aluno.model_dump())
     db.add(new_aluno)
+    # Agregados da turma e notas em formato longo no mesmo commit do insert
+    await apply_turma_delta(db, uuid.UUID(aluno.turma_id), aluno_contribution(new_aluno))
+    await db.flush()
+    await upsert_notas(db, notas_of_aluno(new_aluno))
     await db.commit()
+    _invalidate_cohort_index(uuid.UUID(aluno.escola_id))
     await db.refresh(new_aluno)
     return new_aluno
 
@@ -324,7 +357,7 @@ async def get_alunos(
     turma_id: Optional[str] = None,
     escola_id: Optional[str] = None,
     cluster_id: Optional[int] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Listar todos os alunos"""
     query = select(Aluno)
@@ -339,8 +372,30 @@ async def get_alunos(
     return result.scalars().all()
 
 
+@router.get("/export/alunos")
+async def export_alunos(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    turma_id: Optional[str] = None,
+    escola_id: Optional[str] = None,
+    cluster_id: Optional[int] = None
+):
+    """
+    Exportar alunos (NDJSON ou CSV) com os mesmos filtros de /alunos/.
+    Lido por cursor no servidor: memória constante qualquer que seja o tamanho da escola.
+    """
+    query = select(*Aluno.__table__.columns)
+    if turma_id:
+        query = query.where(Aluno.turma_id == uuid.UUID(turma_id))
+    if escola_id:
+        query = query.where(Aluno.escola_id == uuid.UUID(escola_id))
+    if cluster_id is not None:
+        query = query.where(Aluno.cluster_id == cluster_id)
+    
+    return export_response(query, format, "alunos")
+
+
 @router.get("/alunos/{aluno_id}", response_model=AlunoResponse)
-async def get_aluno(aluno_id: int, db: AsyncSession = Depends(get_db)):
+async def get_aluno(aluno_id: int, db: AsyncSession = Depends(get_read_db)):
     """Buscar aluno por ID"""
     result = await db.execute(select(Aluno).where(Aluno.id == aluno_id))
     aluno = result.scalar_one_or_none()
@@ -356,11 +411,22 @@ async def update_aluno(aluno_id: int, aluno_update: AlunoCreate, db: AsyncSessio
     aluno = result.scalar_one_or_none()
     if not aluno:
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
+    old_turma_id = aluno.turma_id
+    old_escola_id = aluno.escola_id
+    old_contribution = aluno_contribution(aluno)
     
     for key, value in aluno_update.model_dump(exclude_unset=True).items():
         setattr(aluno, key, value)
     
+    await move_aluno_contribution(
+        db, old_turma_id, old_contribution, uuid.UUID(str(aluno.turma_id)), aluno_contribution(aluno)
+    )
+    await upsert_notas(db, notas_of_aluno(aluno))
+    # Nota apagada no PUT: some de notas_bimestrais e a tendência é refeita
+    await delete_notas(db, notas_ausentes_of_aluno(aluno))
     await db.commit()
+    _invalidate_cohort_index(old_escola_id)
+    _invalidate_cohort_index(uuid.UUID(str(aluno.escola_id)))
     await db.refresh(aluno)
     return aluno
 
@@ -373,8 +439,11 @@ async def delete_aluno(aluno_id: int, db: AsyncSession = Depends(get_db)):
     if not aluno:
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
     
+    await apply_turma_delta(db, aluno.turma_id, aluno_contribution(aluno), sign=-1)
+    escola_id = aluno.escola_id
     await db.delete(aluno)
     await db.commit()
+    _invalidate_cohort_index(escola_id)
     return None
 
 
@@ -383,14 +452,14 @@ async def delete_aluno(aluno_id: int, db: AsyncSession = Depends(get_db)):
 # ============================================
 
 @router.get("/clusters-globais/")
-async def get_clusters_globais(db: AsyncSession = Depends(get_db)):
+async def get_clusters_globais(db: AsyncSession = Depends(get_read_db)):
     """Listar todos os clusters globais"""
     result = await db.execute(select(ClusterGlobal))
     return result.scalars().all()
 
 
 @router.get("/clusters-globais/{cluster_id}")
-async def get_cluster_global(cluster_id: int, db: AsyncSession = Depends(get_db)):
+async def get_cluster_global(cluster_id: int, db: AsyncSession = Depends(get_read_db)):
     """Buscar cluster global por ID"""
     result = await db.execute(select(ClusterGlobal).where(ClusterGlobal.cluster_id == cluster_id))
     cluster = result.scalar_one_or_none()
@@ -404,7 +473,7 @@ async def get_cluster_global(cluster_id: int, db: AsyncSession = Depends(get_db)
 # ============================================
 
 @router.get("/turmas/{turma_id}/clusters")
-async def get_clusters_turma(turma_id: str, db: AsyncSession = Depends(get_db)):
+async def get_clusters_turma(turma_id: str, db: AsyncSession = Depends(get_read_db)):
     """Buscar clusters de uma turma específica"""
     result = await db.execute(select(ClusterTurma).where(ClusterTurma.turma_id == uuid.UUID(turma_id)))
     return result.scalars().all()
@@ -418,7 +487,7 @@ async def get_clusters_turma(turma_id: str, db: AsyncSession = Depends(get_db)):
 async def get_distribuicao_faixas(
     turma_id: Optional[str] = None,
     is_global: Optional[bool] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Buscar distribuição de alunos por faixas de desempenho"""
     query = select(DistribuicaoFaixa)
@@ -439,7 +508,7 @@ async def get_distribuicao_faixas(
 async def get_fatores_criticos(
     turma_id: Optional[str] = None,
     is_global: Optional[bool] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Buscar fatores críticos que afetam os alunos"""
     query = select(FatorCritico)
@@ -459,7 +528,7 @@ async def get_fatores_criticos(
 @router.get("/alunos-risco/")
 async def get_alunos_risco(
     nivel_risco: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Buscar alunos em situação de risco"""
     query = select(AlunoRisco)
@@ -471,12 +540,56 @@ async def get_alunos_risco(
 
 
 @router.get("/alunos/{aluno_id}/risco")
-async def get_aluno_risco(aluno_id: int, db: AsyncSession = Depends(get_db)):
+async def get_aluno_risco(aluno_id: int, db: AsyncSession = Depends(get_read_db)):
     """Buscar informações de risco de um aluno específico"""
     result = await db.execute(select(AlunoRisco).where(AlunoRisco.aluno_id == aluno_id))
     return result.scalars().all()
 
 
+# ============================================
+# TENDÊNCIAS DE NOTAS (pré-calculadas por src/grade_trends.py)
+# ============================================
+
+@router.get("/tendencias-notas/")
+async def get_tendencias_notas(
+    escola_id: Optional[str] = None,
+    turma_id: Optional[str] = None,
+    disciplina: Optional[str] = None,
+    somente_alertas: bool = True,
+    skip: int = 0,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Listar tendências das notas bimestrais (maiores quedas primeiro)"""
+    query = (
+        select(*TendenciaNota.__table__.columns, Aluno.nome_aluno, Aluno.turma_id, Aluno.turma_nome)
+        .join(Aluno, Aluno.id == TendenciaNota.aluno_id)
+    )
+    if somente_alertas:
+        query = query.where(TendenciaNota.alerta_queda)
+    if disciplina:
+        query = query.where(TendenciaNota.disciplina == disciplina)
+    if turma_id:
+        query = query.where(Aluno.turma_id == uuid.UUID(turma_id))
+    if escola_id:
+        query = query.where(Aluno.escola_id == uuid.UUID(escola_id))
+    
+    result = await db.execute(
+        query.order_by(TendenciaNota.inclinacao.asc().nulls_last(), TendenciaNota.aluno_id)
+        .offset(skip).limit(limit)
+    )
+    return result.mappings().all()
+
+
+@router.get("/alunos/{aluno_id}/tendencias")
+async def get_aluno_tendencias(aluno_id: int, db: AsyncSession = Depends(get_read_db)):
+    """Buscar as tendências de notas de um aluno (uma por disciplina)"""
+    result = await db.execute(
+        select(TendenciaNota).where(TendenciaNota.aluno_id == aluno_id).order_by(TendenciaNota.disciplina)
+    )
+    return result.scalars().all()
+
+
 # ============================================
 # RELATÓRIOS GERAIS
 # ============================================
@@ -485,7 +598,7 @@ async def get_aluno_risco(aluno_id: int, db: AsyncSession = Depends(get_db)):
 async def get_relatorios(
     tipo_relatorio: Optional[str] = None,
     turma_id: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Buscar relatórios e análises gerais"""
     query = select(RelatorioGeral)
@@ -499,7 +612,7 @@ async def get_relatorios(
 
 
 @router.get("/relatorios/{relatorio_id}")
-async def get_relatorio(relatorio_id: str, db: AsyncSession = Depends(get_db)):
+async def get_relatorio(relatorio_id: str, db: AsyncSession = Depends(get_read_db)):
     """Buscar relatório específico por ID"""
     result = await db.execute(select(RelatorioGeral).where(RelatorioGeral.id == uuid.UUID(relatorio_id)))
     relatorio = result.scalar_one_or_none()
@@ -534,7 +647,7 @@ async def get_planos_acao(
     tipo: Optional[str] = None,
     status: Optional[str] = None,
     is_global: Optional[bool] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Listar todos os planos de ação"""
     query = select(PlanoAcao)
@@ -552,7 +665,7 @@ async def get_planos_acao(
 
 
 @router.get("/planos-acao/{plano_id}", response_model=PlanoAcaoResponse)
-async def get_plano_acao(plano_id: str, db: AsyncSession = Depends(get_db)):
+async def get_plano_acao(plano_id: str, db: AsyncSession = Depends(get_read_db)):
     """Buscar plano de ação por ID"""
     result = await db.execute(select(PlanoAcao).where(PlanoAcao.id == uuid.UUID(plano_id)))
     plano = result.scalar_one_or_none()
@@ -590,84 +703,209 @@ async def delete_plano_acao(plano_id: str, db: AsyncSession = Depends(get_db)):
     return None
 
 
+# ============================================
+# OVERVIEW DA TURMA (uma query)
+# ============================================
+
+# Somas internas dos agregados incrementais (aggregates.py), fora da resposta
+TURMA_SOMAS = (
+    "n_media_geral", "soma_media_geral", "soma_quadrados_media_geral",
+    "n_trabalha", "n_renda", "soma_renda", "n_pretos_pardos"
+)
+
+
+def _jsonb_rows(model, condition, order_by):
+    """Linhas de `model` como array JSON, montado no Postgres (subquery correlacionada)"""
+    return (
+        select(func.coalesce(
+            func.jsonb_agg(aggregate_order_by(func.to_jsonb(model.__table__.table_valued()), order_by)),
+            text("'[]'::jsonb"),
+            type_=JSONB
+        ))
+        .where(condition)
+        .scalar_subquery()
+    )
+
+
+@router.get("/turmas/{turma_id}/overview")
+async def get_turma_overview(turma_id: str, db: AsyncSession = Depends(get_read_db)):
+    """
+    Turma + clusters + distribuição por faixas + fatores críticos + contagem de
+    alunos em risco, numa única query (substitui 5 chamadas do frontend)
+    """
+    risco = (
+        select(func.jsonb_build_object(
+            "total", func.count(distinct(AlunoRisco.aluno_id)),
+            "alto", func.count(distinct(AlunoRisco.aluno_id)).filter(AlunoRisco.nivel_risco == "Alto"),
+            "medio", func.count(distinct(AlunoRisco.aluno_id)).filter(AlunoRisco.nivel_risco == "Médio"),
+            "baixo", func.count(distinct(AlunoRisco.aluno_id)).filter(AlunoRisco.nivel_risco == "Baixo"),
+            type_=JSONB
+        ))
+        .join(Aluno, Aluno.id == AlunoRisco.aluno_id)
+        .where(Aluno.turma_id == Turma.id)
+        .scalar_subquery()
+    )
+    query = select(
+        func.to_jsonb(Turma.__table__.table_valued(), type_=JSONB),
+        _jsonb_rows(ClusterTurma, ClusterTurma.turma_id == Turma.id, ClusterTurma.cluster_id),
+        _jsonb_rows(DistribuicaoFaixa, DistribuicaoFaixa.turma_id == Turma.id, DistribuicaoFaixa.nota_min.nulls_last()),
+        _jsonb_rows(FatorCritico, FatorCritico.turma_id == Turma.id, FatorCritico.total_alunos_afetados.desc()),
+        risco
+    ).where(Turma.id == uuid.UUID(turma_id))
+
+    result = await db.execute(query)
+    row = result.one_or_none()
+    if not row:
+        raise HTTPException(status_code=404, detail="Turma não encontrada")
+
+    turma, clusters, faixas, fatores, alunos_risco = row
+    for coluna in TURMA_SOMAS:
+        turma.pop(coluna, None)
+    return {
+        "turma": turma,
+        "clusters": clusters,
+        "distribuicao_faixas": faixas,
+        "fatores_criticos": fatores,
+        "alunos_risco": alunos_risco
+    }
+
+
 # ============================================
 # ESTATÍSTICAS E ANALYTICS
 # ============================================
 
 @router.get("/estatisticas/geral")
-async def get_estatisticas_gerais(db: AsyncSession = Depends(get_db)):
-    """Obter estatísticas gerais do sistema"""
-    # Total de alunos
-    result = await db.execute(select(func.count(Aluno.id)))
-    total_alunos = result.scalar()
-    
-    # Total de turmas
-    result = await db.execute(select(func.count(Turma.id)))
-    total_turmas = result.scalar()
-    
-    # Total de escolas
-    result = await db.execute(select(func.count(Escola.id)))
-    total_escolas = result.scalar()
-    
-    # Média geral de notas
-    result = await db.execute(select(func.avg(Aluno.media_geral)))
-    media_geral = result.scalar()
-    
-    # Alunos em risco
+async def get_estatisticas_gerais(db: AsyncSession = Depends(get_analytics_db)):
+    """Obter estatísticas gerais do sistema (materialized view por escola)"""
+    escola = mv_estatisticas_escola.c
     result = await db.execute(
-        select(func.count(AlunoRisco.id)).where(AlunoRisco.nivel_risco == "Alto")
+        select(
+            func.coalesce(func.sum(escola.total_alunos), 0),
+            func.coalesce(func.sum(escola.total_turmas), 0),
+            func.count(),
+            func.sum(escola.soma_media_geral) / func.nullif(func.sum(escola.n_media_geral), 0),
+            func.coalesce(func.sum(escola.alunos_risco_alto), 0),
+            refreshed_at("mv_estatisticas_escola")
+        ).select_from(mv_estatisticas_escola)
     )
-    alunos_risco_alto = result.scalar()
+    total_alunos, total_turmas, total_escolas, media_geral, alunos_risco_alto, atualizado_em = result.one()
     
     return {
         "total_alunos": total_alunos,
         "total_turmas": total_turmas,
         "total_escolas": total_escolas,
         "media_geral": float(media_geral) if media_geral else None,
-        "alunos_risco_alto": alunos_risco_alto
+        "alunos_risco_alto": alunos_risco_alto,
+        **staleness(atualizado_em)
     }
 
 
-@router.get("/estatisticas/turma/{turma_id}")
-async def get_estatisticas_turma(turma_id: str, db: AsyncSession = Depends(get_db)):
-    """Obter estatísticas de uma turma específica"""
-    # Verificar se turma existe
-    result = await db.execute(select(Turma).where(Turma.id == uuid.UUID(turma_id)))
-    turma = result.scalar_one_or_none()
-    if not turma:
-        raise HTTPException(status_code=404, detail="Turma não encontrada")
-    
-    # Total de alunos na turma
-    result = await db.execute(
-        select(func.count(Aluno.id)).where(Aluno.turma_id == uuid.UUID(turma_id))
-    )
-    total_alunos = result.scalar()
-    
-    # Média da turma
+@router.get("/estatisticas/escola/{escola_id}")
+async def get_estatisticas_escola(escola_id: str, db: AsyncSession = Depends(get_analytics_db)):
+    """Obter estatísticas de uma escola (materialized view)"""
+    escola = mv_estatisticas_escola.c
     result = await db.execute(
-        select(func.avg(Aluno.media_geral)).where(Aluno.turma_id == uuid.UUID(turma_id))
+        select(mv_estatisticas_escola, refreshed_at("mv_estatisticas_escola").label("atualizado_em"))
+        .where(escola.escola_id == uuid.UUID(escola_id))
     )
-    media_turma = result.scalar()
+    row = result.mappings().one_or_none()
+    if not row:
+        # Escola criada depois do último refresh ainda não está na view
+        result = await db.execute(select(Escola.id).where(Escola.id == uuid.UUID(escola_id)))
+        if not result.scalar_one_or_none():
+            raise HTTPException(status_code=404, detail="Escola não encontrada")
+        return {"escola_id": escola_id, "total_alunos": 0, "total_turmas": 0, **staleness(None)}
     
-    # Alunos que trabalham
+    stats = {key: value for key, value in row.items() if key not in ("n_media_geral", "soma_media_geral", "atualizado_em")}
+    stats["escola_id"] = escola_id
+    return {**stats, **staleness(row["atualizado_em"])}
+
+
+@router.get("/estatisticas/turma/{turma_id}")
+async def get_estatisticas_turma(turma_id: str, db: AsyncSession = Depends(get_analytics_db)):
+    """Obter estatísticas de uma turma específica (materialized view)"""
+    stats = mv_estatisticas_turma.c
+    # LEFT JOIN: turma criada depois do último refresh ainda responde (zerada)
     result = await db.execute(
-        select(func.count(Aluno.id)).where(
-            and_(
-                Aluno.turma_id == uuid.UUID(turma_id),
-                Aluno.trabalha_fora == "Sim"
-            )
+        select(
+            Turma.nome, stats.total_alunos, stats.media_geral, stats.desvio_padrao,
+            stats.nota_minima, stats.nota_maxima, stats.n_trabalha, stats.pct_trabalha,
+            stats.renda_media, stats.pct_pretos_pardos, stats.alunos_risco_alto,
+            refreshed_at("mv_estatisticas_turma")
         )
+        .select_from(Turma)
+        .outerjoin(mv_estatisticas_turma, stats.turma_id == Turma.id)
+        .where(Turma.id == uuid.UUID(turma_id))
     )
-    alunos_trabalham = result.scalar()
+    row = result.one_or_none()
+    if not row:
+        raise HTTPException(status_code=404, detail="Turma não encontrada")
     
+    (nome, total_alunos, media_geral, desvio_padrao, nota_minima, nota_maxima,
+     n_trabalha, pct_trabalha, renda_media, pct_pretos_pardos, alunos_risco_alto, atualizado_em) = row
     return {
         "turma_id": turma_id,
-        "turma_nome": turma.nome,
-        "total_alunos": total_alunos,
-        "media_turma": float(media_turma) if media_turma else None,
-        "alunos_trabalham": alunos_trabalham,
-        "percentual_trabalham": (alunos_trabalham / total_alunos * 100) if total_alunos > 0 else 0
+        "turma_nome": nome,
+        "total_alunos": total_alunos or 0,
+        "media_turma": float(media_geral) if media_geral else None,
+        "desvio_padrao": float(desvio_padrao) if desvio_padrao is not None else None,
+        "nota_minima": nota_minima,
+        "nota_maxima": nota_maxima,
+        "alunos_trabalham": n_trabalha or 0,
+        "percentual_trabalham": pct_trabalha or 0,
+        "renda_media": renda_media,
+        "percentual_pretos_pardos": pct_pretos_pardos or 0,
+        "alunos_risco_alto": alunos_risco_alto or 0,
+        **staleness(atualizado_em)
+    }
+
+
+@router.get("/estatisticas/clusters")
+async def get_estatisticas_clusters(db: AsyncSession = Depends(get_analytics_db)):
+    """Obter características de cada cluster global calculadas sobre os alunos (materialized view)"""
+    result = await db.execute(
+        select(mv_estatisticas_cluster, refreshed_at("mv_estatisticas_cluster").label("atualizado_em"))
+        .order_by(mv_estatisticas_cluster.c.cluster_id)
+    )
+    rows = result.mappings().all()
+    clusters = [{key: value for key, value in row.items() if key != "atualizado_em"} for row in rows]
+    return {"clusters": clusters, **staleness(rows[0]["atualizado_em"] if rows else None)}
+
+
+# ============================================
+# COORTES (índice em bitmap por escola)
+# ============================================
+
+@router.post("/cohorts/query")
+async def query_cohort(cohort: CohortQuery, db: AsyncSession = Depends(get_analytics_db)):
+    """
+    Contar (e opcionalmente listar) os alunos de uma escola que satisfazem uma
+    combinação AND/OR/NOT de fatores, cor/raça e turma (ver src/cohort_index.py)
+    """
+    from .cohort_index import get_cohort_index
+
+    escola_id = uuid.UUID(cohort.escola_id)
+    index = await get_cohort_index(db, escola_id)
+    if not index.size:
+        result = await db.execute(select(Escola.id).where(Escola.id == escola_id))
+        if not result.scalar_one_or_none():
+            raise HTTPException(status_code=404, detail="Escola não encontrada")
+    
+    started = time.perf_counter()
+    try:
+        bits = index.evaluate(cohort.query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response = {
+        "escola_id": cohort.escola_id,
+        "total_alunos": index.size,
+        "total": index.count(bits),
     }
+    if cohort.incluir_ids:
+        response["aluno_ids"] = index.ids(bits, cohort.limite_ids)
+    response["tempo_us"] = round((time.perf_counter() - started) * 1_000_000, 1)
+    response["indice_construido_em"] = index.built_at.isoformat()
+    return response
 
 
 # ============================================
@@ -677,7 +915,7 @@ async def get_estatisticas_turma(turma_id: str, db: AsyncSession = Depends(get_d
 @router.get("/metadata/")
 async def get_metadata(
     tipo: Optional[str] = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Buscar metadados das análises"""
     query = select(Metadata)
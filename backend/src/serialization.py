@@ -0,0 +1,116 @@
+"""
+Serialização JSON rápida para listagens somente leitura
+Converte direto linhas Core (dicts/tuplas) sem passar por modelos Pydantic,
+gerando a mesma saída que o response_model geraria (UUID e Decimal como
+string, datas em ISO 8601). Também gera NDJSON/CSV para exportações em streaming.
+"""
+import csv
+import io
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Iterable, List, Sequence
+
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+
+def json_default(value: Any) -> Any:
+    """Tipos que o json padrão não conhece"""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        text = value.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def dumps_json(payload: Any) -> bytes:
+    """Mesmo formato compacto do JSONResponse do FastAPI"""
+    return json.dumps(
+        payload, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=json_default
+    ).encode("utf-8")
+
+
+def rows_to_dicts(keys: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[dict]:
+    """Linhas Core (tuplas) -> dicts, sem hidratar objetos ORM"""
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def json_rows_response(keys: Sequence[str], rows: Iterable[Sequence[Any]]) -> Response:
+    return Response(content=dumps_json(rows_to_dicts(keys, rows)), media_type="application/json")
+
+
+# =========================
+# Exportação em streaming (NDJSON / CSV)
+# =========================
+
+# Linhas buscadas por ida ao cursor do servidor
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date, uuid.UUID, Decimal)):
+        return json_default(value)
+    return value
+
+
+def encode_rows(keys: Sequence[str], rows: Iterable[Sequence[Any]], export_format: str) -> bytes:
+    """Um lote de linhas já no formato de saída"""
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        return buffer.getvalue().encode("utf-8")
+    return b"".join(dumps_json(dict(zip(keys, row))) + b"\n" for row in rows)
+
+
+async def stream_rows(keys: Sequence[str], partitions: AsyncIterator[Sequence[Sequence[Any]]], export_format: str):
+    """
+    Gera o corpo da exportação lote a lote: só um lote (partition do cursor)
+    fica em memória por vez, independente do tamanho da tabela
+    """
+    if export_format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(keys)
+        yield buffer.getvalue().encode("utf-8")
+    async for rows in partitions:
+        yield encode_rows(keys, rows, export_format)
+
+
+def export_response(query, export_format: str, filename: str) -> StreamingResponse:
+    """
+    StreamingResponse que lê `query` por um cursor no servidor (AsyncSession.stream)
+    com sessão própria do pool de leitura, aberta só durante o envio
+    """
+    try:
+        from .database import read_session_scope
+    except ImportError:
+        from database import read_session_scope
+
+    async def body():
+        async with read_session_scope() as db:
+            result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            async for chunk in stream_rows(list(result.keys()), result.partitions(), export_format):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
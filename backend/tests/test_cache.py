@@ -0,0 +1,331 @@
+"""Cache de respostas: backends, ETag/304, guarda do epoch, vários workers e réplica"""
+import asyncio
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import src.cache as cache
+from src.database import get_db, get_read_db
+from src.main import app
+
+
+def _request(*headers) -> Request:
+    return Request({"type": "http", "headers": [(name.encode(), value.encode()) for name, value in headers]})
+
+
+@pytest.fixture
+def use_cache(monkeypatch):
+    """Troca o cache do processo (get_response_cache) pelo backend do teste"""
+    def install(backend):
+        monkeypatch.setattr(cache, "_cache", backend)
+        return backend
+    return install
+
+
+# =========================
+# Backends
+# =========================
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return cache.SQLiteCache(tmp_path / "cache.sqlite3")
+    return cache.MemoryCache()
+
+
+def test_invalidate_removes_only_tagged_entries(backend):
+    async def scenario():
+        await backend.set("a", b"1", '"a"', 60, ["class:1", "overview"])
+        await backend.set("b", b"2", '"b"', 60, ["class:2"])
+        epoch = await backend.epoch()
+
+        await backend.invalidate_tags(["class:1"])
+
+        assert await backend.get("a") is None
+        assert await backend.get("b") == (b"2", '"b"')
+        assert await backend.epoch() == epoch + 1
+        assert await backend.invalidated_at() > 0
+
+        # Invalidar outra tag da entrada já removida não quebra nada
+        await backend.invalidate_tags(["overview"])
+        assert await backend.get("b") == (b"2", '"b"')
+
+    asyncio.run(scenario())
+
+
+def test_set_replaces_entry_and_its_tags(backend):
+    async def scenario():
+        await backend.set("a", b"1", '"1"', 60, ["old"])
+        await backend.set("a", b"2", '"2"', 60, ["new"])
+
+        await backend.invalidate_tags(["old"])
+        assert await backend.get("a") == (b"2", '"2"')
+        await backend.invalidate_tags(["new"])
+        assert await backend.get("a") is None
+
+    asyncio.run(scenario())
+
+
+def test_expired_entry_is_a_miss(backend):
+    async def scenario():
+        await backend.set("a", b"1", '"a"', -1, ["t"])
+        assert await backend.get("a") is None
+
+    asyncio.run(scenario())
+
+
+def test_lru_eviction(tmp_path, monkeypatch):
+    async def scenario(backend):
+        await backend.set("a", b"1", '"a"', 60, [])
+        await backend.set("b", b"2", '"b"', 60, [])
+        await backend.get("a")
+        await backend.set("c", b"3", '"c"', 60, [])
+
+        assert await backend.get("b") is None
+        assert await backend.get("a") is not None
+        assert await backend.get("c") is not None
+
+    asyncio.run(scenario(cache.MemoryCache(max_entries=2)))
+    # accessed_at do SQLite vem de time.time(): relógio que sempre avança
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(cache.time, "time", lambda: next(clock))
+    asyncio.run(scenario(cache.SQLiteCache(tmp_path / "cache.sqlite3", max_entries=2)))
+
+
+# =========================
+# cached_json_response
+# =========================
+
+def test_etag_and_not_modified(use_cache):
+    use_cache(cache.MemoryCache())
+
+    async def load():
+        return {"total": 3}
+
+    async def scenario():
+        first = await cache.cached_json_response(_request(), "k", ["t"], load)
+        etag = first.headers["ETag"]
+        assert first.status_code == 200 and first.headers["X-Cache"] == "MISS"
+
+        hit = await cache.cached_json_response(_request(("if-none-match", etag)), "k", ["t"], load)
+        assert hit.status_code == 304 and hit.body == b"" and hit.headers["X-Cache"] == "HIT"
+
+        weak = await cache.cached_json_response(_request(("if-none-match", f'"x", W/{etag}')), "k", ["t"], load)
+        assert weak.status_code == 304
+
+        other = await cache.cached_json_response(_request(("if-none-match", '"outro"')), "k", ["t"], load)
+        assert other.status_code == 200 and other.body == b'{"total":3}'
+
+    asyncio.run(scenario())
+
+
+def test_write_during_load_is_not_cached(use_cache):
+    """Guarda do epoch: uma invalidação durante a consulta impede guardar o resultado"""
+    backend = use_cache(cache.MemoryCache())
+    calls = []
+
+    async def load():
+        calls.append(1)
+        if len(calls) == 1:
+            await cache.invalidate("outra_tag")
+        return {"calls": len(calls)}
+
+    async def scenario():
+        await cache.cached_json_response(_request(), "k", ["t"], load)
+        assert await backend.get("k") is None
+        await cache.cached_json_response(_request(), "k", ["t"], load)
+        assert await backend.get("k") is not None
+
+    asyncio.run(scenario())
+
+
+def test_http_exception_is_not_cached(use_cache):
+    backend = use_cache(cache.MemoryCache())
+
+    async def load():
+        raise HTTPException(status_code=404, detail="não encontrado")
+
+    async def scenario():
+        with pytest.raises(HTTPException):
+            await cache.cached_json_response(_request(), "k", ["t"], load)
+        assert await backend.get("k") is None
+
+    asyncio.run(scenario())
+
+
+def test_tags_computed_from_payload(use_cache):
+    backend = use_cache(cache.MemoryCache())
+
+    async def load():
+        return [{"id": 1}, {"id": 2}]
+
+    async def scenario():
+        await cache.cached_json_response(
+            _request(), "k", lambda rows: [f"student:{row['id']}" for row in rows], load
+        )
+        await cache.invalidate("student:2")
+        assert await backend.get("k") is None
+
+    asyncio.run(scenario())
+
+
+def test_cache_off(monkeypatch):
+    monkeypatch.setattr(cache, "_cache", None)
+    monkeypatch.setattr(cache, "RESPONSE_CACHE_BACKEND", "off")
+
+    async def load():
+        return {"ok": True}
+
+    async def scenario():
+        response = await cache.cached_json_response(_request(), "k", ["t"], load)
+        assert response.headers["X-Cache"] == "MISS"
+        await cache.invalidate("t")
+
+    asyncio.run(scenario())
+    assert cache.get_response_cache() is None
+
+
+# =========================
+# Vários workers
+# =========================
+
+def test_write_in_other_worker_invalidates_sqlite_cache(tmp_path, use_cache):
+    path = tmp_path / "cache.sqlite3"
+    # Um SQLiteCache por worker, mesmo arquivo
+    worker_a, worker_b = cache.SQLiteCache(path), cache.SQLiteCache(path)
+    dados = {"name": "Ana"}
+
+    async def load():
+        return dict(dados)
+
+    async def read(worker):
+        use_cache(worker)
+        return await cache.cached_json_response(_request(), "student:1", ["student:1"], load)
+
+    async def scenario():
+        assert (await read(worker_a)).headers["X-Cache"] == "MISS"
+        assert (await read(worker_a)).headers["X-Cache"] == "HIT"
+
+        # Escrita no worker B
+        dados["name"] = "Ana Souza"
+        use_cache(worker_b)
+        await cache.invalidate("student:1")
+
+        response = await read(worker_a)
+        assert response.headers["X-Cache"] == "MISS"
+        assert response.body == b'{"name":"Ana Souza"}'
+
+    asyncio.run(scenario())
+
+
+def test_memory_backend_with_several_workers_uses_sqlite(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "_cache", None)
+    monkeypatch.setattr(cache, "RESPONSE_CACHE_BACKEND", "memory")
+    monkeypatch.setattr(cache, "RESPONSE_CACHE_PATH", tmp_path / "cache.sqlite3")
+    monkeypatch.setattr(cache, "WEB_CONCURRENCY", 2)
+
+    assert isinstance(cache.get_response_cache(), cache.SQLiteCache)
+
+
+def test_memory_backend_with_one_worker(monkeypatch):
+    monkeypatch.setattr(cache, "_cache", None)
+    monkeypatch.setattr(cache, "RESPONSE_CACHE_BACKEND", "memory")
+    monkeypatch.setattr(cache, "WEB_CONCURRENCY", 1)
+
+    assert isinstance(cache.get_response_cache(), cache.MemoryCache)
+
+
+# =========================
+# Réplica de leitura
+# =========================
+
+class _Result:
+    def __init__(self, row):
+        self.row = row
+
+    def scalar_one_or_none(self):
+        return self.row
+
+
+class _Session:
+    def __init__(self, row):
+        self.row = row
+
+    async def execute(self, statement):
+        return _Result(self.row)
+
+
+class _Replica:
+    async def execute(self, statement):
+        raise AssertionError("miss de rota CRUD não deve ler da réplica")
+
+
+def test_student_read_after_write_ignores_replica(use_cache, monkeypatch):
+    monkeypatch.setattr(cache, "READ_REPLICA_HOST", "replica")
+    use_cache(cache.MemoryCache())
+    student_id = uuid.uuid4()
+    student = SimpleNamespace(
+        id=student_id, class_id=uuid.uuid4(), name="Ana", access_code="1234", created_at=datetime(2024, 1, 1),
+    )
+
+    async def primary():
+        yield _Session(student)
+
+    async def replica():
+        yield _Replica()
+
+    app.dependency_overrides[get_db] = primary
+    app.dependency_overrides[get_read_db] = replica
+    try:
+        client = TestClient(app)
+        assert client.get(f"/students/{student_id}").json()["name"] == "Ana"
+
+        # Escrita no primário + invalidação (como em update_student)
+        student.name = "Ana Souza"
+        asyncio.run(cache.invalidate(f"student:{student_id}"))
+
+        response = client.get(f"/students/{student_id}")
+        assert response.headers["X-Cache"] == "MISS"
+        assert response.json()["name"] == "Ana Souza"
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_replica_read_right_after_invalidation_is_not_stored(use_cache, monkeypatch):
+    monkeypatch.setattr(cache, "READ_REPLICA_HOST", "replica")
+    monkeypatch.setattr(cache, "RESPONSE_CACHE_REPLICA_LAG", 60)
+    backend = use_cache(cache.MemoryCache())
+    # Réplica ainda com o valor anterior à escrita
+    replica = {"total": 1}
+
+    async def load():
+        return dict(replica)
+
+    async def read():
+        return await cache.cached_json_response(
+            _request(), "statistics:overview", ["overview"], load, from_replica=True
+        )
+
+    async def scenario():
+        await read()
+        assert (await read()).headers["X-Cache"] == "HIT"
+
+        await cache.invalidate("overview")
+        # Lido dentro da janela de atraso: servido, mas não guardado
+        assert (await read()).headers["X-Cache"] == "MISS"
+        replica["total"] = 2
+        response = await read()
+        assert response.headers["X-Cache"] == "MISS"
+        assert response.body == b'{"total":2}'
+
+        # Passada a janela, volta a cachear
+        backend._invalidated_at -= 60
+        await read()
+        assert (await read()).headers["X-Cache"] == "HIT"
+
+    asyncio.run(scenario())
@@ -0,0 +1,43 @@
+"""correlation_matrix contra scipy.stats.pearsonr par a par"""
+import numpy as np
+import pytest
+from scipy import stats
+
+from src.analysis.causal_stats import correlation_matrix
+
+
+def _reference_correlation(matrix: np.ndarray):
+    """Pearson de cada par de colunas só nas linhas em que as duas existem"""
+    k = matrix.shape[1]
+    r, p, n = np.full((k, k), np.nan), np.full((k, k), np.nan), np.zeros((k, k))
+    for i in range(k):
+        for j in range(k):
+            complete = ~np.isnan(matrix[:, i]) & ~np.isnan(matrix[:, j])
+            n[i, j] = complete.sum()
+            if n[i, j] >= 3:
+                r[i, j], p[i, j] = stats.pearsonr(matrix[complete, i], matrix[complete, j])
+    return r, p, n
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_correlation_matrix_matches_pearsonr(seed):
+    rng = np.random.default_rng(seed)
+    base = rng.normal(size=(120, 1))
+    matrix = np.hstack([
+        base + rng.normal(scale=0.5, size=(120, 1)),
+        -base + rng.normal(scale=2.0, size=(120, 1)),
+        rng.normal(size=(120, 1)),
+        rng.integers(0, 2, size=(120, 1)).astype(float),  # fator binário
+    ])
+    matrix[rng.random(matrix.shape) < 0.2] = np.nan
+    # Coluna quase vazia: pares com menos de 3 linhas completas ficam NaN
+    matrix[:, 3][3:] = np.nan
+
+    r, p, n = correlation_matrix(matrix)
+    r_ref, p_ref, n_ref = _reference_correlation(matrix)
+
+    np.testing.assert_array_equal(n, n_ref)
+    off_diagonal = ~np.eye(matrix.shape[1], dtype=bool)
+    np.testing.assert_allclose(r[off_diagonal], r_ref[off_diagonal], rtol=1e-9, atol=1e-12, equal_nan=True)
+    np.testing.assert_allclose(p[off_diagonal], p_ref[off_diagonal], rtol=1e-6, atol=1e-12, equal_nan=True)
+    np.testing.assert_allclose(np.diag(r)[np.diag(n) >= 3], 1.0)
@@ -0,0 +1,117 @@
+"""CohortIndex.evaluate contra um avaliador de referência sobre conjuntos de posições"""
+import random
+
+import numpy as np
+import pytest
+
+from src.cohort_index import COHORT_EXPR_MAX_DEPTH, CohortIndex
+from src.risk_scoring import FATORES, FATOR_BIT
+
+TURMAS = ("1A", "1B", "2A")
+CORES = ("Branca", "Parda", "Preta", None)
+
+
+def _random_index(rng: random.Random, size: int):
+    masks = np.array([rng.getrandbits(len(FATORES)) for _ in range(size)], dtype=np.uint16)
+    turmas = [rng.choice(TURMAS) for _ in range(size)]
+    cores = [rng.choice(CORES) for _ in range(size)]
+    aluno_ids = rng.sample(range(1, 10 * size + 10), size)
+    return CohortIndex(aluno_ids, masks, turmas, cores), masks, turmas, cores
+
+
+def _random_expr(rng: random.Random, depth: int = 0):
+    kind = rng.choice(("fator", "turma", "cor") if depth >= 3 else ("fator", "turma", "cor", "not", "and", "or", "or"))
+    if kind == "fator":
+        return rng.choice(FATORES)
+    if kind == "turma":
+        return {"turma": rng.choice(TURMAS + ("9Z",))}
+    if kind == "cor":
+        return {"cor_raca": rng.choice(("Branca", "Parda", "Preta", "Amarela"))}
+    if kind == "not":
+        return {"not": _random_expr(rng, depth + 1)}
+    return {kind: [_random_expr(rng, depth + 1) for _ in range(rng.randint(1, 3))]}
+
+
+def _reference(expr, masks, turmas, cores) -> set:
+    """Posições dos alunos que satisfazem `expr`, avaliando aluno a aluno"""
+    universe = set(range(len(masks)))
+    if isinstance(expr, str):
+        return {i for i in universe if masks[i] & FATOR_BIT[expr]}
+    (op, arg), = expr.items()
+    if op == "turma":
+        return {i for i in universe if turmas[i] == arg}
+    if op == "cor_raca":
+        return {i for i in universe if cores[i] == arg}
+    if op == "not":
+        return universe - _reference(arg, masks, turmas, cores)
+    sets = [_reference(sub, masks, turmas, cores) for sub in arg]
+    return set.intersection(*sets) if op == "and" else set.union(*sets)
+
+
+@pytest.mark.parametrize("size", [1, 7, 8, 13, 64, 203])
+def test_evaluate_matches_reference(size):
+    rng = random.Random(size)
+    index, masks, turmas, cores = _random_index(rng, size)
+    for _ in range(200):
+        expr = _random_expr(rng)
+        bits = index.evaluate(expr)
+        expected = _reference(expr, masks, turmas, cores)
+
+        assert index.count(bits) == len(expected), expr
+        assert index.ids(bits) == [index.aluno_ids[i] for i in sorted(expected)], expr
+        # Bits de preenchimento do último byte continuam zerados (inclusive sob "not")
+        assert not np.unpackbits(bits)[size:].any(), expr
+
+
+def test_not_keeps_padding_bits_clear():
+    index, _, _, _ = _random_index(random.Random(0), 13)
+    bits = index.evaluate({"not": {"turma": "inexistente"}})
+    assert index.count(bits) == 13
+    assert not np.unpackbits(bits)[13:].any()
+    assert index.count(index.evaluate({"not": {"not": {"turma": "inexistente"}}})) == 0
+
+
+def test_ids_limit():
+    index, masks, turmas, cores = _random_index(random.Random(1), 50)
+    expr = {"or": ["trabalho", "baixa_renda"]}
+    expected = [index.aluno_ids[i] for i in sorted(_reference(expr, masks, turmas, cores))]
+    assert index.ids(index.evaluate(expr), limit=5) == expected[:5]
+
+
+def test_empty_index():
+    index = CohortIndex([], np.zeros(0, dtype=np.uint16), [], [])
+    assert index.count(index.evaluate({"not": "trabalho"})) == 0
+    assert index.ids(index.evaluate("trabalho")) == []
+
+
+@pytest.mark.parametrize("expr", [
+    "fator_inexistente",
+    {"xor": ["trabalho"]},
+    {"and": []},
+    {"or": "trabalho"},
+    {"turma": "1A", "cor_raca": "Parda"},
+    42,
+    {"turma": ["1A"]},
+    {"cor_raca": {"not": "Parda"}},
+])
+def test_invalid_expressions(expr):
+    index, _, _, _ = _random_index(random.Random(2), 10)
+    with pytest.raises(ValueError):
+        index.evaluate(expr)
+
+
+def test_nesting_limit():
+    index, _, _, _ = _random_index(random.Random(3), 10)
+
+    def nested(depth):
+        expr = "trabalho"
+        for _ in range(depth):
+            expr = {"not": expr}
+        return expr
+
+    index.evaluate(nested(COHORT_EXPR_MAX_DEPTH))
+    with pytest.raises(ValueError):
+        index.evaluate(nested(COHORT_EXPR_MAX_DEPTH + 1))
+    # Bem além do limite de recursão do Python: ainda ValueError (400), não RecursionError
+    with pytest.raises(ValueError):
+        index.evaluate(nested(5000))
@@ -0,0 +1,72 @@
+"""compute_trends contra o cálculo série a série"""
+import math
+import random
+
+import numpy as np
+import pytest
+
+from src.grade_trends import BIMESTRES, INCLINACAO_ALERTA, QUEDA_ALERTA, compute_trends
+
+
+def _reference(serie):
+    """Tendência de uma série (lista de notas, None = bimestre sem nota)"""
+    pontos = [(b, nota) for b, nota in zip(BIMESTRES, serie) if nota is not None]
+    n = len(pontos)
+    if not n:
+        return {"n_bimestres": 0, "primeira_nota": None, "ultima_nota": None, "inclinacao": None,
+                "variancia": None, "queda_maxima": None, "alerta_queda": False}
+
+    media_x = sum(b for b, _ in pontos) / n
+    media_y = sum(nota for _, nota in pontos) / n
+    sxx = sum((b - media_x) ** 2 for b, _ in pontos)
+    inclinacao = sum((b - media_x) * (nota - media_y) for b, nota in pontos) / sxx if sxx > 0 else None
+    variancia = sum((nota - media_y) ** 2 for _, nota in pontos) / n
+    # Quedas entre notas consecutivas existentes (bimestres vazios no meio são pulados)
+    quedas = [anterior - atual for (_, anterior), (_, atual) in zip(pontos, pontos[1:])]
+    queda_maxima = max(quedas) if quedas else None
+    alerta = n >= 2 and (
+        (queda_maxima is not None and queda_maxima >= QUEDA_ALERTA)
+        or (inclinacao is not None and inclinacao <= INCLINACAO_ALERTA)
+    )
+    return {
+        "n_bimestres": n,
+        "primeira_nota": pontos[0][1],
+        "ultima_nota": pontos[-1][1],
+        "inclinacao": inclinacao,
+        "variancia": variancia,
+        "queda_maxima": queda_maxima,
+        "alerta_queda": alerta,
+    }
+
+
+def _assert_close(actual, expected, context):
+    if expected is None:
+        assert math.isnan(actual), context
+    else:
+        assert actual == pytest.approx(expected, abs=1e-9), context
+
+
+def _random_series(rng: random.Random, count: int):
+    series = [[None if rng.random() < 0.3 else round(rng.uniform(0, 10), 1) for _ in BIMESTRES] for _ in range(count)]
+    # Casos de borda: vazia, uma nota, queda atravessando bimestres vazios
+    series += [[None] * 4, [None, 7.0, None, None], [9.0, None, None, 5.0], [8.0, None, 6.0, None], [5.0, 5.0, 5.0, 5.0]]
+    return series
+
+
+def test_compute_trends_matches_reference():
+    series = _random_series(random.Random(3), 3000)
+    notas = np.array([[np.nan if v is None else v for v in serie] for serie in series], dtype=np.float64)
+    trends = compute_trends(notas)
+
+    for i, serie in enumerate(series):
+        expected = _reference(serie)
+        assert trends["n_bimestres"][i] == expected["n_bimestres"], serie
+        assert bool(trends["alerta_queda"][i]) == expected["alerta_queda"], serie
+        for key in ("primeira_nota", "ultima_nota", "inclinacao", "variancia", "queda_maxima"):
+            _assert_close(trends[key][i], expected[key], (serie, key))
+
+
+def test_drop_across_gap():
+    trends = compute_trends(np.array([[9.0, np.nan, np.nan, 5.0]]))
+    assert trends["queda_maxima"][0] == pytest.approx(4.0)
+    assert trends["alerta_queda"][0]
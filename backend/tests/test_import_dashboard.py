@@ -0,0 +1,146 @@
+"""
+load_alunos e o job de tendências contra um Postgres de verdade (TEST_DATABASE_URL=postgresql+asyncpg://...)
+Cada teste cria as tabelas num schema próprio dentro de uma transação desfeita no fim.
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from import_dashboard import load_alunos, resolve_escolas, resolve_turmas
+from src.database import Base
+from src.grade_trends import DESMARCAR_SQL, update_tendencias
+from src.models_dashboard import Aluno, NotaBimestral, TendenciaNota, TendenciaPendente
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL não configurada")
+
+
+def _aluno(aluno_id: int, cpf, nome: str, nota: float):
+    row = {"id": aluno_id, "cpf_aluno": cpf, "nome_aluno": nome, "turma_nome": "1A", "matematica_1bim": nota}
+    return ("Escola Teste", "Rua 1", "1º Ano", row)
+
+
+async def _importar(db: AsyncSession, alunos: list) -> int:
+    escola_ids = await resolve_escolas(db, alunos)
+    turma_ids = await resolve_turmas(db, alunos, escola_ids)
+    upserted = await load_alunos(db, alunos, escola_ids, turma_ids)
+    # ON COMMIT DROP: a transação do teste nunca faz commit
+    await db.execute(text("DROP TABLE alunos_import"))
+    return upserted
+
+
+def _run(scenario):
+    async def main():
+        engine = create_async_engine(TEST_DATABASE_URL)
+        try:
+            async with engine.connect() as conn:
+                await conn.begin()
+                schema = f"test_import_{uuid.uuid4().hex[:8]}"
+                await conn.execute(text(f"CREATE SCHEMA {schema}"))
+                await conn.execute(text(f"SET LOCAL search_path TO {schema}, public"))
+                await conn.run_sync(Base.metadata.create_all)
+                try:
+                    await scenario(AsyncSession(bind=conn, expire_on_commit=False))
+                finally:
+                    await conn.rollback()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+async def _alunos(db: AsyncSession) -> dict:
+    result = await db.execute(select(Aluno.id, Aluno.cpf_aluno, Aluno.nome_aluno).order_by(Aluno.id))
+    return {aluno_id: (cpf, nome) for aluno_id, cpf, nome in result.all()}
+
+
+async def _notas(db: AsyncSession) -> dict:
+    return dict((await db.execute(select(NotaBimestral.aluno_id, NotaBimestral.nota))).all())
+
+
+def test_cpf_added_to_student_imported_without_cpf():
+    async def scenario(db):
+        await _importar(db, [_aluno(1, None, "Ana", 5.0)])
+        await _importar(db, [_aluno(1, "111.111.111-11", "Ana Souza", 6.0)])
+
+        assert await _alunos(db) == {1: ("111.111.111-11", "Ana Souza")}
+        assert await _notas(db) == {1: 6.0}
+
+    _run(scenario)
+
+
+def test_file_id_taken_by_another_cpf_gets_new_id():
+    async def scenario(db):
+        await _importar(db, [_aluno(2, "222.222.222-22", "Bruno", 7.0)])
+        await _importar(db, [_aluno(2, "333.333.333-33", "Carla", 8.0), _aluno(3, None, "Davi", 4.0)])
+
+        alunos = await _alunos(db)
+        assert alunos[2] == ("222.222.222-22", "Bruno")
+        assert alunos[3] == (None, "Davi")
+        novos = [aluno_id for aluno_id, (cpf, _) in alunos.items() if cpf == "333.333.333-33"]
+        assert len(novos) == 1 and novos[0] > 3
+        assert await _notas(db) == {2: 7.0, 3: 4.0, novos[0]: 8.0}
+
+    _run(scenario)
+
+
+def test_reimport_by_cpf_keeps_database_id():
+    async def scenario(db):
+        await _importar(db, [_aluno(4, "444.444.444-44", "Eva", 5.0)])
+        # Mesmo CPF com outro id no arquivo: atualiza a linha existente
+        await _importar(db, [_aluno(9, "444.444.444-44", "Eva Lima", 9.0)])
+
+        assert await _alunos(db) == {4: ("444.444.444-44", "Eva Lima")}
+
+    _run(scenario)
+
+
+async def _pendentes(db: AsyncSession) -> dict:
+    result = await db.execute(select(TendenciaPendente.aluno_id, TendenciaPendente.disciplina, TendenciaPendente.versao))
+    return {(aluno_id, disciplina): versao for aluno_id, disciplina, versao in result.all()}
+
+
+def test_trends_job_reads_only_marked_series():
+    async def scenario(db):
+        await _importar(db, [_aluno(5, "555.555.555-55", "Fabi", 5.0), _aluno(6, "666.666.666-66", "Gil", 6.0)])
+        assert set(await _pendentes(db)) == {(5, "matematica"), (6, "matematica")}
+
+        assert (await update_tendencias(db))["series"] == 2
+        assert await _pendentes(db) == {}
+        assert (await update_tendencias(db))["series"] == 0
+
+        # Reimportação: só a série com nota alterada volta para a fila
+        await _importar(db, [_aluno(5, "555.555.555-55", "Fabi", 5.0), _aluno(6, "666.666.666-66", "Gil", 3.0)])
+        assert set(await _pendentes(db)) == {(6, "matematica")}
+        assert (await update_tendencias(db))["series"] == 1
+        tendencia = await db.get(TendenciaNota, (6, "matematica"))
+        assert tendencia.ultima_nota == 3.0
+
+        # Nota apagada: a série ficou vazia e a tendência sai
+        await _importar(db, [_aluno(6, "666.666.666-66", "Gil", None)])
+        assert set(await _pendentes(db)) == {(6, "matematica")}
+        await update_tendencias(db)
+        assert await db.get(TendenciaNota, (6, "matematica"), populate_existing=True) is None
+        assert await _pendentes(db) == {}
+
+    _run(scenario)
+
+
+def test_stale_mark_is_not_removed():
+    async def scenario(db):
+        await _importar(db, [_aluno(7, "777.777.777-77", "Hugo", 5.0)])
+        lida = (await _pendentes(db))[(7, "matematica")]
+        # Outra edição renova a marca depois da leitura do job: a marca lida já não existe
+        await _importar(db, [_aluno(7, "777.777.777-77", "Hugo", 6.0)])
+        renovada = (await _pendentes(db))[(7, "matematica")]
+        assert renovada != lida
+
+        await db.execute(DESMARCAR_SQL, {"aluno_ids": [7], "disciplinas": ["matematica"], "versoes": [lida]})
+        assert await _pendentes(db) == {(7, "matematica"): renovada}
+
+    _run(scenario)
@@ -0,0 +1,59 @@
+"""Cache em disco das respostas do Gemini: chave, TTL e eviction por tamanho"""
+import asyncio
+
+from src import llm_cache as module
+from src.llm_cache import LLMResponseCache, cache_key
+
+
+def test_cache_key_depends_on_every_part():
+    base = cache_key("gemini-2.5-flash", "sistema", "prompt", {"temperature": 0.2, "maxOutputTokens": 100})
+    # A ordem das chaves da configuração não importa
+    assert base == cache_key("gemini-2.5-flash", "sistema", "prompt", {"maxOutputTokens": 100, "temperature": 0.2})
+    assert base != cache_key("gemini-2.5-pro", "sistema", "prompt", {"temperature": 0.2, "maxOutputTokens": 100})
+    assert base != cache_key("gemini-2.5-flash", None, "prompt", {"temperature": 0.2, "maxOutputTokens": 100})
+    assert base != cache_key("gemini-2.5-flash", "sistema", "prompt!", {"temperature": 0.2, "maxOutputTokens": 100})
+    assert base != cache_key("gemini-2.5-flash", "sistema", "prompt", {"temperature": 0.3, "maxOutputTokens": 100})
+
+
+def test_get_put_and_stats(tmp_path):
+    cache = LLMResponseCache(tmp_path / "llm.sqlite3", ttl=60, max_bytes=1 << 20)
+    value = {"candidates": [{"content": {"parts": [{"text": "ação"}]}}]}
+
+    assert cache.get("k") is None
+    cache.put("k", "gemini", value)
+    assert cache.get("k") == value
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1 and cache.stats["writes"] == 1
+
+    # Outro processo no mesmo arquivo enxerga a entrada
+    other = LLMResponseCache(tmp_path / "llm.sqlite3", ttl=60, max_bytes=1 << 20)
+    assert asyncio.run(other.get_async("k")) == value
+
+
+def test_expired_entry_is_removed(tmp_path, monkeypatch):
+    cache = LLMResponseCache(tmp_path / "llm.sqlite3", ttl=60, max_bytes=1 << 20)
+    asyncio.run(cache.put_async("k", "gemini", {"a": 1}))
+
+    now = module.time.time()
+    monkeypatch.setattr(module.time, "time", lambda: now + 61)
+    assert cache.get("k") is None
+    assert cache.stats["expired"] == 1
+    assert cache.metrics()["entries"] == 0
+
+
+def test_eviction_keeps_recently_used(tmp_path, monkeypatch):
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(module.time, "time", lambda: next(clock))
+    entry = {"text": "x" * 90}
+    size = len(module.json.dumps(entry))
+    cache = LLMResponseCache(tmp_path / "llm.sqlite3", ttl=10_000, max_bytes=size * 3)
+
+    for key in ("a", "b", "c"):
+        cache.put(key, "gemini", entry)
+    cache.get("a")
+    cache.put("d", "gemini", entry)
+
+    # Passou do limite: remove as menos acessadas até 90% dele (b e c)
+    assert cache.get("b") is None and cache.get("c") is None
+    assert cache.get("a") == entry and cache.get("d") == entry
+    assert cache.stats["evictions"] == 2
+    assert cache._total_bytes == size * 2
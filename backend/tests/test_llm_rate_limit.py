@@ -0,0 +1,144 @@
+"""Limite de taxa das chamadas a LLM: baldes RPM/TPM, 429 e vagas de concorrência"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src import llm_rate_limit as module
+from src.llm_rate_limit import LLMRateLimiter, is_rate_limited, parse_rate_limits, retry_after_of
+
+
+def test_parse_rate_limits():
+    assert parse_rate_limits("") == {}
+    assert parse_rate_limits(" gemini-2.5-flash=1000:1000000, gpt-4o=60 ,") == {
+        "gemini-2.5-flash": (1000.0, 1000000.0),
+        "gpt-4o": (60.0, 0.0),
+    }
+
+
+def test_retry_after_and_rate_limited():
+    http_429 = Exception("quota")
+    http_429.response = SimpleNamespace(status_code=429, headers={"retry-after": "7"})
+    assert is_rate_limited(http_429)
+    assert retry_after_of(http_429) == 7.0
+
+    gemini = type("ResourceExhausted", (Exception,), {})("429 retry_delay { seconds: 12 }")
+    assert is_rate_limited(gemini)
+    assert retry_after_of(gemini) == 12.0
+
+    assert not is_rate_limited(ValueError("outro erro"))
+    assert retry_after_of(ValueError("outro erro")) is None
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio de parede controlado pelo teste (time.time do módulo)"""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(module.time, "time", lambda: now.value)
+    return now
+
+
+@pytest.fixture(params=["local", "shared"])
+def buckets(request, tmp_path):
+    if request.param == "shared":
+        return module._SharedBuckets(tmp_path / "rate.sqlite3")
+    return module._LocalBuckets()
+
+
+def test_rpm_bucket(buckets, clock):
+    limits = (60, 0)
+    for _ in range(60):
+        assert buckets.reserve("m", limits, 10) == 0
+    # Balde vazio: 1 requisição por segundo
+    assert buckets.reserve("m", limits, 10) == pytest.approx(1.0)
+    clock.value += 1
+    assert buckets.reserve("m", limits, 10) == 0
+
+
+def test_tpm_bucket_and_adjust(buckets, clock):
+    limits = (0, 600)
+    assert buckets.reserve("m", limits, 500) == 0
+    # Sem saldo, nada é consumido: espera (200 - 100) / 10 tokens/s
+    assert buckets.reserve("m", limits, 200) == pytest.approx(10.0)
+    assert buckets.reserve("m", limits, 200) == pytest.approx(10.0)
+
+    # Uso real menor que o reservado devolve tokens
+    buckets.adjust("m", limits, -100)
+    assert buckets.reserve("m", limits, 200) == 0
+
+    # Pedido maior que a capacidade passa com o balde cheio
+    clock.value += 60
+    assert buckets.reserve("m", limits, 5000) == 0
+
+
+def test_block_pauses_model(buckets, clock):
+    limits = (0, 0)
+    buckets.block("m", limits, 30)
+    assert buckets.reserve("m", limits, 1) == pytest.approx(30.0)
+    assert buckets.reserve("outro", limits, 1) == 0
+    clock.value += 30
+    assert buckets.reserve("m", limits, 1) == 0
+
+
+def test_shared_buckets_between_workers(tmp_path, clock):
+    worker_a = module._SharedBuckets(tmp_path / "rate.sqlite3")
+    worker_b = module._SharedBuckets(tmp_path / "rate.sqlite3")
+    limits = (2, 0)
+    assert worker_a.reserve("m", limits, 1) == 0
+    assert worker_b.reserve("m", limits, 1) == 0
+    assert worker_a.reserve("m", limits, 1) > 0
+
+    worker_b.block("outro", limits, 5)
+    assert worker_a.reserve("outro", limits, 1) == pytest.approx(5.0)
+
+
+def test_slot_limits_concurrency():
+    limiter = LLMRateLimiter({}, (0, 0), max_concurrency=2)
+    running = []
+    peak = []
+
+    async def call(model):
+        async with limiter.slot(model, 10):
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.pop()
+
+    async def scenario():
+        await asyncio.gather(*(call(f"m{i % 3}") for i in range(8)))
+
+    asyncio.run(scenario())
+    assert max(peak) == 2
+    metrics = limiter.metrics()["models"]
+    assert sum(stats["requests"] for stats in metrics.values()) == 8
+    assert all(stats["queued"] == 0 and stats["in_flight"] == 0 for stats in metrics.values())
+
+
+def test_throttled_model_does_not_hold_concurrency_slot():
+    limiter = LLMRateLimiter({}, (0, 0), max_concurrency=1)
+    order = []
+
+    async def call(model):
+        async with limiter.slot(model, 1):
+            order.append(model)
+
+    async def scenario():
+        await limiter.throttled_async("pausado", 0.2)
+        paused = asyncio.create_task(call("pausado"))
+        await asyncio.sleep(0.01)
+        # Com a única vaga livre, o outro modelo não espera a pausa de 429
+        await asyncio.wait_for(call("livre"), timeout=0.1)
+        await paused
+
+    asyncio.run(scenario())
+    assert order == ["livre", "pausado"]
+    assert limiter.metrics()["models"]["pausado"]["throttled_429"] == 1
+
+
+def test_slot_sync():
+    limiter = LLMRateLimiter({"m": (60, 0)}, (0, 0), max_concurrency=1)
+    with limiter.slot_sync("m", 1):
+        assert limiter.metrics()["models"]["m"]["in_flight"] == 1
+    stats = limiter.metrics()["models"]["m"]
+    assert (stats["rpm"], stats["tpm"]) == (60, None)
+    assert (stats["requests"], stats["queued"], stats["in_flight"]) == (1, 0, 0)
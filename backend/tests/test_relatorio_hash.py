@@ -0,0 +1,68 @@
+"""Estabilidade do relatorio_data_hash (reaproveitamento das análises por turma)"""
+import copy
+import json
+from pathlib import Path
+
+import pytest
+
+from src.analysis import causal_analysis
+from src.analysis.causal_analysis import extract_relevant_data, relatorio_data_hash
+from src.analysis.causal_stats import compute_causal_stats
+
+DASHBOARD_PATH = Path(__file__).parent.parent / "utils" / "dados_dashboard.json"
+
+
+@pytest.fixture(scope="module")
+def dashboard():
+    return json.loads(DASHBOARD_PATH.read_text(encoding="utf-8"))
+
+
+def test_hash_ignores_metadata_and_key_order(dashboard):
+    data = extract_relevant_data(dashboard)
+    reordenado = json.loads(json.dumps(data, sort_keys=True))
+    reordenado = dict(reversed(list(reordenado.items())))
+    reordenado["metadata"] = {"gerado_em": "outra data"}
+    assert relatorio_data_hash(data) == relatorio_data_hash(reordenado)
+
+
+def test_hash_changes_with_data(dashboard):
+    turma = dashboard["dados_por_turma"][0]["turma"]
+    data = extract_relevant_data(dashboard, turma=turma)
+    alterado = copy.deepcopy(data)
+    alterado["turmas"][0]["total_alunos"] += 1
+    assert relatorio_data_hash(data) != relatorio_data_hash(alterado)
+
+
+def test_hash_with_stats_is_deterministic(dashboard):
+    turma = dashboard["dados_por_turma"][0]["turma"]
+    data = extract_relevant_data(dashboard, turma=turma)
+    # Cálculos independentes (bootstrap com semente fixa) dão o mesmo hash
+    primeiro = relatorio_data_hash(data, compute_causal_stats(copy.deepcopy(dashboard)), turma)
+    segundo = relatorio_data_hash(data, compute_causal_stats(copy.deepcopy(dashboard)), turma)
+    assert primeiro == segundo
+    # As estatísticas entram no hash quando vão no prompt
+    assert primeiro != relatorio_data_hash(data, turma=turma)
+
+
+def test_hash_changes_with_prompt(dashboard, monkeypatch):
+    turma = dashboard["dados_por_turma"][0]["turma"]
+    data = extract_relevant_data(dashboard, turma=turma)
+    base = relatorio_data_hash(data, turma=turma)
+
+    # A Parte 1 usa outra system instruction
+    assert base != relatorio_data_hash(data)
+
+    monkeypatch.setattr(causal_analysis, "INSTRUCAO_SISTEMA_TURMA", causal_analysis.INSTRUCAO_SISTEMA_TURMA + " Seja breve.")
+    assert relatorio_data_hash(data, turma=turma) != base
+    monkeypatch.undo()
+
+    # Orçamento menor reduz a amostra de alunos no prompt
+    monkeypatch.setattr(causal_analysis, "PROMPT_TOKEN_BUDGET", 1)
+    assert relatorio_data_hash(data, turma=turma) != base
+    monkeypatch.undo()
+
+    monkeypatch.setattr(causal_analysis, "AMOSTRA_COLUNAS", {"id": "id"})
+    assert relatorio_data_hash(data, turma=turma) != base
+    monkeypatch.undo()
+
+    assert relatorio_data_hash(data, turma=turma) == base
@@ -0,0 +1,92 @@
+"""factor_masks e score_masks contra o cálculo aluno a aluno"""
+import random
+
+import numpy as np
+
+from src.aggregates import CORES_PRETOS_PARDOS
+from src.risk_scoring import (
+    FATORES, FATOR_BIT, LIMIAR_ALTO, LIMIAR_MEDIO, PESOS, PESO_MAXIMO, fatores_of, factor_masks, score_masks,
+)
+
+
+def _random_columns(rng: random.Random, size: int) -> dict:
+    def maybe(value):
+        return None if rng.random() < 0.15 else value
+
+    return {
+        # Inclui os limiares exatos (3, 5, 75, 1500, 60) para pegar < vs <=
+        "media_geral": [maybe(rng.choice([rng.uniform(0, 10), 3.0, 5.0])) for _ in range(size)],
+        "frequencia_percentual": [maybe(rng.choice([rng.uniform(40, 100), 75.0])) for _ in range(size)],
+        "trabalha_fora": [maybe(rng.choice(["Sim", "Não"])) for _ in range(size)],
+        "renda_familiar": [maybe(rng.choice([rng.uniform(500, 5000), 1500.0])) for _ in range(size)],
+        "tempo_deslocamento_min": [maybe(rng.choice([rng.randint(5, 120), 60])) for _ in range(size)],
+        "seguranca_alimentar": [maybe(rng.choice(["Segura", "Insegurança leve", "Insegurança grave"])) for _ in range(size)],
+        "acesso_internet": [maybe(rng.choice(["Sim", "Não"])) for _ in range(size)],
+        "cor_raca": [maybe(rng.choice(["Branca", "Amarela", *CORES_PRETOS_PARDOS])) for _ in range(size)],
+    }
+
+
+def _reference_fatores(row: dict) -> set:
+    media, frequencia = row["media_geral"], row["frequencia_percentual"]
+    renda, deslocamento = row["renda_familiar"], row["tempo_deslocamento_min"]
+    fatores = set()
+    if row["trabalha_fora"] == "Sim":
+        fatores.add("trabalho")
+    if renda is not None and renda < 1500:
+        fatores.add("baixa_renda")
+    if deslocamento is not None and deslocamento > 60:
+        fatores.add("deslocamento_longo")
+    if row["seguranca_alimentar"] not in (None, "Segura"):
+        fatores.add("inseg_alimentar")
+    if row["acesso_internet"] == "Não":
+        fatores.add("sem_internet")
+    if row["cor_raca"] in CORES_PRETOS_PARDOS:
+        fatores.add("pretos_pardos_indigenas")
+    if media is not None and media < 3:
+        fatores.add("desempenho_critico")
+    if media is not None and 3 <= media < 5:
+        fatores.add("desempenho_baixo")
+    if frequencia is not None and frequencia < 75:
+        fatores.add("frequencia_baixa")
+    return fatores
+
+
+def test_factor_masks_matches_reference():
+    rng = random.Random(7)
+    columns = _random_columns(rng, 2000)
+    masks = factor_masks(columns)
+
+    assert masks.dtype == np.uint16
+    for i, mask in enumerate(masks.tolist()):
+        row = {name: values[i] for name, values in columns.items()}
+        assert set(fatores_of(mask)) == _reference_fatores(row), row
+
+
+def test_score_masks_matches_reference():
+    # Todas as combinações de fatores possíveis
+    masks = np.arange(1 << len(FATORES), dtype=np.uint16)
+    scores, niveis = score_masks(masks)
+
+    for mask, score, nivel in zip(masks.tolist(), scores.tolist(), niveis.tolist()):
+        esperado = round(sum(PESOS[fator] for fator in FATORES if mask & FATOR_BIT[fator]) * 100.0 / PESO_MAXIMO, 1)
+        assert score == esperado
+        if score >= LIMIAR_ALTO or mask & FATOR_BIT["desempenho_critico"]:
+            assert nivel == "Alto"
+        elif score >= LIMIAR_MEDIO:
+            assert nivel == "Médio"
+        else:
+            assert nivel == "Baixo"
+
+
+def test_score_never_exceeds_100():
+    # desempenho_critico e desempenho_baixo são exclusivos em factor_masks
+    rng = random.Random(11)
+    scores, _ = score_masks(factor_masks(_random_columns(rng, 2000)))
+    assert scores.min() >= 0 and scores.max() <= 100
+
+
+def test_empty_input():
+    columns = {name: [] for name in _random_columns(random.Random(0), 0)}
+    masks = factor_masks(columns)
+    scores, niveis = score_masks(masks)
+    assert len(masks) == len(scores) == len(niveis) == 0